@@ -1,23 +1,133 @@
 from agency_swarm.tools import BaseTool
-from pydantic import Field
-from typing import List, Dict, Any, Optional
+from pydantic import Field, validator
+from typing import List, Dict, Any, Optional, Tuple
 import numpy as np
 import hdbscan
 from sklearn.preprocessing import normalize
 import json
+import logging
+import time
 from pathlib import Path
 
+from shared.qdrant_clients import RetryingClient, get_client, resolve_collection
+
+from .cluster_utils import (
+    BIRCH_THRESHOLD,
+    CLUSTER_BACKENDS,
+    CLUSTER_MODEL_FILENAME,
+    CLUSTER_MODES,
+    CLUSTER_RESULTS_FILENAME,
+    GRAPH_METHODS,
+    REDUCER_FILENAME,
+    REDUCTION_METHODS,
+    REPRESENTATIVES_PER_CLUSTER,
+    RESULTS_CACHE_DIRNAME,
+    STREAM_CODEBOOKS,
+    STREAM_PAGE_SIZE,
+    SWEEP_QUALITY_SAMPLE,
+    ClusterModel,
+    ClusterResults,
+    EmbeddingReducer,
+    ResultsCache,
+    StreamingClusterer,
+    as_embedding_matrix,
+    attach_shared_embeddings,
+    best_sweep_result,
+    choose_backend,
+    graph_cluster,
+    hdbscan_algorithm,
+    knn_graph,
+    load_npy_embeddings,
+    normalize_rows_inplace,
+    relabel_by_size,
+    results_fingerprint,
+    sweep_hdbscan
+)
+
+from .qdrant_utils import (
+    CLUSTER_PAYLOAD_FIELDS,
+    Snapshot,
+    fetch_points,
+    iter_point_batches,
+    parallel_fetch,
+    payload_selector
+)
+
+from .event_utils import (
+    CAPTURE_TIME_KEYS,
+    EVENT_GAP_FACTOR,
+    EVENT_MAX_GAP_SEC,
+    EVENT_MIN_GAP_SEC,
+    FILE_TIME_KEYS,
+    capture_times,
+    cluster_events,
+    segment_events
+)
+
+logger = logging.getLogger(__name__)
+
+# Payload fields read on top of CLUSTER_PAYLOAD_FIELDS for event segmentation
+EVENT_PAYLOAD_FIELDS = ('exif_data',) + CAPTURE_TIME_KEYS + FILE_TIME_KEYS
+
 class ClusterTool(BaseTool):
     """
     Performs HDBSCAN clustering on CLIP embeddings to group similar media items.
     Handles both image and video embeddings, storing results for further processing.
+    Optionally reduces the embeddings with PCA/randomized SVD first, which keeps HDBSCAN fast on large collections.
+    For 100k+ items, parallel Boruvka HDBSCAN or graph clustering on a k-NN graph ('auto' picks by item count).
+    The fitted model is saved, so mode='assign' can place newly ingested items into the existing clusters in seconds.
+    mode='stream' clusters a whole Qdrant collection page by page (mini-batch k-means codebook + HDBSCAN on the
+    centroids) for million-item collections that don't fit in memory.
+    Embeddings can be passed as a float32 matrix (array, memory-mapped .npy or shared memory block) with ids and
+    metadata as separate columns; the matrix is normalized in place, so memory stays near one copy of it.
+    With `from_collection`, the tool reads the whole Qdrant collection itself, so the agent never pages through it;
+    with `snapshot_dir`, it memory-maps a local snapshot written by QdrantFetcherTool instead.
+    Results are saved compactly (labels and per-cluster statistics in an .npz) and cached by a fingerprint of
+    the input, so repeating a call with the same embeddings and settings skips clustering.
+    With `segment_events`, the library is first split into capture-time events that are clustered separately.
+    Each cluster gets a profile (medoid, cohesion, dispersion, diverse representatives) and its items are
+    listed from most to least typical, so other tools can work from a few representative items.
     """
     
     items: List[Dict[str, Any]] = Field(
-        ...,
-        description="List of media items with embeddings and metadata from QdrantFetcherTool"
+        default_factory=list,
+        description="List of media items with embeddings and metadata from QdrantFetcherTool "
+                    "(not used by mode='stream', which reads the collection directly)"
     )
     
+    embeddings: Optional[Any] = Field(
+        default=None,
+        description="Embedding matrix (items x dimensions) instead of items: a NumPy array or memmap, or any "
+                    "array-like such as an HDF5/zarr dataset. A float32 C-contiguous array is used without copying "
+                    "and is normalized in place."
+    )
+
+    embeddings_path: Optional[str] = Field(
+        default=None,
+        description="Path of an .npy embedding matrix to memory-map instead of passing items (the file is not modified)"
+    )
+
+    shared_memory_name: Optional[str] = Field(
+        default=None,
+        description="Name of a multiprocessing shared memory block holding a float32 embedding matrix "
+                    "(requires embeddings_shape); it is normalized in place"
+    )
+
+    embeddings_shape: Optional[List[int]] = Field(
+        default=None,
+        description="Shape [items, dimensions] of the matrix in shared_memory_name"
+    )
+
+    ids: Optional[List[Any]] = Field(
+        default=None,
+        description="Item ids, one per embedding row, when embeddings come as a matrix (default: row numbers)"
+    )
+
+    metadata: Optional[List[Dict[str, Any]]] = Field(
+        default=None,
+        description="Item metadata, one per embedding row, when embeddings come as a matrix"
+    )
+
     min_cluster_size: int = Field(
         default=5,
         description="Minimum number of items to form a cluster"
@@ -33,72 +143,629 @@ class ClusterTool(BaseTool):
         description="Directory to save clustering results"
     )
 
+    reduce_dimensions: int = Field(
+        default=0,
+        description="Project embeddings onto this many principal components before clustering (0 disables). "
+                    "32-64 keeps HDBSCAN fast on tens of thousands of items."
+    )
+
+    reduction_method: str = Field(
+        default="randomized",
+        description="Reduction solver: 'randomized' (randomized SVD, fast) or 'pca' (exact SVD)"
+    )
+
+    refit_reduction: bool = Field(
+        default=False,
+        description="Refit the reduction even if a matching fitted model is cached in output_dir"
+    )
+
+    backend: str = Field(
+        default="auto",
+        description="Clustering backend: 'hdbscan' (HDBSCAN's default algorithm), 'boruvka_kdtree' or "
+                    "'boruvka_balltree' (parallel HDBSCAN for large collections), 'graph' (components of a "
+                    "k-NN similarity graph, for 200k+ items) or 'auto' (chosen by item count)"
+    )
+
+    n_jobs: int = Field(
+        default=-1,
+        description="Parallel workers for HDBSCAN core distances (-1 uses all cores)"
+    )
+
+    graph_neighbors: int = Field(
+        default=15,
+        description="Graph backend: neighbours linked to each item"
+    )
+
+    graph_min_similarity: float = Field(
+        default=0.8,
+        description="Graph backend: minimum cosine similarity of the original embeddings for two items to be linked"
+    )
+
+    graph_method: str = Field(
+        default="components",
+        description="Graph backend: 'components' (connected components) or 'label_propagation' "
+                    "(splits loosely linked groups into communities)"
+    )
+
+    mode: str = Field(
+        default="fit",
+        description="'fit' clusters all items from scratch; 'assign' keeps the labels of items clustered before "
+                    "and places new items into the saved model's clusters, refitting only when needed; 'stream' "
+                    "clusters the whole Qdrant collection in pages with bounded memory; 'sweep' scores a grid of "
+                    "min_cluster_size/min_samples/epsilon settings without clustering results, to pick parameters"
+    )
+
+    refit_noise_ratio: float = Field(
+        default=0.5,
+        description="Assign mode: refit if more than this fraction of the new items fits no existing cluster"
+    )
+
+    refit_drift: float = Field(
+        default=0.1,
+        description="Assign mode: refit if the new items' mean embedding moved this far (euclidean, corrected "
+                    "for batch size) from the mean embedding of the items the model was fitted on"
+    )
+
+    collection_name: Optional[str] = Field(
+        default=None,
+        description="Stream mode and from_collection: Qdrant collection to cluster (defaults to "
+                    "QDRANT_COLLECTION_NAME)"
+    )
+
+    from_collection: bool = Field(
+        default=False,
+        description="Fit/assign mode: read every point of the Qdrant collection (scrolled in pages into one "
+                    "matrix) instead of taking items or embeddings"
+    )
+
+    snapshot_dir: Optional[str] = Field(
+        default=None,
+        description="Fit/assign mode: cluster the local snapshot in this directory (QdrantFetcherTool export_dir), "
+                    "memory-mapped, instead of items or embeddings; only a few payload fields are loaded"
+    )
+
+    fetch_workers: int = Field(
+        default=1,
+        description="from_collection: concurrent scrolls over disjoint id ranges of the collection (1 = one "
+                    "sequential scroll)"
+    )
+
+    stream_page_size: int = Field(
+        default=STREAM_PAGE_SIZE,
+        description="Stream mode and from_collection: points read from Qdrant per page"
+    )
+
+    codebook: str = Field(
+        default="minibatch_kmeans",
+        description="Stream mode: 'minibatch_kmeans' (fixed-size codebook, bounded memory) or 'birch' "
+                    "(CF-tree subclusters, sized by birch_threshold)"
+    )
+
+    codebook_size: int = Field(
+        default=1024,
+        description="Stream mode: number of mini-batch k-means centroids; should be well above the expected cluster count"
+    )
+
+    birch_threshold: float = Field(
+        default=BIRCH_THRESHOLD,
+        description="Stream mode, 'birch' codebook: subcluster radius; smaller values make more subclusters "
+                    "and use more memory"
+    )
+
+    refine_codebook: bool = Field(
+        default=True,
+        description="Stream mode: run HDBSCAN on the codebook centroids to merge them into variable-density clusters"
+    )
+
+    sweep_min_cluster_sizes: List[int] = Field(
+        default_factory=lambda: [5, 10, 20, 50],
+        description="Sweep mode: min_cluster_size values to evaluate"
+    )
+
+    sweep_min_samples: Optional[List[int]] = Field(
+        default=None,
+        description="Sweep mode: min_samples values to evaluate (one HDBSCAN hierarchy is built per value; "
+                    "default: min_samples)"
+    )
+
+    sweep_epsilons: List[float] = Field(
+        default_factory=lambda: [0.0],
+        description="Sweep mode: cluster_selection_epsilon values to evaluate (distances between normalized or "
+                    "reduced embeddings; clusters closer than this are merged)"
+    )
+
+    sweep_sample_size: int = Field(
+        default=SWEEP_QUALITY_SAMPLE,
+        description="Sweep mode: number of items the silhouette and DBCV scores are computed on"
+    )
+
+    segment_events: bool = Field(
+        default=False,
+        description="Split items into events by capture time (EXIF, falling back to file times in the metadata) "
+                    "and cluster each event separately in a process pool; cluster ids stay unique across events. "
+                    "Faster on large time-structured libraries and never mixes unrelated events. With "
+                    "mode='assign' every run refits, since new items can't be placed by nearest cluster "
+                    "without regard to their event"
+    )
+
+    event_gap_factor: float = Field(
+        default=EVENT_GAP_FACTOR,
+        description="Event segmentation: a time gap starts a new event when it is this many times longer than "
+                    "the typical gap around it"
+    )
+
+    event_min_gap_minutes: float = Field(
+        default=EVENT_MIN_GAP_SEC / 60,
+        description="Event segmentation: gaps shorter than this never start a new event"
+    )
+
+    event_max_gap_hours: float = Field(
+        default=EVENT_MAX_GAP_SEC / 3600,
+        description="Event segmentation: gaps longer than this always start a new event"
+    )
+
+    event_workers: int = Field(
+        default=0,
+        description="Event segmentation: processes clustering events in parallel (0 = all cores, 1 = no pool)"
+    )
+
+    representatives: int = Field(
+        default=REPRESENTATIVES_PER_CLUSTER,
+        description="Diverse representative items picked per cluster (farthest-point sampling from the medoid), "
+                    "reported in profiles for summaries and galleries"
+    )
+
+    use_cache: bool = Field(
+        default=True,
+        description="Fit mode: return the cached results of an earlier call with the same embeddings, ids and "
+                    "settings instead of clustering again"
+    )
+
+    export_json: bool = Field(
+        default=False,
+        description="Also write the full results (clusters with every item's metadata) to clustering_results.json; "
+                    "by default only the compact clustering_results.npz (labels and per-cluster statistics) is written"
+    )
+
+    @validator('codebook')
+    def validate_codebook(cls, v):
+        if v not in STREAM_CODEBOOKS:
+            raise ValueError(f"codebook must be one of {STREAM_CODEBOOKS}")
+        return v
+
+    @validator('mode')
+    def validate_mode(cls, v):
+        if v not in CLUSTER_MODES:
+            raise ValueError(f"mode must be one of {CLUSTER_MODES}")
+        return v
+
+    @validator('backend')
+    def validate_backend(cls, v):
+        if v not in CLUSTER_BACKENDS:
+            raise ValueError(f"backend must be one of {CLUSTER_BACKENDS}")
+        return v
+
+    @validator('graph_method')
+    def validate_graph_method(cls, v):
+        if v not in GRAPH_METHODS:
+            raise ValueError(f"graph_method must be one of {GRAPH_METHODS}")
+        return v
+
+    @validator('reduction_method')
+    def validate_reduction_method(cls, v):
+        if v not in REDUCTION_METHODS:
+            raise ValueError(f"reduction_method must be one of {REDUCTION_METHODS}")
+        return v
+
     def _prepare_embeddings(self) -> np.ndarray:
         """Prepare embeddings for clustering."""
-        embeddings = []
-        for item in self.items:
-            if isinstance(item['embedding'], list):
-                embeddings.append(item['embedding'])
-            else:
-                embeddings.append(json.loads(item['embedding']))
-        
-        # Convert to numpy array and normalize
-        embeddings_array = np.array(embeddings)
-        return normalize(embeddings_array)
+        if not self.items:
+            return np.empty((0, 0), dtype=np.float32)
+        first = self.items[0]['embedding']
+        dim = len(first if isinstance(first, list) else json.loads(first))
+        # Fill a preallocated float32 matrix row by row instead of building a list of lists first
+        embeddings_array = np.empty((len(self.items), dim), dtype=np.float32)
+        for row, item in enumerate(self.items):
+            embedding = item['embedding']
+            embeddings_array[row] = embedding if isinstance(embedding, list) else json.loads(embedding)
+        return normalize_rows_inplace(embeddings_array)
 
-    def run(self) -> Dict[str, Any]:
+    @staticmethod
+    def _release_shared(shm: Optional[Any]) -> None:
+        """Detaches from an input shared memory block (the owner unlinks it)."""
+        if shm is None:
+            return
+        try:
+            shm.close()
+        except BufferError:
+            logger.warning("Shared memory block %s is still referenced; leaving it attached", shm.name)
+
+    def _payload_fields(self) -> List[str]:
         """
-        Performs clustering on the provided embeddings and saves results.
-        Returns cluster assignments and statistics.
+        Metadata fields read from Qdrant or a snapshot: enough to identify items in the results (the gallery
+        and summaries read the rest by id), plus capture times for event segmentation.
         """
-        try:
-            # Prepare embeddings
+        return list(CLUSTER_PAYLOAD_FIELDS + (EVENT_PAYLOAD_FIELDS if self.segment_events else ()))
+
+    def _load_inputs(self) -> Tuple[np.ndarray, List[Any], List[Dict[str, Any]], Optional[Any]]:
+        """
+        Returns the normalized float32 embedding matrix with its id and metadata columns, from whichever input
+        was given: a snapshot (`snapshot_dir`), `embeddings`, `embeddings_path`, `shared_memory_name`, the Qdrant
+        collection (`from_collection`) or `items`. The fourth value is the attached shared memory block (to close
+        after clustering), if any.
+        """
+        shm = None
+        if self.snapshot_dir:
+            # Stored normalized, so the read-only mapping is used as is
+            snapshot = Snapshot(self.snapshot_dir)
+            return snapshot.embeddings(), snapshot.ids(), snapshot.payloads(columns=self._payload_fields()), None
+        if self.from_collection:
+            client, collection_name = self._qdrant_client(), resolve_collection(self.collection_name)
+            with_payload = payload_selector(self._payload_fields())
+            if self.fetch_workers > 1:
+                ids, matrix, payloads, _ = parallel_fetch(
+                    client, collection_name, workers=self.fetch_workers, batch_size=self.stream_page_size,
+                    with_payload=with_payload
+                )
+                ids = ids.tolist()
+            else:
+                ids, matrix, payloads, _ = fetch_points(client, collection_name, batch_size=self.stream_page_size,
+                                                        with_payload=with_payload)
+            return normalize_rows_inplace(matrix), ids, payloads, None
+        if self.embeddings is not None:
+            matrix = as_embedding_matrix(self.embeddings)
+        elif self.embeddings_path:
+            matrix = load_npy_embeddings(self.embeddings_path)
+        elif self.shared_memory_name:
+            if not self.embeddings_shape:
+                raise ValueError("embeddings_shape is required with shared_memory_name")
+            shm, matrix = attach_shared_embeddings(self.shared_memory_name, self.embeddings_shape)
+        else:
             embeddings = self._prepare_embeddings()
-            
-            # Perform clustering
+            return embeddings, [item['id'] for item in self.items], [item['metadata'] for item in self.items], None
+
+        ids = list(self.ids) if self.ids is not None else list(range(len(matrix)))
+        metadata = list(self.metadata) if self.metadata is not None else [{} for _ in range(len(matrix))]
+        if len(ids) != len(matrix) or len(metadata) != len(matrix):
+            raise ValueError(
+                f"Got {len(matrix)} embeddings but {len(ids)} ids and {len(metadata)} metadata entries"
+            )
+        return normalize_rows_inplace(matrix), ids, metadata, shm
+
+    def _saved_reducer(self, dim: int) -> Optional[EmbeddingReducer]:
+        """The reducer saved in output_dir if it was fitted with the current settings on `dim`-dimensional input."""
+        reducer = EmbeddingReducer.load(Path(self.output_dir) / REDUCER_FILENAME)
+        if reducer is not None and reducer.matches(self.reduce_dimensions, self.reduction_method, dim):
+            return reducer
+        return None
+
+    def _reduce_embeddings(self, embeddings: np.ndarray,
+                           refit: bool = False) -> Tuple[np.ndarray, Optional[Dict[str, Any]]]:
+        """
+        Applies the dimensionality reduction stage if enabled. The fitted model is cached in output_dir and
+        reused by later runs with the same settings (unless `refit`), so items fetched later land in the same space.
+        Returns the vectors to cluster and the reduction report (None if no reduction was applied).
+        """
+        if self.reduce_dimensions <= 0 or self.reduce_dimensions >= embeddings.shape[1]:
+            return embeddings, None
+
+        reducer = None if self.refit_reduction or refit else self._saved_reducer(embeddings.shape[1])
+        if reducer is not None:
+            return reducer.transform(embeddings), reducer.report(cached=True)
+        if len(embeddings) < 2:
+            return embeddings, None
+
+        reducer = EmbeddingReducer(self.reduce_dimensions, self.reduction_method)
+        reduced = reducer.fit_transform(embeddings)
+        reducer.save(Path(self.output_dir) / REDUCER_FILENAME)
+        return reduced, reducer.report(cached=False)
+
+    def _model_signature(self, dim: int) -> Dict[str, Any]:
+        """Settings a saved model must have been fitted with to be reused for assignment."""
+        return {
+            "input_dim": dim,
+            "min_cluster_size": self.min_cluster_size,
+            "min_samples": self.min_samples,
+            "backend": self.backend,
+            "reduce_dimensions": self.reduce_dimensions,
+            "reduction_method": self.reduction_method,
+            "graph_neighbors": self.graph_neighbors,
+            "graph_min_similarity": self.graph_min_similarity,
+            "graph_method": self.graph_method,
+            **({
+                "segment_events": True,
+                "event_gap_factor": self.event_gap_factor,
+                "event_min_gap_minutes": self.event_min_gap_minutes,
+                "event_max_gap_hours": self.event_max_gap_hours
+            } if self.segment_events else {})
+        }
+
+    def _assign(self, embeddings: np.ndarray, ids: List[Any]) -> Tuple[Optional[np.ndarray], Dict[str, Any]]:
+        """
+        Assign mode: items the saved model has seen keep their labels and new items are predicted into its
+        clusters. Returns (None, report) when a full refit is needed instead: no usable saved model, event
+        segmentation (a per-event fit has no model that respects capture time), or the new items are mostly
+        noise or have drifted from what the model was fitted on.
+        """
+        start = time.perf_counter()
+        report = {"mode": "assign", "refit": True, "refit_reason": None}
+        if self.segment_events:
+            report["refit_reason"] = "event segmentation"
+            return None, report
+        model_path = Path(self.output_dir) / CLUSTER_MODEL_FILENAME
+        model = ClusterModel.load(model_path)
+        if model is None:
+            report["refit_reason"] = "no saved model"
+            return None, report
+        if model.signature != self._model_signature(embeddings.shape[1]):
+            report["refit_reason"] = "clustering settings changed"
+            return None, report
+
+        known = [model.labels_by_id.get(item_id) for item_id in ids]
+        new_indices = [i for i, label in enumerate(known) if label is None]
+        labels = np.array([-1 if label is None else label for label in known], dtype=np.int64)
+        report.update(known_items=len(ids) - len(new_indices), new_items=len(new_indices))
+
+        if new_indices:
+            new_embeddings = embeddings[new_indices]
+            report["drift"] = round(model.drift(new_embeddings), 4)
+            vectors = new_embeddings
+            if 0 < self.reduce_dimensions < embeddings.shape[1]:
+                # Only the reducer the model was fitted in will do; never fit one on the new items alone
+                reducer = self._saved_reducer(embeddings.shape[1])
+                if reducer is None:
+                    report["refit_reason"] = "reduction model missing"
+                    return None, report
+                vectors = reducer.transform(new_embeddings)
+            new_labels = model.assign(vectors, new_embeddings)
+            report["new_noise_ratio"] = round(float((new_labels == -1).mean()), 4)
+            if report["drift"] > self.refit_drift:
+                report["refit_reason"] = "drift"
+                return None, report
+            if report["new_noise_ratio"] > self.refit_noise_ratio:
+                report["refit_reason"] = "noise ratio"
+                return None, report
+            labels[new_indices] = new_labels
+            model.labels_by_id.update(zip([ids[i] for i in new_indices], new_labels.tolist()))
+            model.save(model_path)
+
+        report.update(refit=False, assign_sec=round(time.perf_counter() - start, 3))
+        return labels, report
+
+    def _cluster(self, vectors: np.ndarray, embeddings: np.ndarray, ids: List[Any],
+                 times: Optional[np.ndarray] = None,
+                 fingerprint: Optional[str] = None) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """
+        Clusters `vectors` (the reduced embeddings, or the embeddings themselves) with the configured backend
+        and saves the fitted model for assign mode, tagged with the input `fingerprint` of a cached fit.
+        The graph backend searches neighbours with `vectors` but weighs edges with the original `embeddings`.
+        With capture `times` (event segmentation), HDBSCAN runs separately on each time-window event instead.
+        Returns the labels (-1 for noise) and clustering statistics.
+        """
+        backend = self.backend
+        if times is not None:
+            backend = 'events'
+        elif backend == 'auto':
+            backend = choose_backend(len(vectors), vectors.shape[1])
+        start = time.perf_counter()
+
+        if backend == 'events':
+            events = segment_events(
+                times,
+                gap_factor=self.event_gap_factor,
+                min_gap=self.event_min_gap_minutes * 60,
+                max_gap=self.event_max_gap_hours * 3600
+            )
+            labels, info = cluster_events(
+                vectors, events, self.min_cluster_size, self.min_samples, workers=self.event_workers
+            )
+            info["undated_items"] = int(np.isnan(times).sum())
+            clusterer = None
+        elif backend == 'graph':
+            search_vectors = normalize(vectors) if vectors is not embeddings else embeddings
+            neighbors, similarities = knn_graph(
+                search_vectors,
+                self.graph_neighbors,
+                rescore_vectors=embeddings if vectors is not embeddings else None
+            )
+            labels, info = graph_cluster(
+                neighbors, similarities, self.graph_min_similarity, self.min_cluster_size, self.graph_method
+            )
+            clusterer = None
+        else:
             clusterer = hdbscan.HDBSCAN(
                 min_cluster_size=self.min_cluster_size,
                 min_samples=self.min_samples,
-                metric='euclidean'
+                metric='euclidean',
+                algorithm=hdbscan_algorithm(backend),
+                core_dist_n_jobs=self.n_jobs,
+                prediction_data=True
             )
-            
-            cluster_labels = clusterer.fit_predict(embeddings)
-            
-            # Prepare results
-            clusters = {}
-            noise_points = []
-            
-            for idx, (label, item) in enumerate(zip(cluster_labels, self.items)):
-                if label == -1:
-                    noise_points.append({
-                        "id": item['id'],
-                        "metadata": item['metadata']
-                    })
-                else:
-                    if label not in clusters:
-                        clusters[label] = []
-                    clusters[label].append({
-                        "id": item['id'],
-                        "metadata": item['metadata']
-                    })
-            
+            labels = clusterer.fit_predict(vectors)
+            info = {}
+
+        info.update(backend=backend, clustering_sec=round(time.perf_counter() - start, 3))
+        ClusterModel(
+            self._model_signature(embeddings.shape[1]),
+            ids,
+            labels,
+            embeddings,
+            clusterer=clusterer,
+            min_similarity=self.graph_min_similarity,
+            fingerprint=fingerprint
+        ).save(Path(self.output_dir) / CLUSTER_MODEL_FILENAME)
+        return labels, info
+
+    def _sweep(self, output_path: Path) -> Dict[str, Any]:
+        """
+        Sweep mode: scores every combination of the sweep settings on the (optionally reduced) embeddings,
+        building one HDBSCAN hierarchy per min_samples value. Writes sweep_results.json and returns the
+        scores with the best-scoring combination.
+        """
+        shm, embeddings, vectors = None, None, None
+        try:
+            embeddings, _, _, shm = self._load_inputs()
+            if len(embeddings) < 2:
+                raise ValueError("Sweep mode needs at least two items")
+            total_items = len(embeddings)
+            vectors, reduction = self._reduce_embeddings(embeddings)
+            backend = self.backend
+            if backend in ('auto', 'graph'):
+                # The sweep extracts clusterings from HDBSCAN's hierarchy, so the graph backend doesn't apply
+                backend = choose_backend(len(vectors), vectors.shape[1], allow_graph=False)
+            results, timings = sweep_hdbscan(
+                vectors,
+                self.sweep_min_samples or [self.min_samples],
+                self.sweep_min_cluster_sizes,
+                self.sweep_epsilons,
+                algorithm=hdbscan_algorithm(backend),
+                n_jobs=self.n_jobs,
+                sample_size=self.sweep_sample_size
+            )
+        finally:
+            embeddings = vectors = None
+            self._release_shared(shm)
+
+        statistics = {"total_items": total_items, "backend": backend, **timings}
+        if reduction:
+            statistics["reduction"] = reduction
+        sweep = {"results": results, "best": best_sweep_result(results), "statistics": statistics}
+        output_file = output_path / "sweep_results.json"
+        with open(output_file, 'w') as f:
+            json.dump(sweep, f, indent=2)
+        self._shared_state.set("cluster_sweep", sweep)
+        return {"status": "success", **sweep, "output_file": str(output_file)}
+
+    def _qdrant_client(self) -> RetryingClient:
+        return get_client()
+
+    def _stream_cluster(self) -> Tuple[List[Any], List[Dict[str, Any]], np.ndarray, Dict[str, Any]]:
+        """
+        Stream mode: fits the codebook over one scroll of the collection (vectors only), then labels every
+        point in a second scroll that also fetches the few payload fields kept in the results. Returns ids,
+        payloads, labels and statistics.
+        """
+        client = self._qdrant_client()
+        collection_name = resolve_collection(self.collection_name)
+        clusterer = StreamingClusterer(
+            self.codebook_size, self.codebook, self.refine_codebook, birch_threshold=self.birch_threshold
+        )
+
+        start = time.perf_counter()
+        for batch in iter_point_batches(client, collection_name, self.stream_page_size, with_payload=False):
+            if batch.ids:
+                clusterer.partial_fit(normalize_rows_inplace(batch.vectors))
+        info = clusterer.finalize()
+        info["fit_sec"] = round(time.perf_counter() - start, 3)
+
+        start = time.perf_counter()
+        ids, payloads, labels = [], [], []
+        for batch in iter_point_batches(client, collection_name, self.stream_page_size,
+                                        with_payload=payload_selector(self._payload_fields())):
+            if batch.ids:
+                ids.extend(batch.ids)
+                payloads.extend(batch.payloads)
+                labels.append(clusterer.predict(normalize_rows_inplace(batch.vectors)))
+        labels = relabel_by_size(
+            np.concatenate(labels) if labels else np.empty(0, dtype=np.int64), self.min_cluster_size
+        )
+        info.update(backend="stream", label_sec=round(time.perf_counter() - start, 3))
+        return ids, payloads, labels, info
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Performs clustering on the provided embeddings and saves results.
+        Returns cluster assignments and statistics.
+        """
+        shm, embeddings, vectors = None, None, None
+        try:
             # Create output directory
             output_path = Path(self.output_dir)
             output_path.mkdir(parents=True, exist_ok=True)
+
+            if self.mode == 'sweep':
+                return self._sweep(output_path)
+
+            cluster_labels, assignment, reduction, clustering = None, None, None, None
+            fingerprint, cluster_results, times = None, None, None
+            cache = ResultsCache(output_path / RESULTS_CACHE_DIRNAME)
+
+            if self.mode == 'stream':
+                ids, metadatas, cluster_labels, clustering = self._stream_cluster()
+            else:
+                # Prepare embeddings
+                embeddings, ids, metadatas, shm = self._load_inputs()
+                times = capture_times(metadatas) if self.segment_events else None
+                # Identical embeddings, ids and settings: reuse the cached labels
+                if self.mode == 'fit' and self.use_cache and not self.refit_reduction:
+                    settings = {**self._model_signature(embeddings.shape[1]), "representatives": self.representatives}
+                    fingerprint = results_fingerprint(embeddings, ids, settings, extra=times)
+                    cluster_results = cache.get(fingerprint)
+                    # Only reuse the labels if the saved model (read by assign mode) is from the same fit
+                    if cluster_results is not None:
+                        saved_model = ClusterModel.load(output_path / CLUSTER_MODEL_FILENAME)
+                        if getattr(saved_model, 'fingerprint', None) != fingerprint:
+                            cluster_results = None
+
+            cache_hit = cluster_results is not None
+            if cache_hit:
+                cluster_results.ids = ids
+            else:
+                # Assign mode: reuse the saved model for new items
+                if self.mode == 'assign':
+                    cluster_labels, assignment = self._assign(embeddings, ids)
+
+                if cluster_labels is None:
+                    # Optional dimensionality reduction (refitted too if the collection drifted)
+                    refit = assignment is not None and assignment["refit_reason"] == "drift"
+                    vectors, reduction = self._reduce_embeddings(embeddings, refit=refit)
+
+                    # Perform clustering
+                    cluster_labels, clustering = self._cluster(vectors, embeddings, ids, times, fingerprint)
+
+                statistics = {}
+                if clustering:
+                    statistics["clustering"] = clustering
+                if reduction:
+                    statistics["reduction"] = reduction
+                if assignment:
+                    statistics["assignment"] = assignment
+                cluster_results = ClusterResults(
+                    ids, cluster_labels, embeddings, statistics, fingerprint, n_representatives=self.representatives
+                )
+                if fingerprint:
+                    cache.put(cluster_results)
+
+            # Drop the views on the input matrix so a shared memory block can be closed
+            embeddings = vectors = None
+            self._release_shared(shm)
+            shm = None
             
-            # Save results
+            # Prepare results: labels are stored compactly, metadata is joined back by id for other tools
+            clusters, noise_points = cluster_results.groups(metadatas)
+            profiles = cluster_results.profiles()
             results = {
                 "clusters": clusters,
+                "profiles": profiles,
                 "noise_points": noise_points,
                 "statistics": {
-                    "total_items": len(self.items),
+                    "total_items": len(ids),
                     "num_clusters": len(clusters),
-                    "noise_points": len(noise_points)
+                    "noise_points": len(noise_points),
+                    **cluster_results.statistics
                 }
             }
-            
-            with open(output_path / "clustering_results.json", 'w') as f:
-                json.dump(results, f, indent=2)
+            if fingerprint:
+                results["statistics"]["cache"] = {"hit": cache_hit, "fingerprint": fingerprint}
+
+            # Save results
+            results_file = output_path / CLUSTER_RESULTS_FILENAME
+            cluster_results.save(results_file)
+            output_file = results_file
+            if self.export_json:
+                output_file = output_path / "clustering_results.json"
+                with open(output_file, 'w') as f:
+                    json.dump(results, f, indent=2)
             
             # Store in shared state for other tools
             self._shared_state.set("clustering_results", results)
@@ -106,12 +773,16 @@ class ClusterTool(BaseTool):
             return {
                 "status": "success",
                 "clusters": clusters,
+                "profiles": profiles,
                 "noise_points": noise_points,
                 "statistics": results["statistics"],
-                "output_file": str(output_path / "clustering_results.json")
+                "output_file": str(output_file),
+                "results_file": str(results_file)
             }
             
         except Exception as e:
+            embeddings = vectors = None
+            self._release_shared(shm)
             return {
                 "status": "error",
                 "message": str(e)
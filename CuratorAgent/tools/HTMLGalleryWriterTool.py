@@ -1,18 +1,27 @@
 from agency_swarm.tools import BaseTool
 from pydantic import Field
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import os
 from pathlib import Path
 import json
 import shutil
+import hashlib
 from datetime import datetime
 from jinja2 import Environment, FileSystemLoader
 
+from .qdrant_utils import GALLERY_PAYLOAD_FIELDS, Snapshot
+
 class HTMLGalleryWriterTool(BaseTool):
     """
     Creates interactive HTML galleries for media clusters.
     Supports both images and videos with previews and metadata display.
+    Videos are shown by the poster image and sprite sheet recorded at ingestion (copied into the gallery's
+    media folder), never by loading the video file itself; hovering a video scrubs through its sprite sheet.
     Uses responsive design for optimal viewing on various devices.
+    With cluster profiles from ClusterTool, each cluster opens with its representative items (highlighted),
+    and `max_items_per_cluster` limits large clusters to their representatives and most typical members.
+    With `snapshot_dir`, clusters can carry just item ids: the displayed fields of the shown items are read
+    from the local snapshot.
     """
     
     clusters: Dict[str, List[Dict[str, Any]]] = Field(
@@ -35,6 +44,21 @@ class HTMLGalleryWriterTool(BaseTool):
         description="Title for the gallery"
     )
     
+    profiles: Optional[Dict[str, Dict[str, Any]]] = Field(
+        default=None,
+        description="Cluster profiles from ClusterTool; their representative items are shown first in each cluster"
+    )
+    
+    max_items_per_cluster: Optional[int] = Field(
+        default=None,
+        description="Show at most this many items per cluster (representatives first, then the most typical members)"
+    )
+    
+    snapshot_dir: Optional[str] = Field(
+        default=None,
+        description="Local snapshot (QdrantFetcherTool export_dir) to read missing item metadata from by id"
+    )
+    
     def _create_gallery_structure(self) -> Path:
         """Creates the gallery directory structure."""
         gallery_path = Path(self.output_dir)
@@ -117,12 +141,36 @@ class HTMLGalleryWriterTool(BaseTool):
             transform: scale(1.02);
         }
 
+        .media-item.representative {
+            outline: 2px solid var(--accent-color);
+        }
+
+        .more-items {
+            padding: 0 1rem 1rem;
+            color: #666;
+            font-size: 0.9rem;
+        }
+
         .media-preview {
             width: 100%;
             height: 200px;
             object-fit: cover;
         }
 
+        .video-placeholder {
+            background: var(--secondary-color);
+        }
+
+        .sprite-scrub {
+            position: absolute;
+            top: 0;
+            left: 0;
+            width: 100%;
+            height: 200px;
+            display: none;
+            background-repeat: no-repeat;
+        }
+
         .video-overlay {
             position: absolute;
             top: 50%;
@@ -161,7 +209,7 @@ class HTMLGalleryWriterTool(BaseTool):
                 grid-template-columns: repeat(auto-fill, minmax(150px, 1fr));
             }
             
-            .media-preview {
+            .media-preview, .sprite-scrub {
                 height: 150px;
             }
         }
@@ -176,6 +224,29 @@ class HTMLGalleryWriterTool(BaseTool):
         document.addEventListener('DOMContentLoaded', function() {
             // Initialize lightbox or video player
             const mediaItems = document.querySelectorAll('.media-item');
+
+            // Scrub through a video's sprite sheet while hovering its preview
+            document.querySelectorAll('.media-item[data-sprite]').forEach(item => {
+                const scrub = item.querySelector('.sprite-scrub');
+                const columns = parseInt(item.dataset.spriteColumns, 10);
+                const rows = parseInt(item.dataset.spriteRows, 10);
+                const count = parseInt(item.dataset.spriteCount, 10);
+                scrub.style.backgroundImage = 'url("' + item.dataset.sprite + '")';
+                scrub.style.backgroundSize = (columns * 100) + '% ' + (rows * 100) + '%';
+
+                item.addEventListener('mousemove', function(event) {
+                    const rect = scrub.getBoundingClientRect();
+                    const fraction = Math.min(Math.max((event.clientX - rect.left) / rect.width, 0), 0.999);
+                    const tile = Math.floor(fraction * count);
+                    const x = columns > 1 ? (tile % columns) / (columns - 1) * 100 : 0;
+                    const y = rows > 1 ? Math.floor(tile / columns) / (rows - 1) * 100 : 0;
+                    scrub.style.backgroundPosition = x + '% ' + y + '%';
+                    scrub.style.display = 'block';
+                });
+                item.addEventListener('mouseleave', function() {
+                    scrub.style.display = 'none';
+                });
+            });
             
             mediaItems.forEach(item => {
                 item.addEventListener('click', function() {
@@ -251,9 +322,19 @@ class HTMLGalleryWriterTool(BaseTool):
                     </div>
                     
                     <div class="media-grid">
-                        {% for item in cluster %}
-                        <div class="media-item" data-path="{{ item.metadata.file_path }}" data-type="{{ item.metadata.media_type }}">
-                            <img class="media-preview" src="{{ item.metadata.file_path }}" alt="Media preview">
+                        {% set shown = shown_items(cluster_id, cluster) %}
+                        {% for item, representative in shown %}
+                        {% set preview = preview_for(item) %}
+                        <div class="media-item{% if representative %} representative{% endif %}" data-path="{{ item.metadata.file_path }}" data-type="{{ item.metadata.media_type }}"
+                            {%- if preview.sprite %} data-sprite="{{ preview.sprite.src }}" data-sprite-columns="{{ preview.sprite.columns }}" data-sprite-rows="{{ preview.sprite.rows }}" data-sprite-count="{{ preview.sprite.count }}"{% endif %}>
+                            {% if preview.src %}
+                            <img class="media-preview" src="{{ preview.src }}" alt="Media preview" loading="lazy">
+                            {% else %}
+                            <div class="media-preview video-placeholder"></div>
+                            {% endif %}
+                            {% if preview.sprite %}
+                            <div class="sprite-scrub"></div>
+                            {% endif %}
                             {% if item.metadata.media_type == 'video' %}
                             <div class="video-overlay">▶</div>
                             {% endif %}
@@ -270,6 +351,9 @@ class HTMLGalleryWriterTool(BaseTool):
                         </div>
                         {% endfor %}
                     </div>
+                    {% if cluster|length > shown|length %}
+                    <p class="more-items">+{{ cluster|length - shown|length }} more items</p>
+                    {% endif %}
                 </div>
                 {% endfor %}
             </div>
@@ -279,6 +363,61 @@ class HTMLGalleryWriterTool(BaseTool):
         </html>
         """
 
+    def _copy_to_media(self, file_path: str, gallery_path: Path) -> str:
+        """Copies a preview image into the gallery's media folder and returns its gallery-relative path."""
+        source = Path(file_path)
+        if not source.is_file():
+            return file_path
+        # Prefix with a hash of the full path: different videos can share a file name
+        name = f"{hashlib.md5(str(source).encode()).hexdigest()[:8]}_{source.name}"
+        target = gallery_path / "media" / name
+        # Previews are regenerated in place when a video is re-ingested; copy2 keeps the mtime to compare against
+        source_stat = source.stat()
+        copied = target.stat() if target.exists() else None
+        if copied is None or (copied.st_mtime_ns, copied.st_size) != (source_stat.st_mtime_ns, source_stat.st_size):
+            shutil.copy2(source, target)
+        return f"media/{name}"
+
+    def _shown_items(self, cluster_id: Any, items: List[Dict[str, Any]],
+                     snapshot: Optional[Snapshot] = None) -> List[Tuple[Dict[str, Any], bool]]:
+        """
+        Items to display for a cluster, each with whether it is a representative: the profile's representatives
+        first, then the other items in their given order, cut to `max_items_per_cluster`. With a snapshot, the
+        shown items' metadata is completed from it.
+        """
+        profile = (self.profiles or {}).get(str(cluster_id)) or {}
+        representative_ids = set(profile.get('representatives', []))
+        representatives = [item for item in items if item.get('id') in representative_ids]
+        others = [item for item in items if item.get('id') not in representative_ids]
+        shown = [(item, True) for item in representatives] + [(item, False) for item in others]
+        shown = shown[:self.max_items_per_cluster] if self.max_items_per_cluster else shown
+        if snapshot is not None:
+            shown = [({**item, 'metadata': dict(item.get('metadata') or {})}, representative)
+                     for item, representative in shown]
+            snapshot.fill_metadata([item for item, _ in shown], list(GALLERY_PAYLOAD_FIELDS))
+        return shown
+
+    def _preview(self, item: Dict[str, Any], gallery_path: Path) -> Dict[str, Any]:
+        """
+        Picks what to display for an item: the image itself, or a video's poster and sprite sheet.
+        Videos without a poster get a placeholder instead of pointing <img> at the video file.
+        """
+        metadata = item.get('metadata', {})
+        if metadata.get('media_type') != 'video':
+            return {'src': metadata.get('file_path'), 'sprite': None}
+
+        src = self._copy_to_media(metadata['poster_path'], gallery_path) if metadata.get('poster_path') else None
+        sprite = None
+        sprite_sheet = metadata.get('sprite_sheet')
+        if sprite_sheet and sprite_sheet.get('path'):
+            sprite = {
+                'src': self._copy_to_media(sprite_sheet['path'], gallery_path),
+                'columns': sprite_sheet.get('columns', 1),
+                'rows': sprite_sheet.get('rows', 1),
+                'count': len(sprite_sheet.get('timestamps', [])) or sprite_sheet.get('columns', 1) * sprite_sheet.get('rows', 1),
+            }
+        return {'src': src, 'sprite': sprite}
+
     def run(self) -> Dict[str, Any]:
         """
         Creates an interactive HTML gallery with the provided clusters and summaries.
@@ -295,13 +434,16 @@ class HTMLGalleryWriterTool(BaseTool):
             # Create Jinja2 environment
             env = Environment(loader=FileSystemLoader(str(gallery_path)))
             template = env.from_string(self._create_html_template())
+            snapshot = Snapshot(self.snapshot_dir) if self.snapshot_dir else None
             
             # Render HTML
             html = template.render(
                 title=self.title,
                 clusters=self.clusters,
                 summaries=self.summaries,
-                generation_date=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                generation_date=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                preview_for=lambda item: self._preview(item, gallery_path),
+                shown_items=lambda cluster_id, items: self._shown_items(cluster_id, items, snapshot)
             )
             
             # Write HTML file
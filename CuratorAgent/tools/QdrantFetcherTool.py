@@ -1,115 +1,251 @@
 from agency_swarm.tools import BaseTool
-from pydantic import Field
-from typing import List, Dict, Any, Optional
-import os
-from dotenv import load_dotenv
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import Filter, FieldCondition, MatchValue
-from qdrant_client.http.models import Range
+from pydantic import Field, validator
+from typing import List, Dict, Any, Optional, Tuple
+from pathlib import Path
+import time
 
-load_dotenv()
+from shared.qdrant_clients import RetryingClient, get_client, resolve_collection, write_version
 
-# Initialize Qdrant client
-QDRANT_HOST = os.getenv("QDRANT_HOST", "localhost")
-QDRANT_PORT = int(os.getenv("QDRANT_PORT", 6333))
-QDRANT_COLLECTION_NAME = os.getenv("QDRANT_COLLECTION_NAME", "media_collection")
+from .qdrant_utils import (
+    FETCH_BATCH_SIZE,
+    FETCH_PROJECTIONS,
+    PARTITION_MODES,
+    QueryCache,
+    Snapshot,
+    build_filter,
+    count_points,
+    export_snapshot,
+    fetch_points,
+    payload_selector,
+    query_scope,
+    refresh_snapshot,
+    snapshot_projection
+)
 
-qdrant_client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
+# Pages recently returned by this process, shared by every tool instance
+query_cache = QueryCache()
 
 class QdrantFetcherTool(BaseTool):
     """
     Retrieves media items and their metadata from Qdrant database.
-    Supports filtering by various criteria and pagination.
+    Supports filtering by various criteria and cursor-based pagination: pass the returned next_cursor
+    to get the following page. total_items is the exact number of items matching the filters.
+    Only what the caller needs is downloaded: a named projection (or explicit payload include/exclude lists
+    and with_vectors) selects the payload fields and whether embeddings are read.
+    With export_dir, the matching items are kept as a local snapshot instead of being returned: the first export
+    reads every item by concurrent scrolls over disjoint partitions of the collection, later ones only fetch
+    what was upserted or deleted since. ClusterTool, SummaryWriterTool and HTMLGalleryWriterTool read
+    snapshots with mmap through their snapshot_dir field.
+    Pages are cached in memory for a few minutes; a cached page is dropped as soon as MediaManager upserts
+    into the collection. The cache statistics (hit rate, saved seconds) come back with every page.
     """
-    
+
+    collection_name: Optional[str] = Field(
+        default=None,
+        description="Qdrant collection to read (defaults to QDRANT_COLLECTION_NAME)"
+    )
+
     limit: int = Field(
         default=100,
         description="Maximum number of items to retrieve"
     )
-    
-    offset: int = Field(
-        default=0,
-        description="Number of items to skip"
+
+    cursor: Optional[str] = Field(
+        default=None,
+        description="next_cursor from a previous call with the same filters, to continue after its last item"
     )
-    
+
     media_type: Optional[str] = Field(
         default=None,
         description="Filter by media type ('image' or 'video')"
     )
-    
+
     date_range: Optional[Dict[str, str]] = Field(
         default=None,
         description="Filter by date range with 'start' and 'end' dates in ISO format"
     )
-    
-    def _build_filter(self) -> Optional[Filter]:
-        """Builds Qdrant filter based on provided parameters."""
-        must_conditions = []
-        
-        if self.media_type:
-            must_conditions.append(
-                FieldCondition(
-                    key="media_type",
-                    match=MatchValue(value=self.media_type)
-                )
-            )
-            
-        if self.date_range:
-            must_conditions.append(
-                FieldCondition(
-                    key="file_creation_time",
-                    range=Range(
-                        gte=self.date_range.get("start"),
-                        lte=self.date_range.get("end")
-                    )
-                )
+
+    projection: str = Field(
+        default="full",
+        description="What to read per item: 'full' (embedding and all metadata), 'cluster' (embedding and the "
+                    "few fields ClusterTool keeps), 'gallery' or 'summary' (no embedding, the fields those tools "
+                    "display), 'ids' (ids only)"
+    )
+
+    with_vectors: Optional[bool] = Field(
+        default=None,
+        description="Read embeddings (overrides the projection)"
+    )
+
+    payload_include: Optional[List[str]] = Field(
+        default=None,
+        description="Read only these metadata fields (overrides the projection)"
+    )
+
+    payload_exclude: Optional[List[str]] = Field(
+        default=None,
+        description="Read all metadata fields except these, e.g. ['exif_data'] (overrides the projection)"
+    )
+
+    count_total: bool = Field(
+        default=True,
+        description="Count the matching items exactly (total_items); can be skipped when paging on"
+    )
+
+    use_cache: bool = Field(
+        default=True,
+        description="Serve repeated queries from the in-memory result cache while the collection is unchanged"
+    )
+
+    export_dir: Optional[str] = Field(
+        default=None,
+        description="Snapshot export: keep all matching items in this directory (normalized float32 .npy "
+                    "matrix, id index and one file per payload field) instead of returning a page of items. "
+                    "An existing snapshot of the same query is refreshed incrementally"
+    )
+
+    full_export: bool = Field(
+        default=False,
+        description="Snapshot export: re-read the whole collection even if the snapshot could be refreshed"
+    )
+
+    workers: int = Field(
+        default=4,
+        description="Bulk export: concurrent scroll workers, each reading a disjoint partition"
+    )
+
+    partition_by: str = Field(
+        default="id_range",
+        description="Bulk export: 'id_range' splits the point id space into equal ranges; 'bucket' splits by "
+                    "the shard_bucket payload field written at ingest"
+    )
+
+    @validator('partition_by')
+    def validate_partition_by(cls, v):
+        if v not in PARTITION_MODES:
+            raise ValueError(f"partition_by must be one of {PARTITION_MODES}")
+        return v
+
+    @validator('projection')
+    def validate_projection(cls, v):
+        if v not in FETCH_PROJECTIONS:
+            raise ValueError(f"projection must be one of {tuple(FETCH_PROJECTIONS)}")
+        return v
+
+    def _projection(self) -> Tuple[bool, Optional[List[str]], Optional[List[str]]]:
+        """Whether to read vectors and the payload fields to include / exclude, explicit settings first."""
+        preset = FETCH_PROJECTIONS[self.projection]
+        with_vectors = preset["with_vectors"] if self.with_vectors is None else self.with_vectors
+        if self.payload_include is not None or self.payload_exclude:
+            return with_vectors, self.payload_include, self.payload_exclude
+        include = preset["payload_include"]
+        return with_vectors, list(include) if include is not None else None, None
+
+    def _qdrant_client(self) -> RetryingClient:
+        return get_client()
+
+    def _write_version(self, client: RetryingClient, collection_name: str) -> int:
+        return write_version(client, collection_name)
+
+    def _export(self, client: RetryingClient, collection_name: str) -> Dict[str, Any]:
+        """Writes or refreshes the snapshot in export_dir."""
+        with_vectors, include, exclude = self._projection()
+        if not with_vectors:
+            raise ValueError("Snapshots store embeddings; use a projection with vectors for export_dir")
+        export_dir = Path(self.export_dir)
+        query = {"media_type": self.media_type, "date_range": self.date_range}
+        manifest = Snapshot(export_dir).manifest if Snapshot.exists(export_dir) else None
+        # Only a snapshot of the same query and payload fields with a watermark can be refreshed
+        if (not self.full_export and manifest and manifest["collection"] == collection_name
+                and manifest["query"] == query and manifest.get("payload") == snapshot_projection(include, exclude)
+                and manifest.get("watermark") is not None):
+            statistics = refresh_snapshot(client, export_dir, batch_size=FETCH_BATCH_SIZE)
+        else:
+            statistics = export_snapshot(
+                client,
+                collection_name,
+                export_dir,
+                workers=self.workers,
+                partition_by=self.partition_by,
+                batch_size=FETCH_BATCH_SIZE,
+                payload_include=include,
+                payload_exclude=exclude,
+                **query
             )
-            
-        return Filter(must=must_conditions) if must_conditions else None
+        return {
+            "status": "success",
+            "total_items": len(Snapshot(export_dir)),
+            "snapshot_dir": str(export_dir),
+            "statistics": statistics
+        }
+
+    def _fetch_page(self, client: RetryingClient, collection_name: str, with_vectors: bool,
+                    include: Optional[List[str]], exclude: Optional[List[str]]) -> Dict[str, Any]:
+        """Reads one page of items after `cursor` (and the exact total unless count_total is off)."""
+        search_filter = build_filter(self.media_type, self.date_range)
+        # Cursors only resume the query they came from
+        scope = query_scope(collection_name, media_type=self.media_type, date_range=self.date_range)
+
+        total_items = count_points(client, collection_name, search_filter) if self.count_total else None
+        ids, embeddings, payloads, next_cursor = fetch_points(
+            client,
+            collection_name,
+            search_filter,
+            batch_size=FETCH_BATCH_SIZE,
+            with_payload=payload_selector(include, exclude),
+            max_items=self.limit,
+            cursor=self.cursor,
+            scope=scope,
+            with_vectors=with_vectors
+        )
+
+        items: List[Dict[str, Any]] = []
+        for row, point_id in enumerate(ids):
+            item = {"id": point_id, "metadata": payloads[row] if payloads is not None else {}}
+            if with_vectors:
+                item["embedding"] = embeddings[row].tolist()
+            items.append(item)
+
+        return {
+            "status": "success",
+            "total_items": total_items,
+            "items": items,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None,
+            "limit": self.limit
+        }
 
     def run(self) -> Dict[str, Any]:
         """
-        Retrieves media items from Qdrant based on specified filters.
-        Returns dictionary with items and total count.
+        Retrieves up to `limit` media items from Qdrant based on specified filters, starting after `cursor`.
+        Returns dictionary with items, the exact total count and the cursor for the next page; repeated queries
+        are answered from the result cache while the collection's write version is unchanged.
         """
         try:
-            # Build filter
-            search_filter = self._build_filter()
-            
-            # Get total count
-            collection_info = qdrant_client.get_collection(QDRANT_COLLECTION_NAME)
-            total_points = collection_info.points_count
-            
-            # Retrieve points
-            response = qdrant_client.scroll(
-                collection_name=QDRANT_COLLECTION_NAME,
-                limit=self.limit,
-                offset=self.offset,
-                with_payload=True,
-                with_vectors=True,
-                filter=search_filter
-            )
-            
-            # Extract points data
-            items = []
-            for point in response[0]:
-                item_data = {
-                    "id": point.id,
-                    "embedding": point.vector,
-                    "metadata": point.payload
-                }
-                items.append(item_data)
-            
-            return {
-                "status": "success",
-                "total_items": total_points,
-                "items": items,
-                "offset": self.offset,
-                "limit": self.limit
-            }
-            
+            client = self._qdrant_client()
+            collection_name = resolve_collection(self.collection_name)
+            if self.export_dir:
+                return self._export(client, collection_name)
+
+            with_vectors, include, exclude = self._projection()
+            if self.use_cache:
+                version = self._write_version(client, collection_name)
+                key = QueryCache.key(collection_name, media_type=self.media_type, date_range=self.date_range,
+                                     with_vectors=with_vectors, payload_include=include, payload_exclude=exclude,
+                                     cursor=self.cursor, limit=self.limit, count_total=self.count_total)
+                cached = query_cache.get(key, version)
+                if cached is not None:
+                    return {**cached, "cache": {"hit": True, **query_cache.stats()}}
+
+            began = time.perf_counter()
+            result = self._fetch_page(client, collection_name, with_vectors, include, exclude)
+            if not self.use_cache:
+                return result
+            query_cache.put(key, version, result, time.perf_counter() - began)
+            return {**result, "cache": {"hit": False, **query_cache.stats()}}
+
         except Exception as e:
             return {
                 "status": "error",
                 "message": str(e)
-            } 
\ No newline at end of file
+            }
@@ -1,22 +1,35 @@
 from agency_swarm.tools import BaseTool
 from pydantic import Field
 from typing import List, Dict, Any, Optional
-import os
+import asyncio
+import time
 from dotenv import load_dotenv
-from openai import OpenAI
 import json
 from pathlib import Path
 
-load_dotenv()
+from .chat_utils import (
+    DEFAULT_CHAT_MODEL,
+    DEFAULT_CONCURRENCY,
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_REQUESTS_PER_MINUTE,
+    DEFAULT_TOKENS_PER_MINUTE,
+    ChatClient,
+    RateLimiter,
+    run_sync
+)
+from .qdrant_utils import SUMMARY_PAYLOAD_FIELDS, Snapshot
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+load_dotenv()
 
 class SummaryWriterTool(BaseTool):
     """
     Generates descriptive summaries for media clusters using OpenAI.
     Takes into account both image and video content, creating concise
     and meaningful descriptions for each cluster.
+    With `snapshot_dir`, clusters can carry just item ids; the metadata used is read from the local snapshot.
+    Clusters are summarized concurrently (up to `concurrency` requests in flight) within the requests- and
+    tokens-per-minute limits; rate-limited and failed requests are retried with jittered backoff, and each
+    summary is appended to cluster_summaries.jsonl as soon as it is ready.
     """
     
     clusters: Dict[str, List[Dict[str, Any]]] = Field(
@@ -29,8 +42,69 @@ class SummaryWriterTool(BaseTool):
         description="Directory to save cluster summaries"
     )
     
-    def _generate_cluster_summary(self, cluster_items: List[Dict[str, Any]], cluster_id: str) -> str:
-        """Generate a summary for a cluster using OpenAI."""
+    profiles: Optional[Dict[str, Dict[str, Any]]] = Field(
+        default=None,
+        description="Cluster profiles from ClusterTool (representative item ids, cohesion); when given, each summary "
+                    "is written from the cluster's representative items instead of its first items"
+    )
+    
+    snapshot_dir: Optional[str] = Field(
+        default=None,
+        description="Local snapshot (QdrantFetcherTool export_dir) to read missing item metadata from by id"
+    )
+
+    model: str = Field(
+        default=DEFAULT_CHAT_MODEL,
+        description="Chat model that writes the summaries"
+    )
+
+    concurrency: int = Field(
+        default=DEFAULT_CONCURRENCY,
+        description="Maximum summary requests in flight at once"
+    )
+
+    requests_per_minute: int = Field(
+        default=DEFAULT_REQUESTS_PER_MINUTE,
+        description="Request rate limit of the API account; requests wait instead of exceeding it"
+    )
+
+    tokens_per_minute: int = Field(
+        default=DEFAULT_TOKENS_PER_MINUTE,
+        description="Token rate limit of the API account (prompt estimate plus max tokens per request)"
+    )
+
+    max_retries: int = Field(
+        default=DEFAULT_MAX_RETRIES,
+        description="Retries per cluster on rate limits (429), server errors and timeouts"
+    )
+
+    cluster_timeout: float = Field(
+        default=60.0,
+        description="Seconds allowed per cluster summary, including retries; the cluster is reported as failed after"
+    )
+
+    def _with_snapshot_metadata(self, snapshot: Snapshot) -> Dict[str, List[Dict[str, Any]]]:
+        """Copies of the clusters with item metadata completed from the snapshot (full fields for sampled items)."""
+        clusters = {}
+        for cluster_id, items in self.clusters.items():
+            items = [{**item, 'metadata': dict(item.get('metadata') or {})} for item in items]
+            snapshot.fill_metadata(items, ['media_type'])
+            snapshot.fill_metadata(self._sample_items(items, cluster_id), list(SUMMARY_PAYLOAD_FIELDS))
+            clusters[cluster_id] = items
+        return clusters
+
+    def _sample_items(self, cluster_items: List[Dict[str, Any]], cluster_id: str) -> List[Dict[str, Any]]:
+        """
+        The cluster's representative items if its profile lists them, otherwise its first 3 items
+        (ClusterTool lists members from most to least typical).
+        """
+        profile = (self.profiles or {}).get(str(cluster_id)) or {}
+        by_id = {item['id']: item for item in cluster_items}
+        representatives = [by_id[item_id] for item_id in profile.get('representatives', []) if item_id in by_id]
+        return representatives or cluster_items[:3]
+    
+    def _cluster_prompt(self, cluster_items: List[Dict[str, Any]], cluster_id: str) -> str:
+        """The prompt describing a cluster: its size, media types, cohesion and representative items."""
         # Prepare cluster information for the prompt
         media_types = {}
         for item in cluster_items:
@@ -43,12 +117,14 @@ class SummaryWriterTool(BaseTool):
 Cluster Statistics:
 - Total items: {len(cluster_items)}
 - Media types: {', '.join(f'{k}: {v}' for k, v in media_types.items())}
-
-Key Metadata:
 """
+        profile = (self.profiles or {}).get(str(cluster_id)) or {}
+        if profile.get('cohesion') is not None:
+            prompt += f"- Visual cohesion (mean similarity to the cluster centre, 0-1): {profile['cohesion']}\n"
+        prompt += "\nKey Metadata (representative items):\n"
         
-        # Add sample metadata from a few items
-        for item in cluster_items[:3]:
+        # Add sample metadata from a few representative items
+        for item in self._sample_items(cluster_items, cluster_id):
             metadata = item['metadata']
             prompt += f"- {metadata.get('file_path', 'Unknown path')}\n"
             if 'creation_time' in metadata:
@@ -58,59 +134,112 @@ Key Metadata:
                 
         prompt += "\nPlease provide a concise summary (2-3 sentences) describing the content and characteristics of this cluster."
         
+        return prompt
+
+    async def _generate_cluster_summary(self, chat: ChatClient, cluster_items: List[Dict[str, Any]],
+                                        cluster_id: str) -> str:
+        """Generate a summary for a cluster with the chat API, within cluster_timeout."""
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are a media curator assistant. Create concise, descriptive summaries of media clusters."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=150,
-                temperature=0.7
+            summary, _ = await asyncio.wait_for(
+                chat.complete(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": "You are a media curator assistant. Create concise, descriptive summaries of media clusters."},
+                        {"role": "user", "content": self._cluster_prompt(cluster_items, cluster_id)}
+                    ],
+                    max_tokens=150,
+                    temperature=0.7
+                ),
+                timeout=self.cluster_timeout
             )
-            
-            return response.choices[0].message.content.strip()
-            
+            return summary
+
+        except asyncio.TimeoutError:
+            return f"Error generating summary: timed out after {self.cluster_timeout}s"
         except Exception as e:
             return f"Error generating summary: {str(e)}"
 
+    async def _generate_summaries(self, clusters: Dict[str, List[Dict[str, Any]]],
+                                  progress_file: Path) -> Dict[str, Any]:
+        """
+        Summarizes all clusters concurrently and appends each result to `progress_file` (JSON lines) as it
+        completes. Returns the summaries in cluster order and request statistics.
+        """
+        began = time.perf_counter()
+        slots = asyncio.Semaphore(max(1, self.concurrency))
+        limiter = RateLimiter(self.requests_per_minute, self.tokens_per_minute)
+
+        async with ChatClient(limiter=limiter, max_connections=max(1, self.concurrency),
+                              max_retries=self.max_retries) as chat:
+            async def summarize(cluster_id: str, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+                async with slots:
+                    summary = await self._generate_cluster_summary(chat, items, cluster_id)
+                media_types: Dict[str, int] = {}
+                for item in items:
+                    media_type = item['metadata'].get('media_type', 'unknown')
+                    media_types[media_type] = media_types.get(media_type, 0) + 1
+                return {"cluster_id": cluster_id, "summary": summary, "item_count": len(items),
+                        "media_types": media_types}
+
+            completed = {}
+            with open(progress_file, 'w') as f:
+                for next_done in asyncio.as_completed([summarize(cluster_id, items)
+                                                       for cluster_id, items in clusters.items()]):
+                    entry = await next_done
+                    f.write(json.dumps(entry) + "\n")
+                    f.flush()
+                    completed[entry.pop("cluster_id")] = entry
+
+        summaries = {cluster_id: completed[cluster_id] for cluster_id in clusters}
+        return {
+            "summaries": summaries,
+            "statistics": {
+                "failed_clusters": sum(s["summary"].startswith("Error generating summary") for s in summaries.values()),
+                "requests": chat.requests,
+                "retries": chat.retries,
+                "rate_limit_wait_sec": round(limiter.waited_seconds, 3),
+                "seconds": round(time.perf_counter() - began, 3)
+            }
+        }
+
     def run(self) -> Dict[str, Any]:
         """
         Generates summaries for all clusters and saves them.
-        Returns dictionary with cluster summaries and statistics.
+        Returns dictionary with cluster summaries and statistics. Clusters whose summary failed are counted in
+        statistics.failed_clusters; if every cluster failed, the status is "error" with the first failure.
         """
         try:
             # Create output directory
             output_path = Path(self.output_dir)
             output_path.mkdir(parents=True, exist_ok=True)
             
-            # Generate summaries for each cluster
-            summaries = {}
-            for cluster_id, items in self.clusters.items():
-                summary = self._generate_cluster_summary(items, cluster_id)
-                summaries[cluster_id] = {
-                    "summary": summary,
-                    "item_count": len(items),
-                    "media_types": {}
-                }
-                
-                # Count media types
-                for item in items:
-                    media_type = item['metadata'].get('media_type', 'unknown')
-                    summaries[cluster_id]["media_types"][media_type] = \
-                        summaries[cluster_id]["media_types"].get(media_type, 0) + 1
-            
+            clusters = self._with_snapshot_metadata(Snapshot(self.snapshot_dir)) if self.snapshot_dir else self.clusters
+
+            # Generate summaries for all clusters concurrently, saving each as it completes
+            generated = run_sync(self._generate_summaries(clusters, output_path / "cluster_summaries.jsonl"))
+            summaries = generated["summaries"]
+
             # Save results
             results = {
                 "summaries": summaries,
                 "statistics": {
                     "total_clusters": len(summaries),
-                    "total_items": sum(s["item_count"] for s in summaries.values())
+                    "total_items": sum(s["item_count"] for s in summaries.values()),
+                    **generated["statistics"]
                 }
             }
             
             with open(output_path / "cluster_summaries.json", 'w') as f:
                 json.dump(results, f, indent=2)
+
+            if summaries and results["statistics"]["failed_clusters"] == len(summaries):
+                return {
+                    "status": "error",
+                    "message": next(iter(summaries.values()))["summary"],
+                    "summaries": summaries,
+                    "statistics": results["statistics"],
+                    "output_file": str(output_path / "cluster_summaries.json")
+                }
             
             # Store in shared state for other tools
             self._shared_state.set("cluster_summaries", results)
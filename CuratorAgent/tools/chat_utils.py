@@ -0,0 +1,203 @@
+# 📌 Purpose: Concurrent chat completions for the CuratorAgent tools: an asyncio HTTP client for an
+#    OpenAI-compatible /chat/completions endpoint that stays inside the account's rate limits.
+# ⚙️ Key Logic: `RateLimiter` holds two token buckets refilled continuously, one for requests and one for
+#    tokens per minute (prompt estimated at ~4 characters per token plus max_tokens); each request waits until
+#    both have room. `ChatClient` shares one pooled httpx.AsyncClient, and retries 429, 5xx, timeouts and
+#    connection errors with exponential backoff and full jitter, waiting at least the server's Retry-After; a 429
+#    also pauses the limiter so the other in-flight requests back off with it. OPENAI_BASE_URL points the client
+#    at another server (e.g. a local stub in tests).
+# 📂 Expected File Path: photo_intelligence_agency/CuratorAgent/tools/chat_utils.py
+
+import asyncio
+import logging
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_API_BASE = "https://api.openai.com/v1"
+DEFAULT_CHAT_MODEL = "gpt-4o-mini"
+DEFAULT_CONCURRENCY = 8
+DEFAULT_REQUESTS_PER_MINUTE = 500
+DEFAULT_TOKENS_PER_MINUTE = 200000
+DEFAULT_REQUEST_TIMEOUT_SEC = 30.0
+DEFAULT_MAX_RETRIES = 4
+RETRY_BACKOFF_SEC = 1.0
+MAX_RETRY_DELAY_SEC = 30.0
+CHARS_PER_TOKEN = 4  # Rough prompt size estimate for the token budget (no tokenizer dependency)
+
+
+class ChatAPIError(Exception):
+    """Error response from the chat API."""
+
+    def __init__(self, status_code: int, message: str, retry_after: Optional[float] = None):
+        super().__init__(f"HTTP {status_code}: {message}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, server errors, timeouts and connection errors; other client errors are final."""
+    if isinstance(error, ChatAPIError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+
+def retry_delay(attempt: int, backoff: float = RETRY_BACKOFF_SEC, retry_after: Optional[float] = None) -> float:
+    """Exponential backoff with full jitter, but never shorter than the server's Retry-After."""
+    delay = random.uniform(0, min(MAX_RETRY_DELAY_SEC, backoff * 2 ** attempt))
+    return max(delay, retry_after or 0.0)
+
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header (the HTTP-date form is ignored)."""
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def estimate_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+    """Tokens a request counts against the per-minute budget: its estimated prompt plus the completion limit."""
+    return sum(len(message.get("content") or "") for message in messages) // CHARS_PER_TOKEN + max_tokens
+
+
+def run_sync(coroutine: Awaitable[Any]) -> Any:
+    """Runs a coroutine to completion from synchronous code, in a worker thread if this thread has a running loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coroutine).result()
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute budgets as token buckets (each holds at most one minute's worth).
+    `acquire` waits until both buckets cover the request; waiting callers are served in arrival order.
+    Create it inside the event loop that uses it.
+    """
+
+    def __init__(self, requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE):
+        self.capacity = (float(requests_per_minute), float(tokens_per_minute))
+        self._available = list(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+        self.waited_seconds = 0.0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        for i, capacity in enumerate(self.capacity):
+            self._available[i] = min(capacity, self._available[i] + elapsed * capacity / 60.0)
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every request for `seconds` (after a 429 from the server)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, tokens: int) -> float:
+        """Waits until one request of `tokens` tokens fits the budgets and takes it. Returns the seconds waited."""
+        began = time.monotonic()
+        need = (1.0, float(min(tokens, self.capacity[1])))
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._paused_until - now
+                for available, needed, capacity in zip(self._available, need, self.capacity):
+                    if available < needed:
+                        wait = max(wait, (needed - available) * 60.0 / capacity)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            self._available = [available - needed for available, needed in zip(self._available, need)]
+        waited = time.monotonic() - began
+        self.waited_seconds += waited
+        return waited
+
+
+class ChatClient:
+    """
+    Async client for POST {base_url}/chat/completions, used as `async with ChatClient(...) as chat`. Every
+    request goes through `limiter` and is retried up to `max_retries` times on retryable errors.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        limiter: Optional[RateLimiter] = None,
+        max_connections: int = DEFAULT_CONCURRENCY,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff: float = RETRY_BACKOFF_SEC,
+        request_timeout: float = DEFAULT_REQUEST_TIMEOUT_SEC,
+    ):
+        self.api_key = api_key if api_key is not None else os.getenv("OPENAI_API_KEY")
+        self.base_url = (base_url or os.getenv("OPENAI_BASE_URL") or DEFAULT_API_BASE).rstrip("/")
+        self.limiter = limiter or RateLimiter()
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.request_timeout = request_timeout
+        self.requests = 0
+        self.retries = 0
+        self._http: Optional[httpx.AsyncClient] = None
+
+    async def __aenter__(self) -> "ChatClient":
+        self._http = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"Authorization": f"Bearer {self.api_key}"} if self.api_key else {},
+            timeout=self.request_timeout,
+            limits=httpx.Limits(max_connections=self.max_connections,
+                                max_keepalive_connections=self.max_connections),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self._http.aclose()
+        self._http = None
+
+    async def _post(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        self.requests += 1
+        response = await self._http.post("/chat/completions", json=body)
+        if response.status_code >= 400:
+            try:
+                message = response.json().get("error", {}).get("message") or response.text
+            except ValueError:
+                message = response.text
+            raise ChatAPIError(response.status_code, message, _retry_after(response.headers.get("retry-after")))
+        return response.json()
+
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = DEFAULT_CHAT_MODEL,
+        max_tokens: int = 150,
+        temperature: float = 0.7,
+    ) -> Tuple[str, Dict[str, Any]]:
+        """The assistant's reply to `messages` and the response's token usage."""
+        body = {"model": model, "messages": messages, "max_tokens": max_tokens, "temperature": temperature}
+        tokens = estimate_tokens(messages, max_tokens)
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire(tokens)
+            try:
+                data = await self._post(body)
+                return data["choices"][0]["message"]["content"].strip(), data.get("usage") or {}
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                delay = retry_delay(attempt, self.backoff, getattr(e, "retry_after", None))
+                if getattr(e, "status_code", None) == 429:
+                    self.limiter.pause(delay)
+                self.retries += 1
+                logger.warning(f"Chat request failed ({e}); retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
@@ -0,0 +1,961 @@
+# 📌 Purpose: Numeric helpers for ClusterTool that do not depend on agency_swarm: the dimensionality reduction
+#    stage that runs before HDBSCAN and the scalable clustering backends.
+# ⚙️ Key Logic: HDBSCAN's tree-based neighbour search degrades towards brute force on 512-d CLIP embeddings.
+#    `EmbeddingReducer` projects them onto their top principal components (exact or randomized SVD) before
+#    clustering. The fitted projection (mean + components) is a small .npz, so later runs reuse it instead of refitting.
+#    Backends: HDBSCAN with parallel Boruvka KD/Ball-tree variants, and a graph mode that links each item to its
+#    nearest neighbours (blocked matrix multiplication, memory-bounded) and takes connected components or label
+#    propagation communities as clusters; 'auto' picks one by collection size.
+#    `ClusterModel` persists a fit (HDBSCAN with prediction data, or cluster centroids for the graph backend) so
+#    later runs place new items with `approximate_predict` instead of re-clustering everything.
+#    `StreamingClusterer` handles collections too large for memory: a mini-batch k-means (or BIRCH) codebook is
+#    fitted page by page, HDBSCAN optionally groups the codebook centroids into variable-density clusters, and a
+#    second pass labels every point by its nearest centroid.
+#    Embedding matrices can come in as float32 arrays (memory-mapped .npy, shared memory) and are normalized
+#    in place block by block, so peak memory stays near one copy of the matrix.
+#    `ClusterResults` stores a run compactly (label array + per-cluster size, centroid and cohesion in an .npz;
+#    metadata stays with the caller, referenced by id) under a fingerprint of the embeddings, ids and settings,
+#    so an identical call is answered from the cache instead of re-clustering.
+#    `cluster_profiles` derives centroids, medoids, dispersion and member order (by distance to the centroid) for
+#    all clusters in two sequential passes over the matrix, and a diverse set of representatives per cluster
+#    (farthest-point sampling over a bounded candidate set).
+#    `sweep_hdbscan` builds HDBSCAN's single-linkage hierarchy once per `min_samples` and re-condenses it for
+#    every `min_cluster_size` / cluster-selection epsilon, scoring each flat clustering on a fixed sample.
+# 📂 Expected File Path: photo_intelligence_agency/CuratorAgent/tools/cluster_utils.py
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+import time
+from multiprocessing import resource_tracker, shared_memory
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import hdbscan
+from hdbscan._hdbscan_tree import compute_stability, condense_tree, get_clusters
+from hdbscan.validity import validity_index
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from sklearn.cluster import Birch, MiniBatchKMeans
+from sklearn.decomposition import PCA
+from sklearn.metrics import silhouette_score
+from sklearn.preprocessing import normalize
+
+logger = logging.getLogger(__name__)
+
+# Constants
+NORMALIZE_BLOCK_ROWS = 65536  # Rows normalized per step, bounding the temporary norms/upcasts
+REDUCTION_METHODS = ('pca', 'randomized')  # 'randomized' uses randomized SVD: much faster on large collections
+REDUCER_FILENAME = "reduction_model.npz"
+CLUSTER_MODEL_FILENAME = "cluster_model.pkl"
+CLUSTER_MODEL_VERSION = 1  # Bump when ClusterModel's attributes change; older model files are then refitted
+CLUSTER_MODES = ('fit', 'assign', 'stream', 'sweep')
+CLUSTER_BACKENDS = ('auto', 'hdbscan', 'boruvka_kdtree', 'boruvka_balltree', 'graph')
+GRAPH_METHODS = ('components', 'label_propagation')
+AUTO_BORUVKA_MIN_ITEMS = 10_000  # From here, parallel Boruvka beats HDBSCAN's default (Prim's on high-d data)
+AUTO_GRAPH_MIN_ITEMS = 200_000  # From here, even Boruvka HDBSCAN takes too long on a CPU box
+KDTREE_MAX_DIM = 32  # KD-trees lose to ball trees above roughly this dimensionality
+GRAPH_BLOCK_BYTES = 256 << 20  # Size of the similarity block computed per step of the k-NN search
+LABEL_PROPAGATION_MAX_ITER = 30
+STREAM_CODEBOOKS = ('minibatch_kmeans', 'birch')
+STREAM_PAGE_SIZE = 4096  # Points per Qdrant scroll page in streaming mode
+STREAM_SAMPLE_PER_CENTROID = 50  # Reservoir sample size per k-means centroid (1024 centroids: ~51k points)
+BIRCH_THRESHOLD = 0.5  # Subcluster radius for the BIRCH codebook (embeddings are unit-normalized)
+CLUSTER_RESULTS_FILENAME = "clustering_results.npz"
+RESULTS_CACHE_DIRNAME = "results_cache"
+RESULTS_CACHE_MAX_ENTRIES = 16  # Least recently used cached results beyond this are deleted
+RESULTS_VERSION = 2  # Bump when ClusterResults' stored arrays change; older cached results are recomputed
+REPRESENTATIVES_PER_CLUSTER = 5
+REPRESENTATIVE_CANDIDATES = 1024  # Members per cluster considered by farthest-point sampling (evenly by distance)
+SWEEP_QUALITY_SAMPLE = 2000  # Points scored per flat clustering (DBCV is quadratic in the cluster sizes)
+
+
+def normalize_rows_inplace(matrix: np.ndarray, block_rows: int = NORMALIZE_BLOCK_ROWS) -> np.ndarray:
+    """Scales every row of a float matrix to unit length in place (zero rows stay zero) and returns it."""
+    for start in range(0, len(matrix), block_rows):
+        block = matrix[start:start + block_rows]
+        norms = np.linalg.norm(block, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        block /= norms
+    return matrix
+
+
+def as_embedding_matrix(data: Any) -> np.ndarray:
+    """
+    Returns `data` (an array, memmap or anything exposing __array__, e.g. an HDF5/zarr dataset) as a
+    C-contiguous 2-d float32 matrix, without copying when it already is one.
+    """
+    matrix = np.asarray(data)
+    if matrix.ndim != 2:
+        raise ValueError(f"Embeddings must be a 2-d (items x dimensions) matrix, got shape {matrix.shape}")
+    return np.ascontiguousarray(matrix, dtype=np.float32)
+
+
+def load_npy_embeddings(path: str) -> np.ndarray:
+    """
+    Memory-maps an .npy matrix copy-on-write: pages are read lazily and in-place normalization writes to
+    private memory, never back to the file.
+    """
+    return as_embedding_matrix(np.load(path, mmap_mode='c'))
+
+
+def attach_shared_embeddings(name: str, shape: Sequence[int]) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    """
+    Attaches to a float32 matrix in a shared memory block created by another process. The caller must close
+    the returned SharedMemory once done with the array; the creator stays responsible for unlinking it.
+    """
+    try:
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13 always registers the block, and its resource tracker would unlink it at exit
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm, np.ndarray(tuple(shape), dtype=np.float32, buffer=shm.buf)
+
+
+class EmbeddingReducer:
+    """
+    Linear projection of embeddings onto their top `n_components` principal components.
+
+    Only the mean and component matrix are kept after fitting, so `transform` is a single float32 matrix
+    product and the model can be saved, reloaded and applied to items fetched later.
+    """
+
+    def __init__(self, n_components: int, method: str = 'pca', random_state: int = 0):
+        if method not in REDUCTION_METHODS:
+            raise ValueError(f"method must be one of {REDUCTION_METHODS}")
+        self.n_components = n_components
+        self.method = method
+        self.random_state = random_state
+        self.mean_: Optional[np.ndarray] = None
+        self.components_: Optional[np.ndarray] = None
+        self.explained_variance_ratio_: Optional[np.ndarray] = None
+        self.n_fit_samples = 0
+        self.fit_sec = 0.0
+
+    @property
+    def is_fitted(self) -> bool:
+        return self.components_ is not None
+
+    @property
+    def input_dim(self) -> int:
+        return self.components_.shape[1] if self.is_fitted else 0
+
+    @property
+    def explained_variance(self) -> float:
+        """Fraction of the embeddings' total variance kept by the projection."""
+        return float(self.explained_variance_ratio_.sum()) if self.is_fitted else 0.0
+
+    def fit(self, embeddings: np.ndarray) -> 'EmbeddingReducer':
+        """
+        Fits the projection. `n_components` is capped at min(n_samples, n_features), the most PCA can return;
+        check `components_.shape[0]` for the number actually used.
+        """
+        start = time.perf_counter()
+        n_components = min(self.n_components, *embeddings.shape)
+        pca = PCA(
+            n_components=n_components,
+            svd_solver='randomized' if self.method == 'randomized' else 'full',
+            random_state=self.random_state
+        )
+        pca.fit(embeddings)
+        self.mean_ = pca.mean_.astype(np.float32)
+        self.components_ = pca.components_.astype(np.float32)
+        self.explained_variance_ratio_ = pca.explained_variance_ratio_.astype(np.float32)
+        self.n_fit_samples = embeddings.shape[0]
+        self.fit_sec = round(time.perf_counter() - start, 3)
+        logger.info(
+            f"Fitted {self.method} reduction {embeddings.shape[1]} -> {n_components} dims on {self.n_fit_samples} "
+            f"items in {self.fit_sec}s ({self.explained_variance:.1%} variance kept)"
+        )
+        return self
+
+    def transform(self, embeddings: np.ndarray) -> np.ndarray:
+        """Projects embeddings (n_items x input_dim) to (n_items x n_components) float32."""
+        if not self.is_fitted:
+            raise RuntimeError("EmbeddingReducer is not fitted")
+        if embeddings.shape[1] != self.input_dim:
+            raise ValueError(f"Expected {self.input_dim}-d embeddings, got {embeddings.shape[1]}-d")
+        return (np.asarray(embeddings, dtype=np.float32) - self.mean_) @ self.components_.T
+
+    def fit_transform(self, embeddings: np.ndarray) -> np.ndarray:
+        return self.fit(embeddings).transform(embeddings)
+
+    def matches(self, n_components: int, method: str, input_dim: int) -> bool:
+        """True if this fitted model was built with the given settings for embeddings of `input_dim`."""
+        return (
+            self.is_fitted
+            and self.method == method
+            and self.n_components == n_components
+            and self.input_dim == input_dim
+        )
+
+    def report(self, cached: bool = False) -> Dict[str, Any]:
+        """Summary for ClusterTool statistics."""
+        return {
+            "method": self.method,
+            "input_dim": self.input_dim,
+            "components": int(self.components_.shape[0]) if self.is_fitted else 0,
+            "explained_variance": round(self.explained_variance, 4),
+            "fit_samples": self.n_fit_samples,
+            "fit_sec": self.fit_sec,
+            "cached": cached
+        }
+
+    def save(self, path: Path) -> None:
+        """Writes the fitted projection atomically."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(
+                    f,
+                    n_components=self.n_components,
+                    method=self.method,
+                    mean=self.mean_,
+                    components=self.components_,
+                    explained_variance_ratio=self.explained_variance_ratio_,
+                    n_fit_samples=self.n_fit_samples,
+                    fit_sec=self.fit_sec
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: Path) -> Optional['EmbeddingReducer']:
+        """Reads a model written by `save`. Returns None if the file is missing or unreadable."""
+        if not path.is_file():
+            return None
+        try:
+            with np.load(path) as data:
+                reducer = cls(int(data['n_components']), str(data['method']))
+                reducer.mean_ = data['mean']
+                reducer.components_ = data['components']
+                reducer.explained_variance_ratio_ = data['explained_variance_ratio']
+                reducer.n_fit_samples = int(data['n_fit_samples'])
+                reducer.fit_sec = float(data['fit_sec'])
+            return reducer
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable reduction model {path}: {e}")
+            return None
+
+
+def choose_backend(n_items: int, dim: int, allow_graph: bool = True) -> str:
+    """
+    Picks the clustering backend for 'auto' from the collection size and vector dimensionality
+    (an HDBSCAN variant only, if not `allow_graph`).
+    """
+    if allow_graph and n_items >= AUTO_GRAPH_MIN_ITEMS:
+        return 'graph'
+    if n_items >= AUTO_BORUVKA_MIN_ITEMS:
+        return 'boruvka_kdtree' if dim <= KDTREE_MAX_DIM else 'boruvka_balltree'
+    return 'hdbscan'
+
+
+def hdbscan_algorithm(backend: str) -> str:
+    """Maps an HDBSCAN backend name to the `algorithm` argument of hdbscan.HDBSCAN."""
+    return 'best' if backend == 'hdbscan' else backend
+
+
+def knn_graph(
+    vectors: np.ndarray,
+    k: int,
+    rescore_vectors: Optional[np.ndarray] = None,
+    block_bytes: int = GRAPH_BLOCK_BYTES,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Finds each row's `k` most similar other rows by dot product, computing the similarity matrix in row blocks
+    so memory stays around `block_bytes` whatever the collection size. Rows should be unit-normalized.
+
+    With `rescore_vectors` (e.g. the full embeddings when `vectors` are reduced ones), the neighbours are searched
+    with `vectors` but their similarities are recomputed from `rescore_vectors`: an approximate k-NN graph whose
+    edge weights are exact. Returns (neighbours, similarities), both n x k.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n = len(vectors)
+    k = min(k, n - 1)
+    if k < 1:
+        return np.empty((n, 0), dtype=np.int64), np.empty((n, 0), dtype=np.float32)
+    if rescore_vectors is not None:
+        rescore_vectors = np.ascontiguousarray(rescore_vectors, dtype=np.float32)
+
+    neighbors = np.empty((n, k), dtype=np.int64)
+    similarities = np.empty((n, k), dtype=np.float32)
+    block_rows = max(1, block_bytes // (4 * n))
+    for start in range(0, n, block_rows):
+        stop = min(start + block_rows, n)
+        block = vectors[start:stop] @ vectors.T
+        block[np.arange(stop - start), np.arange(start, stop)] = -np.inf  # no self-loops
+        top = np.argpartition(block, -k, axis=1)[:, -k:]
+        neighbors[start:stop] = top
+        if rescore_vectors is None:
+            similarities[start:stop] = np.take_along_axis(block, top, axis=1)
+        else:
+            similarities[start:stop] = np.einsum('id,ikd->ik', rescore_vectors[start:stop], rescore_vectors[top])
+    return neighbors, similarities
+
+
+def _label_propagation(adjacency: sparse.csr_matrix, max_iter: int = LABEL_PROPAGATION_MAX_ITER,
+                       seed: int = 0) -> np.ndarray:
+    """
+    Label propagation: every item repeatedly takes the label with the largest total edge weight among its
+    neighbours (ties go to the smallest label) until no item would change. Each round updates a random half of
+    the items, which stops the two-cycle oscillations of fully synchronous updates.
+    """
+    n = adjacency.shape[0]
+    rng = np.random.default_rng(seed)
+    coo = adjacency.tocoo()
+    # Zero-weight self-loops make every item a candidate for its own label, so isolated items keep theirs
+    src = np.concatenate([coo.row, np.arange(n)])
+    dst = np.concatenate([coo.col, np.arange(n)])
+    weights = np.concatenate([coo.data, np.zeros(n, dtype=coo.data.dtype)])
+    labels = np.arange(n)
+    for _ in range(max_iter):
+        candidates = labels[dst]
+        order = np.lexsort((candidates, src))
+        s, c, w = src[order], candidates[order], weights[order]
+        starts = np.flatnonzero(np.r_[True, (np.diff(s) != 0) | (np.diff(c) != 0)])
+        scores = np.add.reduceat(w, starts)
+        group_items, group_labels = s[starts], c[starts]
+        best = np.lexsort((group_labels, -scores, group_items))
+        best = best[np.r_[True, np.diff(group_items[best]) != 0]]
+        proposed = labels.copy()
+        proposed[group_items[best]] = group_labels[best]
+        if np.array_equal(proposed, labels):
+            break
+        update = rng.random(n) < 0.5
+        labels = np.where(update, proposed, labels)
+    return labels
+
+
+def relabel_by_size(labels: np.ndarray, min_cluster_size: int) -> np.ndarray:
+    """Renumbers groups 0..k-1 from largest to smallest; groups below `min_cluster_size` become noise (-1)."""
+    groups, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    order = np.argsort(-counts, kind='stable')
+    new_ids = np.full(len(groups), -1, dtype=np.int64)
+    kept = order[counts[order] >= min_cluster_size]
+    new_ids[kept] = np.arange(len(kept))
+    return new_ids[inverse]
+
+
+def graph_cluster(
+    neighbors: np.ndarray,
+    similarities: np.ndarray,
+    min_similarity: float,
+    min_cluster_size: int,
+    method: str = 'components',
+) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    Clusters a k-NN graph: edges below `min_similarity` are dropped, the rest made symmetric, and clusters are
+    the connected components or label propagation communities with at least `min_cluster_size` items.
+    Returns the labels (-1 for noise) and graph statistics.
+    """
+    if method not in GRAPH_METHODS:
+        raise ValueError(f"method must be one of {GRAPH_METHODS}")
+    n = len(neighbors)
+    keep = similarities >= min_similarity
+    rows = np.repeat(np.arange(n), neighbors.shape[1])[keep.ravel()]
+    adjacency = sparse.csr_matrix(
+        (similarities[keep].astype(np.float64), (rows, neighbors[keep])), shape=(n, n)
+    )
+    adjacency = adjacency.maximum(adjacency.T)
+
+    if method == 'components':
+        _, labels = connected_components(adjacency, directed=False)
+    else:
+        labels = _label_propagation(adjacency)
+    return relabel_by_size(labels, min_cluster_size), {"edges": int(adjacency.nnz // 2), "method": method}
+
+
+def clustering_quality(vectors: np.ndarray, labels: np.ndarray, sample: np.ndarray,
+                       score_cache: Optional[Dict[bytes, Tuple[Optional[float], Optional[float]]]] = None
+                       ) -> Dict[str, Any]:
+    """
+    Scores a flat clustering: cluster count and noise ratio over all items, silhouette (clustered items only)
+    and DBCV (density-based validity, noise included) over the rows in `sample`. Scores are None when the
+    sample holds fewer than two clusters. Pass a dict as `score_cache` to skip rescoring sample labellings
+    already seen (neighbouring settings often select the same clusters).
+    """
+    sample_labels = labels[sample]
+    key = sample_labels.tobytes()
+    if score_cache is not None and key in score_cache:
+        silhouette, dbcv = score_cache[key]
+    else:
+        silhouette, dbcv = _sample_scores(vectors[sample], sample_labels)
+        if score_cache is not None:
+            score_cache[key] = (silhouette, dbcv)
+    return {
+        "num_clusters": int(labels.max()) + 1 if len(labels) else 0,
+        "noise_ratio": round(float((labels == -1).mean()), 4) if len(labels) else 0.0,
+        "silhouette": silhouette,
+        "dbcv": dbcv
+    }
+
+
+def _sample_scores(sample_vectors: np.ndarray, sample_labels: np.ndarray) -> Tuple[Optional[float], Optional[float]]:
+    clustered = sample_labels >= 0
+    num_clusters = len(np.unique(sample_labels[clustered]))
+    if num_clusters < 2:
+        return None, None
+    silhouette, dbcv = None, None
+    if clustered.sum() > num_clusters:
+        silhouette = round(float(silhouette_score(sample_vectors[clustered], sample_labels[clustered])), 4)
+    try:
+        score = validity_index(np.asarray(sample_vectors, dtype=np.float64), sample_labels)
+        dbcv = round(float(score), 4) if np.isfinite(score) else None
+    except (ValueError, ZeroDivisionError) as e:  # e.g. a sampled cluster with a single point
+        logger.debug(f"DBCV not computed: {e}")
+    return silhouette, dbcv
+
+
+def sweep_hdbscan(
+    vectors: np.ndarray,
+    min_samples_values: Sequence[int],
+    min_cluster_sizes: Sequence[int],
+    epsilons: Sequence[float] = (0.0,),
+    algorithm: str = 'best',
+    n_jobs: int = -1,
+    sample_size: int = SWEEP_QUALITY_SAMPLE,
+    random_state: int = 0,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Evaluates HDBSCAN over a grid of settings without refitting for each one.
+
+    The mutual-reachability minimum spanning tree (the expensive part) depends only on `min_samples`, so it is
+    built once per value; each `min_cluster_size` only re-condenses the single-linkage tree, and each epsilon
+    only re-selects clusters from the condensed tree. The labels match a full `HDBSCAN` fit with the same
+    settings. Every combination is scored on the same random sample of rows (see `clustering_quality`).
+    Returns the per-combination reports and timing statistics.
+    """
+    rng = np.random.default_rng(random_state)
+    sample = np.sort(rng.choice(len(vectors), size=min(sample_size, len(vectors)), replace=False))
+    results, score_cache = [], {}
+    timings = {"tree_sec": 0.0, "extract_sec": 0.0, "score_sec": 0.0}
+    for min_samples in sorted(set(min_samples_values)):
+        start = time.perf_counter()
+        clusterer = hdbscan.HDBSCAN(
+            min_cluster_size=max(2, min(min_cluster_sizes)),
+            min_samples=min_samples,
+            algorithm=algorithm,
+            core_dist_n_jobs=n_jobs
+        ).fit(vectors)
+        linkage = clusterer.single_linkage_tree_.to_numpy()
+        timings["tree_sec"] += time.perf_counter() - start
+
+        for min_cluster_size in sorted(set(min_cluster_sizes)):
+            start = time.perf_counter()
+            condensed = condense_tree(linkage, max(2, min_cluster_size))
+            stability = compute_stability(condensed)
+            timings["extract_sec"] += time.perf_counter() - start
+            for epsilon in sorted(set(epsilons)):
+                start = time.perf_counter()
+                # get_clusters rewrites the stability dict while selecting clusters, so each call gets a copy
+                labels, _, _ = get_clusters(
+                    condensed, dict(stability), cluster_selection_method='eom', allow_single_cluster=False,
+                    match_reference_implementation=False, cluster_selection_epsilon=float(epsilon)
+                )
+                timings["extract_sec"] += time.perf_counter() - start
+                start = time.perf_counter()
+                report = {
+                    "min_samples": min_samples,
+                    "min_cluster_size": min_cluster_size,
+                    "cluster_selection_epsilon": float(epsilon),
+                    **clustering_quality(vectors, labels, sample, score_cache)
+                }
+                timings["score_sec"] += time.perf_counter() - start
+                results.append(report)
+    timings = {key: round(value, 3) for key, value in timings.items()}
+    timings.update(trees_built=len(set(min_samples_values)), combinations=len(results), sample_size=len(sample))
+    return results, timings
+
+
+def best_sweep_result(results: Sequence[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """The combination with the highest DBCV (then silhouette, then lowest noise), or None if none scored."""
+    scored = [result for result in results if result["dbcv"] is not None or result["silhouette"] is not None]
+    if not scored:
+        return None
+    return max(scored, key=lambda result: (
+        result["dbcv"] if result["dbcv"] is not None else -1.0,
+        result["silhouette"] if result["silhouette"] is not None else -1.0,
+        -result["noise_ratio"]
+    ))
+
+
+class ClusterModel:
+    """
+    A persisted clustering fit that assigns new items to its clusters without refitting.
+
+    HDBSCAN fits keep the clusterer (fitted with prediction data) and use `hdbscan.approximate_predict`;
+    graph fits keep normalized cluster centroids and assign an item to the most similar one if it reaches
+    `min_similarity`. The fit's settings `signature`, item labels and mean embedding are kept to decide
+    when a refit is due, and the `fingerprint` of the fit's input (if it was cached) so a results cache hit
+    can tell whether the saved model belongs to the same fit.
+    """
+
+    def __init__(
+        self,
+        signature: Dict[str, Any],
+        ids: List[Any],
+        labels: np.ndarray,
+        embeddings: np.ndarray,
+        clusterer: Optional[hdbscan.HDBSCAN] = None,
+        min_similarity: float = 0.0,
+        fingerprint: Optional[str] = None,
+    ):
+        self.version = CLUSTER_MODEL_VERSION
+        self.signature = signature
+        self.fingerprint = fingerprint
+        self.labels_by_id = dict(zip(ids, labels.tolist()))
+        self.fit_mean = embeddings.mean(axis=0).astype(np.float32)
+        self.fit_variance = float(((embeddings - self.fit_mean) ** 2).sum(axis=1).mean()) if len(embeddings) else 0.0
+        self.noise_ratio = float((labels == -1).mean()) if len(labels) else 0.0
+        self.clusterer = clusterer
+        self.min_similarity = min_similarity
+        self.centroid_labels = np.array([], dtype=np.int64)
+        self.centroids = np.empty((0, embeddings.shape[1]), dtype=np.float32)
+        if clusterer is None and (labels >= 0).any():
+            clustered = labels >= 0
+            self.centroid_labels, inverse = np.unique(labels[clustered], return_inverse=True)
+            sums = np.zeros((len(self.centroid_labels), embeddings.shape[1]))
+            np.add.at(sums, inverse, embeddings[clustered])
+            self.centroids = normalize(sums).astype(np.float32)
+
+    def assign(self, vectors: np.ndarray, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Labels new items: `vectors` are what the model was fitted on (reduced or not), `embeddings` the
+        normalized full embeddings. Returns -1 for items that fit no cluster.
+        """
+        if self.clusterer is not None:
+            labels, _ = hdbscan.approximate_predict(self.clusterer, vectors)
+            return np.asarray(labels, dtype=np.int64)
+        if not len(self.centroids):
+            return np.full(len(embeddings), -1, dtype=np.int64)
+        similarities = np.asarray(embeddings, dtype=np.float32) @ self.centroids.T
+        best = similarities.argmax(axis=1)
+        matched = similarities[np.arange(len(best)), best] >= self.min_similarity
+        return np.where(matched, self.centroid_labels[best], -1)
+
+    def drift(self, embeddings: np.ndarray) -> float:
+        """
+        How far the mean of `embeddings` moved from the mean embedding the model was fitted on (euclidean),
+        with the shift expected from sampling alone removed, so small batches don't read as drift.
+        """
+        if not len(embeddings):
+            return 0.0
+        squared_shift = float(((embeddings.mean(axis=0) - self.fit_mean) ** 2).sum())
+        return float(np.sqrt(max(0.0, squared_shift - self.fit_variance / len(embeddings))))
+
+    def save(self, path: Path) -> None:
+        """Pickles the model atomically."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @staticmethod
+    def load(path: Path) -> Optional['ClusterModel']:
+        """Reads a model written by `save`. Returns None if the file is missing, unreadable or outdated."""
+        if not path.is_file():
+            return None
+        try:
+            with open(path, 'rb') as f:
+                model = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cluster model {path}: {e}")
+            return None
+        if not isinstance(model, ClusterModel) or getattr(model, 'version', None) != CLUSTER_MODEL_VERSION:
+            return None
+        return model
+
+
+def results_fingerprint(embeddings: np.ndarray, ids: Sequence[Any], settings: Dict[str, Any],
+                        extra: Optional[np.ndarray] = None) -> str:
+    """
+    Hex digest identifying a clustering input: the embedding matrix bytes (hashed block by block, without
+    copying), the item ids in order, the clustering settings and any `extra` per-item array the labels
+    depend on (e.g. capture times).
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    header = {"shape": list(embeddings.shape), "dtype": str(embeddings.dtype), "settings": settings}
+    digest.update(json.dumps(header, sort_keys=True, default=str).encode())
+    for start in range(0, len(embeddings), NORMALIZE_BLOCK_ROWS):
+        digest.update(np.ascontiguousarray(embeddings[start:start + NORMALIZE_BLOCK_ROWS]).data)
+    digest.update(json.dumps(list(ids), default=str).encode())
+    if extra is not None:
+        digest.update(np.ascontiguousarray(extra).data)
+    return digest.hexdigest()
+
+
+def _rowwise_similarity(vectors: np.ndarray, targets: np.ndarray, target_index: np.ndarray,
+                        block_rows: int = NORMALIZE_BLOCK_ROWS) -> np.ndarray:
+    """Dot product of each `vectors[i]` with `targets[target_index[i]]`, over contiguous blocks of `vectors`."""
+    similarities = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), block_rows):
+        block = slice(start, start + block_rows)
+        similarities[block] = np.einsum('ij,ij->i', vectors[block], targets[target_index[block]])
+    return similarities
+
+
+def _farthest_points(candidates: np.ndarray, n_points: int) -> np.ndarray:
+    """
+    Farthest-point sampling from the first candidate (the medoid): each pick is the candidate farthest from
+    the picks so far. Returns candidate positions, -1 padded when there are fewer distinct members.
+    """
+    picks = np.full(n_points, -1, dtype=np.int64)
+    picks[0] = 0
+    min_distance = 1.0 - candidates @ candidates[0]
+    for step in range(1, n_points):
+        farthest = int(min_distance.argmax())
+        if min_distance[farthest] <= 1e-6:
+            break
+        picks[step] = farthest
+        np.minimum(min_distance, 1.0 - candidates @ candidates[farthest], out=min_distance)
+    return picks
+
+
+def cluster_profiles(
+    embeddings: np.ndarray,
+    labels: np.ndarray,
+    n_representatives: int = REPRESENTATIVES_PER_CLUSTER,
+    max_candidates: int = REPRESENTATIVE_CANDIDATES,
+) -> Dict[str, np.ndarray]:
+    """
+    Summarizes every cluster of unit-normalized `embeddings` in a few vectorized passes.
+
+    Returns arrays indexed by cluster (in `cluster_labels` order): `sizes`, `centroids` (normalized mean),
+    `cohesion` (mean cosine similarity to the centroid), `dispersion` (mean squared distance to the mean,
+    1 - |mean|^2), `radius` (largest cosine distance to the centroid), `medoids` and `representatives` (item
+    rows, -1 padded); and per item: `distances` (cosine distance to its centroid, NaN for noise) and `order`
+    (clustered rows sorted by cluster, then distance).
+
+    The medoid is exact: for unit vectors the summed cosine distance from x to the members is m - x.sum, so
+    the member closest to the centroid minimizes it. Representatives are picked by farthest-point sampling
+    from the medoid over at most `max_candidates` members per cluster, gathered from the matrix in blocks.
+    """
+    clustered_rows = np.flatnonzero(labels >= 0)
+    cluster_labels, index, sizes = np.unique(labels[clustered_rows], return_inverse=True, return_counts=True)
+    k = len(cluster_labels)
+    # Per-cluster sums as one sparse (clusters x items) product, without gathering a copy of the matrix
+    membership = sparse.csr_matrix(
+        (np.ones(len(clustered_rows), dtype=np.float32), (index, clustered_rows)), shape=(k, len(embeddings))
+    )
+    sums = np.asarray(membership @ embeddings, dtype=np.float64).reshape(k, embeddings.shape[1])
+    norms = np.linalg.norm(sums, axis=1)
+    centroids = (sums / np.maximum(norms, 1e-12)[:, None]).astype(np.float32)
+    mean_norms = norms / np.maximum(sizes, 1)
+
+    # Distances in row order over contiguous slices (noise rows point at a zero centroid and are discarded),
+    # so the matrix is read sequentially instead of gathered
+    row_cluster = np.full(len(labels), k, dtype=np.int64)
+    row_cluster[clustered_rows] = index
+    padded_centroids = np.vstack([centroids, np.zeros((1, embeddings.shape[1]), dtype=np.float32)])
+    distances = 1.0 - _rowwise_similarity(embeddings, padded_centroids, row_cluster)
+    distances[labels < 0] = np.nan
+    sorted_members = np.lexsort((distances[clustered_rows], index))
+    order = clustered_rows[sorted_members]
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.int64)
+    medoids = order[starts] if k else np.empty(0, dtype=np.int64)
+    radius = np.maximum.reduceat(distances[order], starts) if k else np.empty(0, dtype=np.float32)
+
+    representatives = np.full((k, max(n_representatives, 0)), -1, dtype=np.int64)
+    if k and n_representatives > 0:
+        # Candidates: members spread evenly along each cluster's distance order (the medoid comes first)
+        counts = np.minimum(sizes, max_candidates)
+        cumulative = np.cumsum(counts)
+        candidate_cluster = np.repeat(np.arange(k), counts)
+        candidate_starts = cumulative - counts
+        local = np.arange(len(candidate_cluster)) - candidate_starts[candidate_cluster]
+        candidate_rows = order[starts[candidate_cluster] + local * sizes[candidate_cluster] // counts[candidate_cluster]]
+        # Candidates are gathered from the matrix once per group of about one block; each cluster's candidates
+        # (at most `max_candidates` rows) then stay in cache for all of its sampling steps
+        first = 0
+        while first < k:
+            offset = candidate_starts[first]
+            last = max(first + 1, int(np.searchsorted(cumulative, offset + NORMALIZE_BLOCK_ROWS, side='right')))
+            group_rows = candidate_rows[offset:cumulative[last - 1]]
+            group = embeddings[group_rows]
+            for cluster in range(first, last):
+                begin = candidate_starts[cluster] - offset
+                picks = _farthest_points(group[begin:begin + counts[cluster]], n_representatives)
+                representatives[cluster] = np.where(picks >= 0, group_rows[begin + np.maximum(picks, 0)], -1)
+            first = last
+
+    return {
+        "cluster_labels": cluster_labels,
+        "sizes": sizes,
+        "centroids": centroids,
+        "cohesion": mean_norms.astype(np.float32),
+        "dispersion": (1.0 - mean_norms ** 2).astype(np.float32),
+        "radius": radius.astype(np.float32),
+        "medoids": medoids.astype(np.int64),
+        "representatives": representatives,
+        "distances": distances,
+        "order": order
+    }
+
+
+class ClusterResults:
+    """
+    Compact record of one clustering run: the label of every item (ids in input order), per-cluster summary
+    statistics and the run's statistics dict. Metadata is not stored; it is looked up by id when the
+    results are expanded for other tools.
+
+    Per cluster: `sizes`, and when the embeddings are available the `cluster_profiles` statistics
+    (centroid, cohesion, dispersion, radius, medoid and representatives) plus each item's distance to its
+    centroid, which orders the members of every cluster from most to least typical.
+    """
+
+    def __init__(
+        self,
+        ids: Sequence[Any],
+        labels: np.ndarray,
+        embeddings: Optional[np.ndarray] = None,
+        statistics: Optional[Dict[str, Any]] = None,
+        fingerprint: Optional[str] = None,
+        n_representatives: int = REPRESENTATIVES_PER_CLUSTER,
+    ):
+        self.ids = list(ids)
+        self.labels = np.asarray(labels, dtype=np.int64)
+        self.statistics = statistics or {}
+        self.fingerprint = fingerprint
+        self.cluster_labels, self.sizes = np.unique(self.labels[self.labels >= 0], return_counts=True)
+        k = len(self.cluster_labels)
+        self.centroids = np.empty((0, 0), dtype=np.float32)
+        self.cohesion = self.dispersion = self.radius = np.full(k, np.nan, dtype=np.float32)
+        self.medoids = np.full(k, -1, dtype=np.int64)
+        self.representatives = np.empty((k, 0), dtype=np.int64)
+        self.distances = np.full(len(self.labels), np.nan, dtype=np.float32)
+        if embeddings is not None and k:
+            profiles = cluster_profiles(embeddings, self.labels, n_representatives)
+            for name in ('centroids', 'cohesion', 'dispersion', 'radius', 'medoids', 'representatives', 'distances'):
+                setattr(self, name, profiles[name])
+
+    def member_order(self) -> np.ndarray:
+        """Rows of clustered items, grouped by cluster and sorted by distance to the centroid within each."""
+        clustered = np.flatnonzero(self.labels >= 0)
+        distances = np.nan_to_num(self.distances[clustered], nan=0.0)
+        return clustered[np.lexsort((distances, self.labels[clustered]))]
+
+    def groups(self, metadata_by_row: Sequence[Dict[str, Any]]) -> Tuple[Dict[int, List[Dict[str, Any]]],
+                                                                          List[Dict[str, Any]]]:
+        """
+        Expands the labels into ({label: [{id, metadata, distance}]}, noise [{id, metadata}]) for other tools.
+        Cluster members are listed from closest to farthest from their centroid.
+        """
+        clusters: Dict[int, List[Dict[str, Any]]] = {}
+        for row in self.member_order().tolist():
+            entry = {"id": self.ids[row], "metadata": metadata_by_row[row]}
+            if np.isfinite(self.distances[row]):
+                entry["distance"] = round(float(self.distances[row]), 4)
+            clusters.setdefault(int(self.labels[row]), []).append(entry)
+        noise = [
+            {"id": self.ids[row], "metadata": metadata_by_row[row]}
+            for row in np.flatnonzero(self.labels == -1).tolist()
+        ]
+        return clusters, noise
+
+    def profiles(self) -> Dict[int, Dict[str, Any]]:
+        """Per-cluster summary for other tools: size, statistics, and medoid and representative item ids."""
+        profiles = {}
+        for i, label in enumerate(self.cluster_labels.tolist()):
+            profile = {"size": int(self.sizes[i])}
+            if self.medoids[i] >= 0:
+                profile.update(
+                    medoid=self.ids[self.medoids[i]],
+                    representatives=[self.ids[row] for row in self.representatives[i].tolist() if row >= 0],
+                    cohesion=round(float(self.cohesion[i]), 4),
+                    dispersion=round(float(self.dispersion[i]), 4),
+                    radius=round(float(self.radius[i]), 4)
+                )
+            profiles[label] = profile
+        return profiles
+
+    def save(self, path: Path) -> None:
+        """Writes the results as a compressed .npz atomically (no pickled objects)."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        ids = np.asarray(self.ids)
+        if ids.dtype == object:
+            ids = ids.astype(str)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(
+                    f,
+                    version=RESULTS_VERSION,
+                    ids=ids,
+                    labels=self.labels.astype(np.int32),
+                    cluster_labels=self.cluster_labels,
+                    sizes=self.sizes,
+                    centroids=self.centroids,
+                    cohesion=self.cohesion,
+                    dispersion=self.dispersion,
+                    radius=self.radius,
+                    medoids=self.medoids,
+                    representatives=self.representatives,
+                    distances=self.distances,
+                    statistics=json.dumps(self.statistics),
+                    fingerprint=self.fingerprint or ""
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: Path) -> Optional['ClusterResults']:
+        """Reads results written by `save`. Returns None if the file is missing, unreadable or outdated."""
+        if not path.is_file():
+            return None
+        try:
+            with np.load(path) as data:
+                if 'version' not in data.files or int(data['version']) != RESULTS_VERSION:
+                    return None
+                results = cls(data['ids'].tolist(), data['labels'], statistics=json.loads(str(data['statistics'])),
+                              fingerprint=str(data['fingerprint']) or None)
+                for name in ('centroids', 'cohesion', 'dispersion', 'radius', 'medoids', 'representatives',
+                             'distances'):
+                    setattr(results, name, data[name])
+            return results
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable clustering results {path}: {e}")
+            return None
+
+
+class ResultsCache:
+    """
+    Directory of `ClusterResults` files named by input fingerprint, trimmed to the `max_entries` most
+    recently used ones.
+    """
+
+    def __init__(self, directory: Path, max_entries: int = RESULTS_CACHE_MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+
+    def path(self, fingerprint: str) -> Path:
+        return self.directory / f"{fingerprint}.npz"
+
+    def get(self, fingerprint: str) -> Optional[ClusterResults]:
+        path = self.path(fingerprint)
+        results = ClusterResults.load(path)
+        if results is not None:
+            os.utime(path)  # Mark as recently used
+        return results
+
+    def put(self, results: ClusterResults) -> Path:
+        path = self.path(results.fingerprint)
+        results.save(path)
+        entries = sorted(self.directory.glob("*.npz"), key=lambda entry: entry.stat().st_mtime, reverse=True)
+        for stale in entries[self.max_entries:]:
+            stale.unlink(missing_ok=True)
+        return path
+
+
+class StreamingClusterer:
+    """
+    Clusters a stream of embedding pages with memory bounded by the codebook, not the collection.
+
+    Pass one feeds pages to `partial_fit`. For mini-batch k-means it keeps a uniform reservoir sample of
+    `sample_size` points (so the codebook doesn't depend on page order: scroll order follows ingestion, which
+    is often grouped by event or topic) and fits `codebook_size` centroids on it in `finalize`; BIRCH instead
+    updates its CF-tree online and its subclusters form the codebook, so its size (and memory) is set by
+    `birch_threshold` rather than `codebook_size` and grows quickly if the threshold is small for the data. `finalize` then optionally runs HDBSCAN on
+    the centroids: k-means places centroids densely where the data is dense, so density-based grouping of the
+    centroids recovers clusters of varying size and density. Pass two labels each page with `predict`.
+    Centroids HDBSCAN leaves as noise stay clusters of their own; the caller drops clusters that end up smaller
+    than its minimum cluster size once all points are labelled.
+    """
+
+    def __init__(
+        self,
+        codebook_size: int = 1024,
+        method: str = 'minibatch_kmeans',
+        refine: bool = True,
+        sample_size: Optional[int] = None,
+        birch_threshold: float = BIRCH_THRESHOLD,
+        random_state: int = 0,
+    ):
+        if method not in STREAM_CODEBOOKS:
+            raise ValueError(f"method must be one of {STREAM_CODEBOOKS}")
+        self.codebook_size = codebook_size
+        self.method = method
+        self.refine = refine
+        self.sample_size = sample_size or codebook_size * STREAM_SAMPLE_PER_CENTROID
+        self.birch_threshold = birch_threshold
+        self.random_state = random_state
+        self.n_seen = 0
+        self.centroids: Optional[np.ndarray] = None
+        self.centroid_labels: Optional[np.ndarray] = None
+        self._birch: Optional[Birch] = None
+        self._sample: Optional[np.ndarray] = None
+        self._rng = np.random.default_rng(random_state)
+
+    def partial_fit(self, embeddings: np.ndarray) -> None:
+        """Takes one page of pass one."""
+        if self.method == 'birch':
+            if self._birch is None:
+                self._birch = Birch(threshold=self.birch_threshold, n_clusters=None)
+            self._birch.partial_fit(embeddings)
+        else:
+            self._update_sample(embeddings)
+        self.n_seen += len(embeddings)
+
+    def _update_sample(self, embeddings: np.ndarray) -> None:
+        """Reservoir sampling (Algorithm R), vectorized per page."""
+        needed = min(self.sample_size, self.n_seen + len(embeddings))
+        if self._sample is None or len(self._sample) < needed:
+            # Grow by doubling up to sample_size, so small collections don't allocate the full reservoir
+            grown = np.empty((min(self.sample_size, max(needed, 2 * self.n_seen)), embeddings.shape[1]), dtype=np.float32)
+            if self._sample is not None:
+                grown[:self.n_seen] = self._sample[:self.n_seen]
+            self._sample = grown
+        positions = self.n_seen + np.arange(len(embeddings))
+        slots = np.where(positions < self.sample_size, positions, self._rng.integers(0, positions + 1))
+        kept = slots < self.sample_size
+        self._sample[slots[kept]] = embeddings[kept]
+
+    def finalize(self) -> Dict[str, Any]:
+        """Ends pass one: fits the codebook and groups its centroids. Returns codebook statistics."""
+        if not self.n_seen:
+            raise ValueError("No embeddings were streamed")
+        if self.method == 'birch':
+            centers = self._birch.subcluster_centers_
+        else:
+            sample = self._sample[:min(self.n_seen, self.sample_size)]
+            centers = MiniBatchKMeans(
+                n_clusters=min(self.codebook_size, len(sample)), random_state=self.random_state, n_init=3
+            ).fit(sample).cluster_centers_
+        self.centroids = np.asarray(centers, dtype=np.float32)
+
+        labels = np.full(len(self.centroids), -1, dtype=np.int64)
+        if self.refine and len(self.centroids) > 2:
+            labels = hdbscan.HDBSCAN(min_cluster_size=2, min_samples=1).fit_predict(self.centroids)
+        grouped = int(labels.max()) + 1
+        # Centroids without a group keep a cluster of their own
+        isolated = labels == -1
+        labels[isolated] = grouped + np.arange(isolated.sum())
+        self.centroid_labels = labels
+        self._birch, self._sample = None, None  # the centroids are all pass two needs
+        return {
+            "codebook": self.method,
+            "codebook_size": len(self.centroids),
+            "refined_groups": grouped,
+            "points_seen": self.n_seen
+        }
+
+    def predict(self, embeddings: np.ndarray) -> np.ndarray:
+        """Pass two: labels a page by its nearest codebook centroid's group."""
+        if self.centroids is None:
+            raise RuntimeError("StreamingClusterer is not finalized")
+        # argmin of squared euclidean distance, dropping the per-row |x|^2 term
+        distances = (self.centroids ** 2).sum(axis=1) - 2.0 * (embeddings @ self.centroids.T)
+        return self.centroid_labels[distances.argmin(axis=1)]
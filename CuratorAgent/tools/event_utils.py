@@ -0,0 +1,200 @@
+# 📌 Purpose: Time-based event segmentation for ClusterTool: splits a library into capture-time events and
+#    clusters each event separately.
+# ⚙️ Key Logic: Capture times come from EXIF (DateTimeOriginal, then DateTimeDigitized/DateTime) and fall back to
+#    file times from the metadata. Items are sorted by time (O(n log n)) and split wherever a gap is much longer
+#    than the gaps around it: log(gap) must exceed the mean log gap of its neighbourhood by log(gap_factor),
+#    with hard minimum/maximum gaps. HDBSCAN then runs per event in a process pool and the per-event labels are
+#    merged into globally unique cluster ids, renumbered by size.
+# 📂 Expected File Path: photo_intelligence_agency/CuratorAgent/tools/event_utils.py
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import hdbscan
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Constants
+EXIF_TIME_TAGS = ('DateTimeOriginal', 'DateTimeDigitized', 'DateTime')
+CAPTURE_TIME_KEYS = ('capture_time',)
+FILE_TIME_KEYS = ('file_modification_time', 'modification_time', 'file_creation_time', 'creation_time')
+EXIF_TIME_FORMAT = '%Y:%m:%d %H:%M:%S'
+EVENT_GAP_FACTOR = 17.0  # A gap splits events when it is this many times the (geometric) mean of nearby gaps
+EVENT_GAP_WINDOW = 10  # Gaps on each side averaged for the local mean
+EVENT_MIN_GAP_SEC = 3600.0  # Shorter gaps never split an event
+EVENT_MAX_GAP_SEC = 86400.0  # Longer gaps always split
+EVENT_JOBS_PER_WORKER = 4  # Chunks of events per worker process, to balance uneven event sizes
+
+
+def parse_time(value: Any) -> Optional[float]:
+    """
+    Converts a metadata time (datetime, epoch seconds, ISO 8601 string or EXIF 'YYYY:MM:DD HH:MM:SS') into
+    epoch seconds. Returns None if it can't be parsed (EXIF placeholders such as '0000:00:00 00:00:00').
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value) if np.isfinite(value) else None
+    text = str(value).strip().rstrip('\x00')
+    try:
+        return datetime.strptime(text[:19], EXIF_TIME_FORMAT).timestamp()
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(text.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+def capture_time(metadata: Optional[Dict[str, Any]]) -> Optional[float]:
+    """Capture time of one item in epoch seconds: EXIF first, then an explicit capture_time, then file times."""
+    if not metadata:
+        return None
+    exif = metadata.get('exif_data') or {}
+    candidates = [exif.get(tag) for tag in EXIF_TIME_TAGS]
+    candidates += [metadata.get(key) for key in CAPTURE_TIME_KEYS + FILE_TIME_KEYS]
+    for value in candidates:
+        seconds = parse_time(value)
+        if seconds is not None:
+            return seconds
+    return None
+
+
+def capture_times(metadatas: Sequence[Optional[Dict[str, Any]]]) -> np.ndarray:
+    """Capture times of all items as float64 epoch seconds (NaN where no time is known)."""
+    times = [capture_time(metadata) for metadata in metadatas]
+    return np.array([np.nan if t is None else t for t in times], dtype=np.float64)
+
+
+def segment_events(
+    times: np.ndarray,
+    gap_factor: float = EVENT_GAP_FACTOR,
+    window: int = EVENT_GAP_WINDOW,
+    min_gap: float = EVENT_MIN_GAP_SEC,
+    max_gap: float = EVENT_MAX_GAP_SEC,
+) -> np.ndarray:
+    """
+    Assigns every item an event number (0.. in time order) from its capture time.
+
+    Each gap between consecutive items is compared in log space with the mean of the `window` gaps before it
+    and the mean of the `window` gaps after it, and must exceed both by `gap_factor`, so a 2-hour pause splits
+    a day of bursts but not a week of one photo every few hours. Items without a time
+    form one extra event after the dated ones.
+    """
+    events = np.zeros(len(times), dtype=np.int64)
+    dated = np.flatnonzero(np.isfinite(times))
+    if len(dated):
+        order = dated[np.argsort(times[dated], kind='stable')]
+        gaps = np.diff(times[order])
+        log_gaps = np.log1p(gaps)
+        # Mean log gap over the `window` gaps before and after each gap, from cumulative sums. A gap must stand
+        # out on both sides, so the first gaps of a slow series right after a burst don't split it
+        sums = np.concatenate(([0.0], np.cumsum(log_gaps)))
+        positions = np.arange(len(gaps))
+        lo = np.maximum(0, positions - window)
+        hi = np.minimum(len(gaps), positions + window + 1)
+        before = np.where(positions > lo, (sums[positions] - sums[lo]) / np.maximum(positions - lo, 1), -np.inf)
+        after = np.where(hi > positions + 1, (sums[hi] - sums[positions + 1]) / np.maximum(hi - positions - 1, 1),
+                         -np.inf)
+        local_mean = np.maximum(before, after)
+        local_mean[~np.isfinite(local_mean)] = 0.0  # A single gap: only the hard limits apply
+        splits = (gaps >= max_gap) | ((gaps >= min_gap) & (log_gaps >= local_mean + np.log(gap_factor)))
+        events[order] = np.concatenate(([0], np.cumsum(splits)))
+    undated = ~np.isfinite(times)
+    if undated.any():
+        events[undated] = events[dated].max() + 1 if len(dated) else 0
+    return events
+
+
+def _cluster_event_chunk(job: Dict[str, Any]) -> List[np.ndarray]:
+    """Worker: HDBSCAN on each event of a chunk (a single cluster is allowed, as events are often one scene)."""
+    results = []
+    for vectors in job['events']:
+        if len(vectors) < max(2, job['min_cluster_size']):
+            results.append(np.full(len(vectors), -1, dtype=np.int64))
+            continue
+        clusterer = hdbscan.HDBSCAN(
+            min_cluster_size=job['min_cluster_size'],
+            min_samples=max(1, min(job['min_samples'], len(vectors) - 1)),
+            allow_single_cluster=True
+        )
+        results.append(np.asarray(clusterer.fit_predict(vectors), dtype=np.int64))
+    return results
+
+
+def merge_event_labels(members: Dict[int, np.ndarray], event_labels: Dict[int, np.ndarray],
+                       n_items: int) -> np.ndarray:
+    """
+    Combines per-event labels (each numbered from 0) into globally unique cluster ids, renumbered from the
+    largest cluster down; noise stays -1. `members[event]` are the item positions of an event, in the
+    order of its labels.
+    """
+    labels = np.full(n_items, -1, dtype=np.int64)
+    offset = 0
+    for event, rows in members.items():
+        local = event_labels[event]
+        labels[rows] = np.where(local >= 0, local + offset, -1)
+        offset += int(local.max()) + 1 if len(local) else 0
+    clustered = labels >= 0
+    if clustered.any():
+        groups, inverse, counts = np.unique(labels[clustered], return_inverse=True, return_counts=True)
+        rank = np.empty(len(groups), dtype=np.int64)
+        rank[np.argsort(-counts, kind='stable')] = np.arange(len(groups))
+        labels[clustered] = rank[inverse]
+    return labels
+
+
+def cluster_events(
+    vectors: np.ndarray,
+    events: np.ndarray,
+    min_cluster_size: int,
+    min_samples: int,
+    workers: int = 0,
+) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    Clusters each event separately and merges the labels (see `merge_event_labels`).
+
+    Events smaller than `min_cluster_size` are noise without running HDBSCAN. The rest are grouped into
+    chunks of similar total size and run in a process pool with `workers` processes (0 = all cores,
+    1 = in this process). Returns the labels and statistics about the events.
+    """
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    order = np.argsort(events, kind='stable')
+    event_ids, starts, sizes = np.unique(events[order], return_index=True, return_counts=True)
+    members = {int(event): order[start:start + size] for event, start, size in zip(event_ids, starts, sizes)}
+
+    event_labels = {event: np.full(len(rows), -1, dtype=np.int64) for event, rows in members.items()}
+    clusterable = sorted((event for event, rows in members.items() if len(rows) >= max(2, min_cluster_size)),
+                         key=lambda event: -len(members[event]))
+    # Largest events first, dealt round-robin so chunks get similar amounts of work
+    n_chunks = max(1, min(len(clusterable), workers * EVENT_JOBS_PER_WORKER))
+    chunks = [clusterable[i::n_chunks] for i in range(n_chunks)] if clusterable else []
+    jobs = [
+        {'events': [vectors[members[event]] for event in chunk], 'min_cluster_size': min_cluster_size,
+         'min_samples': min_samples}
+        for chunk in chunks
+    ]
+    if workers <= 1 or len(jobs) <= 1:
+        chunk_results = [_cluster_event_chunk(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            chunk_results = list(pool.map(_cluster_event_chunk, jobs))
+    for chunk, results in zip(chunks, chunk_results):
+        for event, local in zip(chunk, results):
+            event_labels[event] = local
+
+    labels = merge_event_labels(members, event_labels, len(events))
+    info = {
+        "events": len(members),
+        "clustered_events": len(clusterable),
+        "largest_event": int(sizes.max()) if len(sizes) else 0,
+        "workers": min(workers, len(jobs)) if jobs else 0
+    }
+    return labels, info
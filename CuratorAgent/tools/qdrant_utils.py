@@ -0,0 +1,859 @@
+# 📌 Purpose: Reading points out of Qdrant for the CuratorAgent tools: exact filtered counts, cursor-based
+#    scrolling of a whole collection in fixed-size NumPy batches, and resumable opaque cursors.
+# ⚙️ Key Logic: `scroll` takes the id of the next point as its offset (not a number of rows to skip) and returns
+#    the offset of the following page, so a full read follows `next_page_offset` until it is None. Each page is
+#    copied into a preallocated float32 array (no list of lists). A cursor is the next offset plus the
+#    collection and filter it belongs to, base64-encoded so callers treat it as opaque; resuming with a cursor
+#    from a different query is rejected instead of silently returning the wrong points.
+#    Bulk reads can run several scrolls at once over disjoint partitions: contiguous ranges of the id space
+#    (Qdrant returns points in id order and an offset can be any id) or groups of the hash bucket written into
+#    the payload at ingest. Pages are copied into one preallocated matrix as they arrive.
+#    Snapshots keep a (filtered) collection on local disk for offline curation: a normalized float32 .npy
+#    opened with mmap, an id array and one JSON file per payload field, so tools load only the fields they use.
+#    A manifest names the current generation of files and is replaced atomically. Refreshes fetch only points
+#    upserted since the watermark (the newest `indexed_at` seen) plus an id-only scroll (no payload or vectors)
+#    that finds deleted points.
+#    Query results can be cached in memory (`QueryCache`): LRU entries with a TTL, each tagged with the
+#    collection's write version (bumped by the MediaManager processors on upsert), so a write makes them stale
+#    at once and the TTL only bounds writes from clients that don't bump it.
+# 📂 Expected File Path: photo_intelligence_agency/CuratorAgent/tools/qdrant_utils.py
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from qdrant_client.http.models import (
+    FieldCondition,
+    Filter,
+    MatchAny,
+    MatchValue,
+    PayloadSelectorExclude,
+    PayloadSelectorInclude,
+    Range
+)
+
+logger = logging.getLogger(__name__)
+
+# Constants
+FETCH_BATCH_SIZE = 1000  # Points per scroll request when reading a whole collection
+CURSOR_VERSION = 1
+PARTITION_MODES = ('id_range', 'bucket')
+PARTITION_FIELD = "shard_bucket"  # Payload hash bucket written at ingest (MediaManager processing_utils.shard_bucket)
+PARTITION_BUCKETS = 64  # Must match SHARD_BUCKETS in MediaManager processing_utils
+UUID_SPACE = 1 << 128
+# Payload fields each consumer reads; everything else (EXIF blocks, scene lists, sprite timestamps) stays on
+# the server. ClusterTool adds capture-time fields when it segments events
+CLUSTER_PAYLOAD_FIELDS = ('file_path', 'filename', 'media_type', 'duration')
+GALLERY_PAYLOAD_FIELDS = ('file_path', 'filename', 'media_type', 'creation_time', 'duration', 'poster_path',
+                          'sprite_sheet')
+SUMMARY_PAYLOAD_FIELDS = ('file_path', 'media_type', 'creation_time', 'duration')
+# Named projections for QdrantFetcherTool: whether vectors are read and which payload fields (None = all)
+FETCH_PROJECTIONS = {
+    'full': {"with_vectors": True, "payload_include": None},
+    'cluster': {"with_vectors": True, "payload_include": CLUSTER_PAYLOAD_FIELDS},
+    'gallery': {"with_vectors": False, "payload_include": GALLERY_PAYLOAD_FIELDS},
+    'summary': {"with_vectors": False, "payload_include": SUMMARY_PAYLOAD_FIELDS},
+    'ids': {"with_vectors": False, "payload_include": ()},
+}
+SNAPSHOT_VERSION = 1
+SNAPSHOT_MANIFEST = "manifest.json"
+WATERMARK_FIELD = "indexed_at"  # Upsert time written at ingest (MediaManager processing_utils.ingest_fields)
+SNAPSHOT_BLOCK_ROWS = 65536  # Rows copied per step when a refresh rewrites the matrix
+QUERY_CACHE_MAX_ENTRIES = 256
+QUERY_CACHE_TTL_SEC = 300.0
+
+
+class PointBatch(NamedTuple):
+    """One scroll page: ids, float32 vectors (rows in id order, None without vectors), payloads and the cursor
+    that resumes after this page (None after the last page)."""
+    ids: List[Any]
+    vectors: Optional[np.ndarray]
+    payloads: Optional[List[Dict[str, Any]]]
+    cursor: Optional[str]
+
+
+def build_filter(media_type: Optional[str] = None, date_range: Optional[Dict[str, str]] = None) -> Optional[Filter]:
+    """Qdrant filter for the media type and creation date range, or None when neither is given."""
+    must_conditions = []
+    if media_type:
+        must_conditions.append(FieldCondition(key="media_type", match=MatchValue(value=media_type)))
+    if date_range:
+        must_conditions.append(
+            FieldCondition(
+                key="file_creation_time",
+                range=Range(gte=date_range.get("start"), lte=date_range.get("end"))
+            )
+        )
+    return Filter(must=must_conditions) if must_conditions else None
+
+
+def payload_selector(include: Optional[Sequence[str]] = None, exclude: Optional[Sequence[str]] = None) -> Any:
+    """
+    The `with_payload` argument for a scroll: every field (True), only the `include` fields (False when the
+    list is empty), or every field except `exclude`.
+    """
+    if include is not None and exclude:
+        raise ValueError("Pass either payload fields to include or to exclude, not both")
+    if include is not None:
+        return PayloadSelectorInclude(include=list(include)) if include else False
+    if exclude:
+        return PayloadSelectorExclude(exclude=list(exclude))
+    return True
+
+
+def query_scope(collection_name: str, **query: Any) -> str:
+    """Short digest of a collection and the query parameters (filters) a cursor is valid for."""
+    text = json.dumps({"collection": collection_name, **query}, sort_keys=True, default=str)
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+def encode_cursor(offset: Any, scope: str) -> str:
+    """Opaque cursor for resuming a scroll at point id `offset` of the query identified by `scope`."""
+    text = json.dumps({"v": CURSOR_VERSION, "offset": offset, "scope": scope})
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, scope: str) -> Any:
+    """Scroll offset stored in `cursor`. Raises ValueError if it is malformed or was issued for another query."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    if not isinstance(data, dict) or data.get("v") != CURSOR_VERSION or "offset" not in data:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if data.get("scope") != scope:
+        raise ValueError("Cursor was issued for a different collection or filter")
+    return data["offset"]
+
+
+def count_points(client: Any, collection_name: str, scroll_filter: Optional[Filter] = None) -> int:
+    """Exact number of points matching the filter (the collection's points_count ignores filters)."""
+    return client.count(collection_name=collection_name, count_filter=scroll_filter, exact=True).count
+
+
+def point_vector(point: Any, vector_name: Optional[str] = None) -> Any:
+    """The point's vector, or its named vector when the collection stores several."""
+    vector = point.vector
+    if isinstance(vector, dict):
+        if vector_name is None:
+            if len(vector) != 1:
+                raise ValueError(f"Point {point.id} has named vectors {sorted(vector)}; pass vector_name")
+            return next(iter(vector.values()))
+        return vector[vector_name]
+    return vector
+
+
+def _page_arrays(points: List[Any], with_payload: Any, with_vectors: bool,
+                 vector_name: Optional[str]) -> Tuple[Optional[np.ndarray], Optional[List[Dict[str, Any]]]]:
+    """A page's vectors as a float32 matrix (None without vectors) and its payloads (None without payloads)."""
+    vectors = None
+    if with_vectors and points:
+        first = point_vector(points[0], vector_name)
+        vectors = np.empty((len(points), len(first)), dtype=np.float32)
+        for row, point in enumerate(points):
+            vectors[row] = point_vector(point, vector_name)
+    payloads = [point.payload or {} for point in points] if with_payload else None
+    return vectors, payloads
+
+
+def iter_point_batches(
+    client: Any,
+    collection_name: str,
+    batch_size: int = FETCH_BATCH_SIZE,
+    scroll_filter: Optional[Filter] = None,
+    with_payload: Any = True,
+    with_vectors: bool = True,
+    cursor: Optional[str] = None,
+    scope: Optional[str] = None,
+    vector_name: Optional[str] = None,
+) -> Iterator[PointBatch]:
+    """
+    Scrolls every point matching the filter, following `next_page_offset`, one batch of up to `batch_size`
+    points per request. Starts after `cursor` when given; `scope` (see `query_scope`) ties cursors to the query
+    and defaults to the collection alone. `with_payload` may be a `payload_selector` to read only some fields.
+    """
+    scope = scope or query_scope(collection_name)
+    offset = decode_cursor(cursor, scope) if cursor else None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            scroll_filter=scroll_filter,
+            limit=batch_size,
+            offset=offset,
+            with_payload=with_payload,
+            with_vectors=[vector_name] if with_vectors and vector_name else with_vectors
+        )
+        vectors, payloads = _page_arrays(points, with_payload, with_vectors, vector_name)
+        next_cursor = encode_cursor(offset, scope) if offset is not None else None
+        if points or next_cursor is None:
+            yield PointBatch([point.id for point in points], vectors, payloads, next_cursor)
+        if offset is None:
+            return
+
+
+def fetch_points(
+    client: Any,
+    collection_name: str,
+    scroll_filter: Optional[Filter] = None,
+    batch_size: int = FETCH_BATCH_SIZE,
+    with_payload: Any = True,
+    max_items: Optional[int] = None,
+    cursor: Optional[str] = None,
+    scope: Optional[str] = None,
+    vector_name: Optional[str] = None,
+    with_vectors: bool = True,
+) -> Tuple[List[Any], np.ndarray, Optional[List[Dict[str, Any]]], Optional[str]]:
+    """
+    Reads all matching points (or the next `max_items` after `cursor`) into one float32 matrix.
+
+    The matrix is preallocated from the exact filtered count (or `max_items` when that fits in one batch) and
+    each batch is copied into its rows, so peak memory is the matrix plus one batch. Points added while
+    scrolling grow it; points deleted shrink it. Without vectors the matrix has no columns.
+    Returns ids, the matrix, payloads (None without payloads) and the cursor to continue from (None when done).
+    """
+    if max_items is not None and max_items <= batch_size:
+        expected = batch_size = max(max_items, 1)
+    else:
+        expected = count_points(client, collection_name, scroll_filter)
+        if max_items is not None:
+            expected = min(expected, max_items)
+    ids: List[Any] = []
+    payloads: Optional[List[Dict[str, Any]]] = [] if with_payload else None
+    matrix: Optional[np.ndarray] = None
+    next_cursor = None
+    for batch in iter_point_batches(client, collection_name, batch_size, scroll_filter, with_payload, with_vectors,
+                                    cursor, scope, vector_name):
+        take = len(batch.ids) if max_items is None else min(len(batch.ids), max_items - len(ids))
+        if take and with_vectors:
+            if matrix is None:
+                matrix = np.empty((max(expected, take), batch.vectors.shape[1]), dtype=np.float32)
+            if len(ids) + take > len(matrix):
+                logger.info("Collection %s grew while it was read; enlarging the matrix", collection_name)
+                matrix = np.concatenate([matrix, np.empty((len(ids) + take - len(matrix) + batch_size,
+                                                           matrix.shape[1]), dtype=np.float32)])
+            matrix[len(ids):len(ids) + take] = batch.vectors[:take]
+        ids.extend(batch.ids[:take])
+        if payloads is not None:
+            payloads.extend(batch.payloads[:take])
+        next_cursor = batch.cursor
+        if max_items is not None and len(ids) >= max_items:
+            if take < len(batch.ids):
+                # Stopped inside a page: resume at the first point not returned
+                next_cursor = encode_cursor(batch.ids[take], scope or query_scope(collection_name))
+            break
+    if not with_vectors:
+        matrix = np.empty((len(ids), 0), dtype=np.float32)
+    elif matrix is None:
+        matrix = np.empty((0, 0), dtype=np.float32)
+    return ids, matrix[:len(ids)], payloads, next_cursor
+
+
+def _id_key(point_id: Any) -> Tuple[int, int]:
+    """Sort key matching Qdrant's point order: integer ids first, then UUIDs by their 128-bit value."""
+    if isinstance(point_id, int):
+        return 0, point_id
+    return 1, uuid.UUID(str(point_id)).int
+
+
+def _first_id(client: Any, collection_name: str, scroll_filter: Optional[Filter], offset: Any = None) -> Any:
+    """Id of the first matching point at or after `offset`, or None."""
+    points, _ = client.scroll(collection_name=collection_name, scroll_filter=scroll_filter, limit=1, offset=offset,
+                              with_payload=False, with_vectors=False)
+    return points[0].id if points else None
+
+
+def _last_int_id(client: Any, collection_name: str, scroll_filter: Optional[Filter], first: int) -> int:
+    """Largest matching integer id, by exponential then binary search over scroll offsets (~2 log2(max) probes)."""
+    def probe(offset: int) -> Optional[int]:
+        found = _first_id(client, collection_name, scroll_filter, offset)
+        return found if isinstance(found, int) else None  # UUIDs sort after every integer id
+
+    low, step = first, 1
+    while True:
+        found = probe(low + step)
+        if found is None:
+            break
+        low, step = found, step * 2
+    high = low + step  # A point at `low`, none at or after `high`
+    while high - low > 1:
+        middle = (low + high) // 2
+        found = probe(middle)
+        if found is None:
+            high = middle
+        else:
+            low = found
+    return low
+
+
+def id_range_partitions(
+    client: Any,
+    collection_name: str,
+    n_partitions: int,
+    scroll_filter: Optional[Filter] = None,
+) -> List[Tuple[Any, Optional[Any]]]:
+    """
+    Splits the ids of the matching points into `n_partitions` contiguous ranges of equal width, as
+    (first offset, exclusive end or None) pairs. Integer ids are split between the smallest and largest id,
+    UUIDs (random, so spread evenly) between the smallest one and the end of the UUID space. The last range is
+    open, so UUIDs after integer ids are still read.
+    """
+    first = _first_id(client, collection_name, scroll_filter)
+    if first is None:
+        return []
+    if isinstance(first, int):
+        end = _last_int_id(client, collection_name, scroll_filter, first) + 1
+        bounds = [first + (end - first) * i // n_partitions for i in range(n_partitions)]
+    else:
+        start = uuid.UUID(str(first)).int
+        bounds = [str(uuid.UUID(int=start + (UUID_SPACE - start) * i // n_partitions)) for i in range(n_partitions)]
+    bounds = list(dict.fromkeys(bounds))  # Fewer ids than partitions
+    return [(lo, hi) for lo, hi in zip(bounds, bounds[1:] + [None])]
+
+
+def _with_condition(scroll_filter: Optional[Filter], condition: FieldCondition) -> Filter:
+    """The filter with one more `must` condition."""
+    if scroll_filter is None:
+        return Filter(must=[condition])
+    extra = {key: getattr(scroll_filter, key) for key in ('should', 'must_not') if getattr(scroll_filter, key, None)}
+    return Filter(must=list(scroll_filter.must or []) + [condition], **extra)
+
+
+def bucket_partitions(
+    client: Any,
+    collection_name: str,
+    n_partitions: int,
+    scroll_filter: Optional[Filter] = None,
+    field: str = PARTITION_FIELD,
+    buckets: int = PARTITION_BUCKETS,
+) -> List[Filter]:
+    """
+    One filter per partition, each matching an interleaved group of the payload's hash buckets. Raises
+    ValueError if some matching points have no bucket (ingested before it was written), as they would be missed.
+    """
+    n_partitions = max(1, min(n_partitions, buckets))
+    filters = [
+        _with_condition(scroll_filter, FieldCondition(key=field, match=MatchAny(any=list(range(i, buckets, n_partitions)))))
+        for i in range(n_partitions)
+    ]
+    bucketed = count_points(client, collection_name,
+                            _with_condition(scroll_filter, FieldCondition(key=field, match=MatchAny(any=list(range(buckets))))))
+    missing = count_points(client, collection_name, scroll_filter) - bucketed
+    if missing > 0:
+        raise ValueError(f"{missing} points have no '{field}' payload field; use partition_by='id_range'")
+    return filters
+
+
+class _MatrixSink:
+    """Rows of concurrently read pages, copied into one preallocated matrix under a lock (grown if needed)."""
+
+    def __init__(self, capacity: int, with_payload: bool):
+        self.capacity = max(capacity, 1)
+        self.matrix: Optional[np.ndarray] = None
+        self.ids = np.empty(self.capacity, dtype=object)
+        self.payloads: Optional[List[Any]] = [None] * self.capacity if with_payload else None
+        self.size = 0
+        self.segments: List[Tuple[int, int, int, int]] = []  # (partition, page, first row, rows)
+        self.lock = threading.Lock()
+
+    def add(self, partition: int, page: int, ids: List[Any], vectors: np.ndarray,
+            payloads: Optional[List[Dict[str, Any]]]) -> None:
+        with self.lock:
+            if self.matrix is None:
+                self.matrix = np.empty((self.capacity, vectors.shape[1]), dtype=np.float32)
+            start, stop = self.size, self.size + len(ids)
+            if stop > self.capacity:
+                # Points were added while reading
+                self.capacity = max(stop, int(self.capacity * 1.25))
+                self.matrix = np.concatenate([self.matrix, np.empty((self.capacity - len(self.matrix),
+                                                                     self.matrix.shape[1]), dtype=np.float32)])
+                self.ids = np.concatenate([self.ids, np.empty(self.capacity - len(self.ids), dtype=object)])
+                if self.payloads is not None:
+                    self.payloads.extend([None] * (self.capacity - len(self.payloads)))
+            self.matrix[start:stop] = vectors
+            self.ids[start:stop] = ids
+            if self.payloads is not None:
+                self.payloads[start:stop] = payloads
+            self.segments.append((partition, page, start, len(ids)))
+            self.size = stop
+
+    def rows_in_partition_order(self) -> np.ndarray:
+        """Row permutation putting the pages back in (partition, page) order."""
+        segments = sorted(self.segments)
+        if not segments:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(start, start + rows) for _, _, start, rows in segments])
+
+
+def _scroll_partition(
+    client: Any,
+    collection_name: str,
+    scroll_filter: Optional[Filter],
+    start: Any,
+    stop: Optional[Any],
+    batch_size: int,
+    with_payload: bool,
+    vector_name: Optional[str],
+    sink: _MatrixSink,
+    partition: int,
+) -> Dict[str, Any]:
+    """Worker: scrolls one partition (from `start` until an id at or past `stop`) into the sink."""
+    began = time.perf_counter()
+    stop_key = _id_key(stop) if stop is not None else None
+    offset, pages, points_read = start, 0, 0
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            scroll_filter=scroll_filter,
+            limit=batch_size,
+            offset=offset,
+            with_payload=with_payload,
+            with_vectors=[vector_name] if vector_name else True
+        )
+        if stop_key is not None:
+            kept = [point for point in points if _id_key(point.id) < stop_key]
+            if len(kept) < len(points) or (offset is not None and _id_key(offset) >= stop_key):
+                offset = None
+            points = kept
+        if points:
+            vectors, payloads = _page_arrays(points, with_payload, True, vector_name)
+            sink.add(partition, pages, [point.id for point in points], vectors, payloads)
+            pages += 1
+            points_read += len(points)
+        if offset is None:
+            break
+    seconds = time.perf_counter() - began
+    return {
+        "worker": partition,
+        "points": points_read,
+        "pages": pages,
+        "seconds": round(seconds, 3),
+        "points_per_sec": round(points_read / seconds, 1) if seconds > 0 else None
+    }
+
+
+def parallel_fetch(
+    client: Any,
+    collection_name: str,
+    scroll_filter: Optional[Filter] = None,
+    workers: int = 4,
+    partition_by: str = 'id_range',
+    batch_size: int = FETCH_BATCH_SIZE,
+    with_payload: bool = True,
+    vector_name: Optional[str] = None,
+) -> Tuple[np.ndarray, np.ndarray, Optional[List[Dict[str, Any]]], Dict[str, Any]]:
+    """
+    Reads every matching point with `workers` concurrent scrolls over disjoint partitions ('id_range' or
+    'bucket', see `id_range_partitions` / `bucket_partitions`) into one float32 matrix preallocated from the
+    exact count. Rows come back in partition order, which for 'id_range' is the order of a sequential scroll.
+
+    Returns the id array (int64, or strings for UUIDs), the matrix, payloads (None without payloads) and
+    statistics: total points, seconds, points per second and per-worker timings.
+    """
+    if partition_by not in PARTITION_MODES:
+        raise ValueError(f"partition_by must be one of {PARTITION_MODES}")
+    began = time.perf_counter()
+    total = count_points(client, collection_name, scroll_filter)
+    workers = max(1, workers)
+    if partition_by == 'bucket':
+        jobs = [(partition_filter, None, None) for partition_filter in
+                bucket_partitions(client, collection_name, workers, scroll_filter)]
+    else:
+        jobs = [(scroll_filter, lo, hi) for lo, hi in id_range_partitions(client, collection_name, workers, scroll_filter)]
+
+    sink = _MatrixSink(total, with_payload)
+    with ThreadPoolExecutor(max_workers=max(1, len(jobs))) as pool:
+        futures = [
+            pool.submit(_scroll_partition, client, collection_name, job_filter, lo, hi, batch_size, with_payload,
+                        vector_name, sink, partition)
+            for partition, (job_filter, lo, hi) in enumerate(jobs)
+        ]
+        per_worker = [future.result() for future in futures]
+
+    order = sink.rows_in_partition_order()
+    if len(order) and not np.array_equal(order, np.arange(len(order))):
+        matrix = sink.matrix[order]
+        ids = sink.ids[order]
+        payloads = [sink.payloads[row] for row in order] if sink.payloads is not None else None
+    else:
+        matrix = sink.matrix[:sink.size] if sink.matrix is not None else np.empty((0, 0), dtype=np.float32)
+        ids = sink.ids[:sink.size]
+        payloads = sink.payloads[:sink.size] if sink.payloads is not None else None
+    seconds = time.perf_counter() - began
+    statistics = {
+        "points": int(sink.size),
+        "expected_points": int(total),
+        "workers": len(jobs),
+        "partition_by": partition_by,
+        "seconds": round(seconds, 3),
+        "points_per_sec": round(sink.size / seconds, 1) if seconds > 0 else None,
+        "per_worker": per_worker
+    }
+    ids = np.array(ids.tolist()) if len(ids) else np.empty(0, dtype=np.int64)
+    return ids, matrix, payloads, statistics
+
+
+class QueryCache:
+    """
+    Thread-safe in-memory cache of query results, keyed by `QueryCache.key` (collection, filter, projection,
+    cursor...) and trimmed to the `max_entries` most recently used. An entry is served only while it is younger
+    than `ttl` seconds and was stored at the collection's current write version; each keeps the seconds its
+    query took, so hits add up to the latency they saved. Values are stored pickled and every `get` returns a
+    fresh copy, so callers may modify what they get (or what they put) without changing later hits.
+    """
+
+    def __init__(self, max_entries: int = QUERY_CACHE_MAX_ENTRIES, ttl: float = QUERY_CACHE_TTL_SEC):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, int, bytes, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(("hits", "misses", "expired", "invalidated", "evicted"), 0)
+        self._saved_seconds = 0.0
+
+    @staticmethod
+    def key(collection_name: str, **query: Any) -> str:
+        """Digest of a collection and everything that shapes the result of a query on it."""
+        return query_scope(collection_name, **query)
+
+    def get(self, key: str, version: int) -> Optional[Any]:
+        """The cached result for `key`, or None if there is none, it is older than the TTL or another write
+        version of the collection."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, stored_version, value, seconds = entry
+                if stored_version != version or time.monotonic() - stored_at > self.ttl:
+                    del self._entries[key]
+                    self._counters["invalidated" if stored_version != version else "expired"] += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    self._saved_seconds += seconds
+                    return pickle.loads(value)
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, key: str, version: int, value: Any, seconds: float) -> None:
+        """Stores the result of a query that took `seconds`, read at write version `version`."""
+        value = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), version, value, seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evicted"] += 1
+
+    def clear(self) -> None:
+        """Drops every entry and resets the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._counters = dict.fromkeys(self._counters, 0)
+            self._saved_seconds = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """Entries, hit / miss counts and rate, why entries were dropped and the query seconds hits saved."""
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                "entries": len(self._entries),
+                **self._counters,
+                "hit_rate": round(self._counters["hits"] / lookups, 3) if lookups else None,
+                "saved_seconds": round(self._saved_seconds, 3)
+            }
+
+
+def _write_atomic(path: Path, write: Callable[[Any], None]) -> None:
+    """Writes a file through `write(file)` into a temporary file that replaces `path` once complete."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class Snapshot:
+    """
+    Read side of a local snapshot. The embedding matrix is memory-mapped read-only (rows are unit-normalized),
+    ids are loaded on first use and payload fields are loaded column by column as they are asked for.
+    """
+
+    def __init__(self, directory: Any):
+        self.directory = Path(directory)
+        manifest_path = self.directory / SNAPSHOT_MANIFEST
+        if not manifest_path.is_file():
+            raise FileNotFoundError(f"No snapshot in {self.directory}")
+        with open(manifest_path) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Snapshot in {self.directory} has an unsupported version")
+        self._ids: Optional[List[Any]] = None
+        self._index: Optional[Dict[Any, int]] = None
+        self._columns: Dict[str, List[Any]] = {}
+
+    @staticmethod
+    def exists(directory: Any) -> bool:
+        return (Path(directory) / SNAPSHOT_MANIFEST).is_file()
+
+    def __len__(self) -> int:
+        return self.manifest["count"]
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.manifest["columns"])
+
+    def embeddings(self) -> np.ndarray:
+        """The (items x dim) float32 matrix, memory-mapped read-only."""
+        if not self.manifest["count"]:
+            return np.empty((0, self.manifest.get("dim") or 0), dtype=np.float32)
+        return np.load(self.directory / self.manifest["embeddings"], mmap_mode='r')
+
+    def ids(self) -> List[Any]:
+        if self._ids is None:
+            self._ids = np.load(self.directory / self.manifest["ids"]).tolist() if self.manifest["count"] else []
+        return self._ids
+
+    def rows(self, ids: List[Any]) -> List[Optional[int]]:
+        """Row of each id (None if it isn't in the snapshot)."""
+        if self._index is None:
+            self._index = {point_id: row for row, point_id in enumerate(self.ids())}
+        return [self._index.get(point_id) for point_id in ids]
+
+    def column(self, name: str) -> List[Any]:
+        """One payload field for every row (None where a point doesn't have it)."""
+        if name not in self._columns:
+            file_name = self.manifest["columns"].get(name)
+            if file_name is None:
+                self._columns[name] = [None] * len(self)
+            else:
+                with open(self.directory / file_name) as f:
+                    self._columns[name] = json.load(f)
+        return self._columns[name]
+
+    def payloads(self, rows: Optional[List[int]] = None, columns: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Payloads of the given rows (all by default) restricted to `columns` (all fields by default)."""
+        names = [name for name in (columns if columns is not None else self.columns) if name in self.manifest["columns"]]
+        values = [self.column(name) for name in names]
+        rows = range(len(self)) if rows is None else rows
+        return [{name: column[row] for name, column in zip(names, values) if column[row] is not None} for row in rows]
+
+    def fill_metadata(self, items: List[Dict[str, Any]], columns: Optional[List[str]] = None) -> None:
+        """Adds the snapshot's payload fields (only `columns`) to items by id, keeping fields they already have."""
+        rows = self.rows([item.get('id') for item in items])
+        found = [(item, row) for item, row in zip(items, rows) if row is not None]
+        for (item, _), payload in zip(found, self.payloads([row for _, row in found], columns)):
+            metadata = item.setdefault('metadata', {})
+            for key, value in payload.items():
+                metadata.setdefault(key, value)
+
+
+def _normalized(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def _latest_watermark(values: List[Any], current: Optional[float] = None) -> Optional[float]:
+    numbers = [value for value in values if isinstance(value, (int, float)) and not isinstance(value, bool)]
+    if current is not None:
+        numbers.append(current)
+    return max(numbers) if numbers else None
+
+
+def _write_generation(directory: Path, generation: int, ids: List[Any], rows: int, dim: int,
+                      fill_matrix: Callable[[np.ndarray], None], columns: Dict[str, List[Any]]) -> Dict[str, Any]:
+    """Writes the files of one snapshot generation; `fill_matrix` writes the rows into the new .npy."""
+    names = {"embeddings": f"embeddings.{generation}.npy", "ids": f"ids.{generation}.npy"}
+    if rows:
+        matrix = np.lib.format.open_memmap(directory / names["embeddings"], mode='w+', dtype=np.float32,
+                                           shape=(rows, dim))
+        fill_matrix(matrix)
+        matrix.flush()
+        del matrix
+        np.save(directory / names["ids"], np.array(ids), allow_pickle=False)
+    column_dir = f"payload.{generation}"
+    (directory / column_dir).mkdir(exist_ok=True)
+    names["columns"] = {}
+    for number, (name, values) in enumerate(sorted(columns.items())):
+        names["columns"][name] = f"{column_dir}/{number:04d}.json"
+        with open(directory / names["columns"][name], 'w') as f:
+            json.dump(values, f, default=str)
+    return names
+
+
+def _commit_generation(directory: Path, manifest: Dict[str, Any], previous: Optional[Dict[str, Any]]) -> None:
+    """Switches the snapshot to a new generation by replacing the manifest, then removes the old files."""
+    _write_atomic(directory / SNAPSHOT_MANIFEST, lambda f: f.write(json.dumps(manifest, indent=2).encode()))
+    if previous and previous.get("generation") != manifest["generation"]:
+        for key in ("embeddings", "ids"):
+            (directory / previous[key]).unlink(missing_ok=True)
+        for file_name in previous["columns"].values():
+            (directory / file_name).unlink(missing_ok=True)
+        old_column_dir = directory / f"payload.{previous['generation']}"
+        if old_column_dir.is_dir() and not any(old_column_dir.iterdir()):
+            old_column_dir.rmdir()
+
+
+def _payload_columns(payloads: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    names = sorted({key for payload in payloads for key in payload})
+    return {name: [payload.get(name) for payload in payloads] for name in names}
+
+
+def snapshot_projection(include: Optional[Sequence[str]], exclude: Optional[Sequence[str]]) -> Dict[str, Any]:
+    """Payload selection stored in a snapshot's manifest, always keeping the watermark field."""
+    if include is not None:
+        include = sorted(set(include) | {WATERMARK_FIELD})
+    if exclude:
+        exclude = sorted(set(exclude) - {WATERMARK_FIELD}) or None
+    payload_selector(include, exclude)  # Rejects include and exclude together
+    return {"include": include, "exclude": exclude or None}
+
+
+def export_snapshot(
+    client: Any,
+    collection_name: str,
+    directory: Any,
+    media_type: Optional[str] = None,
+    date_range: Optional[Dict[str, str]] = None,
+    workers: int = 4,
+    partition_by: str = 'id_range',
+    batch_size: int = FETCH_BATCH_SIZE,
+    payload_include: Optional[Sequence[str]] = None,
+    payload_exclude: Optional[Sequence[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Writes a full snapshot of the collection (optionally filtered by media type / date range) to `directory`
+    using `parallel_fetch`, replacing any snapshot there. Only the `payload_include` fields (or all but
+    `payload_exclude`) are kept; the watermark field always is, so the snapshot can be refreshed.
+    Returns statistics.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    previous = Snapshot(directory).manifest if Snapshot.exists(directory) else None
+    projection = snapshot_projection(payload_include, payload_exclude)
+    ids, matrix, payloads, statistics = parallel_fetch(
+        client, collection_name, build_filter(media_type, date_range), workers, partition_by, batch_size,
+        with_payload=payload_selector(**projection)
+    )
+    columns = _payload_columns(payloads)
+    generation = previous["generation"] + 1 if previous else 1
+
+    def fill(target: np.ndarray) -> None:
+        for start in range(0, len(matrix), SNAPSHOT_BLOCK_ROWS):
+            target[start:start + SNAPSHOT_BLOCK_ROWS] = _normalized(matrix[start:start + SNAPSHOT_BLOCK_ROWS])
+
+    dim = matrix.shape[1] if len(matrix) else 0
+    files = _write_generation(directory, generation, ids.tolist(), len(ids), dim, fill, columns)
+    now = time.time()
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "generation": generation,
+        "collection": collection_name,
+        "query": {"media_type": media_type, "date_range": date_range},
+        "payload": projection,
+        "count": len(ids),
+        "dim": dim,
+        "normalized": True,
+        "watermark_field": WATERMARK_FIELD,
+        "watermark": _latest_watermark(columns.get(WATERMARK_FIELD, [])),
+        "created_at": now,
+        "refreshed_at": now,
+        **files
+    }
+    _commit_generation(directory, manifest, previous)
+    return {"mode": "full", "points": len(ids), "generation": generation, "fetch": statistics}
+
+
+def refresh_snapshot(client: Any, directory: Any, batch_size: int = FETCH_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Brings a snapshot up to date with the collection without re-reading it: fetches the points whose
+    watermark field is at or after the snapshot's watermark (with the snapshot's payload fields), updates or
+    appends them, and drops deleted points, found with an id-only scroll of the query (counts alone miss a
+    deletion and an addition between refreshes). Points without the watermark field are only picked up by a full export.
+    Returns statistics.
+    """
+    began = time.perf_counter()
+    directory = Path(directory)
+    snapshot = Snapshot(directory)
+    manifest = snapshot.manifest
+    collection_name = manifest["collection"]
+    base_filter = build_filter(**manifest["query"])
+    watermark = manifest.get("watermark")
+    if watermark is None:
+        raise ValueError(f"Snapshot has no '{WATERMARK_FIELD}' watermark to refresh from; export it in full")
+
+    changed_filter = _with_condition(base_filter, FieldCondition(key=WATERMARK_FIELD, range=Range(gte=watermark)))
+    changed_ids, changed_vectors, changed_payloads, _ = fetch_points(
+        client, collection_name, changed_filter, batch_size, with_payload=payload_selector(**manifest["payload"])
+    )
+    old_ids = snapshot.ids()
+    old_rows = snapshot.rows(changed_ids)
+    watermarks = snapshot.column(WATERMARK_FIELD) if WATERMARK_FIELD in manifest["columns"] else [None] * len(old_ids)
+    # Points stamped exactly at the watermark were already seen unless they are new
+    keep = [i for i, row in enumerate(old_rows)
+            if row is None or changed_payloads[i].get(WATERMARK_FIELD) != watermarks[row]]
+    updates = {old_rows[i]: i for i in keep if old_rows[i] is not None}
+    appended = [i for i in keep if old_rows[i] is None]
+
+    live_ids = set()
+    for batch in iter_point_batches(client, collection_name, batch_size, base_filter, with_payload=False,
+                                    with_vectors=False):
+        live_ids.update(batch.ids)
+    deleted = {row for row, point_id in enumerate(old_ids) if point_id not in live_ids}
+
+    statistics = {"mode": "incremental", "updated": len(updates), "added": len(appended), "deleted": len(deleted),
+                  "generation": manifest["generation"]}
+    if not updates and not appended and not deleted:
+        manifest["refreshed_at"] = time.time()
+        _write_atomic(directory / SNAPSHOT_MANIFEST, lambda f: f.write(json.dumps(manifest, indent=2).encode()))
+        statistics["seconds"] = round(time.perf_counter() - began, 3)
+        return statistics
+
+    kept_rows = np.array([row for row in range(len(old_ids)) if row not in deleted], dtype=np.int64)
+    new_ids = [old_ids[row] for row in kept_rows] + [changed_ids[i] for i in appended]
+    dim = manifest["dim"] or (changed_vectors.shape[1] if len(changed_vectors) else 0)
+    new_position = {row: position for position, row in enumerate(kept_rows.tolist())}
+    old_matrix = snapshot.embeddings()
+
+    def fill(target: np.ndarray) -> None:
+        for start in range(0, len(kept_rows), SNAPSHOT_BLOCK_ROWS):
+            block = kept_rows[start:start + SNAPSHOT_BLOCK_ROWS]
+            target[start:start + len(block)] = old_matrix[block]
+        for row, i in updates.items():
+            if row in new_position:
+                target[new_position[row]] = _normalized(changed_vectors[i:i + 1])[0]
+        if appended:
+            target[len(kept_rows):] = _normalized(changed_vectors[appended])
+
+    old_payloads = snapshot.payloads(kept_rows.tolist())
+    for row, i in updates.items():
+        if row in new_position:
+            old_payloads[new_position[row]] = changed_payloads[i]
+    columns = _payload_columns(old_payloads + [changed_payloads[i] for i in appended])
+
+    generation = manifest["generation"] + 1
+    files = _write_generation(directory, generation, new_ids, len(new_ids), dim, fill, columns)
+    del old_matrix
+    new_manifest = {
+        **manifest,
+        **files,
+        "generation": generation,
+        "count": len(new_ids),
+        "dim": dim,
+        "watermark": _latest_watermark([payload.get(WATERMARK_FIELD) for payload in changed_payloads], watermark),
+        "refreshed_at": time.time()
+    }
+    _commit_generation(directory, new_manifest, manifest)
+    statistics.update(generation=generation, seconds=round(time.perf_counter() - began, 3))
+    return statistics
@@ -18,7 +18,9 @@ from .processing_utils import (
     model,
     DEVICE,
     EMBEDDING_DIM,
-    QDRANT_COLLECTION_NAME
+    QDRANT_COLLECTION_NAME,
+    ingest_fields,
+    mark_collection_written
 )
 
 class ImageProcessor(BaseTool):
@@ -188,10 +190,11 @@ class ImageProcessor(BaseTool):
                 if metadata.get('file_modification_time'):
                     metadata['file_modification_time'] = metadata['file_modification_time'].isoformat()
                 
+                point_id = str(metadata['file_path'])
                 points.append(PointStruct(
-                    id=str(metadata['file_path']),
+                    id=point_id,
                     vector=data['embedding'],
-                    payload=metadata
+                    payload={**metadata, **ingest_fields(point_id)}
                 ))
                 
             if points:
@@ -200,6 +203,7 @@ class ImageProcessor(BaseTool):
                     points=points,
                     wait=True
                 )
+                mark_collection_written()
             return True
             
         except Exception as e:
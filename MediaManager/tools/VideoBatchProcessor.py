@@ -0,0 +1,436 @@
+# 📌 Purpose: Processes many video files in one call: metadata probing, frame selection and decoding run in a
+#    process pool while the parent process keeps CLIP busy with full batches and streams points to Qdrant.
+# ⚙️ Key Logic: Metadata for all videos is harvested up front by concurrent ffprobe calls (cached by path, size and
+#    mtime). Worker processes run video_pipeline.prepare_video (no CLIP) and return in-memory frames; frames
+#    from different videos are pooled into `inference_batch_size` CLIP batches, per-video embeddings are
+#    accumulated as running sums and upserted in batches as soon as each video's last frame is embedded.
+# 📂 Expected File Path: photo_intelligence_agency/MediaManager/tools/VideoBatchProcessor.py
+# 🧠 Reasoning: Ingesting an archive one VideoProcessor call per clip leaves the model idle between tiny batches
+
+import os
+import json
+import time
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+import numpy as np
+import torch
+from pydantic import Field, validator
+from agency_swarm.tools import BaseTool
+from qdrant_client.http.models import PointStruct
+
+# Import shared resources
+from .processing_utils import (
+    logger,
+    qdrant_client,
+    processor,
+    model,
+    DEVICE,
+    QDRANT_COLLECTION_NAME,
+    ingest_fields,
+    mark_collection_written
+)
+from .FileSystemScanner import VIDEO_EXTENSIONS
+from .scene_utils import (
+    CONTENT_THRESHOLD,
+    HISTOGRAM_THRESHOLD,
+    SAMPLING_MODES,
+    SCENE_DETECTORS
+)
+from .video_metadata import PROBE_CONCURRENCY, ProbeCache, VideoMetadata, harvest_metadata
+from .video_pipeline import FrameSampler, prepare_video
+from .video_previews import PREVIEW_FORMATS
+from .video_utils import FrameSink, PREVIEW_MAX_SIZE, output_stem
+
+
+class VideoBatchProcessor(BaseTool):
+    """
+    Creates and updates the video database in Qdrant for many videos at once:
+    - Probes metadata, selects representative frames (scenes, keyframes or uniform sampling) and decodes them in a pool of worker processes
+    - Pools frames from different videos into full CLIP batches, so the model stays busy regardless of how few frames each video has
+    - Streams one point per video to Qdrant in batches as videos complete, and reports per-video and aggregate throughput
+    Use this instead of VideoProcessor when ingesting more than a handful of videos. Requires FFmpeg and an initialized CLIP model and Qdrant client.
+    """
+    input_paths: List[str] = Field(
+        ...,
+        description="List of video file paths or directories (searched recursively) to process."
+    )
+    output_dir: Optional[str] = Field(
+        None,
+        description="Directory for metadata JSON files and frame previews of all videos. If None, nothing is written to disk."
+    )
+    sampling_mode: str = Field(
+        'auto',
+        description="How representative frames are chosen: 'scenes', 'keyframes', 'uniform' or 'auto' (picked per video from duration and bitrate). See VideoProcessor."
+    )
+    sample_interval_sec: float = Field(
+        10.0,
+        description="Seconds between sampled frames in 'uniform' mode."
+    )
+    max_sampled_frames: int = Field(
+        240,
+        description="Upper bound on frames sampled per video in 'keyframes' and 'uniform' modes."
+    )
+    scene_detector: str = Field(
+        'content',
+        description="Scene detector for 'scenes' mode: 'content' (most accurate) or 'histogram' (much faster)."
+    )
+    scene_detection_threshold: float = Field(
+        CONTENT_THRESHOLD,
+        description="Threshold for PySceneDetect's ContentDetector (lower means more sensitive)."
+    )
+    histogram_threshold: float = Field(
+        HISTOGRAM_THRESHOLD,
+        description="Threshold for the 'histogram' detector: fraction (0-1) of the colour histogram that must change to cut."
+    )
+    scene_downscale: int = Field(
+        0,
+        description="Factor frames are downscaled by before scene analysis (0 = automatic based on resolution)."
+    )
+    scene_frame_skip: int = Field(
+        0,
+        description="Analyse only every (N+1)-th frame during scene detection."
+    )
+    cache_scene_stats: bool = Field(
+        True,
+        description="Cache per-frame scene metrics in output_dir/scene_stats (requires output_dir) so re-running with another threshold skips decoding."
+    )
+    max_workers: int = Field(
+        0,
+        description="Worker processes probing and decoding videos (0 = all CPU cores)."
+    )
+    probe_concurrency: int = Field(
+        PROBE_CONCURRENCY,
+        description="Maximum number of ffprobe processes running at once while harvesting metadata."
+    )
+    max_pending_videos: int = Field(
+        0,
+        description="Videos decoded ahead of inference at any time, bounding memory (0 = twice the number of workers)."
+    )
+    inference_batch_size: int = Field(
+        64,
+        description="Frames per CLIP forward pass, pooled across videos (adjust based on available GPU memory)."
+    )
+    upsert_batch_size: int = Field(
+        64,
+        description="Video points sent to Qdrant per upsert request."
+    )
+    create_previews: bool = Field(
+        True,
+        description="Whether to write a poster image and a scrubbing sprite sheet per video to output_dir/previews (requires output_dir) and record their paths in the payload."
+    )
+    preview_format: str = Field(
+        'jpeg',
+        description="Image format of posters and sprite sheets: 'jpeg' or 'webp' (smaller)."
+    )
+    save_frames: bool = Field(
+        False,
+        description="Whether to save downscaled previews of the extracted frames to output_dir/frames (written in the background)."
+    )
+    preview_max_size: int = Field(
+        PREVIEW_MAX_SIZE,
+        description="Longest side in pixels of the saved frame previews."
+    )
+
+    @validator('input_paths')
+    def validate_paths(cls, paths):
+        valid_paths = []
+        for path in paths:
+            p = Path(path)
+            if p.is_file() and p.suffix.lower() in VIDEO_EXTENSIONS:
+                valid_paths.append(str(p.resolve()))
+            elif p.is_dir():
+                valid_paths.extend(sorted(
+                    str(f.resolve()) for f in p.rglob('*')
+                    if f.is_file() and f.suffix.lower() in VIDEO_EXTENSIONS
+                ))
+        valid_paths = list(dict.fromkeys(valid_paths))  # drop duplicates, keep order
+        if not valid_paths:
+            raise ValueError("No valid video files found in the provided paths")
+        return valid_paths
+
+    @validator('sampling_mode')
+    def validate_sampling_mode(cls, v):
+        if v not in SAMPLING_MODES:
+            raise ValueError(f"sampling_mode must be one of {SAMPLING_MODES}")
+        return v
+
+    @validator('scene_detector')
+    def validate_scene_detector(cls, v):
+        if v not in SCENE_DETECTORS:
+            raise ValueError(f"scene_detector must be one of {SCENE_DETECTORS}")
+        return v
+
+    @validator('preview_format')
+    def validate_preview_format(cls, v):
+        if v not in PREVIEW_FORMATS:
+            raise ValueError(f"preview_format must be one of {PREVIEW_FORMATS}")
+        return v
+
+    @validator('output_dir')
+    def setup_output_dir(cls, v):
+        if v is not None:
+            v = str(v)
+            os.makedirs(os.path.join(v, "frames"), exist_ok=True)
+            os.makedirs(os.path.join(v, "metadata"), exist_ok=True)
+        return v
+
+    def _frame_sampler(self) -> FrameSampler:
+        """Returns the frame sampler shipped to worker processes. Scene detection stays serial inside each worker."""
+        return FrameSampler(
+            sampling_mode=self.sampling_mode,
+            sample_interval_sec=self.sample_interval_sec,
+            max_sampled_frames=self.max_sampled_frames,
+            scene_detector=self.scene_detector,
+            scene_detection_threshold=self.scene_detection_threshold,
+            histogram_threshold=self.histogram_threshold,
+            scene_detection_workers=1,
+            scene_downscale=self.scene_downscale,
+            scene_frame_skip=self.scene_frame_skip,
+            show_progress=False,  # interleaved progress bars from many workers are unreadable
+            scene_stats_dir=os.path.join(self.output_dir, "scene_stats") if self.cache_scene_stats and self.output_dir else None
+        )
+
+    def _embed_frames(self, frames: List[np.ndarray]) -> np.ndarray:
+        """Runs one CLIP forward pass over `frames` and returns the image features as a (n, dim) array."""
+        inputs = processor(images=frames, return_tensors="pt")
+        with torch.no_grad():
+            outputs = model.get_image_features(pixel_values=inputs['pixel_values'].to(DEVICE))
+        return outputs.cpu().numpy()
+
+    def _write_metadata(self, metadata: VideoMetadata) -> None:
+        """Saves the video's metadata JSON to output_dir/metadata, if an output directory was given."""
+        if not self.output_dir:
+            return
+        # Named by path, not file name: folder trees often repeat file names (e.g. camera card dumps)
+        metadata_file = Path(self.output_dir) / "metadata" / f"{output_stem(metadata.file_path)}_metadata.json"
+        try:
+            with open(metadata_file, 'w') as f:
+                json.dump(metadata.dict(), f, indent=4)
+        except Exception as e:
+            logger.warning(f"Could not save metadata JSON to {metadata_file}: {e}")
+
+    def _upsert_points(self, points: List[PointStruct]) -> bool:
+        """Upserts a batch of video points to Qdrant."""
+        try:
+            qdrant_client.upsert(
+                collection_name=QDRANT_COLLECTION_NAME,
+                points=points,
+                wait=True
+            )
+            mark_collection_written()
+            return True
+        except Exception as e:
+            logger.error(f"Error upserting {len(points)} video points to Qdrant: {e}")
+            return False
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Processes all videos in input_paths, stores one embedding per video in Qdrant,
+        and returns a status summary with per-video results and aggregate throughput.
+        """
+        if not model or not processor:
+            logger.error("CLIP model/processor not initialized")
+            return {'status': 'error', 'message': 'CLIP model or processor not initialized'}
+        if not qdrant_client:
+            logger.error("Qdrant client not initialized")
+            return {'status': 'error', 'message': 'Qdrant client not initialized'}
+
+        video_paths = self.validate_paths(self.input_paths)
+        sampler = self._frame_sampler()
+        workers = self.max_workers or os.cpu_count() or 1
+        max_pending = self.max_pending_videos or 2 * workers
+        preview_dir = os.path.join(self.output_dir, "previews") if self.create_previews and self.output_dir else None
+        frame_sink = None
+        if self.save_frames and self.output_dir:
+            frame_sink = FrameSink(os.path.join(self.output_dir, "frames"), max_size=self.preview_max_size)
+
+        videos: Dict[str, Dict[str, Any]] = {}  # per-video state and report, by path
+        frame_queue = deque()  # (video_path, frame) waiting for inference
+        pending_points = []  # (video_path, point) waiting for upsert
+        totals = {'inference_sec': 0.0, 'upsert_sec': 0.0, 'inference_batches': 0, 'frames_embedded': 0}
+        run_start = time.perf_counter()
+
+        # Metadata for every video first: concurrent ffprobe calls, unchanged files served from the probe cache
+        probe_cache = ProbeCache(os.path.join(self.output_dir, "metadata", "probe_cache.json") if self.output_dir else None)
+        harvest = harvest_metadata(video_paths, max_concurrency=self.probe_concurrency, cache=probe_cache)
+        for path, message in harvest['errors'].items():
+            logger.warning(message)
+            videos[path] = {'status': 'error', 'message': message}
+        harvested = harvest['metadata']
+        logger.info(
+            f"Harvested metadata for {len(harvested)}/{len(video_paths)} videos in {harvest['elapsed_sec']:.2f}s "
+            f"({harvest['cache_hits']} from cache)"
+        )
+
+        def embed_batch(size: int) -> None:
+            batch = [frame_queue.popleft() for _ in range(min(size, len(frame_queue)))]
+            stage_start = time.perf_counter()
+            try:
+                features = self._embed_frames([frame for _, frame in batch])
+            except Exception as e:
+                logger.error(f"Error generating embeddings for batch: {e}")
+                features = None
+            elapsed = time.perf_counter() - stage_start
+            totals['inference_sec'] += elapsed
+            totals['inference_batches'] += 1
+            totals['frames_embedded'] += len(batch)
+
+            for i, (path, _) in enumerate(batch):
+                video = videos[path]
+                video['timings']['inference_sec'] += elapsed / len(batch)
+                video['remaining'] -= 1
+                if features is None:
+                    video['embedding_failed'] = True
+                else:
+                    video['embedding_sum'] = features[i] if video['embedding_sum'] is None else video['embedding_sum'] + features[i]
+                if video['remaining'] == 0:
+                    finish_video(path)
+
+        def finish_video(path: str) -> None:
+            video = videos[path]
+            if video.pop('embedding_failed', False):
+                video.update(status='error', message=f"Failed to generate embedding for {Path(path).name}")
+                return
+            metadata = video.pop('metadata')
+            embedding = video.pop('embedding_sum') / video['frames_extracted']
+            self._write_metadata(metadata)
+            pending_points.append((path, PointStruct(
+                id=str(metadata.file_path),  # Use file path as unique ID, like VideoProcessor
+                vector=embedding.tolist(),
+                payload={**metadata.dict(), 'media_type': 'video', **ingest_fields(metadata.file_path)}
+            )))
+            if len(pending_points) >= self.upsert_batch_size:
+                flush_points()
+
+        def flush_points() -> None:
+            if not pending_points:
+                return
+            stage_start = time.perf_counter()
+            success = self._upsert_points([point for _, point in pending_points])
+            now = time.perf_counter()
+            totals['upsert_sec'] += now - stage_start
+            for path, point in pending_points:
+                video = videos[path]
+                video['timings']['latency_sec'] = round(now - video.pop('submitted_at'), 3)
+                if success:
+                    video.update(status='success', qdrant_id=point.id)
+                else:
+                    video.update(status='error', message=f"Processed video {Path(path).name}, but failed to store in Qdrant.")
+            pending_points.clear()
+
+        def register(result: Dict[str, Any], submitted_at: float) -> None:
+            path = result['video_path']
+            metadata = result['metadata']
+            frames = result['frames']
+            videos[path] = {
+                'status': 'pending',
+                'metadata': metadata,
+                'sampling_mode': metadata.sampling_mode,
+                'duration_seconds': metadata.duration_seconds,
+                'frames_extracted': len(frames),
+                'ffmpeg_processes': result['ffmpeg_processes'],
+                'timings': {**result['timings'], 'inference_sec': 0.0},
+                'submitted_at': submitted_at,
+                'remaining': len(frames),
+                'embedding_sum': None
+            }
+            if len(frames) < result['frames_planned']:
+                logger.warning(f"Decoded {len(frames)} of {result['frames_planned']} requested frames for {metadata.filename}")
+            stem = output_stem(path)
+            for scene_num, frame_idx, _, frame in frames:
+                if frame_sink:
+                    frame_sink.submit(frame, f"{stem}_scene_{scene_num:04d}_frame_{frame_idx:02d}.jpg")
+                frame_queue.append((path, frame))
+
+        logger.info(f"Starting batch processing of {len(video_paths)} videos with {workers} workers...")
+        # Workers are spawned, not forked: the parent holds CLIP (and possibly a CUDA context), which must not be copied
+        mp_context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as pool:
+            queued_paths = iter([path for path in video_paths if path in harvested])
+            in_flight = {}
+
+            def submit_next() -> None:
+                path = next(queued_paths, None)
+                if path is not None:
+                    future = pool.submit(prepare_video, path, sampler, harvested[path], preview_dir, self.preview_format)
+                    in_flight[future] = (path, time.perf_counter())
+
+            for _ in range(max_pending):
+                submit_next()
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, submitted_at = in_flight.pop(future)
+                    submit_next()
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {"status": "error", "video_path": path, "message": f"Worker failed: {e}"}
+                    if result['status'] != 'success':
+                        logger.warning(result['message'])
+                        videos[path] = {'status': 'error', 'message': result['message']}
+                        continue
+                    register(result, submitted_at)
+                # Only full batches while videos are still decoding; the tail is flushed below
+                while len(frame_queue) >= self.inference_batch_size:
+                    embed_batch(self.inference_batch_size)
+
+        while frame_queue:
+            embed_batch(self.inference_batch_size)
+        flush_points()
+        if frame_sink:
+            sink_result = frame_sink.close()
+            logger.info(f"Wrote {len(sink_result['written'])} frame previews to {self.output_dir}")
+
+        wall_sec = time.perf_counter() - run_start
+        report = []
+        for path in video_paths:
+            video = videos.get(path, {'status': 'error', 'message': 'Not processed'})
+            entry = {'video_path': path, **{k: v for k, v in video.items() if k not in ('remaining', 'embedding_sum', 'metadata', 'submitted_at')}}
+            timings = entry.get('timings')
+            if timings:
+                timings['inference_sec'] = round(timings['inference_sec'], 3)
+                busy_sec = sum(v for k, v in timings.items() if k != 'latency_sec')
+                entry['frames_per_sec'] = round(entry['frames_extracted'] / busy_sec, 2) if busy_sec > 0 else None
+            report.append(entry)
+
+        succeeded = [entry for entry in report if entry['status'] == 'success']
+        failed_paths = [entry['video_path'] for entry in report if entry['status'] != 'success']
+        footage_sec = sum(entry['duration_seconds'] for entry in succeeded)
+        throughput = {
+            'wall_sec': round(wall_sec, 3),
+            'metadata_harvest_sec': harvest['elapsed_sec'],
+            'probe_cache_hits': harvest['cache_hits'],
+            'videos_per_sec': round(len(succeeded) / wall_sec, 3) if wall_sec > 0 else None,
+            'frames_per_sec': round(totals['frames_embedded'] / wall_sec, 2) if wall_sec > 0 else None,
+            'footage_sec': round(footage_sec, 1),
+            'footage_sec_per_wall_sec': round(footage_sec / wall_sec, 2) if wall_sec > 0 else None,
+            'inference_sec': round(totals['inference_sec'], 3),
+            'inference_batches': totals['inference_batches'],
+            'mean_batch_size': round(totals['frames_embedded'] / totals['inference_batches'], 1) if totals['inference_batches'] else 0,
+            'upsert_sec': round(totals['upsert_sec'], 3),
+            'workers': workers
+        }
+        logger.info(
+            f"Processed {len(succeeded)}/{len(video_paths)} videos in {wall_sec:.2f}s "
+            f"({throughput['frames_per_sec']} frames/s, {throughput['footage_sec_per_wall_sec']}x realtime)"
+        )
+
+        if not succeeded:
+            status, message = 'error', f"None of the {len(video_paths)} videos could be processed and stored."
+        elif failed_paths:
+            status, message = 'warning', f"Processed and stored {len(succeeded)} of {len(video_paths)} videos."
+        else:
+            status, message = 'success', f"Successfully processed and stored {len(succeeded)} videos."
+        return {
+            'status': status,
+            'message': message,
+            'processed_count': len(succeeded),
+            'failed_count': len(failed_paths),
+            'failed_paths': failed_paths,
+            'videos': report,
+            'throughput': throughput
+        }
@@ -1,30 +1,23 @@
 # 📌 Purpose: Processes a single video file: extracts metadata, detects scenes, generates representative embeddings using CLIP (leveraging CUDA), and stores data in Qdrant for efficient retrieval.
-# 🔄 Latest Changes: Enhanced scene detection, improved frame storage, added output directory structure
-# ⚙️ Key Logic: Uses ffmpeg-python for metadata/frame extraction, scenedetect for scene boundaries, CLIP for embeddings (CUDA), and Qdrant for searchable storage
+# 🔄 Latest Changes: Metadata probing and frame selection/decoding moved to video_pipeline (shared with VideoBatchProcessor)
+# ⚙️ Key Logic: Uses ffmpeg-python for metadata and single-pass frame extraction, scenedetect for scene boundaries, CLIP for embeddings (CUDA), and Qdrant for searchable storage
 # 📂 Expected File Path: photo_intelligence_agency/MediaManager/tools/VideoProcessor.py
 # 🧠 Reasoning: Centralizes video processing with efficient storage/retrieval via Qdrant
 
 import os
 import json
 import shutil
-import tempfile
+import time
 import logging
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
-from datetime import datetime
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 import ffmpeg
-from PIL import Image
+import numpy as np
 import torch
 from pydantic import Field, validator
 from agency_swarm.tools import BaseTool
 from qdrant_client.http.models import PointStruct
 
-try:
-    from scenedetect import detect, ContentDetector, SceneManager, open_video
-    SCENEDETECT_AVAILABLE = True
-except ImportError:
-    SCENEDETECT_AVAILABLE = False
-
 # Import shared resources
 from .processing_utils import (
     logger,
@@ -33,62 +26,35 @@ from .processing_utils import (
     model,
     DEVICE,
     EMBEDDING_DIM,
-    QDRANT_COLLECTION_NAME
+    QDRANT_COLLECTION_NAME,
+    ingest_fields,
+    mark_collection_written
+)
+from .scene_utils import (
+    CONTENT_THRESHOLD,
+    HISTOGRAM_THRESHOLD,
+    SAMPLING_MODES,
+    SCENE_DETECTORS,
+    SCENEDETECT_AVAILABLE
 )
+from .video_metadata import SceneInfo, VideoMetadata, extract_video_metadata
+from .video_pipeline import FrameSampler, ffmpeg_process_count
+from .video_previews import PREVIEW_FORMATS, VideoPreviewBuilder
+from .video_utils import FrameSink, PREVIEW_MAX_SIZE, output_stem
 
 # Constants
-SCENE_DETECTION_THRESHOLD = 27.0  # Default threshold for content-aware scene detection
-
-class SceneInfo:
-    """Data class for scene information"""
-    def __init__(self, scene_number: int, start_time_sec: float, end_time_sec: float, duration_sec: float):
-        self.scene_number = scene_number
-        self.start_time_sec = start_time_sec
-        self.end_time_sec = end_time_sec
-        self.duration_sec = duration_sec
-        
-    def dict(self):
-        return {
-            'scene_number': self.scene_number,
-            'start_time_sec': self.start_time_sec,
-            'end_time_sec': self.end_time_sec,
-            'duration_sec': self.duration_sec
-        }
-
-class VideoMetadata:
-    """Data class for video metadata"""
-    def __init__(self, **kwargs):
-        self.filename: str = kwargs.get('filename', '')
-        self.file_path: str = kwargs.get('file_path', '')
-        self.file_size_bytes: int = kwargs.get('file_size_bytes', 0)
-        self.duration_seconds: float = kwargs.get('duration_seconds', 0.0)
-        self.width: int = kwargs.get('width', 0)
-        self.height: int = kwargs.get('height', 0)
-        self.fps: float = kwargs.get('fps', 0.0)
-        self.codec_name: str = kwargs.get('codec_name', '')
-        self.bitrate: int = kwargs.get('bitrate', 0)
-        self.scenes: List[SceneInfo] = kwargs.get('scenes', [])
-        self.creation_time: datetime = kwargs.get('creation_time')
-        self.modification_time: datetime = kwargs.get('modification_time')
-        
-    def dict(self, exclude_none: bool = True):
-        data = {
-            'filename': self.filename,
-            'file_path': self.file_path,
-            'file_size_bytes': self.file_size_bytes,
-            'duration_seconds': self.duration_seconds,
-            'width': self.width,
-            'height': self.height,
-            'fps': self.fps,
-            'codec_name': self.codec_name,
-            'bitrate': self.bitrate,
-            'scenes': [scene.dict() for scene in self.scenes] if self.scenes else [],
-            'creation_time': self.creation_time.isoformat() if self.creation_time else None,
-            'modification_time': self.modification_time.isoformat() if self.modification_time else None
-        }
-        if exclude_none:
-            return {k: v for k, v in data.items() if v is not None}
-        return data
+SCENE_DETECTION_THRESHOLD = CONTENT_THRESHOLD  # Default threshold for content-aware scene detection
+
+def _batched(items: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+    """Groups an iterable into lists of at most `batch_size` items."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 class VideoProcessor(BaseTool):
     """
@@ -109,10 +75,80 @@ class VideoProcessor(BaseTool):
         SCENE_DETECTION_THRESHOLD,
         description="Threshold for PySceneDetect's ContentDetector (lower means more sensitive)."
     )
+    sampling_mode: str = Field(
+        'scenes',
+        description="How representative frames are chosen: 'scenes' (scene detection, 3 frames per scene), 'keyframes' (I-frames from ffprobe packet flags, no pixel analysis), 'uniform' (one frame every sample_interval_sec), or 'auto' (picked from duration and bitrate)."
+    )
+    sample_interval_sec: float = Field(
+        10.0,
+        description="Seconds between sampled frames in 'uniform' mode."
+    )
+    max_sampled_frames: int = Field(
+        240,
+        description="Upper bound on frames sampled in 'keyframes' and 'uniform' modes; samples are spread evenly over the video."
+    )
+    scene_detector: str = Field(
+        'content',
+        description="Scene detector: 'content' (PySceneDetect ContentDetector, most accurate) or 'histogram' (compact colour histograms, much faster)."
+    )
+    histogram_threshold: float = Field(
+        HISTOGRAM_THRESHOLD,
+        description="Threshold for the 'histogram' detector: fraction (0-1) of the colour histogram that must change to cut."
+    )
+    scene_detection_workers: int = Field(
+        1,
+        description="Processes used for scene detection of this video. Above 1, long videos are split into overlapping time segments detected in parallel (0 = all CPU cores)."
+    )
+    scene_downscale: int = Field(
+        0,
+        description="Factor frames are downscaled by before scene analysis (0 = automatic based on resolution, 1 = full resolution)."
+    )
+    scene_frame_skip: int = Field(
+        0,
+        description="Analyse only every (N+1)-th frame during scene detection. Faster on high frame rate footage, less precise cut positions."
+    )
+    cache_scene_stats: bool = Field(
+        True,
+        description="Cache per-frame scene metrics in output_dir/scene_stats so re-running with another threshold skips decoding. Not used when scene_frame_skip > 0."
+    )
     save_frames: bool = Field(
         True,
-        description="Whether to save extracted frames to disk."
+        description="Whether to save downscaled previews of the extracted frames to disk (written in the background)."
+    )
+    preview_max_size: int = Field(
+        PREVIEW_MAX_SIZE,
+        description="Longest side in pixels of the saved frame previews."
+    )
+    create_previews: bool = Field(
+        True,
+        description="Whether to write a poster image and a scrubbing sprite sheet to output_dir/previews (from the frames decoded for embedding) and record their paths in the payload for galleries."
     )
+    preview_format: str = Field(
+        'jpeg',
+        description="Image format of the poster and sprite sheet: 'jpeg' or 'webp' (smaller)."
+    )
+    frame_batch_size: int = Field(
+        32,
+        description="Number of frames preprocessed and embedded per CLIP forward pass."
+    )
+
+    @validator('sampling_mode')
+    def validate_sampling_mode(cls, v):
+        if v not in SAMPLING_MODES:
+            raise ValueError(f"sampling_mode must be one of {SAMPLING_MODES}")
+        return v
+
+    @validator('scene_detector')
+    def validate_scene_detector(cls, v):
+        if v not in SCENE_DETECTORS:
+            raise ValueError(f"scene_detector must be one of {SCENE_DETECTORS}")
+        return v
+
+    @validator('preview_format')
+    def validate_preview_format(cls, v):
+        if v not in PREVIEW_FORMATS:
+            raise ValueError(f"preview_format must be one of {PREVIEW_FORMATS}")
+        return v
 
     @validator('output_dir', pre=True, always=True)
     def setup_output_dir(cls, v, values):
@@ -126,145 +162,51 @@ class VideoProcessor(BaseTool):
             os.makedirs(os.path.join(v, "metadata"), exist_ok=True)
         return v
 
+    def _frame_sampler(self) -> FrameSampler:
+        """Returns the frame sampler configured from this tool's sampling fields."""
+        return FrameSampler(
+            sampling_mode=self.sampling_mode,
+            sample_interval_sec=self.sample_interval_sec,
+            max_sampled_frames=self.max_sampled_frames,
+            scene_detector=self.scene_detector,
+            scene_detection_threshold=self.scene_detection_threshold,
+            histogram_threshold=self.histogram_threshold,
+            scene_detection_workers=self.scene_detection_workers,
+            scene_downscale=self.scene_downscale,
+            scene_frame_skip=self.scene_frame_skip,
+            scene_stats_dir=os.path.join(self.output_dir, "scene_stats") if self.cache_scene_stats else None
+        )
+
     def _extract_metadata(self, vid_path: Path) -> Optional[VideoMetadata]:
         """Extracts comprehensive metadata using FFmpeg."""
-        try:
-            probe = ffmpeg.probe(str(vid_path))
-            video_info = next(s for s in probe['streams'] if s['codec_type'] == 'video')
-            
-            # Calculate duration
-            duration = float(probe['format'].get('duration', 0))
-            
-            # Get file stats
-            file_stats = vid_path.stat()
-            
-            return VideoMetadata(
-                filename=vid_path.name,
-                file_path=str(vid_path.resolve()),
-                file_size_bytes=file_stats.st_size,
-                duration_seconds=duration,
-                width=int(video_info.get('width', 0)),
-                height=int(video_info.get('height', 0)),
-                fps=eval(video_info.get('r_frame_rate', '0/1')),
-                codec_name=video_info.get('codec_name', ''),
-                bitrate=int(probe['format'].get('bit_rate', 0)),
-                creation_time=datetime.fromtimestamp(file_stats.st_ctime),
-                modification_time=datetime.fromtimestamp(file_stats.st_mtime)
-            )
-            
-        except Exception as e:
-            logger.error(f"Error extracting metadata: {e}")
-            return None
-
-    def _detect_scenes(self, vid_path: Path) -> Optional[Tuple[List[SceneInfo], List[Tuple[float, Path]]]]:
-        """Detects scenes using PySceneDetect and saves representative frames."""
-        if not SCENEDETECT_AVAILABLE:
-            logger.warning("Scene detection skipped as PySceneDetect is not available.")
-            return None, None
-
-        scene_list_info = []
-        scene_frame_paths = []
-        frames_dir = os.path.join(self.output_dir, "frames") if self.save_frames else tempfile.mkdtemp(prefix="scene_frames_")
-        
-        try:
-            logger.info(f"Detecting scenes for {vid_path.name}...")
-            video = open_video(str(vid_path))
-            scene_manager = SceneManager()
-            scene_manager.add_detector(ContentDetector(threshold=self.scene_detection_threshold))
-            scene_manager.detect_scenes(video=video, show_progress=True)
-            scene_list_tuples = scene_manager.get_scene_list()
-
-            if not scene_list_tuples:
-                logger.info(f"No scenes detected for {vid_path.name} (or only one scene).")
-                middle_time_sec = video.duration.get_seconds() / 2
-                scene_list_tuples = [(video.base_timecode, video.duration)]
-            else:
-                logger.info(f"Detected {len(scene_list_tuples)} scenes for {vid_path.name}.")
-
-            for i, (start, end) in enumerate(scene_list_tuples):
-                scene_num = i + 1
-                start_sec = start.get_seconds()
-                end_sec = end.get_seconds()
-                duration_sec = end_sec - start_sec
-
-                scene_list_info.append(SceneInfo(
-                    scene_number=scene_num,
-                    start_time_sec=start_sec,
-                    end_time_sec=end_sec,
-                    duration_sec=duration_sec
-                ))
-
-                # Extract multiple frames per scene for better representation
-                frame_times = [
-                    start_sec + (duration_sec * j / 4) for j in range(1, 4)  # 3 frames per scene
-                ]
-                
-                for frame_idx, frame_time in enumerate(frame_times):
-                    frame_path = os.path.join(frames_dir, f"scene_{scene_num:04d}_frame_{frame_idx:02d}.jpg")
-                    try:
-                        (
-                            ffmpeg
-                            .input(str(vid_path), ss=frame_time)
-                            .output(str(frame_path), vframes=1, format='image2', vcodec='mjpeg', q=2)
-                            .overwrite_output()
-                            .run(capture_stdout=True, capture_stderr=True)
-                        )
-                        if os.path.exists(frame_path):
-                            scene_frame_paths.append((frame_time, Path(frame_path)))
-                            logger.debug(f"Saved frame {frame_idx} for scene {scene_num} at {frame_time:.2f}s")
-                        else:
-                            logger.warning(f"Failed to save frame {frame_idx} for scene {scene_num}")
-                    except Exception as e:
-                        logger.warning(f"Error saving frame {frame_idx} for scene {scene_num}: {e}")
+        return extract_video_metadata(vid_path)
 
-            if not scene_frame_paths:
-                logger.warning("Could not extract any frames. Scene detection failed.")
-                return scene_list_info, None
-
-            return scene_list_info, scene_frame_paths
-
-        except Exception as e:
-            logger.error(f"Failed during scene detection: {e}", exc_info=True)
-            if not self.save_frames and os.path.exists(frames_dir):
-                shutil.rmtree(frames_dir)
-            return None, None
-
-    def _generate_embedding_from_frames(self, frame_paths: List[Path]) -> Optional[List[float]]:
-        """Generate a single embedding from multiple frames using CLIP."""
+    def _generate_embedding_from_frames(self, frames: Iterable[np.ndarray]) -> Optional[List[float]]:
+        """
+        Generate a single embedding from multiple frames using CLIP.
+        NumPy frames are preprocessed and embedded in batches of `frame_batch_size` as they arrive,
+        so decoding and inference overlap and only one batch is held in memory.
+        """
         if not model or not processor:
             logger.error("CLIP model/processor not initialized")
             return None
             
         try:
-            # Load and preprocess all frames
-            processed_frames = []
-            for frame_path in frame_paths:
-                try:
-                    img = Image.open(frame_path)
-                    if img.mode != "RGB":
-                        img = img.convert("RGB")
-                    inputs = processor(images=img, return_tensors="pt", padding=True)
-                    processed_frames.append(inputs)
-                except Exception as e:
-                    logger.warning(f"Error processing frame {frame_path}: {e}")
-                    continue
+            embedding_sum = None
+            frame_count = 0
+            for batch in _batched(frames, self.frame_batch_size):
+                inputs = processor(images=batch, return_tensors="pt")
+                with torch.no_grad():
+                    outputs = model.get_image_features(pixel_values=inputs['pixel_values'].to(DEVICE))
+                batch_sum = outputs.sum(dim=0)
+                embedding_sum = batch_sum if embedding_sum is None else embedding_sum + batch_sum
+                frame_count += len(batch)
                     
-            if not processed_frames:
+            if not frame_count:
                 return None
-                
-            # Combine all preprocessed frames
-            batch_inputs = {
-                k: torch.cat([frame[k] for frame in processed_frames]).to(DEVICE)
-                for k in processed_frames[0].keys()
-            }
-            
-            # Generate embeddings
-            with torch.no_grad():
-                outputs = model.get_image_features(**batch_inputs)
-            embeddings = outputs.cpu().numpy()
             
             # Average all frame embeddings
-            avg_embedding = embeddings.mean(axis=0)
+            avg_embedding = (embedding_sum / frame_count).cpu().numpy()
             return avg_embedding.tolist()
             
         except Exception as e:
@@ -286,7 +228,8 @@ class VideoProcessor(BaseTool):
                 vector=embedding,
                 payload={
                     **metadata.dict(), # Include all metadata
-                    'media_type': 'video'
+                    'media_type': 'video',
+                    **ingest_fields(metadata.file_path)
                 }
             )
             
@@ -295,6 +238,7 @@ class VideoProcessor(BaseTool):
                 points=[point],
                 wait=True
             )
+            mark_collection_written()
             logger.info(f"Successfully upserted video data for {metadata.filename} to Qdrant.")
             return True
             
@@ -304,53 +248,74 @@ class VideoProcessor(BaseTool):
 
     def run(self) -> Dict[str, Any]:
         """
-        Processes the video: extracts metadata, detects scenes, generates embedding,
-        stores in Qdrant, and returns a status summary.
+        Processes the video: extracts metadata, selects frames (scenes/keyframes/uniform), generates embedding,
+        stores in Qdrant, and returns a status summary including per-stage timings.
         """
         vid_path = Path(self.video_path)
         if not vid_path.is_file():
             return {"status": "error", "message": f"Video file not found: {self.video_path}"}
             
         logger.info(f"Starting processing for video: {vid_path.name}")
+        run_start = time.perf_counter()
+        timings = {}
+        sampler = self._frame_sampler()
 
         # 1. Extract Metadata
+        stage_start = time.perf_counter()
         metadata = self._extract_metadata(vid_path)
+        timings['metadata_sec'] = round(time.perf_counter() - stage_start, 3)
         if not metadata:
             return {"status": "error", "message": f"Failed to extract metadata for {vid_path.name}"}
 
-        # 2. Detect Scenes and Extract Frames
-        scene_info_list, frame_data = self._detect_scenes(vid_path)
-        if scene_info_list is not None:
-            metadata.scenes = scene_info_list # Add scene info to metadata
-        
-        frames_to_process = [fp for _, fp in frame_data] if frame_data else []
-        temp_frames_dir = None
-        if not self.save_frames and frame_data: # If frames were saved temporarily
-            # Extract the temporary directory path from one of the frame paths
-            if frames_to_process:
-                 temp_frames_dir = frames_to_process[0].parent
-
-        if not frames_to_process:
-            logger.warning(f"No frames extracted for {vid_path.name}, cannot generate embedding.")
-            # Still try to save metadata without embedding if scene detection failed?
-            # For now, let's return an error if no embedding can be made.
-            if temp_frames_dir and os.path.exists(temp_frames_dir):
-                shutil.rmtree(temp_frames_dir)
-            return {"status": "error", "message": f"No frames extracted for {vid_path.name}, cannot generate embedding."}
-
-        # 3. Generate Embedding
-        logger.info(f"Generating embedding from {len(frames_to_process)} frames for {vid_path.name}...")
-        embedding = self._generate_embedding_from_frames(frames_to_process)
-
-        # Clean up temporary frames if they were created
-        if temp_frames_dir and os.path.exists(temp_frames_dir):
-            shutil.rmtree(temp_frames_dir)
-            logger.info(f"Cleaned up temporary frames directory: {temp_frames_dir}")
+        # 2. Select Frames (scene detection, keyframes or uniform sampling)
+        stage_start = time.perf_counter()
+        mode, frame_plan, frame_keys = sampler.plan(vid_path, metadata, sampler.resolve_mode(metadata))
+        metadata.sampling_mode = mode
+        ffmpeg_processes = ffmpeg_process_count(mode)
+        timings['frame_selection_sec'] = round(time.perf_counter() - stage_start, 3)
+
+        # 3. Extract Frames and Generate Embedding
+        # Frames stream from the decoder straight into CLIP preprocessing; previews (if requested)
+        # are written by a background sink so inference never waits on disk.
+        frame_sink = FrameSink(os.path.join(self.output_dir, "frames"), max_size=self.preview_max_size) if self.save_frames else None
+        preview_builder = VideoPreviewBuilder([t for _, _, t in frame_plan]) if self.create_previews else None
+        frames_extracted = 0
+
+        def frame_stream() -> Iterator[np.ndarray]:
+            nonlocal frames_extracted
+            for scene_num, frame_idx, frame_time, frame in sampler.iter_frames(vid_path, metadata, frame_plan, frame_keys, mode):
+                frames_extracted += 1
+                if frame_sink:
+                    frame_sink.submit(frame, f"scene_{scene_num:04d}_frame_{frame_idx:02d}.jpg")
+                if preview_builder:
+                    preview_builder.add(frame_time, frame)
+                yield frame
+
+        logger.info(f"Generating embedding from {len(frame_plan)} frames for {vid_path.name}...")
+        stage_start = time.perf_counter()
+        embedding = self._generate_embedding_from_frames(frame_stream())
+        timings['frames_and_embedding_sec'] = round(time.perf_counter() - stage_start, 3)
+        if frames_extracted < len(frame_plan):
+            logger.warning(f"Decoded {frames_extracted} of {len(frame_plan)} requested frames for {vid_path.name}")
 
         if not embedding:
+            if frame_sink:
+                frame_sink.close()
+            if not frames_extracted:
+                logger.warning(f"No frames extracted for {vid_path.name}, cannot generate embedding.")
+                return {"status": "error", "message": f"No frames extracted for {vid_path.name}, cannot generate embedding."}
             return {"status": "error", "message": f"Failed to generate embedding for {vid_path.name}"}
         
-        # 4. Save Metadata Locally (Optional but good practice)
+        # 4. Write poster and sprite sheet from the frames kept during decoding (no second decode pass)
+        if preview_builder:
+            try:
+                previews = preview_builder.save(os.path.join(self.output_dir, "previews"), output_stem(vid_path), self.preview_format)
+                metadata.poster_path = previews.get('poster_path')
+                metadata.sprite_sheet = previews.get('sprite_sheet')
+            except Exception as e:
+                logger.warning(f"Could not write previews for {vid_path.name}: {e}")
+
+        # 5. Save Metadata Locally (Optional but good practice)
         metadata_file = Path(self.output_dir) / "metadata" / f"{vid_path.stem}_metadata.json"
         try:
             with open(metadata_file, 'w') as f:
@@ -359,21 +324,35 @@ class VideoProcessor(BaseTool):
         except Exception as e:
              logger.warning(f"Could not save metadata JSON to {metadata_file}: {e}")
 
-        # 5. Upsert to Qdrant
+        # 6. Upsert to Qdrant
+        stage_start = time.perf_counter()
         upsert_success = self._upsert_to_qdrant(metadata, embedding)
+        timings['upsert_sec'] = round(time.perf_counter() - stage_start, 3)
+
+        if frame_sink:
+            sink_result = frame_sink.close()
+            logger.info(f"Wrote {len(sink_result['written'])} frame previews for {vid_path.name}")
+        timings['total_sec'] = round(time.perf_counter() - run_start, 3)
+        logger.info(f"Processed {vid_path.name} in {timings['total_sec']:.2f}s ({ffmpeg_processes} ffmpeg processes)")
 
         if upsert_success:
             return {
                 "status": "success",
                 "message": f"Successfully processed and stored video {vid_path.name}",
                 "output_directory": self.output_dir,
-                "qdrant_id": str(metadata.file_path)
+                "qdrant_id": str(metadata.file_path),
+                "sampling_mode": mode,
+                "frames_extracted": frames_extracted,
+                "ffmpeg_processes": ffmpeg_processes,
+                "timings": timings
             }
         else:
              return {
                 "status": "error",
                 "message": f"Processed video {vid_path.name}, but failed to store in Qdrant.",
-                "output_directory": self.output_dir
+                "output_directory": self.output_dir,
+                "ffmpeg_processes": ffmpeg_processes,
+                "timings": timings
             }
 
 # Example Test Case
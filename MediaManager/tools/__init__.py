@@ -2,15 +2,20 @@
 Tools for media processing and management.
 """
 
-# Import all tools with error handling
-try:
-    from .FileSystemScanner import FileSystemScanner
-    from .ImageProcessor import ImageProcessor
-    from .VideoProcessor import VideoProcessor
-    
-    __all__ = ['FileSystemScanner', 'ImageProcessor', 'VideoProcessor']
-except ImportError as e:
-    import sys
-    print(f"Error importing MediaManager tools: {e}", file=sys.stderr)
-    # Provide fallback minimal imports if possible
-    __all__ = [] 
\ No newline at end of file
+import importlib
+import sys
+
+__all__ = ['FileSystemScanner', 'ImageProcessor', 'VideoProcessor', 'VideoBatchProcessor']
+
+# Tools are imported lazily: ImageProcessor/VideoProcessor/VideoBatchProcessor load CLIP and connect to Qdrant on import,
+# and process-pool workers that only need helper modules (e.g. scene_utils) must not pay for that.
+def __getattr__(name):
+    if name not in __all__:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    try:
+        tool = getattr(importlib.import_module(f".{name}", __name__), name)
+    except ImportError as e:
+        print(f"Error importing MediaManager tools: {e}", file=sys.stderr)
+        raise AttributeError(name) from e
+    globals()[name] = tool
+    return tool
@@ -1,13 +1,14 @@
+import hashlib
 import logging
-import os
 import torch
 from transformers import CLIPProcessor, CLIPModel
-from qdrant_client import QdrantClient
 from qdrant_client.http.models import Distance, VectorParams, PointStruct
 from qdrant_client.http.exceptions import UnexpectedResponse
 import time
 from dotenv import load_dotenv
 
+from shared.qdrant_clients import bump_write_version, get_client, resolve_collection
+
 # Load environment variables
 load_dotenv()
 
@@ -18,7 +19,25 @@ logger = logging.getLogger(__name__)
 # Constants
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 EMBEDDING_DIM = 512
-QDRANT_COLLECTION_NAME = "media_embeddings"
+QDRANT_COLLECTION_NAME = resolve_collection()  # QDRANT_COLLECTION_NAME, the same collection CuratorAgent reads
+SHARD_FIELD = "shard_bucket"
+SHARD_BUCKETS = 64  # CuratorAgent's parallel export reads groups of buckets concurrently
+INDEXED_AT_FIELD = "indexed_at"  # Upsert time; CuratorAgent snapshots refresh from the last one they saw
+
+def shard_bucket(point_id) -> int:
+    """Stable hash bucket of a point id, stored in its payload so bulk exports can split the collection"""
+    return int.from_bytes(hashlib.blake2b(str(point_id).encode(), digest_size=4).digest(), 'big') % SHARD_BUCKETS
+
+def ingest_fields(point_id) -> dict:
+    """Payload fields every processor adds to a point it upserts: its hash bucket and the upsert time"""
+    return {SHARD_FIELD: shard_bucket(point_id), INDEXED_AT_FIELD: time.time()}
+
+def mark_collection_written():
+    """Bump the collection's write version after an upsert, so CuratorAgent drops query results it cached"""
+    try:
+        bump_write_version(qdrant_client, QDRANT_COLLECTION_NAME)
+    except Exception as e:
+        logger.warning(f"Could not bump write version of {QDRANT_COLLECTION_NAME}: {e}")
 
 def wait_for_qdrant(client, max_retries=5, delay=2):
     """Wait for Qdrant to become available"""
@@ -45,17 +64,9 @@ except Exception as e:
     model = None
     processor = None
 
-# Initialize Qdrant client
+# Initialize Qdrant client (shared, pooled and retrying; QDRANT_LOCATION selects embedded local mode)
 try:
-    # Get host and port from environment variables with defaults
-    qdrant_host = os.getenv("QDRANT_HOST", "localhost")
-    qdrant_port = int(os.getenv("QDRANT_PORT", 6333))
-    
-    qdrant_client = QdrantClient(
-        host=qdrant_host,
-        port=qdrant_port,
-        timeout=5.0
-    )
+    qdrant_client = get_client()
     
     # Wait for Qdrant to be available
     if wait_for_qdrant(qdrant_client):
@@ -63,8 +74,8 @@ try:
         try:
             qdrant_client.get_collection(QDRANT_COLLECTION_NAME)
             logger.info(f"Connected to existing Qdrant collection: {QDRANT_COLLECTION_NAME}")
-        except UnexpectedResponse:
-            # Collection doesn't exist, create it
+        except (UnexpectedResponse, ValueError):
+            # Collection doesn't exist (local mode raises ValueError), create it
             qdrant_client.create_collection(
                 collection_name=QDRANT_COLLECTION_NAME,
                 vectors_config=VectorParams(
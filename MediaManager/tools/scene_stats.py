@@ -0,0 +1,248 @@
+# 📌 Purpose: Caches per-frame scene-detection metrics (PySceneDetect StatsManager output) so scene boundaries can be
+#    recomputed for any threshold or minimum scene length without decoding the video again.
+# ⚙️ Key Logic: One full-frame detector pass records every metric into float32 arrays, saved as a compressed .npz
+#    keyed by a content fingerprint of the file, the detector and the downscale factor. Cuts are then a threshold
+#    comparison plus the detector's minimum-scene-length rule over the cached arrays, which takes milliseconds.
+# 📂 Expected File Path: photo_intelligence_agency/MediaManager/tools/scene_stats.py
+
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .scene_utils import (
+    CONTENT_THRESHOLD,
+    HISTOGRAM_THRESHOLD,
+    MIN_SCENE_LEN,
+    MIN_SEGMENT_SEC,
+    SCENEDETECT_AVAILABLE,
+    HistogramDetector,
+    _open_scene_manager,
+    cuts_to_scenes,
+    make_detector,
+    merge_segment_cuts,
+    plan_segments
+)
+
+if SCENEDETECT_AVAILABLE:
+    from scenedetect import ContentDetector, StatsManager, open_video
+
+logger = logging.getLogger(__name__)
+
+# Constants
+SCENE_STATS_VERSION = 1  # Bump when the stored metrics change meaning; older cache files are then recomputed
+FINGERPRINT_CHUNK_BYTES = 1 << 20  # Bytes hashed from the start and the end of the file
+
+
+def file_fingerprint(video_path: str) -> str:
+    """
+    Content fingerprint of a file: a hash of its size plus its first and last FINGERPRINT_CHUNK_BYTES.
+    Survives renames, moves and touched mtimes, and costs two small reads regardless of file size.
+    """
+    size = os.path.getsize(video_path)
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(video_path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_CHUNK_BYTES))
+        if size > FINGERPRINT_CHUNK_BYTES:
+            f.seek(max(FINGERPRINT_CHUNK_BYTES, size - FINGERPRINT_CHUNK_BYTES))
+            digest.update(f.read(FINGERPRINT_CHUNK_BYTES))
+    return digest.hexdigest()
+
+
+def scene_stats_path(cache_dir: str, video_path: str, detector: str, downscale: int) -> Path:
+    """Cache file for the metrics of `video_path` analysed by `detector` at `downscale`."""
+    return Path(cache_dir) / f"{file_fingerprint(video_path)}_{detector}_d{downscale}.npz"
+
+
+def save_scene_stats(path: Path, stats: Dict[str, Any]) -> None:
+    """Writes metrics to a compressed .npz atomically, so concurrent readers never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    arrays = {f"metric_{key}": values for key, values in stats['metrics'].items()}
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez_compressed(
+                f, version=SCENE_STATS_VERSION, fps=stats['fps'], total_frames=stats['total_frames'], **arrays
+            )
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_scene_stats(path: Path) -> Optional[Dict[str, Any]]:
+    """Reads metrics saved by `save_scene_stats`. Returns None if the file is missing, unreadable or outdated."""
+    if not path.is_file():
+        return None
+    try:
+        with np.load(path) as data:
+            if int(data['version']) != SCENE_STATS_VERSION:
+                return None
+            return {
+                'fps': float(data['fps']),
+                'total_frames': int(data['total_frames']),
+                'metrics': {name[len('metric_'):]: data[name] for name in data.files if name.startswith('metric_')},
+            }
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable scene stats cache {path}: {e}")
+        return None
+
+
+def compute_scene_metrics(
+    video_path: str,
+    detector: str = 'content',
+    downscale: int = 0,
+    start_frame: int = 0,
+    end_frame: Optional[int] = None,
+    show_progress: bool = False,
+) -> Dict[str, Any]:
+    """
+    Decodes frames [start_frame, end_frame) and records the detector's per-frame metrics.
+    Returns the frame rate, total frame count and one float32 array per metric covering the range
+    (NaN where a frame has no metric, e.g. the first frame analysed).
+    """
+    if not SCENEDETECT_AVAILABLE:
+        raise RuntimeError("PySceneDetect is not installed")
+
+    video = open_video(str(video_path))
+    fps = video.frame_rate
+    total_frames = video.duration.get_frames()
+    if start_frame > 0:
+        video.seek(start_frame)
+    stats_manager = StatsManager()
+    scene_manager = _open_scene_manager(detector, None, downscale, stats_manager=stats_manager)
+    # StatsManager needs every frame, so no frame skipping here
+    scene_manager.detect_scenes(video=video, end_time=end_frame, show_progress=show_progress)
+
+    keys = make_detector(detector).get_metrics()
+    end = total_frames if end_frame is None else min(end_frame, total_frames)
+    metrics = {key: np.full(max(0, end - start_frame), np.nan, dtype=np.float32) for key in keys}
+    for n in range(start_frame, end):
+        if stats_manager.metrics_exist(n, keys):
+            for key, value in zip(keys, stats_manager.get_metrics(n, keys)):
+                metrics[key][n - start_frame] = value
+    return {'fps': fps, 'total_frames': total_frames, 'metrics': metrics}
+
+
+def _compute_segment_metrics(job: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """Process-pool worker: computes metrics from the warm-up start and keeps the owned range."""
+    result = compute_scene_metrics(
+        job['video_path'],
+        detector=job['detector'],
+        downscale=job['downscale'],
+        start_frame=job['warmup_start'],
+        end_frame=job['own_end'],
+    )
+    offset = job['own_start'] - job['warmup_start']
+    return {key: values[offset:] for key, values in result['metrics'].items()}
+
+
+def compute_scene_metrics_parallel(video_path: str, detector: str = 'content', downscale: int = 0,
+                                   workers: int = 2) -> Dict[str, Any]:
+    """
+    Segmented version of `compute_scene_metrics` for the whole video. Every metric depends only on a frame
+    and its predecessor, so segments with a warm-up window produce the same arrays as a serial pass.
+    """
+    video = open_video(str(video_path))
+    fps = video.frame_rate
+    total_frames = video.duration.get_frames()
+    del video
+
+    workers = max(1, min(workers, int(total_frames / fps // MIN_SEGMENT_SEC)))
+    if workers == 1:
+        return compute_scene_metrics(video_path, detector, downscale)
+
+    jobs = [
+        dict(segment, video_path=str(video_path), detector=detector, downscale=downscale)
+        for segment in plan_segments(total_frames, fps, workers)
+    ]
+    with ProcessPoolExecutor(max_workers=len(jobs)) as pool:
+        segments = list(pool.map(_compute_segment_metrics, jobs))
+    metrics = {key: np.concatenate([segment[key] for segment in segments]) for key in segments[0]}
+    return {'fps': fps, 'total_frames': total_frames, 'metrics': metrics}
+
+
+def get_scene_stats(
+    video_path: str,
+    cache_dir: str,
+    detector: str = 'content',
+    downscale: int = 0,
+    workers: int = 1,
+    show_progress: bool = False,
+) -> Dict[str, Any]:
+    """Returns cached metrics for the video, computing and caching them first on a miss."""
+    path = scene_stats_path(cache_dir, video_path, detector, downscale)
+    stats = load_scene_stats(path)
+    if stats is not None:
+        logger.info(f"Loaded scene stats for {Path(video_path).name} from {path}")
+        return stats
+
+    start = time.perf_counter()
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    if workers > 1:
+        stats = compute_scene_metrics_parallel(video_path, detector, downscale, workers)
+    else:
+        stats = compute_scene_metrics(video_path, detector, downscale, show_progress=show_progress)
+    try:
+        save_scene_stats(path, stats)
+        logger.info(f"Cached scene stats for {Path(video_path).name} in {path} ({time.perf_counter() - start:.2f}s)")
+    except OSError as e:
+        logger.warning(f"Could not cache scene stats to {path}: {e}")
+    return stats
+
+
+def cuts_from_metrics(
+    metrics: Dict[str, np.ndarray],
+    detector: str = 'content',
+    threshold: Optional[float] = None,
+    min_scene_len: int = MIN_SCENE_LEN,
+    weights: Optional[Sequence[float]] = None,
+) -> List[int]:
+    """
+    Recomputes cut frame numbers from cached metrics, applying the same rule as the detector: a frame whose
+    score reaches `threshold` starts a new scene if at least `min_scene_len` frames passed since the last cut.
+    For the content detector, `weights` (hue, saturation, luma, edges) re-weights the stored components.
+    """
+    if detector == 'content':
+        threshold = CONTENT_THRESHOLD if threshold is None else threshold
+        if weights is None:
+            score = metrics[ContentDetector.FRAME_SCORE_KEY]
+        else:
+            components = np.stack([metrics[key] for key in ContentDetector.Components._fields])
+            weights = np.asarray(weights, dtype=np.float64)
+            score = (weights[:, None] * components).sum(axis=0) / np.abs(weights).sum()
+    elif detector == 'histogram':
+        threshold = HISTOGRAM_THRESHOLD if threshold is None else threshold
+        score = metrics[HistogramDetector.METRIC_KEY]
+    else:
+        raise ValueError(f"Unknown scene detector '{detector}'")
+
+    with np.errstate(invalid='ignore'):
+        candidates = np.flatnonzero(score >= threshold)  # NaN (no metric) never cuts
+    return merge_segment_cuts([candidates.tolist()], min_scene_len)
+
+
+def detect_scenes_cached(
+    video_path: str,
+    cache_dir: str,
+    detector: str = 'content',
+    threshold: Optional[float] = None,
+    downscale: int = 0,
+    workers: int = 1,
+    min_scene_len: int = MIN_SCENE_LEN,
+    show_progress: bool = False,
+) -> List[Tuple[float, float]]:
+    """
+    Drop-in for `scene_utils.detect_scenes` backed by the metrics cache in `cache_dir`.
+    The first call per file/detector/downscale decodes the video; later calls with any threshold don't.
+    """
+    stats = get_scene_stats(video_path, cache_dir, detector, downscale, workers, show_progress)
+    cuts = cuts_from_metrics(stats['metrics'], detector, threshold, min_scene_len)
+    return cuts_to_scenes(cuts, stats['total_frames'], stats['fps'])
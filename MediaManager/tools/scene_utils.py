@@ -0,0 +1,300 @@
+# 📌 Purpose: Scene boundary detection and frame sampling helpers for VideoProcessor, with speed/accuracy knobs.
+# ⚙️ Key Logic: Wraps PySceneDetect's SceneManager with an explicit downscale factor and frame-skip stride, and adds a
+#    cheap HistogramDetector that compares compact joint colour histograms instead of per-pixel HSV differences.
+#    Sampling modes (keyframes / uniform) skip pixel analysis entirely for long, low-cut footage.
+#    Long videos can be split into overlapping time segments analysed in a process pool; cuts are merged so
+#    the result matches a serial run, except where cuts closer than MIN_SCENE_LEN chain across a segment start
+#    (see `detect_cuts_parallel`).
+# 📂 Expected File Path: photo_intelligence_agency/MediaManager/tools/scene_utils.py
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from scenedetect import ContentDetector, SceneManager, open_video
+    from scenedetect.scene_detector import SceneDetector
+    SCENEDETECT_AVAILABLE = True
+except ImportError:
+    SceneDetector = object
+    SCENEDETECT_AVAILABLE = False
+
+# Not importing processing_utils on purpose: it loads CLIP and connects to Qdrant at import time.
+logger = logging.getLogger(__name__)
+
+# Constants
+SCENE_DETECTORS = ('content', 'histogram')
+CONTENT_THRESHOLD = 27.0  # Default threshold for content-aware scene detection
+HISTOGRAM_THRESHOLD = 0.35  # Fraction of the colour histogram that must change between frames to cut
+HISTOGRAM_BINS = 8  # Bins per channel; the joint histogram has HISTOGRAM_BINS ** 3 entries
+MIN_SCENE_LEN = 15  # Frames, same default as PySceneDetect's detectors
+SEGMENT_OVERLAP_SEC = 2.0  # Warm-up before each parallel segment so detector state catches up with a serial run
+MIN_SEGMENT_SEC = 30.0  # Videos are only split if every segment gets at least this much footage
+
+SAMPLING_MODES = ('scenes', 'keyframes', 'uniform', 'auto')
+AUTO_SCENES_MAX_DURATION_SEC = 15 * 60  # 'auto' runs full scene detection only on videos up to this long
+LOW_MOTION_BITS_PER_PIXEL = 0.05  # Below this, long footage is treated as mostly static (surveillance, lectures)
+
+
+def compact_histogram(frame: np.ndarray, bins: int = HISTOGRAM_BINS) -> np.ndarray:
+    """Returns the normalized joint colour histogram (bins ** 3 entries) of a uint8 3-channel frame."""
+    shift = 8 - int(np.log2(bins))
+    q = (frame.reshape(-1, 3) >> shift).astype(np.int32)
+    index = (q[:, 0] * bins + q[:, 1]) * bins + q[:, 2]
+    hist = np.bincount(index, minlength=bins ** 3).astype(np.float32)
+    return hist / max(1.0, float(index.size))
+
+
+class HistogramDetector(SceneDetector):
+    """
+    Detects hard cuts by comparing compact colour histograms of consecutive processed frames.
+
+    The per-frame metric is half the L1 distance between normalized histograms (0 = identical, 1 = disjoint).
+    It is far cheaper than ContentDetector's HSV conversion and per-pixel deltas, and pairs well with
+    aggressive downscaling since histograms are insensitive to resolution.
+    """
+
+    METRIC_KEY = 'hist_diff'
+
+    def __init__(self, threshold: float = HISTOGRAM_THRESHOLD, bins: int = HISTOGRAM_BINS, min_scene_len: int = MIN_SCENE_LEN):
+        if bins & (bins - 1) or not 2 <= bins <= 256:
+            raise ValueError(f"bins must be a power of two between 2 and 256, got {bins}")
+        self.threshold = threshold
+        self.bins = bins
+        self.min_scene_len = min_scene_len
+        self.stats_manager = None  # Set by SceneManager.add_detector
+        self._last_hist = None
+        self._last_cut = None
+
+    def get_metrics(self) -> List[str]:
+        return [self.METRIC_KEY]
+
+    def is_processing_required(self, frame_num: int) -> bool:
+        return True
+
+    def process_frame(self, frame_num: int, frame_img: Optional[np.ndarray]) -> List[int]:
+        if self._last_cut is None:
+            self._last_cut = frame_num
+        if frame_img is None:
+            self._last_hist = None
+            return []
+
+        hist = compact_histogram(frame_img, self.bins)
+        cuts = []
+        if self._last_hist is not None:
+            diff = 0.5 * float(np.abs(hist - self._last_hist).sum())
+            if self.stats_manager is not None:
+                self.stats_manager.set_metrics(frame_num, {self.METRIC_KEY: diff})
+            if diff >= self.threshold and frame_num - self._last_cut >= self.min_scene_len:
+                cuts.append(frame_num)
+                self._last_cut = frame_num
+        self._last_hist = hist
+        return cuts
+
+
+def make_detector(detector: str = 'content', threshold: Optional[float] = None) -> "SceneDetector":
+    """Creates a scene detector by name ('content' or 'histogram'), using the detector's default threshold if None."""
+    if detector == 'content':
+        return ContentDetector(threshold=CONTENT_THRESHOLD if threshold is None else threshold)
+    if detector == 'histogram':
+        return HistogramDetector(threshold=HISTOGRAM_THRESHOLD if threshold is None else threshold)
+    raise ValueError(f"Unknown scene detector '{detector}', expected one of {SCENE_DETECTORS}")
+
+
+def _open_scene_manager(detector: str, threshold: Optional[float], downscale: int, stats_manager=None) -> "SceneManager":
+    scene_manager = SceneManager(stats_manager=stats_manager)
+    if downscale > 0:
+        scene_manager.auto_downscale = False
+        scene_manager.downscale = downscale
+    scene_manager.add_detector(make_detector(detector, threshold))
+    return scene_manager
+
+
+def cuts_to_scenes(cuts: List[int], total_frames: int, fps: float) -> List[Tuple[float, float]]:
+    """Converts sorted cut frame numbers into (start_sec, end_sec) scenes. No cuts means no scenes."""
+    if not cuts:
+        return []
+    bounds = [0] + list(cuts) + [total_frames]
+    return [(bounds[i] / fps, bounds[i + 1] / fps) for i in range(len(bounds) - 1)]
+
+
+def detect_cuts(
+    video_path: str,
+    detector: str = 'content',
+    threshold: Optional[float] = None,
+    downscale: int = 0,
+    frame_skip: int = 0,
+    start_frame: int = 0,
+    end_frame: Optional[int] = None,
+    show_progress: bool = False,
+) -> Dict[str, Any]:
+    """
+    Runs scene detection over frames [start_frame, end_frame) and returns the cut frame numbers
+    together with the video's frame rate and total frame count.
+    """
+    if not SCENEDETECT_AVAILABLE:
+        raise RuntimeError("PySceneDetect is not installed")
+
+    video = open_video(str(video_path))
+    fps = video.frame_rate
+    total_frames = video.duration.get_frames()
+    if start_frame > 0:
+        video.seek(start_frame)
+    scene_manager = _open_scene_manager(detector, threshold, downscale)
+    scene_manager.detect_scenes(video=video, end_time=end_frame, frame_skip=frame_skip, show_progress=show_progress)
+    cuts = [start.get_frames() for start, _ in scene_manager.get_scene_list()[1:]]
+    return {'cuts': cuts, 'fps': fps, 'total_frames': total_frames}
+
+
+def _detect_segment_cuts(job: Dict[str, Any]) -> List[int]:
+    """Process-pool worker: detects cuts from the warm-up start and keeps those inside the owned range."""
+    result = detect_cuts(
+        job['video_path'],
+        detector=job['detector'],
+        threshold=job['threshold'],
+        downscale=job['downscale'],
+        frame_skip=job['frame_skip'],
+        start_frame=job['warmup_start'],
+        end_frame=job['own_end'],
+    )
+    return [cut for cut in result['cuts'] if job['own_start'] <= cut < job['own_end']]
+
+
+def merge_segment_cuts(segment_cuts: List[List[int]], min_scene_len: int = MIN_SCENE_LEN) -> List[int]:
+    """
+    Merges per-segment cuts into one sorted list, re-applying the minimum scene length across segment
+    borders like a single detector pass does (the first scene starts at frame 0).
+    """
+    merged, last_cut = [], 0
+    for cut in sorted(set(cut for cuts in segment_cuts for cut in cuts)):
+        if cut - last_cut >= min_scene_len:
+            merged.append(cut)
+            last_cut = cut
+    return merged
+
+
+def plan_segments(total_frames: int, fps: float, workers: int, frame_skip: int = 0,
+                  overlap_sec: float = SEGMENT_OVERLAP_SEC) -> List[Dict[str, int]]:
+    """
+    Splits [0, total_frames) into `workers` owned ranges, each with a warm-up window of `overlap_sec`.
+    Boundaries are aligned to the frame-skip stride so every segment analyses the same frames a serial run would.
+    """
+    stride = frame_skip + 1
+    overlap = max(MIN_SCENE_LEN + 1, int(round(overlap_sec * fps)))
+    overlap = -(-overlap // stride) * stride
+    bounds = [(total_frames * i // workers) // stride * stride for i in range(workers)] + [total_frames]
+    return [
+        {'own_start': bounds[i], 'own_end': bounds[i + 1], 'warmup_start': max(0, bounds[i] - overlap)}
+        for i in range(workers)
+        if bounds[i] < bounds[i + 1]
+    ]
+
+
+def detect_scenes(
+    video_path: str,
+    detector: str = 'content',
+    threshold: Optional[float] = None,
+    downscale: int = 0,
+    frame_skip: int = 0,
+    workers: int = 1,
+    show_progress: bool = False,
+) -> List[Tuple[float, float]]:
+    """
+    Runs scene detection and returns (start_sec, end_sec) for every detected scene.
+
+    `downscale` is the integer factor frames are shrunk by before analysis (0 = PySceneDetect's automatic
+    factor based on resolution, 1 = full resolution). `frame_skip` analyses only every (frame_skip + 1)-th
+    frame; skipped frames are grabbed without being decoded. Both trade boundary accuracy for speed.
+    With `workers` > 1 (0 = all cores) a long video is split into overlapping segments detected in parallel.
+    Returns an empty list if no cuts were found.
+    """
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        result = detect_cuts(video_path, detector, threshold, downscale, frame_skip, show_progress=show_progress)
+    else:
+        result = detect_cuts_parallel(video_path, detector, threshold, downscale, frame_skip, workers)
+    return cuts_to_scenes(result['cuts'], result['total_frames'], result['fps'])
+
+
+def detect_cuts_parallel(
+    video_path: str,
+    detector: str = 'content',
+    threshold: Optional[float] = None,
+    downscale: int = 0,
+    frame_skip: int = 0,
+    workers: int = 2,
+) -> Dict[str, Any]:
+    """
+    Segmented version of `detect_cuts` for a single long video.
+
+    Each worker process opens the video, seeks to its segment's warm-up start and runs its own detector;
+    cuts are kept only inside the segment's owned range and merged with `merge_segment_cuts`. Videos too
+    short to give every worker MIN_SEGMENT_SEC of footage use fewer workers (down to a serial run).
+
+    The cuts equal `detect_cuts` unless cuts closer than MIN_SCENE_LEN frames chain across a segment start: a
+    worker does not see the cut before its warm-up, so a warm-up cut the serial run suppresses can in turn
+    suppress an owned cut up to MIN_SCENE_LEN frames later (cuts at 285, 296 and 305 around a segment start at
+    300 give [285] instead of [285, 305]). Cuts at least MIN_SCENE_LEN frames apart always match.
+    """
+    if not SCENEDETECT_AVAILABLE:
+        raise RuntimeError("PySceneDetect is not installed")
+
+    video = open_video(str(video_path))
+    fps = video.frame_rate
+    total_frames = video.duration.get_frames()
+    del video
+
+    workers = max(1, min(workers, int(total_frames / fps // MIN_SEGMENT_SEC)))
+    if workers == 1:
+        return detect_cuts(video_path, detector, threshold, downscale, frame_skip)
+
+    jobs = [
+        dict(segment, video_path=str(video_path), detector=detector, threshold=threshold,
+             downscale=downscale, frame_skip=frame_skip)
+        for segment in plan_segments(total_frames, fps, workers, frame_skip)
+    ]
+    logger.info(f"Detecting scenes in {len(jobs)} parallel segments of {video_path}")
+    with ProcessPoolExecutor(max_workers=len(jobs)) as pool:
+        segment_cuts = list(pool.map(_detect_segment_cuts, jobs))
+    return {'cuts': merge_segment_cuts(segment_cuts), 'fps': fps, 'total_frames': total_frames}
+
+
+def evenly_spaced_indices(count: int, max_count: int) -> List[int]:
+    """Returns at most `max_count` indices spread evenly over range(count), always including the first."""
+    if count <= max_count:
+        return list(range(count))
+    if max_count <= 0:
+        return []
+    step = count / max_count
+    return sorted({int(i * step) for i in range(max_count)})
+
+
+def uniform_timestamps(duration_sec: float, interval_sec: float, max_samples: int) -> List[float]:
+    """
+    One timestamp per `interval_sec` (at the middle of each interval), widening the interval
+    if that would exceed `max_samples`. Always returns at least one timestamp for a non-empty video.
+    """
+    if duration_sec <= 0 or max_samples <= 0:
+        return []
+    interval_sec = max(interval_sec, duration_sec / max_samples)
+    count = max(1, int(duration_sec // interval_sec))
+    return [min(duration_sec, (k + 0.5) * interval_sec) for k in range(count)]
+
+
+def choose_sampling_mode(duration_sec: float, bitrate: int, width: int, height: int, fps: float) -> str:
+    """
+    Picks a sampling mode from duration and bitrate.
+
+    Short videos get full scene detection. For long videos, the bitrate per pixel per frame is used as a
+    proxy for how much the picture changes: low values (static cameras, slides) are sampled uniformly,
+    higher values use keyframes, which encoders tend to place at cuts.
+    """
+    if duration_sec <= AUTO_SCENES_MAX_DURATION_SEC:
+        return 'scenes'
+    pixel_rate = width * height * fps
+    bits_per_pixel = bitrate / pixel_rate if pixel_rate > 0 else 0.0
+    return 'uniform' if bits_per_pixel < LOW_MOTION_BITS_PER_PIXEL else 'keyframes'
@@ -0,0 +1,271 @@
+# 📌 Purpose: Video metadata model and probing: single-file ffprobe for VideoProcessor and a concurrent harvester
+#    that probes whole archives for VideoBatchProcessor.
+# ⚙️ Key Logic: ffprobe output is reduced to a small summary (duration, size, frame rate, codec, bitrate) with safe
+#    parsing of rational frame rates. The harvester runs many ffprobe subprocesses at once with asyncio, bounded by a
+#    semaphore, and keeps summaries in a JSON cache keyed by (path, size, mtime) so unchanged files are never re-probed.
+# 📂 Expected File Path: photo_intelligence_agency/MediaManager/tools/video_metadata.py
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from fractions import Fraction
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Optional
+
+import ffmpeg
+
+logger = logging.getLogger(__name__)
+
+# Constants
+PROBE_TIMEOUT_SEC = 30.0  # Per-file ffprobe timeout in the harvester
+PROBE_CONCURRENCY = min(32, 4 * (os.cpu_count() or 1))  # ffprobe is mostly waiting on I/O, so oversubscribe cores
+PROBE_ENTRIES = 'format=duration,bit_rate:stream=codec_type,codec_name,width,height,r_frame_rate,avg_frame_rate,duration'
+
+
+class SceneInfo:
+    """Data class for scene information"""
+    def __init__(self, scene_number: int, start_time_sec: float, end_time_sec: float, duration_sec: float):
+        self.scene_number = scene_number
+        self.start_time_sec = start_time_sec
+        self.end_time_sec = end_time_sec
+        self.duration_sec = duration_sec
+
+    def dict(self):
+        return {
+            'scene_number': self.scene_number,
+            'start_time_sec': self.start_time_sec,
+            'end_time_sec': self.end_time_sec,
+            'duration_sec': self.duration_sec
+        }
+
+class VideoMetadata:
+    """Data class for video metadata"""
+    def __init__(self, **kwargs):
+        self.filename: str = kwargs.get('filename', '')
+        self.file_path: str = kwargs.get('file_path', '')
+        self.file_size_bytes: int = kwargs.get('file_size_bytes', 0)
+        self.duration_seconds: float = kwargs.get('duration_seconds', 0.0)
+        self.width: int = kwargs.get('width', 0)
+        self.height: int = kwargs.get('height', 0)
+        self.fps: float = kwargs.get('fps', 0.0)
+        self.codec_name: str = kwargs.get('codec_name', '')
+        self.bitrate: int = kwargs.get('bitrate', 0)
+        self.scenes: List[SceneInfo] = kwargs.get('scenes', [])
+        self.sampling_mode: Optional[str] = kwargs.get('sampling_mode')
+        self.poster_path: Optional[str] = kwargs.get('poster_path')
+        self.sprite_sheet: Optional[Dict[str, Any]] = kwargs.get('sprite_sheet')
+        self.creation_time: datetime = kwargs.get('creation_time')
+        self.modification_time: datetime = kwargs.get('modification_time')
+
+    def dict(self, exclude_none: bool = True):
+        data = {
+            'filename': self.filename,
+            'file_path': self.file_path,
+            'file_size_bytes': self.file_size_bytes,
+            'duration_seconds': self.duration_seconds,
+            'width': self.width,
+            'height': self.height,
+            'fps': self.fps,
+            'codec_name': self.codec_name,
+            'bitrate': self.bitrate,
+            'scenes': [scene.dict() for scene in self.scenes] if self.scenes else [],
+            'sampling_mode': self.sampling_mode,
+            'poster_path': self.poster_path,
+            'sprite_sheet': self.sprite_sheet,
+            'creation_time': self.creation_time.isoformat() if self.creation_time else None,
+            'modification_time': self.modification_time.isoformat() if self.modification_time else None
+        }
+        if exclude_none:
+            return {k: v for k, v in data.items() if v is not None}
+        return data
+
+
+def parse_frame_rate(value: Any) -> float:
+    """
+    Parses an ffprobe frame rate ('30000/1001', '25/1', '25') into frames per second.
+    Returns 0.0 for missing or malformed values and for the '0/0' ffprobe reports when the rate is unknown.
+    """
+    try:
+        rate = Fraction(str(value).strip())
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+    return float(rate) if rate > 0 else 0.0
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0  # ffprobe reports 'N/A' for unknown values
+
+
+def summarize_probe(probe: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduces ffprobe JSON output to the fields VideoMetadata needs. Raises ValueError if there is no video stream."""
+    video_info = next((s for s in probe.get('streams', []) if s.get('codec_type') == 'video'), None)
+    if video_info is None:
+        raise ValueError("No video stream found")
+    fmt = probe.get('format', {})
+    return {
+        'duration_seconds': _to_float(fmt.get('duration')) or _to_float(video_info.get('duration')),
+        'width': int(video_info.get('width', 0)),
+        'height': int(video_info.get('height', 0)),
+        'fps': parse_frame_rate(video_info.get('r_frame_rate')) or parse_frame_rate(video_info.get('avg_frame_rate')),
+        'codec_name': video_info.get('codec_name', ''),
+        'bitrate': int(_to_float(fmt.get('bit_rate'))),
+    }
+
+
+def metadata_from_summary(vid_path: Path, summary: Dict[str, Any], file_stats: os.stat_result) -> VideoMetadata:
+    """Builds VideoMetadata from a probe summary and the file's stat result."""
+    return VideoMetadata(
+        filename=vid_path.name,
+        file_path=str(vid_path.resolve()),
+        file_size_bytes=file_stats.st_size,
+        creation_time=datetime.fromtimestamp(file_stats.st_ctime),
+        modification_time=datetime.fromtimestamp(file_stats.st_mtime),
+        **summary
+    )
+
+
+class ProbeCache:
+    """
+    Probe summaries keyed by (path, size, mtime), optionally persisted as a JSON file.
+    A file whose size or modification time changed is a miss and gets probed again.
+    """
+
+    def __init__(self, cache_file: Optional[str] = None):
+        self.cache_file = Path(cache_file) if cache_file else None
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        if self.cache_file and self.cache_file.is_file():
+            try:
+                with open(self.cache_file, 'r') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable probe cache {self.cache_file}: {e}")
+
+    def get(self, path: str, file_stats: os.stat_result) -> Optional[Dict[str, Any]]:
+        """Returns the cached summary if the file is unchanged since it was probed."""
+        entry = self._entries.get(path)
+        if entry and entry['size'] == file_stats.st_size and entry['mtime_ns'] == file_stats.st_mtime_ns:
+            return entry['summary']
+        return None
+
+    def put(self, path: str, file_stats: os.stat_result, summary: Dict[str, Any]) -> None:
+        self._entries[path] = {'size': file_stats.st_size, 'mtime_ns': file_stats.st_mtime_ns, 'summary': summary}
+        self._dirty = True
+
+    def save(self) -> None:
+        """Writes the cache file atomically if anything changed."""
+        if not self.cache_file or not self._dirty:
+            return
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_file.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.cache_file)
+            self._dirty = False
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def extract_video_metadata(vid_path: Path, cache: Optional[ProbeCache] = None) -> Optional[VideoMetadata]:
+    """Extracts comprehensive metadata using FFmpeg."""
+    try:
+        # Get file stats
+        file_stats = vid_path.stat()
+        summary = cache.get(str(vid_path), file_stats) if cache else None
+        if summary is None:
+            summary = summarize_probe(ffmpeg.probe(str(vid_path)))
+            if cache:
+                cache.put(str(vid_path), file_stats, summary)
+        return metadata_from_summary(vid_path, summary, file_stats)
+
+    except Exception as e:
+        logger.error(f"Error extracting metadata: {e}")
+        return None
+
+
+async def probe_async(video_path: str, timeout: float = PROBE_TIMEOUT_SEC) -> Dict[str, Any]:
+    """Runs ffprobe on one file without blocking the event loop and returns its parsed JSON output."""
+    process = await asyncio.create_subprocess_exec(
+        'ffprobe', '-v', 'error', '-show_entries', PROBE_ENTRIES, '-of', 'json', str(video_path),
+        stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise TimeoutError(f"ffprobe timed out after {timeout}s")
+    if process.returncode != 0:
+        raise RuntimeError(stderr.decode(errors='replace').strip() or f"ffprobe exited with {process.returncode}")
+    return json.loads(stdout)
+
+
+async def harvest_metadata_async(
+    video_paths: Iterable[str],
+    max_concurrency: int = PROBE_CONCURRENCY,
+    cache: Optional[ProbeCache] = None,
+    timeout: float = PROBE_TIMEOUT_SEC,
+) -> Dict[str, Any]:
+    """
+    Probes many videos concurrently, at most `max_concurrency` ffprobe processes at a time.
+
+    Returns {'metadata': {path: VideoMetadata}, 'errors': {path: message}, 'probed': n, 'cache_hits': n,
+    'elapsed_sec': s}. Files unchanged since they were cached are not probed.
+    """
+    start = time.perf_counter()
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    metadata, errors = {}, {}
+    counts = {'probed': 0, 'cache_hits': 0}
+
+    async def harvest_one(path: str) -> None:
+        vid_path = Path(path)
+        try:
+            file_stats = vid_path.stat()
+            summary = cache.get(path, file_stats) if cache else None
+            if summary is not None:
+                counts['cache_hits'] += 1
+            else:
+                async with semaphore:
+                    probe = await probe_async(path, timeout)
+                counts['probed'] += 1
+                summary = summarize_probe(probe)
+                if cache:
+                    cache.put(path, file_stats, summary)
+            metadata[path] = metadata_from_summary(vid_path, summary, file_stats)
+        except Exception as e:
+            errors[path] = f"Failed to extract metadata for {vid_path.name}: {e}"
+
+    await asyncio.gather(*(harvest_one(str(path)) for path in video_paths))
+    if cache:
+        try:
+            cache.save()
+        except OSError as e:
+            logger.warning(f"Could not save probe cache: {e}")
+    return {'metadata': metadata, 'errors': errors, **counts, 'elapsed_sec': round(time.perf_counter() - start, 3)}
+
+
+def harvest_metadata(
+    video_paths: Iterable[str],
+    max_concurrency: int = PROBE_CONCURRENCY,
+    cache: Optional[ProbeCache] = None,
+    timeout: float = PROBE_TIMEOUT_SEC,
+) -> Dict[str, Any]:
+    """Synchronous wrapper around `harvest_metadata_async`, usable from code that may already run an event loop."""
+    coroutine = harvest_metadata_async(list(video_paths), max_concurrency, cache, timeout)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    # Called from inside an event loop (e.g. an async agent runtime): run on a private loop in a helper thread
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
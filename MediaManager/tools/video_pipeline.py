@@ -0,0 +1,256 @@
+# 📌 Purpose: CLIP-free half of the video pipeline: frame selection (scenes/keyframes/uniform) and frame decoding,
+#    shared by VideoProcessor (one video) and VideoBatchProcessor (many videos in a process pool).
+# ⚙️ Key Logic: `FrameSampler` holds the sampling settings and turns a video into a frame plan plus a stream of
+#    in-memory RGB frames; `prepare_video` runs the whole CPU-bound stage for one video and is picklable, so it
+#    can execute in worker processes while the parent keeps the model busy.
+# 📂 Expected File Path: photo_intelligence_agency/MediaManager/tools/video_pipeline.py
+
+import logging
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+import numpy as np
+
+from .scene_utils import (
+    CONTENT_THRESHOLD,
+    HISTOGRAM_THRESHOLD,
+    SCENEDETECT_AVAILABLE,
+    choose_sampling_mode,
+    detect_scenes,
+    evenly_spaced_indices,
+    uniform_timestamps
+)
+from .scene_stats import detect_scenes_cached
+from .video_metadata import SceneInfo, VideoMetadata, extract_video_metadata
+from .video_previews import VideoPreviewBuilder
+from .video_utils import (
+    frame_output_size,
+    iter_frames,
+    iter_frames_seek,
+    output_stem,
+    probe_keyframe_times,
+    timestamps_to_frame_numbers
+)
+
+# Deliberately not importing processing_utils: worker processes must not load CLIP or connect to Qdrant.
+logger = logging.getLogger(__name__)
+
+FramePlan = List[Tuple[int, int, float]]  # (scene_number, frame_index, timestamp)
+
+
+@dataclass
+class FrameSampler:
+    """Sampling settings of a video tool and the frame selection/decoding they imply."""
+    sampling_mode: str = 'scenes'
+    sample_interval_sec: float = 10.0
+    max_sampled_frames: int = 240
+    scene_detector: str = 'content'
+    scene_detection_threshold: float = CONTENT_THRESHOLD
+    histogram_threshold: float = HISTOGRAM_THRESHOLD
+    scene_detection_workers: int = 1
+    scene_downscale: int = 0
+    scene_frame_skip: int = 0
+    show_progress: bool = True
+    scene_stats_dir: Optional[str] = None  # cache per-frame detector metrics here (requires scene_frame_skip == 0)
+
+    def detect_scenes(self, vid_path: Path, metadata: VideoMetadata) -> List[SceneInfo]:
+        """Detects scenes using PySceneDetect. Falls back to a single scene spanning the whole video."""
+        scene_list_tuples = []
+        if not SCENEDETECT_AVAILABLE:
+            logger.warning("Scene detection skipped as PySceneDetect is not available.")
+        else:
+            try:
+                logger.info(f"Detecting scenes for {vid_path.name} ({self.scene_detector} detector)...")
+                threshold = self.scene_detection_threshold if self.scene_detector == 'content' else self.histogram_threshold
+                if self.scene_stats_dir and self.scene_frame_skip == 0:
+                    # Re-runs with another threshold reuse the cached metrics instead of decoding again
+                    scene_list_tuples = detect_scenes_cached(
+                        str(vid_path),
+                        self.scene_stats_dir,
+                        detector=self.scene_detector,
+                        threshold=threshold,
+                        downscale=self.scene_downscale,
+                        workers=self.scene_detection_workers,
+                        show_progress=self.show_progress
+                    )
+                else:
+                    scene_list_tuples = detect_scenes(
+                        str(vid_path),
+                        detector=self.scene_detector,
+                        threshold=threshold,
+                        downscale=self.scene_downscale,
+                        frame_skip=self.scene_frame_skip,
+                        workers=self.scene_detection_workers,
+                        show_progress=self.show_progress
+                    )
+            except Exception as e:
+                logger.error(f"Failed during scene detection: {e}", exc_info=True)
+
+        if not scene_list_tuples:
+            logger.info(f"No scenes detected for {vid_path.name} (or only one scene).")
+            scene_list_tuples = [(0.0, metadata.duration_seconds)]
+        else:
+            logger.info(f"Detected {len(scene_list_tuples)} scenes for {vid_path.name}.")
+
+        return [
+            SceneInfo(
+                scene_number=i + 1,
+                start_time_sec=start_sec,
+                end_time_sec=end_sec,
+                duration_sec=end_sec - start_sec
+            )
+            for i, (start_sec, end_sec) in enumerate(scene_list_tuples)
+        ]
+
+    def resolve_mode(self, metadata: VideoMetadata) -> str:
+        """Returns the effective sampling mode, resolving 'auto' from duration and bitrate."""
+        if self.sampling_mode != 'auto':
+            return self.sampling_mode
+        mode = choose_sampling_mode(
+            metadata.duration_seconds, metadata.bitrate, metadata.width, metadata.height, metadata.fps
+        )
+        logger.info(f"Auto-selected '{mode}' sampling for {metadata.filename}")
+        return mode
+
+    @staticmethod
+    def plan_scene_frames(scenes: List[SceneInfo]) -> FramePlan:
+        """Returns (scene_number, frame_index, timestamp) for the representative frames of every scene."""
+        plan = []
+        for scene in scenes:
+            # Extract multiple frames per scene for better representation
+            for frame_idx, j in enumerate(range(1, 4)):  # 3 frames per scene
+                plan.append((scene.scene_number, frame_idx, scene.start_time_sec + (scene.duration_sec * j / 4)))
+        return plan
+
+    def plan(self, vid_path: Path, metadata: VideoMetadata, mode: str) -> Tuple[str, FramePlan, List[Any]]:
+        """
+        Chooses the frames to embed for the given sampling mode.
+        Returns the mode actually used, the (scene_number, frame_index, timestamp) plan and, aligned with it,
+        the keys the frame reader needs: frame numbers ('scenes'), keyframe ordinals ('keyframes') or
+        timestamps ('uniform').
+        """
+        if mode == 'scenes':
+            metadata.scenes = self.detect_scenes(vid_path, metadata)
+            plan = self.plan_scene_frames(metadata.scenes)
+            return mode, plan, timestamps_to_frame_numbers([t for _, _, t in plan], metadata.fps)
+
+        if mode == 'keyframes':
+            try:
+                keyframe_times = probe_keyframe_times(str(vid_path))
+            except Exception as e:
+                logger.warning(f"Could not read keyframes of {vid_path.name}, falling back to uniform sampling: {e}")
+                keyframe_times = []
+            if keyframe_times:
+                ordinals = evenly_spaced_indices(len(keyframe_times), self.max_sampled_frames)
+                logger.info(f"Sampling {len(ordinals)} of {len(keyframe_times)} keyframes for {vid_path.name}")
+                return mode, [(i + 1, 0, keyframe_times[k]) for i, k in enumerate(ordinals)], ordinals
+
+        timestamps = uniform_timestamps(metadata.duration_seconds, self.sample_interval_sec, self.max_sampled_frames)
+        logger.info(f"Sampling {len(timestamps)} frames uniformly for {vid_path.name}")
+        return 'uniform', [(i + 1, 0, t) for i, t in enumerate(timestamps)], timestamps
+
+    def iter_frames(
+        self,
+        vid_path: Path,
+        metadata: VideoMetadata,
+        frame_plan: FramePlan,
+        frame_keys: List[Any],
+        mode: str
+    ) -> Iterator[Tuple[int, int, float, np.ndarray]]:
+        """
+        Streams the planned frames as in-memory RGB arrays.
+        'scenes' decodes the video once with a select filter, 'keyframes' decodes I-frames only and
+        'uniform' seeks to each timestamp, so the last two scale with the number of samples, not duration.
+        Yields (scene_number, frame_index, timestamp, frame) in decode order.
+        """
+        plan_by_key = {}
+        for entry, key in zip(frame_plan, frame_keys):
+            plan_by_key.setdefault(key, []).append(entry)
+
+        width, height = frame_output_size(metadata.width, metadata.height)
+        if mode == 'uniform':
+            source = iter_frames_seek(str(vid_path), frame_keys, width, height)
+        else:
+            source = iter_frames(str(vid_path), frame_keys, width, height, keyframes_only=(mode == 'keyframes'))
+        for key, frame in source:
+            for scene_num, frame_idx, frame_time in plan_by_key[key]:
+                yield scene_num, frame_idx, frame_time, frame
+
+
+def ffmpeg_process_count(mode: str) -> int:
+    """ffmpeg/ffprobe processes launched for one video in `mode`, including the metadata probe."""
+    count = 1  # metadata probe
+    if mode == 'keyframes':
+        count += 1  # ffprobe packet scan
+    if mode != 'uniform':
+        count += 1  # frame extraction ('uniform' seeks in-process with OpenCV)
+    return count
+
+
+def prepare_video(
+    video_path: str,
+    sampler: FrameSampler,
+    metadata: Optional[VideoMetadata] = None,
+    preview_dir: Optional[str] = None,
+    preview_format: str = 'jpeg',
+) -> Dict[str, Any]:
+    """
+    Runs the CPU-bound stage for one video: probes metadata (unless already harvested and passed in),
+    selects frames and decodes them into memory. With `preview_dir`, a poster and sprite sheet are written
+    from the decoded frames and their paths recorded in the metadata.
+
+    Meant to run in a worker process. Returns a status dict; on success it carries the VideoMetadata, the
+    decoded frames as (scene_number, frame_index, timestamp, frame) tuples, the number of frames planned
+    and per-stage timings.
+    """
+    vid_path = Path(video_path)
+    if not vid_path.is_file():
+        return {"status": "error", "video_path": video_path, "message": f"Video file not found: {video_path}"}
+
+    timings = {}
+    stage_start = time.perf_counter()
+    if metadata is None:
+        metadata = extract_video_metadata(vid_path)
+    timings['metadata_sec'] = round(time.perf_counter() - stage_start, 3)
+    if not metadata:
+        return {"status": "error", "video_path": video_path, "message": f"Failed to extract metadata for {vid_path.name}"}
+
+    stage_start = time.perf_counter()
+    mode, frame_plan, frame_keys = sampler.plan(vid_path, metadata, sampler.resolve_mode(metadata))
+    metadata.sampling_mode = mode
+    timings['frame_selection_sec'] = round(time.perf_counter() - stage_start, 3)
+
+    stage_start = time.perf_counter()
+    try:
+        frames = list(sampler.iter_frames(vid_path, metadata, frame_plan, frame_keys, mode))
+    except Exception as e:
+        logger.error(f"Error decoding frames of {vid_path.name}: {e}")
+        frames = []
+    timings['decode_sec'] = round(time.perf_counter() - stage_start, 3)
+    if not frames:
+        return {"status": "error", "video_path": video_path, "message": f"No frames extracted for {vid_path.name}, cannot generate embedding."}
+
+    if preview_dir:
+        stage_start = time.perf_counter()
+        try:
+            preview_builder = VideoPreviewBuilder([t for _, _, t in frame_plan])
+            for _, _, frame_time, frame in frames:
+                preview_builder.add(frame_time, frame)
+            previews = preview_builder.save(preview_dir, output_stem(video_path), preview_format)
+            metadata.poster_path = previews.get('poster_path')
+            metadata.sprite_sheet = previews.get('sprite_sheet')
+        except Exception as e:
+            logger.warning(f"Could not write previews for {vid_path.name}: {e}")
+        timings['previews_sec'] = round(time.perf_counter() - stage_start, 3)
+
+    return {
+        "status": "success",
+        "video_path": video_path,
+        "metadata": metadata,
+        "frames": frames,
+        "frames_planned": len(frame_plan),
+        "ffmpeg_processes": ffmpeg_process_count(mode),
+        "timings": timings
+    }
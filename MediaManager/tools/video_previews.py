@@ -0,0 +1,107 @@
+# 📌 Purpose: Lightweight video previews for galleries: a poster image and a scrubbing sprite sheet per video,
+#    built from the frames VideoProcessor/VideoBatchProcessor already decode for embedding.
+# ⚙️ Key Logic: The frames to keep are chosen up front from the planned timestamps (poster = middle sample, tiles =
+#    evenly spaced samples), so only small downscaled copies are held while frames stream past, and nothing is decoded twice.
+# 📂 Expected File Path: photo_intelligence_agency/MediaManager/tools/video_previews.py
+
+import logging
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+from PIL import Image, features
+
+from .scene_utils import evenly_spaced_indices
+
+logger = logging.getLogger(__name__)
+
+# Constants
+PREVIEW_FORMATS = ('jpeg', 'webp')
+POSTER_MAX_SIZE = 480  # Longest side of the poster image
+SPRITE_TILE_WIDTH = 160  # Width of each sprite sheet tile; height follows the video's aspect ratio
+SPRITE_MAX_TILES = 25  # Tiles per sprite sheet (a 5x5 grid), spread evenly over the video
+PREVIEW_QUALITY = 80
+
+
+class VideoPreviewBuilder:
+    """
+    Collects a poster frame and sprite sheet tiles from a stream of (timestamp, frame) pairs.
+
+    `timestamps` are all the timestamps that will be fed to `add`; the builder picks the middle one as the
+    poster and up to `max_tiles` evenly spaced ones as tiles, keeping only downscaled copies of those.
+    """
+
+    def __init__(
+        self,
+        timestamps: List[float],
+        poster_max_size: int = POSTER_MAX_SIZE,
+        tile_width: int = SPRITE_TILE_WIDTH,
+        max_tiles: int = SPRITE_MAX_TILES,
+    ):
+        ordered = sorted(set(timestamps))
+        self.poster_time = ordered[len(ordered) // 2] if ordered else None
+        self.tile_times = [ordered[i] for i in evenly_spaced_indices(len(ordered), max_tiles)]
+        self._wanted_tiles = set(self.tile_times)
+        self.poster_max_size = poster_max_size
+        self.tile_width = tile_width
+        self._poster: Optional[Image.Image] = None
+        self._tiles: Dict[float, Image.Image] = {}
+
+    def add(self, timestamp: float, frame: np.ndarray) -> None:
+        """Offers a decoded RGB frame; it is kept (downscaled) only if it is the poster or a sprite tile."""
+        if timestamp != self.poster_time and timestamp not in self._wanted_tiles:
+            return
+        img = Image.fromarray(frame)
+        if timestamp == self.poster_time and self._poster is None:
+            self._poster = img.copy()
+            self._poster.thumbnail((self.poster_max_size, self.poster_max_size))
+        if timestamp in self._wanted_tiles and timestamp not in self._tiles:
+            tile_height = max(1, round(img.height * self.tile_width / img.width))
+            self._tiles[timestamp] = img.resize((self.tile_width, tile_height), Image.BILINEAR)
+
+    def _sprite_sheet(self) -> Optional[Dict[str, Any]]:
+        times = [t for t in self.tile_times if t in self._tiles]
+        if not times:
+            return None
+        tile_w, tile_h = self._tiles[times[0]].size
+        columns = int(np.ceil(np.sqrt(len(times))))
+        rows = int(np.ceil(len(times) / columns))
+        sheet = Image.new('RGB', (columns * tile_w, rows * tile_h))
+        for i, t in enumerate(times):
+            sheet.paste(self._tiles[t].resize((tile_w, tile_h)), ((i % columns) * tile_w, (i // columns) * tile_h))
+        return {
+            'image': sheet,
+            'columns': columns,
+            'rows': rows,
+            'tile_width': tile_w,
+            'tile_height': tile_h,
+            'timestamps': [round(t, 3) for t in times],
+        }
+
+    def save(self, output_dir: str, stem: str, image_format: str = 'jpeg', quality: int = PREVIEW_QUALITY) -> Dict[str, Any]:
+        """
+        Writes `<stem>_poster` and `<stem>_sprite` images into `output_dir`; `stem` must be unique per video
+        (see video_utils.output_stem), since previews of many videos share one folder.
+        Returns payload fields: 'poster_path' and 'sprite_sheet' (path, grid layout and tile timestamps),
+        omitting any that could not be produced. WebP falls back to JPEG if Pillow lacks WebP support.
+        """
+        if image_format not in PREVIEW_FORMATS:
+            raise ValueError(f"image_format must be one of {PREVIEW_FORMATS}")
+        if image_format == 'webp' and not features.check('webp'):
+            logger.warning("Pillow was built without WebP support, writing JPEG previews instead")
+            image_format = 'jpeg'
+        extension = 'jpg' if image_format == 'jpeg' else 'webp'
+        directory = Path(output_dir)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        previews = {}
+        if self._poster is not None:
+            poster_path = directory / f"{stem}_poster.{extension}"
+            self._poster.save(poster_path, format=image_format.upper(), quality=quality)
+            previews['poster_path'] = str(poster_path.resolve())
+        sprite = self._sprite_sheet()
+        if sprite is not None:
+            sprite_path = directory / f"{stem}_sprite.{extension}"
+            sprite.pop('image').save(sprite_path, format=image_format.upper(), quality=quality)
+            previews['sprite_sheet'] = {'path': str(sprite_path.resolve()), **sprite}
+        return previews
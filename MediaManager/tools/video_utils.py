@@ -0,0 +1,309 @@
+# 📌 Purpose: Shared video helpers for VideoProcessor: single-pass frame extraction straight into memory,
+#    keyframe probing/decoding, seek-based sparse sampling, and an optional background preview sink.
+# ⚙️ Key Logic: One ffmpeg process decodes the video once, a `select` filter keeps only the requested frames,
+#    and raw RGB frames are streamed back over a pipe as NumPy arrays (no intermediate image files). The select
+#    expression is a binary search over the requested frame ranges, read from a filter script file: a film with
+#    thousands of shots would otherwise exceed the per-argument length limit and cost one test per frame requested.
+#    Keyframe mode decodes I-frames only; uniform sampling seeks with OpenCV so cost scales with samples, not duration.
+# 📂 Expected File Path: photo_intelligence_agency/MediaManager/tools/video_utils.py
+
+import hashlib
+import logging
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+import ffmpeg
+import numpy as np
+from PIL import Image
+
+try:
+    import cv2
+    OPENCV_AVAILABLE = True
+except ImportError:
+    OPENCV_AVAILABLE = False
+
+# Deliberately not importing processing_utils here: it loads CLIP and connects to Qdrant at import time,
+# which helper code (and any worker process importing it) must not pay for.
+logger = logging.getLogger(__name__)
+
+# Constants
+FRAME_SHORT_SIDE = 224  # CLIP ViT-B/32 input size; larger frames are only downscaled again by the processor
+PREVIEW_MAX_SIZE = 256  # Longest side of frame previews written by FrameSink
+
+
+def frame_output_size(width: int, height: int, short_side: int = FRAME_SHORT_SIDE) -> Tuple[int, int]:
+    """Returns the (width, height) frames are decoded at: shorter side scaled to `short_side`, even dimensions."""
+    if width <= 0 or height <= 0:
+        raise ValueError(f"Invalid video dimensions: {width}x{height}")
+    scale = min(1.0, short_side / min(width, height))
+    out_w = max(2, int(round(width * scale / 2)) * 2)
+    out_h = max(2, int(round(height * scale / 2)) * 2)
+    return out_w, out_h
+
+
+def output_stem(video_path: str) -> str:
+    """
+    File name stem for files written per video (previews, metadata, frames): the video's stem plus a short hash
+    of its resolved path, so same-named videos in different folders (e.g. camera card dumps) never collide.
+    """
+    path = Path(video_path).resolve()
+    return f"{path.stem}_{hashlib.blake2b(str(path).encode(), digest_size=4).hexdigest()}"
+
+
+def timestamps_to_frame_numbers(timestamps: List[float], fps: float) -> List[int]:
+    """Maps timestamps (seconds) to decoded frame numbers for the given frame rate."""
+    if fps <= 0:
+        raise ValueError(f"Invalid frame rate: {fps}")
+    return [max(0, int(round(t * fps))) for t in timestamps]
+
+
+def parse_keyframe_packets(output: str) -> List[float]:
+    """Parses `ffprobe -show_entries packet=pts_time,flags -of csv=p=0` output into sorted keyframe timestamps."""
+    times = set()
+    for line in output.splitlines():
+        parts = line.strip().split(',')
+        if len(parts) < 2 or not parts[1].startswith('K'):
+            continue
+        try:
+            times.add(float(parts[0]))
+        except ValueError:
+            continue  # pts_time can be N/A
+    return sorted(times)
+
+
+def probe_keyframe_times(video_path: str, timeout: Optional[float] = None) -> List[float]:
+    """
+    Returns the timestamps of the video stream's keyframes from ffprobe packet flags.
+    Only the container is demuxed (no decoding), so this is cheap even for hours of footage.
+    """
+    result = subprocess.run(
+        [
+            'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+            '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', str(video_path)
+        ],
+        capture_output=True, text=True, timeout=timeout, check=True
+    )
+    return parse_keyframe_packets(result.stdout)
+
+
+def select_expression(frame_numbers: List[int]) -> str:
+    """
+    Expression for ffmpeg's `select` filter that is true exactly for `frame_numbers`. Consecutive numbers become
+    one between() range and the ranges are nested as a balanced binary search on n; if() only evaluates the
+    branch it takes, so each decoded frame costs O(log ranges) comparisons. `frame_numbers` must not be empty.
+    """
+    ranges = []
+    for n in sorted(set(frame_numbers)):
+        if ranges and n == ranges[-1][1] + 1:
+            ranges[-1][1] = n
+        else:
+            ranges.append([n, n])
+
+    def search(lo: int, hi: int) -> str:
+        if hi - lo == 1:
+            first, last = ranges[lo]
+            return f"eq(n,{first})" if first == last else f"between(n,{first},{last})"
+        mid = (lo + hi) // 2
+        return f"if(lt(n,{ranges[mid][0]}),{search(lo, mid)},{search(mid, hi)})"
+
+    return search(0, len(ranges))
+
+
+def frame_select_command(
+    video_path: str,
+    frame_numbers: List[int],
+    width: int,
+    height: int,
+    script_path: str,
+    keyframes_only: bool = False,
+) -> Tuple[List[str], str]:
+    """
+    Returns the ffmpeg command line used by `iter_frames` and the filter graph it reads from `script_path`,
+    which the caller must write before starting the process (-filter_complex_script keeps argv short).
+    """
+    input_options = {'skip_frame': 'nokey'} if keyframes_only else {}
+    command = (
+        ffmpeg
+        .input(str(video_path), noautorotate=None, **input_options)
+        .filter('select', select_expression(frame_numbers))
+        .filter('scale', width, height)
+        .output('pipe:', format='rawvideo', pix_fmt='rgb24', vsync='passthrough')
+        .global_args('-nostdin', '-loglevel', 'error')
+        .compile()
+    )
+    graph_index = command.index('-filter_complex') + 1
+    graph = command[graph_index]
+    command[graph_index - 1:graph_index + 1] = ['-filter_complex_script', script_path]
+    return command, graph
+
+
+def iter_frames(
+    video_path: str,
+    frame_numbers: List[int],
+    width: int,
+    height: int,
+    keyframes_only: bool = False,
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Decodes `video_path` once and yields (frame_number, RGB array) for each requested frame, in ascending order.
+
+    A single ffmpeg process runs a `select` filter over the stream and writes raw rgb24 frames of size
+    `width` x `height` to stdout, so frames are read into memory one at a time without touching disk.
+    Duplicate frame numbers are decoded once. With `keyframes_only` the decoder skips every non-key frame
+    and `frame_numbers` are keyframe ordinals (0 = first keyframe).
+    """
+    wanted = sorted(set(frame_numbers))
+    if not wanted:
+        return
+
+    frame_bytes = width * height * 3
+    fd, script_path = tempfile.mkstemp(prefix='select_', suffix='.txt')
+    try:
+        with os.fdopen(fd, 'w') as script:
+            command, graph = frame_select_command(video_path, wanted, width, height, script_path, keyframes_only)
+            script.write(graph)
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except BaseException:
+        os.remove(script_path)
+        raise
+    # Drain stderr concurrently so a chatty decoder can never block on a full pipe
+    stderr_chunks = []
+    stderr_reader = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+    stderr_reader.start()
+    try:
+        for n in wanted:
+            buffer = process.stdout.read(frame_bytes)
+            if len(buffer) < frame_bytes:
+                # Requested frames past the end of the stream are simply not emitted
+                logger.debug(f"Frame stream for {video_path} ended before frame {n}")
+                break
+            yield n, np.frombuffer(buffer, dtype=np.uint8).reshape(height, width, 3)
+    finally:
+        process.stdout.close()
+        process.wait()
+        os.remove(script_path)
+        stderr_reader.join()
+        stderr = b"".join(stderr_chunks)
+        if process.returncode not in (0, None) and stderr:
+            logger.warning(f"ffmpeg reported errors for {video_path}: {stderr.decode(errors='replace').strip()}")
+
+
+def iter_frames_seek(
+    video_path: str,
+    timestamps: List[float],
+    width: int,
+    height: int,
+) -> Iterator[Tuple[float, np.ndarray]]:
+    """
+    Yields (timestamp, RGB array) for sparse timestamps by seeking with a single OpenCV reader.
+
+    Each sample costs one seek plus decoding from the preceding keyframe, so total work scales with the
+    number of samples rather than the video's duration. Timestamps are visited in ascending order.
+    """
+    if not OPENCV_AVAILABLE:
+        raise RuntimeError("OpenCV is not installed")
+
+    capture = cv2.VideoCapture(str(video_path))
+    if not capture.isOpened():
+        raise RuntimeError(f"Could not open video: {video_path}")
+    try:
+        # Match the ffmpeg path (noautorotate) so frames have the stored width/height
+        capture.set(cv2.CAP_PROP_ORIENTATION_AUTO, 0)
+        for t in sorted(set(timestamps)):
+            capture.set(cv2.CAP_PROP_POS_MSEC, t * 1000.0)
+            ok, frame = capture.read()
+            if not ok:
+                logger.debug(f"Could not read frame at {t:.2f}s from {video_path}")
+                continue
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            if frame.shape[1] != width or frame.shape[0] != height:
+                frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+            yield t, frame
+    finally:
+        capture.release()
+
+
+def extract_frames(
+    video_path: str,
+    timestamps: List[float],
+    fps: float,
+    width: int,
+    height: int,
+    short_side: int = FRAME_SHORT_SIDE,
+) -> Tuple[List[Optional[np.ndarray]], Dict[str, Any]]:
+    """
+    Extracts the frames at `timestamps` (seconds) in one decode pass.
+
+    Returns a list aligned with `timestamps` (None where a frame could not be decoded) and extraction stats:
+    number of ffmpeg processes launched, frames requested/decoded and wall time.
+    """
+    start = time.perf_counter()
+    out_w, out_h = frame_output_size(width, height, short_side)
+    frame_numbers = timestamps_to_frame_numbers(timestamps, fps)
+
+    decoded = {}
+    if frame_numbers:
+        for n, frame in iter_frames(video_path, frame_numbers, out_w, out_h):
+            decoded[n] = frame
+
+    frames = [decoded.get(n) for n in frame_numbers]
+    stats = {
+        'ffmpeg_processes': 1 if frame_numbers else 0,
+        'frames_requested': len(timestamps),
+        'frames_decoded': sum(frame is not None for frame in frames),
+        'frame_size': [out_w, out_h],
+        'extraction_time_sec': round(time.perf_counter() - start, 3),
+    }
+    return frames, stats
+
+
+class FrameSink:
+    """
+    Writes downscaled JPEG previews of frames in a background thread.
+
+    Decoding and embedding never wait on disk: `submit` only queues the (read-only) frame array,
+    and `close` waits for pending writes and returns a summary of what was written.
+    """
+
+    def __init__(self, output_dir: str, max_size: int = PREVIEW_MAX_SIZE, quality: int = 85, max_workers: int = 1):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.quality = quality
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="frame_sink")
+        self._futures = []
+
+    def _write(self, frame: np.ndarray, path: Path) -> str:
+        img = Image.fromarray(frame)
+        img.thumbnail((self.max_size, self.max_size))
+        img.save(path, format='JPEG', quality=self.quality)
+        return str(path)
+
+    def submit(self, frame: np.ndarray, filename: str) -> None:
+        """Queues `frame` to be written as `filename` inside the sink's output directory."""
+        self._futures.append(self._executor.submit(self._write, frame, self.output_dir / filename))
+
+    def close(self) -> Dict[str, Any]:
+        """Waits for all queued writes and returns the written paths and failure count."""
+        written, failed = [], 0
+        for future in self._futures:
+            try:
+                written.append(future.result())
+            except Exception as e:
+                failed += 1
+                logger.warning(f"Error writing frame preview: {e}")
+        self._executor.shutdown(wait=True)
+        self._futures = []
+        return {'written': written, 'failed': failed}
+
+    def __enter__(self) -> "FrameSink":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
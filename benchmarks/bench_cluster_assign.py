@@ -0,0 +1,76 @@
+"""
+Benchmark for ClusterTool's assign mode: placing a day's new items into a saved model versus re-clustering.
+
+Fits HDBSCAN (with prediction data) on synthetic CLIP-like embeddings (see bench_cluster_reduction), saves the
+model, then times loading it and assigning a batch of new items with `approximate_predict`, compared with a full
+refit on old + new items. Reports agreement of the assigned labels with the refit (ARI on the new items).
+
+Usage:
+    python benchmarks/bench_cluster_assign.py [--items 20000] [--new 500] [--reduce 32]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import hdbscan
+import numpy as np
+from sklearn.metrics import adjusted_rand_score
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "CuratorAgent" / "tools"))
+from cluster_utils import ClusterModel, EmbeddingReducer  # noqa: E402
+from bench_cluster_reduction import make_embeddings  # noqa: E402
+
+
+def fit(vectors: np.ndarray, args: argparse.Namespace) -> hdbscan.HDBSCAN:
+    return hdbscan.HDBSCAN(
+        min_cluster_size=args.min_cluster_size, min_samples=args.min_samples, prediction_data=True
+    ).fit(vectors)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=20000, help="Items in the saved model")
+    parser.add_argument('--new', type=int, default=500, help="Newly ingested items to assign")
+    parser.add_argument('--reduce', type=int, default=32)
+    parser.add_argument('--topics', type=int, default=200)
+    parser.add_argument('--min-cluster-size', type=int, default=10)
+    parser.add_argument('--min-samples', type=int, default=5)
+    args = parser.parse_args()
+
+    embeddings, _ = make_embeddings(args.items + args.new, args.topics)
+    old, new = embeddings[:args.items], embeddings[args.items:]
+    reducer = EmbeddingReducer(args.reduce, 'randomized').fit(old)
+
+    start = time.perf_counter()
+    clusterer = fit(reducer.transform(old), args)
+    fit_sec = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "cluster_model.pkl"
+        ClusterModel({}, list(range(args.items)), clusterer.labels_, old, clusterer=clusterer).save(path)
+        print(f"initial fit of {args.items} items: {fit_sec:.2f}s, model file {path.stat().st_size / 1e6:.1f} MB")
+
+        start = time.perf_counter()
+        model = ClusterModel.load(path)
+        load_sec = time.perf_counter() - start
+        start = time.perf_counter()
+        assigned = model.assign(reducer.transform(new), new)
+        assign_sec = time.perf_counter() - start
+
+    start = time.perf_counter()
+    refit_labels = fit(reducer.transform(embeddings), args).labels_
+    refit_sec = time.perf_counter() - start
+
+    print(f"assign {args.new} new items: load {load_sec:.2f}s + predict {assign_sec:.2f}s, "
+          f"{(assigned == -1).mean():.1%} noise, drift {model.drift(new):.4f}")
+    print(f"full refit on {len(embeddings)} items: {refit_sec:.2f}s "
+          f"({refit_sec / (load_sec + assign_sec):.0f}x slower)")
+    print(f"ARI of assigned vs refit labels on the new items: "
+          f"{adjusted_rand_score(refit_labels[args.items:], assigned):.3f}")
+
+
+if __name__ == "__main__":
+    main()
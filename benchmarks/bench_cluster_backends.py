@@ -0,0 +1,95 @@
+"""
+Benchmark for the clustering backends of ClusterTool on large collections.
+
+Clusters synthetic CLIP-like embeddings (see bench_cluster_reduction) with each backend: HDBSCAN's default
+algorithm, parallel Boruvka KD-tree/Ball-tree HDBSCAN and the k-NN graph backend (connected components and
+label propagation). Reports wall time, cluster count, noise ratio and agreement with the true topics (ARI).
+
+Usage:
+    python benchmarks/bench_cluster_backends.py [--sizes 20000 100000] [--backends boruvka_kdtree graph]
+                                                [--reduce 32] [--jobs -1]
+
+HDBSCAN's default algorithm is skipped above --max-default-items, where it takes far too long.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import hdbscan
+import numpy as np
+from sklearn.metrics import adjusted_rand_score
+from sklearn.preprocessing import normalize
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "CuratorAgent" / "tools"))
+from cluster_utils import (  # noqa: E402
+    CLUSTER_BACKENDS,
+    GRAPH_METHODS,
+    EmbeddingReducer,
+    choose_backend,
+    graph_cluster,
+    hdbscan_algorithm,
+    knn_graph
+)
+from bench_cluster_reduction import make_embeddings  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20000, 100000])
+    parser.add_argument('--backends', nargs='+', choices=CLUSTER_BACKENDS[1:],
+                        default=['hdbscan', 'boruvka_kdtree', 'boruvka_balltree', 'graph'])
+    parser.add_argument('--reduce', type=int, default=32, help="PCA dimensions before clustering (0 disables)")
+    parser.add_argument('--jobs', type=int, default=-1, help="core_dist_n_jobs for HDBSCAN")
+    parser.add_argument('--topics', type=int, default=200)
+    parser.add_argument('--min-cluster-size', type=int, default=10)
+    parser.add_argument('--min-samples', type=int, default=5)
+    parser.add_argument('--neighbors', type=int, default=15)
+    parser.add_argument('--min-similarity', type=float, default=0.3)
+    parser.add_argument('--max-default-items', type=int, default=50000)
+    args = parser.parse_args()
+
+    print(f"{'items':>7} {'backend':<30} {'time (s)':>9} {'clusters':>9} {'noise':>6} {'ARI true':>9}")
+    for size in args.sizes:
+        embeddings, topics = make_embeddings(size, args.topics)
+        start = time.perf_counter()
+        vectors = EmbeddingReducer(args.reduce, 'randomized').fit_transform(embeddings) if args.reduce else embeddings
+        reduce_sec = time.perf_counter() - start
+        print(f"{size:>7} {f'(reduction to {vectors.shape[1]} dims)':<30} {reduce_sec:>9.2f}   auto -> "
+              f"{choose_backend(size, vectors.shape[1])}")
+
+        for backend in args.backends:
+            if backend == 'hdbscan' and size > args.max_default_items:
+                continue
+            runs = []
+            if backend == 'graph':
+                start = time.perf_counter()
+                search = normalize(vectors) if args.reduce else embeddings
+                neighbors, similarities = knn_graph(
+                    search, args.neighbors, rescore_vectors=embeddings if args.reduce else None
+                )
+                graph_sec = time.perf_counter() - start
+                for method in GRAPH_METHODS:
+                    start = time.perf_counter()
+                    labels, _ = graph_cluster(
+                        neighbors, similarities, args.min_similarity, args.min_cluster_size, method
+                    )
+                    runs.append((f"graph ({method})", graph_sec + time.perf_counter() - start, labels))
+            else:
+                start = time.perf_counter()
+                labels = hdbscan.HDBSCAN(
+                    min_cluster_size=args.min_cluster_size,
+                    min_samples=args.min_samples,
+                    algorithm=hdbscan_algorithm(backend),
+                    core_dist_n_jobs=args.jobs
+                ).fit_predict(vectors)
+                runs.append((backend, time.perf_counter() - start, labels))
+
+            for name, elapsed, labels in runs:
+                print(f"{size:>7} {name:<30} {elapsed:>9.2f} {labels.max() + 1:>9} {(labels == -1).mean():>6.1%} "
+                      f"{adjusted_rand_score(topics, labels):>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
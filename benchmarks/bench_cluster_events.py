@@ -0,0 +1,97 @@
+"""
+Benchmark for ClusterTool's event segmentation (per-event HDBSCAN) against clustering the whole library at once.
+
+Builds a synthetic time-structured library: events days apart, each a few bursts of shots of some scenes drawn
+from a shared pool of topics (the same kind of scene recurs across events, as in a personal library). Compares
+one HDBSCAN over everything with segmentation by capture time followed by HDBSCAN per event in a process pool.
+Reports wall time, cluster count, noise, the share of clusters mixing several events, and agreement (ARI) with
+the true (event, scene) groups.
+
+Usage:
+    python benchmarks/bench_cluster_events.py [--events 200] [--per-event 100] [--workers 0] [--reduce 32]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import hdbscan
+import numpy as np
+from sklearn.metrics import adjusted_rand_score
+from sklearn.preprocessing import normalize
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "CuratorAgent" / "tools"))
+from cluster_utils import EmbeddingReducer, choose_backend, hdbscan_algorithm  # noqa: E402
+from event_utils import cluster_events, segment_events  # noqa: E402
+
+
+def make_library(n_events: int, per_event: int, n_topics: int, scenes_per_event: int, dim: int, seed: int = 0):
+    """Embeddings, capture times (epoch seconds), true event ids and true (event, scene) group ids."""
+    rng = np.random.default_rng(seed)
+    centers = normalize(rng.normal(size=(n_topics, dim)))
+    embeddings, times, events, groups = [], [], [], []
+    start = 1.7e9
+    for event in range(n_events):
+        scenes = rng.choice(n_topics, size=scenes_per_event, replace=False)
+        scene_of_item = rng.integers(0, scenes_per_event, size=per_event)
+        # Bursts a few seconds apart, minutes between bursts
+        times.append(start + np.sort(rng.uniform(0, 3 * 3600, size=per_event)))
+        # Each visit to a scene looks a little different from other visits (lighting, people, angle)
+        offsets = normalize(rng.normal(size=(scenes_per_event, dim))) * 0.6
+        noise = rng.normal(scale=0.8 / np.sqrt(dim), size=(per_event, dim))
+        embeddings.append(normalize(centers[scenes[scene_of_item]] + offsets[scene_of_item] + noise))
+        events.append(np.full(per_event, event))
+        groups.append(event * scenes_per_event + scene_of_item)
+        start += rng.uniform(1, 14) * 86400
+    return (np.concatenate(embeddings).astype(np.float32), np.concatenate(times), np.concatenate(events),
+            np.concatenate(groups))
+
+
+def report(name: str, labels: np.ndarray, elapsed: float, events: np.ndarray, groups: np.ndarray) -> None:
+    clustered = labels >= 0
+    mixed = sum(len(np.unique(events[labels == label])) > 1 for label in np.unique(labels[clustered]))
+    num_clusters = len(np.unique(labels[clustered]))
+    print(f"{name:<28} {elapsed:>9.2f} {num_clusters:>9} {(~clustered).mean():>6.1%} "
+          f"{mixed / max(num_clusters, 1):>7.1%} {adjusted_rand_score(groups, labels):>7.3f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=200)
+    parser.add_argument('--per-event', type=int, default=100)
+    parser.add_argument('--topics', type=int, default=30)
+    parser.add_argument('--scenes-per-event', type=int, default=4)
+    parser.add_argument('--dim', type=int, default=512)
+    parser.add_argument('--reduce', type=int, default=32)
+    parser.add_argument('--min-cluster-size', type=int, default=5)
+    parser.add_argument('--min-samples', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=0, help="Processes for per-event clustering (0 = all cores)")
+    args = parser.parse_args()
+
+    embeddings, times, events, groups = make_library(
+        args.events, args.per_event, args.topics, args.scenes_per_event, args.dim
+    )
+    vectors = EmbeddingReducer(args.reduce, 'randomized').fit_transform(embeddings) if args.reduce else embeddings
+    print(f"{len(embeddings)} items in {args.events} events, {args.dim} dims reduced to {vectors.shape[1]}")
+    print(f"{'':<28} {'time (s)':>9} {'clusters':>9} {'noise':>6} {'mixed':>7} {'ARI':>7}")
+
+    start = time.perf_counter()
+    labels = hdbscan.HDBSCAN(
+        min_cluster_size=args.min_cluster_size,
+        min_samples=args.min_samples,
+        algorithm=hdbscan_algorithm(choose_backend(len(vectors), vectors.shape[1], allow_graph=False))
+    ).fit_predict(vectors)
+    report("whole library", labels, time.perf_counter() - start, events, groups)
+
+    start = time.perf_counter()
+    segments = segment_events(times[::-1].copy())[::-1]  # Input order doesn't matter
+    segment_sec = time.perf_counter() - start
+    labels, info = cluster_events(vectors, segments, args.min_cluster_size, args.min_samples, args.workers)
+    report(f"events ({info['workers']} workers)", labels, time.perf_counter() - start, events, groups)
+    print(f"segmentation: {segment_sec * 1000:.1f} ms, {info['events']} events found "
+          f"(ARI vs true events {adjusted_rand_score(events, segments):.3f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark for the cluster profiles ClusterTool computes after clustering (centroids, medoids, dispersion,
+member order and farthest-point representatives).
+
+Times `cluster_profiles` on synthetic CLIP-like embeddings (see bench_cluster_reduction), labelled by their true
+topics, against a straightforward per-cluster loop that orders members, finds medoids from pairwise distance matrices and runs
+farthest-point sampling cluster by cluster. Checks that both pick the same medoids.
+
+Usage:
+    python benchmarks/bench_cluster_profiles.py [--items 100000] [--topics 200] [--representatives 5]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "CuratorAgent" / "tools"))
+from cluster_utils import cluster_profiles  # noqa: E402
+from bench_cluster_reduction import make_embeddings  # noqa: E402
+
+
+def naive_profiles(embeddings: np.ndarray, labels: np.ndarray, n_representatives: int, max_pairwise: int):
+    """
+    Per-cluster loop computing the same outputs; pairwise medoids for clusters up to `max_pairwise` members
+    (centroid-nearest above).
+    """
+    medoids = {}
+    order = []
+    for label in np.unique(labels[labels >= 0]):
+        members = np.flatnonzero(labels == label)
+        vectors = embeddings[members]
+        centroid = vectors.mean(axis=0)
+        distances = 1 - vectors @ (centroid / np.linalg.norm(centroid))
+        order.append(members[np.argsort(distances)])
+        _ = distances.max(), 1 - centroid @ centroid  # Radius and dispersion
+        if len(members) <= max_pairwise:
+            medoid = members[(1 - vectors @ vectors.T).sum(axis=1).argmin()]
+        else:
+            medoid = members[distances.argmin()]
+        chosen = [medoid]
+        min_distance = 1 - vectors @ embeddings[medoid]
+        for _ in range(1, min(n_representatives, len(members))):
+            pick = members[min_distance.argmax()]
+            chosen.append(pick)
+            min_distance = np.minimum(min_distance, 1 - vectors @ embeddings[pick])
+        medoids[int(label)] = int(medoid)
+    return medoids
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--topics', type=int, default=200)
+    parser.add_argument('--representatives', type=int, default=5)
+    parser.add_argument('--max-pairwise', type=int, default=5000,
+                        help="Largest cluster the naive loop computes a full distance matrix for")
+    args = parser.parse_args()
+
+    embeddings, labels = make_embeddings(args.items, args.topics)
+
+    start = time.perf_counter()
+    profiles = cluster_profiles(embeddings, labels, args.representatives)
+    vectorized_sec = time.perf_counter() - start
+
+    start = time.perf_counter()
+    medoids = naive_profiles(embeddings, labels, args.representatives, args.max_pairwise)
+    naive_sec = time.perf_counter() - start
+
+    same = sum(medoids[int(label)] == medoid for label, medoid in zip(profiles["cluster_labels"], profiles["medoids"]))
+    print(f"{args.items} items in {len(profiles['cluster_labels'])} clusters, {args.representatives} representatives")
+    print(f"vectorized profiles: {vectorized_sec:.2f}s   per-cluster loop: {naive_sec:.2f}s "
+          f"({naive_sec / vectorized_sec:.1f}x)")
+    print(f"medoids agreeing: {same}/{len(medoids)}   mean dispersion {profiles['dispersion'].mean():.3f}   "
+          f"mean radius {profiles['radius'].mean():.3f}")
+
+
+if __name__ == "__main__":
+    main()
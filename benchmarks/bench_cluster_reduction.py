@@ -0,0 +1,87 @@
+"""
+Benchmark for the dimensionality reduction stage of ClusterTool.
+
+Clusters synthetic CLIP-like embeddings (unit-normalized 512-d vectors around a number of topic centers) with
+HDBSCAN on the full vectors and after PCA/randomized SVD to several dimensionalities. Reports fit and clustering
+time, explained variance and cluster agreement (adjusted Rand index) with the full-dimension run and with the
+true topics, at several dataset sizes.
+
+Usage:
+    python benchmarks/bench_cluster_reduction.py [--sizes 2000 5000 10000] [--dims 16 32 64] [--method randomized]
+
+Use --embeddings FILE.npy to benchmark real embeddings (agreement is then only measured against the full run).
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import hdbscan
+import numpy as np
+from sklearn.metrics import adjusted_rand_score
+from sklearn.preprocessing import normalize
+
+# Import the helper module directly: importing the CuratorAgent package would require agency_swarm
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "CuratorAgent" / "tools"))
+from cluster_utils import REDUCTION_METHODS, EmbeddingReducer  # noqa: E402
+
+
+def make_embeddings(n_items: int, n_topics: int = 50, dim: int = 512, spread: float = 1.2, seed: int = 0):
+    """Unit-normalized embeddings scattered around `n_topics` random directions, plus their topic labels."""
+    rng = np.random.default_rng(seed)
+    centers = normalize(rng.normal(size=(n_topics, dim)))
+    topics = rng.integers(0, n_topics, size=n_items)
+    noise = rng.normal(scale=spread / np.sqrt(dim), size=(n_items, dim))
+    return normalize(centers[topics] + noise).astype(np.float32), topics
+
+
+def cluster(embeddings: np.ndarray, min_cluster_size: int, min_samples: int):
+    """HDBSCAN with ClusterTool's settings. Returns labels and elapsed seconds."""
+    start = time.perf_counter()
+    labels = hdbscan.HDBSCAN(
+        min_cluster_size=min_cluster_size, min_samples=min_samples, metric='euclidean'
+    ).fit_predict(embeddings)
+    return labels, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2000, 5000, 10000])
+    parser.add_argument('--dims', type=int, nargs='+', default=[16, 32, 64])
+    parser.add_argument('--method', choices=REDUCTION_METHODS, default='randomized')
+    parser.add_argument('--topics', type=int, default=50, help="Number of synthetic topics")
+    parser.add_argument('--spread', type=float, default=1.2, help="Noise around each topic (larger overlaps topics)")
+    parser.add_argument('--min-cluster-size', type=int, default=5)
+    parser.add_argument('--min-samples', type=int, default=3)
+    parser.add_argument('--embeddings', help="Benchmark a saved (n_items x dim) .npy matrix instead")
+    args = parser.parse_args()
+
+    print(f"{'items':>7} {'dims':>5} {'fit (s)':>8} {'hdbscan (s)':>12} {'total (s)':>10} {'variance':>9} "
+          f"{'clusters':>9} {'noise':>6} {'ARI full':>9} {'ARI true':>9}")
+    for size in args.sizes:
+        if args.embeddings:
+            embeddings = normalize(np.load(args.embeddings, mmap_mode='r')[:size]).astype(np.float32)
+            topics = None
+        else:
+            embeddings, topics = make_embeddings(size, args.topics, spread=args.spread)
+
+        full_labels, full_sec = cluster(embeddings, args.min_cluster_size, args.min_samples)
+        rows = [(embeddings.shape[1], 0.0, full_sec, 1.0, full_labels)]
+        for dims in args.dims:
+            reducer = EmbeddingReducer(dims, args.method)
+            start = time.perf_counter()
+            reduced = reducer.fit_transform(embeddings)
+            fit_sec = time.perf_counter() - start
+            labels, cluster_sec = cluster(reduced, args.min_cluster_size, args.min_samples)
+            rows.append((dims, fit_sec, cluster_sec, reducer.explained_variance, labels))
+
+        for dims, fit_sec, cluster_sec, variance, labels in rows:
+            ari_true = f"{adjusted_rand_score(topics, labels):>9.3f}" if topics is not None else f"{'-':>9}"
+            print(f"{len(embeddings):>7} {dims:>5} {fit_sec:>8.2f} {cluster_sec:>12.2f} {fit_sec + cluster_sec:>10.2f} "
+                  f"{variance:>9.1%} {labels.max() + 1:>9} {(labels == -1).mean():>6.1%} "
+                  f"{adjusted_rand_score(full_labels, labels):>9.3f} {ari_true}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark for ClusterTool's streaming mode on collections too large to cluster in memory.
+
+Streams synthetic CLIP-like embeddings (see bench_cluster_reduction) page by page, generated on the fly so the
+full matrix never exists, through StreamingClusterer: codebook pass, HDBSCAN on the centroids, labelling pass.
+Reports time per pass, peak traced memory against the size of the full matrix, and agreement with the true
+topics (ARI). Pages can arrive sorted by topic, like a scroll over a collection ingested event by event.
+
+Usage:
+    python benchmarks/bench_cluster_streaming.py [--items 1000000] [--codebook minibatch_kmeans] [--sorted]
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+from sklearn.metrics import adjusted_rand_score
+from sklearn.preprocessing import normalize
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "CuratorAgent" / "tools"))
+from cluster_utils import STREAM_CODEBOOKS, StreamingClusterer, relabel_by_size  # noqa: E402
+
+
+def iter_pages(n_items: int, page_size: int, n_topics: int, dim: int, spread: float, sorted_topics: bool):
+    """Yields (embeddings, topics) pages; the same arguments always give the same pages."""
+    centers = normalize(np.random.default_rng(0).normal(size=(n_topics, dim)))
+    all_topics = np.random.default_rng(1).integers(0, n_topics, size=n_items)
+    if sorted_topics:
+        all_topics.sort()
+    for page, start in enumerate(range(0, n_items, page_size)):
+        topics = all_topics[start:start + page_size]
+        noise = np.random.default_rng(page + 2).normal(scale=spread / np.sqrt(dim), size=(len(topics), dim))
+        yield normalize(centers[topics] + noise).astype(np.float32), topics
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=1_000_000)
+    parser.add_argument('--page-size', type=int, default=4096)
+    parser.add_argument('--codebook', choices=STREAM_CODEBOOKS, default='minibatch_kmeans')
+    parser.add_argument('--codebook-size', type=int, default=1024)
+    parser.add_argument('--no-refine', action='store_true', help="Skip HDBSCAN on the centroids")
+    parser.add_argument('--topics', type=int, default=200)
+    parser.add_argument('--dim', type=int, default=512)
+    parser.add_argument('--spread', type=float, default=1.2)
+    parser.add_argument('--min-cluster-size', type=int, default=50)
+    parser.add_argument('--sorted', action='store_true', help="Deliver pages sorted by topic")
+    args = parser.parse_args()
+
+    pages = dict(n_items=args.items, page_size=args.page_size, n_topics=args.topics, dim=args.dim,
+                 spread=args.spread, sorted_topics=args.sorted)
+    clusterer = StreamingClusterer(args.codebook_size, args.codebook, refine=not args.no_refine)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for embeddings, _ in iter_pages(**pages):
+        clusterer.partial_fit(embeddings)
+    info = clusterer.finalize()
+    fit_sec = time.perf_counter() - start
+
+    start = time.perf_counter()
+    labels, topics = [], []
+    for embeddings, page_topics in iter_pages(**pages):
+        labels.append(clusterer.predict(embeddings))
+        topics.append(page_topics)
+    labels = relabel_by_size(np.concatenate(labels), args.min_cluster_size)
+    label_sec = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print(f"{args.items} items x {args.dim} dims, {args.codebook} codebook of {info['codebook_size']}, "
+          f"{info['refined_groups']} HDBSCAN groups")
+    print(f"pass one (codebook): {fit_sec:.1f}s   pass two (labelling): {label_sec:.1f}s   "
+          f"throughput {2 * args.items / (fit_sec + label_sec):,.0f} points/s")
+    print(f"peak traced memory {peak / 1e6:,.0f} MB vs full matrix {args.items * args.dim * 4 / 1e6:,.0f} MB")
+    print(f"clusters {labels.max() + 1}, noise {(labels == -1).mean():.1%}, "
+          f"ARI vs topics {adjusted_rand_score(np.concatenate(topics), labels):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark for ClusterTool's sweep mode: scoring a grid of HDBSCAN settings from one hierarchy per min_samples.
+
+Runs `sweep_hdbscan` on synthetic CLIP-like embeddings (see bench_cluster_reduction), reduced as ClusterTool
+would, and compares its time with fitting HDBSCAN from scratch for every combination (what calling ClusterTool
+once per setting costs). Prints the score table and checks the cluster counts match the full fits.
+
+Usage:
+    python benchmarks/bench_cluster_sweep.py [--items 20000] [--min-cluster-sizes 10 25 50 100]
+                                             [--min-samples 5 10] [--epsilons 0 0.1]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import hdbscan
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "CuratorAgent" / "tools"))
+from cluster_utils import (  # noqa: E402
+    EmbeddingReducer,
+    best_sweep_result,
+    choose_backend,
+    hdbscan_algorithm,
+    sweep_hdbscan
+)
+from bench_cluster_reduction import make_embeddings  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=20000)
+    parser.add_argument('--reduce', type=int, default=32)
+    parser.add_argument('--topics', type=int, default=200)
+    parser.add_argument('--min-cluster-sizes', type=int, nargs='+', default=[10, 25, 50, 100])
+    parser.add_argument('--min-samples', type=int, nargs='+', default=[5, 10])
+    parser.add_argument('--epsilons', type=float, nargs='+', default=[0.0, 0.1])
+    parser.add_argument('--sample-size', type=int, default=2000)
+    parser.add_argument('--skip-full-fits', action='store_true')
+    args = parser.parse_args()
+
+    embeddings, _ = make_embeddings(args.items, args.topics)
+    vectors = EmbeddingReducer(args.reduce, 'randomized').fit_transform(embeddings) if args.reduce else embeddings
+    algorithm = hdbscan_algorithm(choose_backend(len(vectors), vectors.shape[1], allow_graph=False))
+
+    start = time.perf_counter()
+    results, timings = sweep_hdbscan(vectors, args.min_samples, args.min_cluster_sizes, args.epsilons,
+                                     algorithm=algorithm, sample_size=args.sample_size)
+    sweep_sec = time.perf_counter() - start
+
+    print(f"{'min_samples':>11} {'min_size':>8} {'epsilon':>7} {'clusters':>8} {'noise':>6} {'silhouette':>10} "
+          f"{'DBCV':>7}")
+    for r in results:
+        silhouette = f"{r['silhouette']:.3f}" if r['silhouette'] is not None else "-"
+        dbcv = f"{r['dbcv']:.3f}" if r['dbcv'] is not None else "-"
+        print(f"{r['min_samples']:>11} {r['min_cluster_size']:>8} {r['cluster_selection_epsilon']:>7.2f} "
+              f"{r['num_clusters']:>8} {r['noise_ratio']:>6.1%} {silhouette:>10} {dbcv:>7}")
+    best = best_sweep_result(results)
+    if best:
+        print(f"best: min_samples={best['min_samples']} min_cluster_size={best['min_cluster_size']} "
+              f"epsilon={best['cluster_selection_epsilon']}")
+    print(f"sweep of {len(results)} settings on {args.items} items: {sweep_sec:.1f}s "
+          f"(trees {timings['tree_sec']:.1f}s, extraction {timings['extract_sec']:.1f}s, "
+          f"scoring {timings['score_sec']:.1f}s)")
+
+    if args.skip_full_fits:
+        return
+    start = time.perf_counter()
+    mismatches = 0
+    for r in results:
+        labels = hdbscan.HDBSCAN(
+            min_cluster_size=r['min_cluster_size'],
+            min_samples=r['min_samples'],
+            cluster_selection_epsilon=r['cluster_selection_epsilon'],
+            algorithm=algorithm
+        ).fit_predict(vectors)
+        mismatches += int(labels.max() + 1 != r['num_clusters'])
+    full_sec = time.perf_counter() - start
+    print(f"one full HDBSCAN fit per setting: {full_sec:.1f}s ({full_sec / sweep_sec:.1f}x the sweep, "
+          f"without scoring); cluster count mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
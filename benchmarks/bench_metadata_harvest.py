@@ -0,0 +1,74 @@
+"""
+Benchmark for harvesting video metadata across an archive.
+
+Compares the sequential per-file `ffmpeg.probe` used by VideoProcessor with the concurrent asyncio harvester
+at several concurrency limits, then a second harvester pass served from the (path, size, mtime) cache.
+
+Usage:
+    python benchmarks/bench_metadata_harvest.py [DIRECTORY] [--concurrency 4 16 32]
+
+Without DIRECTORY, --files copies of a short synthetic clip are generated with ffmpeg.
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import ffmpeg
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from MediaManager.tools.FileSystemScanner import VIDEO_EXTENSIONS  # noqa: E402
+from MediaManager.tools.video_metadata import ProbeCache, extract_video_metadata, harvest_metadata  # noqa: E402
+
+
+def make_archive(directory: Path, files: int) -> None:
+    """Writes `files` copies of a 2 second clip into `directory`."""
+    first = directory / "clip_0000.mp4"
+    (
+        ffmpeg
+        .input('testsrc=size=640x360:rate=30', f='lavfi', t=2)
+        .output(str(first), vcodec='libx264', pix_fmt='yuv420p')
+        .overwrite_output()
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    for i in range(1, files):
+        shutil.copy(first, directory / f"clip_{i:04d}.mp4")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('directory', nargs='?', help="Directory of videos to probe (default: synthetic archive)")
+    parser.add_argument('--files', type=int, default=200, help="Number of synthetic clips")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[4, 16, 32])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(args.directory) if args.directory else Path(tmp) / "archive"
+        if not args.directory:
+            directory.mkdir()
+            print(f"Generating {args.files} synthetic clips...")
+            make_archive(directory, args.files)
+        paths = sorted(str(p.resolve()) for p in directory.rglob('*') if p.suffix.lower() in VIDEO_EXTENSIONS)
+
+        print(f"\n{'method':<32} {'time (s)':>9} {'files/s':>9} {'ok':>6}")
+        start = time.perf_counter()
+        ok = sum(extract_video_metadata(Path(p)) is not None for p in paths)
+        elapsed = time.perf_counter() - start
+        print(f"{'sequential ffmpeg.probe':<32} {elapsed:>9.2f} {len(paths) / elapsed:>9.1f} {ok:>6}")
+
+        cache_file = str(Path(tmp) / "probe_cache.json")
+        for concurrency in args.concurrency:
+            result = harvest_metadata(paths, max_concurrency=concurrency, cache=ProbeCache(cache_file if concurrency == args.concurrency[-1] else None))
+            elapsed = result['elapsed_sec']
+            print(f"{f'harvester, {concurrency} concurrent':<32} {elapsed:>9.2f} {len(paths) / elapsed:>9.1f} {len(result['metadata']):>6}")
+
+        result = harvest_metadata(paths, cache=ProbeCache(cache_file))
+        elapsed = max(result['elapsed_sec'], 1e-3)
+        print(f"{'harvester, cached':<32} {elapsed:>9.3f} {len(paths) / elapsed:>9.0f} {len(result['metadata']):>6}")
+
+
+if __name__ == "__main__":
+    main()
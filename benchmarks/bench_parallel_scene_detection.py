@@ -0,0 +1,60 @@
+"""
+Benchmark for segmented parallel scene detection of a single long video.
+
+Runs serial detection, then the segmented process-pool version with increasing worker counts, and reports
+wall time, speedup and whether the merged cuts are identical to the serial run.
+
+Usage:
+    python benchmarks/bench_parallel_scene_detection.py [VIDEO] [--workers 2 4 8] [--detector content]
+
+Without VIDEO a synthetic 4K clip with known hard cuts is generated with ffmpeg.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from MediaManager.tools.scene_utils import SCENE_DETECTORS, detect_cuts, detect_cuts_parallel  # noqa: E402
+from bench_scene_detection import make_synthetic_video  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('video', nargs='?', help="Video to benchmark (default: synthetic clip)")
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4, os.cpu_count() or 1])
+    parser.add_argument('--detector', choices=SCENE_DETECTORS, default='content')
+    parser.add_argument('--frame-skip', type=int, default=0)
+    parser.add_argument('--segments', type=int, default=60, help="Hard cuts + 1 in the synthetic clip")
+    parser.add_argument('--segment-duration', type=float, default=3.0)
+    parser.add_argument('--size', default='3840x2160', help="Synthetic clip resolution")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video = args.video
+        if video is None:
+            video = str(Path(tmp) / "synthetic.mp4")
+            print(f"Generating synthetic {args.size} clip with {args.segments - 1} cuts...")
+            make_synthetic_video(Path(video), args.segments, args.segment_duration, args.size)
+
+        options = dict(detector=args.detector, frame_skip=args.frame_skip)
+        start = time.perf_counter()
+        serial = detect_cuts(video, **options)
+        serial_time = time.perf_counter() - start
+
+        print(f"\nCPU cores: {os.cpu_count()}")
+        print(f"{'workers':>7} {'time (s)':>9} {'speedup':>8} {'cuts':>5} {'matches serial':>15}")
+        print(f"{1:>7} {serial_time:>9.2f} {1.0:>7.1f}x {len(serial['cuts']):>5} {'-':>15}")
+        for workers in sorted(set(w for w in args.workers if w > 1)):
+            start = time.perf_counter()
+            parallel = detect_cuts_parallel(video, workers=workers, **options)
+            elapsed = time.perf_counter() - start
+            print(f"{workers:>7} {elapsed:>9.2f} {serial_time / elapsed:>7.1f}x {len(parallel['cuts']):>5} "
+                  f"{str(parallel['cuts'] == serial['cuts']):>15}")
+
+
+if __name__ == "__main__":
+    main()
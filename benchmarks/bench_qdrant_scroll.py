@@ -0,0 +1,113 @@
+"""
+Benchmark for bulk reads from Qdrant: one sequential cursor scroll (`fetch_points`) against concurrent scrolls
+over disjoint partitions (`parallel_fetch`, by id range or payload hash bucket).
+
+Uses Qdrant's local in-process mode through the shared client factory (no server needed). Local mode answers
+queries in Python in this process, which a real server does elsewhere, so every request is answered once
+untimed and then replayed: each replayed request waits `--latency-ms` plus `--server-us-per-point` per returned
+point, standing in for the round trip and server time that concurrent workers overlap. Converting pages into the matrix stays real client work.
+Reports points/sec and the per-worker timings.
+
+Usage:
+    python benchmarks/bench_qdrant_scroll.py [--points 50000] [--dim 512] [--latency-ms 5]
+                                             [--server-us-per-point 20] [--workers 1 2 4 8]
+"""
+
+import argparse
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+from qdrant_client.http import models
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "CuratorAgent" / "tools"))
+from qdrant_utils import PARTITION_BUCKETS, PARTITION_FIELD, fetch_points, parallel_fetch  # noqa: E402
+from shared.qdrant_clients import QdrantSettings, RetryingClient, get_client  # noqa: E402
+
+
+class ReplayClient:
+    """Answers each distinct request once from the local client, then replays it with a modelled delay."""
+
+    def __init__(self, client: RetryingClient, latency: float, per_point: float):
+        self.client = client
+        self.latency = latency
+        self.per_point = per_point
+        self.responses = {}
+        self.replay = False
+
+    def scroll(self, **kwargs):
+        key = repr(sorted(kwargs.items(), key=lambda item: item[0]))
+        if key not in self.responses:
+            self.responses[key] = self.client.scroll(**kwargs)
+        points, offset = self.responses[key]
+        if self.replay:
+            time.sleep(self.latency + self.per_point * len(points))
+        return points, offset
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+def make_collection(n_points: int, dim: int, seed: int = 0) -> RetryingClient:
+    rng = np.random.default_rng(seed)
+    client = get_client(QdrantSettings.local())
+    client.recreate_collection("media", vectors_config=models.VectorParams(size=dim, distance=models.Distance.COSINE))
+    for start in range(0, n_points, 1000):
+        vectors = rng.normal(size=(min(1000, n_points - start), dim)).astype(np.float32)
+        client.upsert("media", points=[
+            models.PointStruct(
+                id=str(uuid.UUID(bytes=rng.bytes(16), version=4)),
+                vector=vector.tolist(),
+                payload={"file_path": f"/photos/{start + row}.jpg", PARTITION_FIELD: int(rng.integers(PARTITION_BUCKETS))}
+            )
+            for row, vector in enumerate(vectors)
+        ])
+    return client
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points', type=int, default=50000)
+    parser.add_argument('--dim', type=int, default=512)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--latency-ms', type=float, default=5.0)
+    parser.add_argument('--server-us-per-point', type=float, default=20.0)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    client = ReplayClient(make_collection(args.points, args.dim), args.latency_ms / 1000,
+                          args.server_us_per_point / 1e6)
+    print(f"{args.points} points x {args.dim} dims, {args.latency_ms:.0f} ms + {args.server_us_per_point:.0f} us/point "
+          f"per scroll request")
+
+    def timed(read):
+        client.replay = False
+        read()  # Untimed: fills the replay cache
+        client.replay = True
+        start = time.perf_counter()
+        result = read()
+        return result, time.perf_counter() - start
+
+    (ids, matrix, _, _), sequential_sec = timed(lambda: fetch_points(client, "media", batch_size=args.batch_size))
+    print(f"{'sequential cursor scroll':<28} {sequential_sec:>7.2f}s {len(ids) / sequential_sec:>10.0f} points/s")
+
+    for partition_by in ('id_range', 'bucket'):
+        for workers in args.workers:
+            (parallel_ids, parallel_matrix, _, stats), _ = timed(lambda: parallel_fetch(
+                client, "media", workers=workers, partition_by=partition_by, batch_size=args.batch_size
+            ))
+            assert len(parallel_ids) == len(ids)
+            if partition_by == 'id_range':
+                assert np.array_equal(parallel_matrix, matrix)
+            slowest = max(worker["seconds"] for worker in stats["per_worker"])
+            fastest = min(worker["seconds"] for worker in stats["per_worker"])
+            print(f"{partition_by + ' x' + str(stats['workers']):<28} {stats['seconds']:>7.2f}s "
+                  f"{stats['points_per_sec']:>10.0f} points/s  ({sequential_sec / stats['seconds']:.1f}x, "
+                  f"workers {fastest:.2f}-{slowest:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
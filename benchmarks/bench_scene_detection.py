@@ -0,0 +1,106 @@
+"""
+Benchmark for VideoProcessor's scene detection speed/accuracy knobs.
+
+Runs full-resolution ContentDetector as the reference and compares faster configurations (downscaling,
+frame skipping, the histogram detector) on wall time and scene-boundary recall/precision.
+
+Usage:
+    python benchmarks/bench_scene_detection.py [VIDEO] [--tolerance 0.5]
+
+Without VIDEO a synthetic clip with known hard cuts is generated with ffmpeg.
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import ffmpeg
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from MediaManager.tools.scene_utils import detect_scenes  # noqa: E402
+
+CONFIGS = [
+    ("content, full resolution (reference)", dict(detector='content', downscale=1)),
+    ("content, auto downscale", dict(detector='content', downscale=0)),
+    ("content, downscale 4", dict(detector='content', downscale=4)),
+    ("content, downscale 4, skip 1", dict(detector='content', downscale=4, frame_skip=1)),
+    ("content, downscale 4, skip 3", dict(detector='content', downscale=4, frame_skip=3)),
+    ("histogram, downscale 4", dict(detector='histogram', downscale=4)),
+    ("histogram, downscale 8, skip 1", dict(detector='histogram', downscale=8, frame_skip=1)),
+    ("histogram, downscale 8, skip 3", dict(detector='histogram', downscale=8, frame_skip=3)),
+]
+
+SYNTHETIC_SOURCES = ['testsrc', 'smptebars', 'mandelbrot', 'rgbtestsrc', 'testsrc2', 'smptehdbars', 'yuvtestsrc', 'pal75bars']
+
+
+def make_synthetic_video(path: Path, segments: int, segment_duration: float, size: str) -> None:
+    """Concatenates `segments` different lavfi test sources, producing a hard cut every `segment_duration` seconds."""
+    parts = [
+        ffmpeg.input(f"{SYNTHETIC_SOURCES[i % len(SYNTHETIC_SOURCES)]}=size={size}:rate=30", f='lavfi', t=segment_duration)
+        .filter('hue', h=(i // len(SYNTHETIC_SOURCES)) * 90)
+        for i in range(segments)
+    ]
+    (
+        ffmpeg
+        .concat(*parts, v=1, a=0)
+        .output(str(path), vcodec='libx264', pix_fmt='yuv420p', preset='veryfast')
+        .overwrite_output()
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+
+
+def cut_times(scenes: List[Tuple[float, float]]) -> List[float]:
+    """Scene start times, excluding the start of the video."""
+    return [start for start, _ in scenes[1:]]
+
+
+def match_boundaries(reference: List[float], candidate: List[float], tolerance: float) -> int:
+    """Greedy one-to-one matching of candidate cuts to reference cuts within `tolerance` seconds."""
+    matched, used = 0, set()
+    for ref in reference:
+        best = None
+        for i, cand in enumerate(candidate):
+            if i not in used and abs(cand - ref) <= tolerance and (best is None or abs(cand - ref) < abs(candidate[best] - ref)):
+                best = i
+        if best is not None:
+            used.add(best)
+            matched += 1
+    return matched
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('video', nargs='?', help="Video to benchmark (default: synthetic clip)")
+    parser.add_argument('--tolerance', type=float, default=0.5, help="Max boundary offset in seconds counted as a match")
+    parser.add_argument('--segments', type=int, default=24, help="Hard cuts + 1 in the synthetic clip")
+    parser.add_argument('--segment-duration', type=float, default=2.0)
+    parser.add_argument('--size', default='1920x1080', help="Synthetic clip resolution")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video = args.video
+        if video is None:
+            video = str(Path(tmp) / "synthetic.mp4")
+            print(f"Generating synthetic {args.size} clip with {args.segments - 1} cuts...")
+            make_synthetic_video(Path(video), args.segments, args.segment_duration, args.size)
+
+        reference = None
+        reference_time = None
+        print(f"\n{'configuration':<40} {'time (s)':>9} {'speedup':>8} {'cuts':>5} {'recall':>7} {'precision':>9}")
+        for name, config in CONFIGS:
+            start = time.perf_counter()
+            cuts = cut_times(detect_scenes(video, **config))
+            elapsed = time.perf_counter() - start
+            if reference is None:
+                reference, reference_time = cuts, elapsed
+            matched = match_boundaries(reference, cuts, args.tolerance)
+            recall = matched / len(reference) if reference else 1.0
+            precision = matched / len(cuts) if cuts else 1.0
+            print(f"{name:<40} {elapsed:>9.2f} {reference_time / elapsed:>7.1f}x {len(cuts):>5} {recall:>7.2f} {precision:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
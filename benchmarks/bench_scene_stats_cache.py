@@ -0,0 +1,61 @@
+"""
+Benchmark for re-thresholding scene detection from cached per-frame metrics.
+
+Runs a threshold sweep twice: once by decoding the video for every threshold (scene_utils.detect_scenes)
+and once through the scene stats cache, where only the first call decodes. Reports wall time per threshold
+and whether both paths found the same scenes.
+
+Usage:
+    python benchmarks/bench_scene_stats_cache.py [VIDEO] [--detector content] [--thresholds 15 27 40]
+
+Without VIDEO a synthetic clip with known hard cuts is generated with ffmpeg.
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from MediaManager.tools.scene_stats import detect_scenes_cached  # noqa: E402
+from MediaManager.tools.scene_utils import SCENE_DETECTORS, detect_scenes  # noqa: E402
+from bench_scene_detection import make_synthetic_video  # noqa: E402
+
+DEFAULT_THRESHOLDS = {'content': [15.0, 21.0, 27.0, 33.0, 40.0], 'histogram': [0.2, 0.3, 0.35, 0.45, 0.6]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('video', nargs='?', help="Video to benchmark (default: synthetic clip)")
+    parser.add_argument('--detector', choices=SCENE_DETECTORS, default='content')
+    parser.add_argument('--thresholds', type=float, nargs='+', help="Thresholds to sweep (default depends on detector)")
+    parser.add_argument('--downscale', type=int, default=0)
+    parser.add_argument('--segments', type=int, default=24, help="Hard cuts + 1 in the synthetic clip")
+    parser.add_argument('--segment-duration', type=float, default=2.0)
+    parser.add_argument('--size', default='1920x1080', help="Synthetic clip resolution")
+    args = parser.parse_args()
+    thresholds = args.thresholds or DEFAULT_THRESHOLDS[args.detector]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video = args.video
+        if video is None:
+            video = str(Path(tmp) / "synthetic.mp4")
+            print(f"Generating synthetic {args.size} clip with {args.segments - 1} cuts...")
+            make_synthetic_video(Path(video), args.segments, args.segment_duration, args.size)
+        cache_dir = str(Path(tmp) / "scene_stats")
+
+        print(f"\n{'threshold':>9} {'decode (s)':>11} {'cached (s)':>11} {'scenes':>7} {'identical':>10}")
+        for threshold in thresholds:
+            start = time.perf_counter()
+            decoded = detect_scenes(video, detector=args.detector, threshold=threshold, downscale=args.downscale)
+            decode_time = time.perf_counter() - start
+            start = time.perf_counter()
+            cached = detect_scenes_cached(video, cache_dir, detector=args.detector, threshold=threshold, downscale=args.downscale)
+            cached_time = time.perf_counter() - start
+            print(f"{threshold:>9.2f} {decode_time:>11.3f} {cached_time:>11.4f} {len(cached):>7} {str(cached == decoded):>10}")
+        print("\nThe first cached run includes decoding and writing the cache; later runs only read it.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark for local snapshots: a full export against an incremental refresh after a small share of the
+collection changed, and the cost of opening the snapshot (mmap) against reading the collection again.
+
+Uses Qdrant's local in-process mode through the shared client factory (no server needed), so the timings only
+cover client-side work plus the in-process query cost; against a real server the full export also pays the
+network for every point while the refresh only transfers the changed ones.
+
+Usage:
+    python benchmarks/bench_snapshot_refresh.py [--points 20000] [--dim 512] [--changed 0.01]
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+from qdrant_client.http import models
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "CuratorAgent" / "tools"))
+from qdrant_utils import WATERMARK_FIELD, Snapshot, export_snapshot, fetch_points, refresh_snapshot  # noqa: E402
+from shared.qdrant_clients import QdrantSettings, get_client  # noqa: E402
+
+
+def points(ids, rng, dim, stamp):
+    vectors = rng.normal(size=(len(ids), dim)).astype(np.float32)
+    return [
+        models.PointStruct(id=point_id, vector=vector.tolist(),
+                           payload={"file_path": f"/photos/{point_id}.jpg", "media_type": "image",
+                                    WATERMARK_FIELD: stamp + row})
+        for row, (point_id, vector) in enumerate(zip(ids, vectors))
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points', type=int, default=20000)
+    parser.add_argument('--dim', type=int, default=512)
+    parser.add_argument('--changed', type=float, default=0.01, help="Share of points upserted again")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    client = get_client(QdrantSettings.local())
+    client.recreate_collection("media", vectors_config=models.VectorParams(size=args.dim,
+                                                                            distance=models.Distance.COSINE))
+    ids = [str(uuid.UUID(bytes=rng.bytes(16), version=4)) for _ in range(args.points)]
+    for start in range(0, len(ids), 1000):
+        client.upsert("media", points=points(ids[start:start + 1000], rng, args.dim, 1000.0 + start))
+
+    directory = Path(tempfile.mkdtemp())
+    try:
+        start = time.perf_counter()
+        export_snapshot(client, "media", directory, workers=1)
+        full_sec = time.perf_counter() - start
+
+        n_changed = max(1, int(args.points * args.changed))
+        changed = rng.choice(len(ids), n_changed // 2, replace=False)
+        client.upsert("media", points=points([ids[i] for i in changed], rng, args.dim, 1e9))
+        client.upsert("media", points=points([str(uuid.uuid4()) for _ in range(n_changed - len(changed))], rng,
+                                             args.dim, 2e9))
+        start = time.perf_counter()
+        stats = refresh_snapshot(client, directory)
+        refresh_sec = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fetch_points(client, "media")
+        fetch_sec = time.perf_counter() - start
+        start = time.perf_counter()
+        snapshot = Snapshot(directory)
+        embeddings, item_ids, media_types = snapshot.embeddings(), snapshot.ids(), snapshot.column("media_type")
+        open_sec = time.perf_counter() - start
+
+        print(f"{args.points} points x {args.dim} dims, {n_changed} upserted since the export")
+        print(f"{'full export':<28} {full_sec:>8.2f}s")
+        print(f"{'incremental refresh':<28} {refresh_sec:>8.2f}s  ({full_sec / refresh_sec:.0f}x, "
+              f"{stats['updated']} updated, {stats['added']} added)")
+        print(f"{'read collection again':<28} {fetch_sec:>8.2f}s")
+        print(f"{'open snapshot (mmap)':<28} {open_sec:>8.3f}s  ({len(item_ids)} ids, {embeddings.shape} matrix, "
+              f"{len(media_types)} media types)")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
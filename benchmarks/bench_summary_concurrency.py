@@ -0,0 +1,87 @@
+"""
+Benchmark for SummaryWriterTool's concurrent requests: cluster summaries against a local stub of the chat API
+that answers after a fixed latency, sequentially (concurrency 1) and with more requests in flight. An optional
+share of rate-limited (429) answers shows the cost of retries.
+
+Usage:
+    python benchmarks/bench_summary_concurrency.py [--clusters 200] [--latency 0.3] [--concurrency 1 8 32]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "CuratorAgent" / "tools"))
+from chat_utils import ChatClient, RateLimiter  # noqa: E402
+
+
+def stub_server(latency, rate_limited):
+    """Chat completions stub: answers after `latency` seconds, with 429 for a `rate_limited` share of requests."""
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            time.sleep(latency)
+            status = 429 if random.random() < rate_limited else 200
+            body = {"error": {"message": "Rate limit reached"}} if status == 429 else \
+                {"choices": [{"message": {"role": "assistant", "content": "A summary."}}]}
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def summarize(url, clusters, concurrency, backoff):
+    slots = asyncio.Semaphore(concurrency)
+    async with ChatClient(api_key="bench", base_url=url, limiter=RateLimiter(10 ** 6, 10 ** 9),
+                          max_connections=concurrency, backoff=backoff, max_retries=8) as chat:
+        async def one(i):
+            async with slots:
+                await chat.complete([{"role": "user", "content": f"Summarize cluster {i}"}])
+
+        await asyncio.gather(*(one(i) for i in range(clusters)))
+        return chat.requests, chat.retries
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clusters', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.3, help="Seconds the stub takes per request")
+    parser.add_argument('--rate-limited', type=float, default=0.05, help="Share of requests answered with 429")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    args = parser.parse_args()
+    logging.getLogger("chat_utils").setLevel(logging.ERROR)  # Retries are counted, not logged
+
+    server = stub_server(args.latency, args.rate_limited)
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    try:
+        print(f"{args.clusters} clusters, {args.latency}s per request, {args.rate_limited:.0%} rate limited")
+        baseline = None
+        for concurrency in args.concurrency:
+            start = time.perf_counter()
+            requests, retries = asyncio.run(summarize(url, args.clusters, concurrency, backoff=args.latency))
+            seconds = time.perf_counter() - start
+            baseline = baseline or seconds
+            print(f"concurrency {concurrency:<4} {seconds:>8.2f}s  ({baseline / seconds:.1f}x, "
+                  f"{requests} requests, {retries} retries)")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
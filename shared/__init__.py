@@ -0,0 +1,2 @@
+# Shared infrastructure
+# Helpers used by more than one agent (e.g. the Qdrant client factory), so they are configured in one place.
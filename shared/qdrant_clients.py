@@ -0,0 +1,289 @@
+# 📌 Purpose: One configured way to reach Qdrant for every agent: connection settings and the collection name
+#    come from a single place, and sync (`QdrantClient`) and async (`AsyncQdrantClient`) clients are created
+#    once and shared instead of per tool or per call.
+# ⚙️ Key Logic: `QdrantSettings.from_env()` reads QDRANT_* variables. Clients get an explicit request timeout and
+#    an HTTP connection pool with keep-alive (qdrant-client turns keep-alive off for localhost by default, so
+#    every request would reconnect). They are wrapped so idempotent calls are retried with jittered exponential
+#    backoff on timeouts, connection errors and 429/502/503/504. With `location` (':memory:' or a directory),
+#    the clients run Qdrant's embedded local mode, so tests and benchmarks need no server. Async clients are
+#    kept per event loop, since their connection pool belongs to the loop that opened it. Writers bump a
+#    per-collection write version (`bump_write_version`), kept in a small side collection, so readers can tell
+#    whether results they cached are still current.
+# 📂 Expected File Path: photo_intelligence_agency/shared/qdrant_clients.py
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+import weakref
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional
+
+import httpx
+from dotenv import load_dotenv
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+from qdrant_client.http.models import Distance, PointStruct, VectorParams
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_COLLECTION_NAME = "media_collection"
+DEFAULT_TIMEOUT_SEC = 10  # qdrant-client rounds timeouts up to whole seconds
+DEFAULT_MAX_CONNECTIONS = 16
+DEFAULT_KEEPALIVE_SEC = 30.0
+DEFAULT_RETRIES = 3
+DEFAULT_RETRY_BACKOFF_SEC = 0.5
+MAX_RETRY_DELAY_SEC = 10.0
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+# Calls that are safe to repeat: reads, and writes that set state by point id
+RETRIED_METHODS = frozenset({
+    'scroll', 'count', 'retrieve', 'search', 'search_batch', 'recommend', 'get_collection', 'get_collections',
+    'collection_exists', 'upsert', 'delete', 'set_payload', 'overwrite_payload', 'delete_payload',
+})
+WRITE_VERSIONS_COLLECTION = "collection_write_versions"  # One point per written collection: {collection, version}
+
+
+@dataclass(frozen=True)
+class QdrantSettings:
+    """Where Qdrant is and how to talk to it. `location` (':memory:' or a path) selects embedded local mode."""
+    url: Optional[str] = None
+    host: str = "localhost"
+    port: int = 6333
+    api_key: Optional[str] = None
+    location: Optional[str] = None
+    collection_name: str = DEFAULT_COLLECTION_NAME
+    timeout: int = DEFAULT_TIMEOUT_SEC
+    max_connections: int = DEFAULT_MAX_CONNECTIONS
+    retries: int = DEFAULT_RETRIES
+    retry_backoff: float = DEFAULT_RETRY_BACKOFF_SEC
+
+    @classmethod
+    def from_env(cls) -> "QdrantSettings":
+        """Settings from QDRANT_URL (or QDRANT_HOST/QDRANT_PORT), QDRANT_API_KEY, QDRANT_LOCATION,
+        QDRANT_COLLECTION_NAME, QDRANT_TIMEOUT, QDRANT_MAX_CONNECTIONS, QDRANT_RETRIES and QDRANT_RETRY_BACKOFF."""
+        return cls(
+            url=os.getenv("QDRANT_URL") or None,
+            host=os.getenv("QDRANT_HOST", "localhost"),
+            port=int(os.getenv("QDRANT_PORT", 6333)),
+            api_key=os.getenv("QDRANT_API_KEY") or None,
+            location=os.getenv("QDRANT_LOCATION") or None,
+            collection_name=os.getenv("QDRANT_COLLECTION_NAME", DEFAULT_COLLECTION_NAME),
+            timeout=int(os.getenv("QDRANT_TIMEOUT", DEFAULT_TIMEOUT_SEC)),
+            max_connections=int(os.getenv("QDRANT_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS)),
+            retries=int(os.getenv("QDRANT_RETRIES", DEFAULT_RETRIES)),
+            retry_backoff=float(os.getenv("QDRANT_RETRY_BACKOFF", DEFAULT_RETRY_BACKOFF_SEC)),
+        )
+
+    @classmethod
+    def local(cls, location: str = ":memory:", **overrides: Any) -> "QdrantSettings":
+        """Embedded local mode (no server), for tests and benchmarks."""
+        return replace(cls.from_env(), location=location, url=None, **overrides)
+
+    def client_args(self) -> Dict[str, Any]:
+        """Keyword arguments for QdrantClient / AsyncQdrantClient."""
+        if self.location:
+            return {"location": self.location} if self.location == ":memory:" else {"path": self.location}
+        args: Dict[str, Any] = {
+            "timeout": self.timeout,
+            "api_key": self.api_key,
+            "limits": httpx.Limits(max_connections=self.max_connections,
+                                   max_keepalive_connections=self.max_connections,
+                                   keepalive_expiry=DEFAULT_KEEPALIVE_SEC),
+        }
+        if self.url:
+            args["url"] = self.url
+        else:
+            args.update(host=self.host, port=self.port)
+        return args
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether a failed call is worth retrying: timeouts, connection errors and overload/gateway responses."""
+    if isinstance(error, UnexpectedResponse):
+        return error.status_code in RETRY_STATUS_CODES
+    return isinstance(error, (ResponseHandlingException, httpx.TransportError))
+
+
+def retry_delay(attempt: int, backoff: float) -> float:
+    """Exponential backoff with full jitter, so clients that failed together don't retry together."""
+    return random.uniform(0, min(MAX_RETRY_DELAY_SEC, backoff * 2 ** attempt))
+
+
+class RetryingClient:
+    """
+    Wraps a QdrantClient: calls in RETRIED_METHODS are retried up to `retries` times on transient errors;
+    everything else is passed through unchanged.
+    """
+
+    def __init__(self, client: Any, retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_RETRY_BACKOFF_SEC):
+        self.client = client
+        self.retries = retries
+        self.backoff = backoff
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self.client, name)
+        if name not in RETRIED_METHODS or not callable(attribute):
+            return attribute
+
+        def call(*args: Any, **kwargs: Any) -> Any:
+            for attempt in range(self.retries + 1):
+                try:
+                    return attribute(*args, **kwargs)
+                except Exception as e:
+                    if attempt == self.retries or not is_transient(e):
+                        raise
+                    delay = retry_delay(attempt, self.backoff)
+                    logger.warning(f"Qdrant {name} failed ({e}); retry {attempt + 1}/{self.retries} in {delay:.2f}s")
+                    time.sleep(delay)
+
+        return call
+
+
+class AsyncRetryingClient(RetryingClient):
+    """RetryingClient for AsyncQdrantClient: retried calls are coroutines and wait with asyncio.sleep."""
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self.client, name)
+        if name not in RETRIED_METHODS or not callable(attribute):
+            return attribute
+
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            for attempt in range(self.retries + 1):
+                try:
+                    return await attribute(*args, **kwargs)
+                except Exception as e:
+                    if attempt == self.retries or not is_transient(e):
+                        raise
+                    delay = retry_delay(attempt, self.backoff)
+                    logger.warning(f"Qdrant {name} failed ({e}); retry {attempt + 1}/{self.retries} in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+
+        return call
+
+
+_lock = threading.Lock()
+_clients: Dict[QdrantSettings, RetryingClient] = {}
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[QdrantSettings, AsyncRetryingClient]]" = \
+    weakref.WeakKeyDictionary()
+
+
+def qdrant_settings() -> QdrantSettings:
+    """Current settings from the environment."""
+    return QdrantSettings.from_env()
+
+
+def resolve_collection(name: Optional[str] = None) -> str:
+    """`name`, or the configured collection (QDRANT_COLLECTION_NAME) every agent reads and writes by default."""
+    return name or qdrant_settings().collection_name
+
+
+def get_client(settings: Optional[QdrantSettings] = None) -> RetryingClient:
+    """The shared sync client for these settings (from the environment by default), created on first use."""
+    settings = settings or qdrant_settings()
+    with _lock:
+        client = _clients.get(settings)
+        if client is None:
+            client = _clients[settings] = RetryingClient(
+                QdrantClient(**settings.client_args()), settings.retries, settings.retry_backoff
+            )
+        return client
+
+
+def get_async_client(settings: Optional[QdrantSettings] = None) -> AsyncRetryingClient:
+    """
+    The shared async client for these settings on the running event loop, created on first use.
+    In local mode it is a separate store from the sync client's; use a server to share data between them.
+    """
+    settings = settings or qdrant_settings()
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(settings)
+        if client is None:
+            client = clients[settings] = AsyncRetryingClient(
+                AsyncQdrantClient(**settings.client_args()), settings.retries, settings.retry_backoff
+            )
+        return client
+
+
+def close_clients() -> int:
+    """Closes and forgets every shared sync client. Returns how many were closed."""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception as e:
+            logger.warning(f"Error closing Qdrant client: {e}")
+    return len(clients)
+
+
+async def close_async_clients() -> int:
+    """Closes and forgets the shared async clients of the running event loop. Returns how many were closed."""
+    with _lock:
+        clients = list(_async_clients.pop(asyncio.get_running_loop(), {}).values())
+    for client in clients:
+        try:
+            await client.close()
+        except Exception as e:
+            logger.warning(f"Error closing async Qdrant client: {e}")
+    return len(clients)
+
+
+def _version_point_id(collection_name: str) -> str:
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"qdrant-write-version:{collection_name}"))
+
+
+def _collection_missing(error: Exception) -> bool:
+    """Whether a call failed because its collection does not exist (local mode raises ValueError for that)."""
+    if isinstance(error, UnexpectedResponse):
+        return error.status_code == 404
+    return isinstance(error, ValueError)
+
+
+def write_version(client: Any, collection_name: str) -> int:
+    """
+    Current write version of a collection: how many times writers have called `bump_write_version` for it
+    (0 if never). Results read at one version are stale once it changes.
+    """
+    try:
+        points = client.retrieve(collection_name=WRITE_VERSIONS_COLLECTION, ids=[_version_point_id(collection_name)],
+                                 with_payload=True, with_vectors=False)
+    except (UnexpectedResponse, ValueError) as e:
+        if not _collection_missing(e):
+            raise  # Reading 0 here would move the version backwards
+        return 0  # No writer has bumped a version yet
+    return int((points[0].payload or {}).get("version", 0)) if points else 0
+
+
+def bump_write_version(client: Any, collection_name: str) -> int:
+    """
+    Marks `collection_name` as written: increments its write version and returns the new one. Call after every
+    upsert or delete. Two concurrent bumps may both store the same number, but it always moves past what either
+    saw before, which is all readers compare against.
+    """
+    version = write_version(client, collection_name) + 1
+    point = PointStruct(id=_version_point_id(collection_name), vector=[1.0],
+                        payload={"collection": collection_name, "version": version, "updated_at": time.time()})
+    try:
+        client.upsert(collection_name=WRITE_VERSIONS_COLLECTION, points=[point], wait=True)
+    except (UnexpectedResponse, ValueError) as e:
+        if not _collection_missing(e):
+            raise
+        try:
+            client.create_collection(collection_name=WRITE_VERSIONS_COLLECTION,
+                                     vectors_config=VectorParams(size=1, distance=Distance.DOT))
+        except (UnexpectedResponse, ValueError) as create_error:
+            try:
+                client.get_collection(WRITE_VERSIONS_COLLECTION)  # Another writer created it first
+            except (UnexpectedResponse, ValueError):
+                raise create_error
+        client.upsert(collection_name=WRITE_VERSIONS_COLLECTION, points=[point], wait=True)
+    return version
@@ -1,7 +1,11 @@
 from unittest.mock import MagicMock
 from typing import Any, Dict, Optional, List
 import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
+from pydantic.fields import FieldInfo
 
 class SharedState:
     def __init__(self):
@@ -16,6 +20,10 @@ class SharedState:
 class MockBaseTool:
     def __init__(self, **kwargs):
         self._shared_state = SharedState()
+        # Like the real pydantic-based BaseTool, fields that are not passed take their Field defaults
+        for key, value in vars(type(self)).items():
+            if isinstance(value, FieldInfo) and not value.is_required():
+                setattr(self, key, value.get_default(call_default_factory=True))
         for key, value in kwargs.items():
             setattr(self, key, value)
     
@@ -46,11 +54,38 @@ class MockMatchValue:
     def __init__(self, value=None):
         self.value = value
 
+class MockMatchAny:
+    def __init__(self, any=None):
+        self.any = any or []
+
+class MockPayloadSelectorInclude:
+    def __init__(self, include=None):
+        self.include = include or []
+
+class MockPayloadSelectorExclude:
+    def __init__(self, exclude=None):
+        self.exclude = exclude or []
+
 class MockRange:
     def __init__(self, gte=None, lte=None):
         self.gte = gte
         self.lte = lte
 
+class MockPointStruct:
+    def __init__(self, id=None, vector=None, payload=None):
+        self.id = id
+        self.vector = vector
+        self.payload = payload
+
+class MockVectorParams:
+    def __init__(self, size=None, distance=None):
+        self.size = size
+        self.distance = distance
+
+class MockDistance:
+    COSINE = "Cosine"
+    DOT = "Dot"
+
 class MockPoint:
     def __init__(self, id: str, vector: List[float], payload: Dict[str, Any]):
         self.id = id
@@ -98,6 +133,136 @@ class MockQdrantClient:
     def __getattr__(self, name):
         return getattr(self._mock, name)
 
+class FakeQdrantCollection:
+    """
+    In-memory stand-in for a Qdrant collection behind the scroll/count API: like Qdrant, `offset` is the id of
+    the first point to return and each page reports the id that starts the next one. Points are kept in id
+    order and filtered on `must` conditions (match or range on payload keys). `with_payload` may select fields.
+    """
+    def __init__(self, vectors, payloads=None, ids=None):
+        ids = list(ids) if ids is not None else [10 * (i + 1) for i in range(len(vectors))]
+        payloads = payloads or [{} for _ in vectors]
+        self.points = sorted(
+            (MockPoint(id=point_id, vector=list(map(float, vector)), payload=payload)
+             for point_id, vector, payload in zip(ids, vectors, payloads)),
+            key=lambda point: point.id
+        )
+        self.scroll_calls = []
+        self.count_calls = 0
+
+    @staticmethod
+    def _matches(point, query_filter):
+        for condition in (query_filter.must if query_filter else []):
+            value = point.payload.get(condition.key)
+            if condition.match is not None:
+                allowed = condition.match.any if hasattr(condition.match, 'any') else [condition.match.value]
+                if value not in allowed:
+                    return False
+            if condition.range is not None:
+                low, high = condition.range.gte, condition.range.lte
+                if value is None or (low is not None and value < low) or (high is not None and value > high):
+                    return False
+        return True
+
+    @staticmethod
+    def _project(payload, with_payload):
+        if with_payload is True:
+            return payload
+        if not with_payload:
+            return None
+        if hasattr(with_payload, 'include'):
+            return {key: value for key, value in payload.items() if key in with_payload.include}
+        return {key: value for key, value in payload.items() if key not in with_payload.exclude}
+
+    def count(self, collection_name, count_filter=None, exact=True):
+        self.count_calls += 1
+        return type('CountResult', (), {'count': sum(self._matches(p, count_filter) for p in self.points)})
+
+    def scroll(self, collection_name, scroll_filter=None, limit=10, offset=None, with_payload=True, with_vectors=False):
+        self.scroll_calls.append({"collection_name": collection_name, "scroll_filter": scroll_filter, "limit": limit,
+                                  "offset": offset, "with_payload": with_payload, "with_vectors": with_vectors})
+        matching = [p for p in self.points if self._matches(p, scroll_filter) and (offset is None or p.id >= offset)]
+        page = [
+            MockPoint(id=p.id, vector=p.vector if with_vectors else None, payload=self._project(p.payload, with_payload))
+            for p in matching[:limit]
+        ]
+        next_offset = matching[limit].id if len(matching) > limit else None
+        return page, next_offset
+
+class StubChatServer:
+    """
+    Local HTTP server that mimics the chat completions API (POST /v1/chat/completions). It records request
+    bodies, answers each after `delay` seconds with `reply`, and first works through `failures`: (status, message,
+    headers) responses returned in order. `max_in_flight` is the most requests it was handling at once.
+    """
+    def __init__(self, reply="This is a test summary for the cluster.", failures=(), delay=0.0):
+        self.reply = reply
+        self.failures = list(failures)
+        self.delay = delay
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub._lock:
+                    stub.requests.append(body)
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    failure = stub.failures.pop(0) if stub.failures else None
+                try:
+                    time.sleep(stub.delay)
+                    if failure:
+                        status, message, headers = failure
+                        self.respond(status, {"error": {"message": message}}, headers)
+                    else:
+                        self.respond(200, {"choices": [{"index": 0,
+                                                        "message": {"role": "assistant", "content": stub.reply},
+                                                        "finish_reason": "stop"}],
+                                           "usage": {"prompt_tokens": 50, "completion_tokens": 20,
+                                                     "total_tokens": 70}})
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+            def respond(self, status, payload, headers=None):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                try:
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The client timed out and closed the connection
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05},
+                                       daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def prompts(self):
+        return [request["messages"][1]["content"] for request in self.requests]
+
 class MockOpenAIClient:
     def __init__(self, api_key: str = None):
         self._mock = MagicMock()
@@ -108,6 +273,16 @@ class MockOpenAIClient:
     def __getattr__(self, name):
         return getattr(self._mock, name)
 
+class MockUnexpectedResponse(Exception):
+    def __init__(self, status_code=None, reason_phrase="", content=b"", headers=None):
+        super().__init__(f"Unexpected Response: {status_code} ({reason_phrase})")
+        self.status_code = status_code
+
+class MockResponseHandlingException(Exception):
+    def __init__(self, source=None):
+        super().__init__(str(source))
+        self.source = source
+
 # Mock the agency_swarm module
 class MockAgencySwarm:
     class tools:
@@ -120,12 +295,23 @@ class MockQdrantModels:
     Filter = MockFilter
     FieldCondition = MockFieldCondition
     MatchValue = MockMatchValue
+    MatchAny = MockMatchAny
+    PayloadSelectorInclude = MockPayloadSelectorInclude
+    PayloadSelectorExclude = MockPayloadSelectorExclude
     Range = MockRange
+    PointStruct = MockPointStruct
+    VectorParams = MockVectorParams
+    Distance = MockDistance
 
 # Create mocks for the packages
 import sys
 sys.modules['agency_swarm'] = MockAgencySwarm
 sys.modules['agency_swarm.tools'] = MockAgencySwarm.tools
-sys.modules['qdrant_client'] = type('MockQdrantClientModule', (), {'QdrantClient': MockQdrantClient})
+sys.modules['qdrant_client'] = type('MockQdrantClientModule', (), {'QdrantClient': MockQdrantClient,
+                                                                  'AsyncQdrantClient': MockQdrantClient})
 sys.modules['qdrant_client.http.models'] = MockQdrantModels
+sys.modules['qdrant_client.http.exceptions'] = type('MockQdrantExceptions', (), {
+    'UnexpectedResponse': MockUnexpectedResponse,
+    'ResponseHandlingException': MockResponseHandlingException
+})
 sys.modules['openai'] = type('MockOpenAIModule', (), {'OpenAI': MockOpenAIClient}) 
\ No newline at end of file
@@ -0,0 +1,75 @@
+import unittest
+import asyncio
+import time
+import httpx
+from CuratorAgent.tools.chat_utils import (
+    ChatAPIError,
+    RateLimiter,
+    estimate_tokens,
+    is_retryable,
+    retry_delay,
+    run_sync
+)
+
+class TestRateLimiter(unittest.TestCase):
+    def test_token_budget(self):
+        async def acquire_twice():
+            limiter = RateLimiter(requests_per_minute=1000, tokens_per_minute=6000)  # 100 tokens per second
+            first = await limiter.acquire(6000)
+            second = await limiter.acquire(20)
+            return first, second
+
+        first, second = asyncio.run(acquire_twice())
+        self.assertLess(first, 0.05)
+        self.assertGreater(second, 0.15)
+
+    def test_request_budget(self):
+        async def acquire(n):
+            limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=10 ** 6)  # 10 requests per second
+            began = time.monotonic()
+            for _ in range(n):
+                await limiter.acquire(1)
+            return time.monotonic() - began
+
+        # A full minute's budget is available at once, then requests are spaced out
+        self.assertLess(asyncio.run(acquire(600)), 0.1)
+        self.assertGreater(asyncio.run(acquire(602)), 0.15)
+
+    def test_pause(self):
+        async def paused():
+            limiter = RateLimiter()
+            limiter.pause(0.2)
+            return await limiter.acquire(10)
+
+        self.assertGreater(asyncio.run(paused()), 0.15)
+
+class TestRetries(unittest.TestCase):
+    def test_retryable_errors(self):
+        self.assertTrue(is_retryable(ChatAPIError(429, "Rate limit reached")))
+        self.assertTrue(is_retryable(ChatAPIError(503, "Overloaded")))
+        self.assertTrue(is_retryable(httpx.ReadTimeout("timed out")))
+        self.assertFalse(is_retryable(ChatAPIError(400, "Bad request")))
+        self.assertFalse(is_retryable(ValueError("bad response")))
+
+    def test_retry_delay(self):
+        delays = [retry_delay(3, backoff=1.0) for _ in range(100)]
+        self.assertTrue(all(0 <= delay <= 8.0 for delay in delays))
+        self.assertGreater(len(set(delays)), 1)
+        self.assertGreaterEqual(retry_delay(0, backoff=0.1, retry_after=2.0), 2.0)
+
+    def test_estimate_tokens(self):
+        messages = [{"role": "system", "content": "x" * 40}, {"role": "user", "content": "y" * 400}]
+        self.assertEqual(estimate_tokens(messages, max_tokens=150), 260)
+
+    def test_run_sync_inside_event_loop(self):
+        async def answer():
+            return 42
+
+        async def caller():
+            return run_sync(answer())
+
+        self.assertEqual(run_sync(answer()), 42)
+        self.assertEqual(asyncio.run(caller()), 42)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,34 @@
 import unittest
 import numpy as np
+import os
 from pathlib import Path
 import json
 import shutil
+import tempfile
+from multiprocessing import shared_memory
+from types import SimpleNamespace
 from CuratorAgent.tools.ClusterTool import ClusterTool
+from CuratorAgent.tools.cluster_utils import ClusterModel
+from CuratorAgent.tools.qdrant_utils import export_snapshot
+from test_base import FakeQdrantCollection
+
+class FakeScrollClient:
+    """Serves a fixed set of points through Qdrant's scroll API, page by page."""
+    def __init__(self, vectors):
+        self.points = [
+            SimpleNamespace(id=i, vector=vector.tolist(), payload={"file_path": f"/path/to/{i}.jpg", "media_type": "image"})
+            for i, vector in enumerate(vectors)
+        ]
+        self.scroll_calls = []
+
+    def scroll(self, collection_name, limit, offset=None, with_payload=True, with_vectors=True, scroll_filter=None):
+        self.scroll_calls.append((collection_name, offset, with_payload))
+        start = offset or 0
+        next_offset = start + limit if start + limit < len(self.points) else None
+        page = self.points[start:start + limit]
+        if not with_payload:
+            page = [SimpleNamespace(id=p.id, vector=p.vector, payload=None) for p in page]
+        return page, next_offset
 
 class TestClusterTool(unittest.TestCase):
     def setUp(self):
@@ -33,7 +58,8 @@ class TestClusterTool(unittest.TestCase):
             items=self.test_items,
             min_cluster_size=3,
             min_samples=2,
-            output_dir=self.test_output_dir
+            output_dir=self.test_output_dir,
+            export_json=True
         )
         
         result = cluster_tool.run()
@@ -123,5 +149,421 @@ class TestClusterTool(unittest.TestCase):
         self.assertIsNotNone(shared_results)
         self.assertEqual(shared_results["statistics"], result["statistics"])
 
+    def test_dimensionality_reduction(self):
+        """Test the PCA stage: reported variance, cached model reuse and refitting"""
+        rng = np.random.default_rng(0)
+        centers = rng.normal(size=(3, 512))
+        items = [
+            {
+                "id": f"blob_{i}",
+                "embedding": (centers[i % 3] + 0.05 * rng.normal(size=512)).tolist(),
+                "metadata": {"file_path": f"/path/to/blob_{i}.jpg", "media_type": "image"}
+            }
+            for i in range(60)
+        ]
+        cluster_tool = ClusterTool(
+            items=items,
+            min_cluster_size=5,
+            min_samples=3,
+            output_dir=self.test_output_dir,
+            reduce_dimensions=8,
+            reduction_method="randomized",
+            refit_reduction=False
+        )
+        result = cluster_tool.run()
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["statistics"]["num_clusters"], 3)
+
+        reduction = result["statistics"]["reduction"]
+        self.assertEqual(reduction["components"], 8)
+        self.assertEqual(reduction["input_dim"], 512)
+        self.assertGreater(reduction["explained_variance"], 0.9)
+        self.assertFalse(reduction["cached"])
+        self.assertTrue((Path(self.test_output_dir) / "reduction_model.npz").exists())
+
+        # A second run reuses the fitted model unless asked to refit (bypassing the results cache)
+        cluster_tool.use_cache = False
+        self.assertTrue(cluster_tool.run()["statistics"]["reduction"]["cached"])
+        cluster_tool.refit_reduction = True
+        self.assertFalse(cluster_tool.run()["statistics"]["reduction"]["cached"])
+
+    def test_clustering_backends(self):
+        """Test that every backend finds well separated groups and reports itself"""
+        rng = np.random.default_rng(1)
+        centers = rng.normal(size=(3, 512))
+        items = [
+            {
+                "id": f"blob_{i}",
+                "embedding": (centers[i % 3] + 0.02 * rng.normal(size=512)).tolist(),
+                "metadata": {"file_path": f"/path/to/blob_{i}.jpg", "media_type": "image"}
+            }
+            for i in range(45)
+        ]
+        for backend, reduce_dimensions in [
+            ("boruvka_kdtree", 8), ("boruvka_balltree", 0), ("graph", 0), ("graph", 8)
+        ]:
+            cluster_tool = ClusterTool(
+                items=items,
+                min_cluster_size=5,
+                min_samples=3,
+                output_dir=self.test_output_dir,
+                reduce_dimensions=reduce_dimensions,
+                backend=backend,
+                n_jobs=1
+            )
+            result = cluster_tool.run()
+            self.assertEqual(result["status"], "success")
+            self.assertEqual(result["statistics"]["num_clusters"], 3)
+            self.assertEqual(result["statistics"]["noise_points"], 0)
+            self.assertEqual(result["statistics"]["clustering"]["backend"], backend)
+
+        # Small collections use HDBSCAN's default algorithm
+        result = ClusterTool(items=items, output_dir=self.test_output_dir, backend="auto").run()
+        self.assertEqual(result["statistics"]["clustering"]["backend"], "hdbscan")
+
+    def test_assign_mode(self):
+        """Test that assign mode places new items into saved clusters and refits only when needed"""
+        rng = np.random.default_rng(2)
+        centers = rng.normal(size=(4, 512))
+
+        def make_items(prefix, count, topics):
+            return [
+                {
+                    "id": f"{prefix}_{i}",
+                    "embedding": (centers[topics[i % len(topics)]] + 0.05 * rng.normal(size=512)).tolist(),
+                    "metadata": {"file_path": f"/path/to/{prefix}_{i}.jpg", "media_type": "image"}
+                }
+                for i in range(count)
+            ]
+
+        old_items = make_items("old", 60, [0, 1, 2])
+        params = dict(min_cluster_size=5, min_samples=3, output_dir=self.test_output_dir, reduce_dimensions=8)
+
+        # Without a saved model, assign mode falls back to a full fit
+        result = ClusterTool(items=old_items, mode="assign", **params).run()
+        self.assertEqual(result["statistics"]["assignment"]["refit_reason"], "no saved model")
+        self.assertEqual(result["statistics"]["num_clusters"], 3)
+        old_labels = {item["id"]: label for label, members in result["clusters"].items() for item in members}
+
+        # New items of known topics join the existing clusters; old items keep their labels
+        new_items = make_items("new", 9, [0, 1, 2])
+        result = ClusterTool(items=old_items + new_items, mode="assign", **params).run()
+        assignment = result["statistics"]["assignment"]
+        self.assertEqual(result["status"], "success")
+        self.assertFalse(assignment["refit"])
+        self.assertEqual((assignment["known_items"], assignment["new_items"]), (60, 9))
+        self.assertEqual(assignment["new_noise_ratio"], 0.0)
+        self.assertNotIn("clustering", result["statistics"])
+        labels = {item["id"]: label for label, members in result["clusters"].items() for item in members}
+        self.assertTrue(all(labels[item_id] == label for item_id, label in old_labels.items()))
+        self.assertEqual(labels["new_0"], labels["old_0"])
+
+        # A batch of an unseen topic fits no cluster and triggers a refit
+        unseen_items = make_items("unseen", 12, [3])
+        result = ClusterTool(items=old_items + new_items + unseen_items, mode="assign", **params).run()
+        self.assertTrue(result["statistics"]["assignment"]["refit"])
+        self.assertIn(result["statistics"]["assignment"]["refit_reason"], ("noise ratio", "drift"))
+        self.assertEqual(result["statistics"]["num_clusters"], 4)
+
+        # Without the saved reducer a new item cannot be placed: refit, and no reducer is fitted on it alone
+        reducer_path = Path(self.test_output_dir) / "reduction_model.npz"
+        reducer_path.unlink()
+        result = ClusterTool(items=old_items + new_items + unseen_items + make_items("late", 1, [0]),
+                             mode="assign", **params).run()
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["statistics"]["assignment"]["refit_reason"], "reduction model missing")
+        self.assertFalse(result["statistics"]["reduction"]["cached"])
+        self.assertEqual(result["statistics"]["num_clusters"], 4)
+
+    def test_stream_mode(self):
+        """Test streaming clustering of a collection read page by page"""
+        rng = np.random.default_rng(3)
+        centers = rng.normal(size=(4, 64))
+        topics = np.repeat(np.arange(4), [200, 100, 60, 40])
+        client = FakeScrollClient(centers[topics] + 0.05 * rng.normal(size=(400, 64)))
+
+        cluster_tool = ClusterTool(
+            mode="stream",
+            collection_name="test_collection",
+            stream_page_size=50,
+            codebook_size=32,
+            min_cluster_size=10,
+            output_dir=self.test_output_dir
+        )
+        cluster_tool._qdrant_client = lambda: client
+        result = cluster_tool.run()
+
+        self.assertEqual(result["status"], "success")
+        stats = result["statistics"]
+        self.assertEqual(stats["total_items"], 400)
+        self.assertEqual(stats["num_clusters"], 4)
+        self.assertEqual(stats["noise_points"], 0)
+        self.assertEqual(stats["clustering"]["backend"], "stream")
+        self.assertEqual(stats["clustering"]["points_seen"], 400)
+        # Largest cluster first, and every topic lands in exactly one cluster
+        self.assertEqual([len(result["clusters"][label]) for label in range(4)], [200, 100, 60, 40])
+        self.assertEqual(result["clusters"][0][0]["metadata"]["file_path"], "/path/to/0.jpg")
+        # Two full scrolls of 8 pages; only the second fetches payloads
+        self.assertEqual(len(client.scroll_calls), 16)
+        self.assertEqual([call[2] for call in client.scroll_calls[:8]], [False] * 8)
+        # The labelling pass reads only the payload fields kept in the results
+        self.assertTrue(all("file_path" in call[2].include and "exif_data" not in call[2].include
+                            for call in client.scroll_calls[8:]))
+
+    def test_from_collection(self):
+        """Test fit mode reading a whole collection from Qdrant without paging by the caller"""
+        vectors = self.topic_matrix()
+        payloads = [{"file_path": f"/path/to/{i}.jpg", "media_type": "image"} for i in range(len(vectors))]
+        client = FakeQdrantCollection(vectors, payloads)
+
+        cluster_tool = ClusterTool(
+            from_collection=True,
+            collection_name="test_collection",
+            stream_page_size=16,
+            min_cluster_size=5,
+            output_dir=self.test_output_dir
+        )
+        cluster_tool._qdrant_client = lambda: client
+        result = cluster_tool.run()
+
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["statistics"]["total_items"], 60)
+        self.assertEqual(sorted(len(items) for items in result["clusters"].values()), [10, 20, 30])
+        self.assertEqual(len(client.scroll_calls), 4)
+        self.assertEqual(client.count_calls, 1)
+        smallest = min(result["clusters"].values(), key=len)
+        self.assertEqual({item["id"] for item in smallest}, {10 * (i + 1) for i in range(50, 60)})
+
+        # Parallel scrolls over id ranges return the same rows in the same order: a cache hit
+        cluster_tool.fetch_workers = 3
+        result = cluster_tool.run()
+        self.assertEqual(result["status"], "success")
+        self.assertTrue(result["statistics"]["cache"]["hit"])
+
+    def test_snapshot_input(self):
+        """Test clustering a memory-mapped local snapshot with only a few payload fields loaded"""
+        vectors = self.topic_matrix()
+        payloads = [{"file_path": f"/path/to/{i}.jpg", "media_type": "image", "exif_data": {"Make": "X"},
+                     "indexed_at": float(i)} for i in range(len(vectors))]
+        snapshot_dir = os.path.join(self.test_output_dir, "snapshot")
+        export_snapshot(FakeQdrantCollection(vectors, payloads), "test_collection", snapshot_dir, workers=2)
+
+        result = ClusterTool(
+            snapshot_dir=snapshot_dir,
+            min_cluster_size=5,
+            output_dir=self.test_output_dir
+        ).run()
+
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["statistics"]["total_items"], 60)
+        self.assertEqual(sorted(len(items) for items in result["clusters"].values()), [10, 20, 30])
+        item = next(iter(result["clusters"].values()))[0]
+        self.assertEqual(set(item["metadata"]), {"file_path", "media_type"})
+
+    def topic_matrix(self, seed=4):
+        rng = np.random.default_rng(seed)
+        centers = rng.normal(size=(3, 64))
+        topics = np.repeat(np.arange(3), [30, 20, 10])
+        return (centers[topics] + 0.05 * rng.normal(size=(60, 64))).astype(np.float32)
+
+    def test_array_input(self):
+        """Test clustering a float32 matrix passed directly, with ids and metadata as columns"""
+        embeddings = self.topic_matrix()
+        ids = [f"item_{i}" for i in range(60)]
+        metadata = [{"file_path": f"/path/to/{i}.jpg"} for i in range(60)]
+        result = ClusterTool(
+            embeddings=embeddings,
+            ids=ids,
+            metadata=metadata,
+            min_cluster_size=5,
+            output_dir=self.test_output_dir
+        ).run()
+
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["statistics"]["total_items"], 60)
+        self.assertEqual(result["statistics"]["num_clusters"], 3)
+        clustered = {item["id"]: item["metadata"] for items in result["clusters"].values() for item in items}
+        self.assertEqual(clustered["item_7"], {"file_path": "/path/to/7.jpg"})
+        # Profiles: medoid first in each cluster, members ordered by distance to the centroid
+        for label, items in result["clusters"].items():
+            profile = result["profiles"][label]
+            self.assertEqual(profile["size"], len(items))
+            self.assertEqual(items[0]["id"], profile["medoid"])
+            self.assertEqual(profile["representatives"][0], profile["medoid"])
+            self.assertEqual(len(profile["representatives"]), 5)
+            distances = [item["distance"] for item in items]
+            self.assertEqual(distances, sorted(distances))
+        # Normalized in place, no copy
+        np.testing.assert_allclose(np.linalg.norm(embeddings, axis=1), 1.0, rtol=1e-5)
+
+        # Ids default to row numbers; mismatched columns are rejected
+        result = ClusterTool(embeddings=self.topic_matrix(), min_cluster_size=5, output_dir=self.test_output_dir).run()
+        self.assertEqual(sorted(item["id"] for items in result["clusters"].values() for item in items), list(range(60)))
+        result = ClusterTool(embeddings=self.topic_matrix(), ids=ids[:10], output_dir=self.test_output_dir).run()
+        self.assertEqual(result["status"], "error")
+        self.assertIn("60 embeddings", result["message"])
+
+    def test_npy_path_input(self):
+        """Test clustering a memory-mapped .npy file, which must stay untouched"""
+        embeddings = self.topic_matrix()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "embeddings.npy"
+            np.save(path, embeddings)
+            result = ClusterTool(embeddings_path=str(path), min_cluster_size=5, output_dir=self.test_output_dir).run()
+            self.assertEqual(result["status"], "success")
+            self.assertEqual(result["statistics"]["num_clusters"], 3)
+            np.testing.assert_array_equal(np.load(path), embeddings)
+
+    def test_shared_memory_input(self):
+        """Test clustering a matrix held in shared memory by another process"""
+        embeddings = self.topic_matrix()
+        shm = shared_memory.SharedMemory(create=True, size=embeddings.nbytes)
+        try:
+            np.ndarray(embeddings.shape, dtype=np.float32, buffer=shm.buf)[:] = embeddings
+            result = ClusterTool(
+                shared_memory_name=shm.name,
+                embeddings_shape=list(embeddings.shape),
+                min_cluster_size=5,
+                output_dir=self.test_output_dir
+            ).run()
+            self.assertEqual(result["status"], "success")
+            self.assertEqual(result["statistics"]["num_clusters"], 3)
+
+            result = ClusterTool(shared_memory_name=shm.name, output_dir=self.test_output_dir).run()
+            self.assertEqual(result["status"], "error")
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def test_compact_results_and_cache(self):
+        """Test the .npz results and the fingerprint cache"""
+        embeddings = self.topic_matrix()
+        params = dict(min_cluster_size=5, output_dir=self.test_output_dir)
+        first = ClusterTool(embeddings=embeddings.copy(), **params).run()
+        self.assertEqual(first["status"], "success")
+        self.assertFalse(first["statistics"]["cache"]["hit"])
+        self.assertTrue(first["output_file"].endswith("clustering_results.npz"))
+        self.assertFalse((Path(self.test_output_dir) / "clustering_results.json").exists())
+
+        with np.load(first["results_file"]) as data:
+            self.assertEqual(data["labels"].shape, (60,))
+            self.assertEqual(sorted(data["sizes"].tolist()), [10, 20, 30])
+            self.assertEqual(data["centroids"].shape, (3, 64))
+            self.assertTrue((data["cohesion"] > 0.9).all())
+
+        # Same input: served from the cache with the same clusters and current metadata
+        metadata = [{"file_path": f"/path/to/{i}.jpg"} for i in range(60)]
+        second = ClusterTool(embeddings=embeddings.copy(), metadata=metadata, export_json=True, **params).run()
+        self.assertTrue(second["statistics"]["cache"]["hit"])
+        self.assertEqual(second["statistics"]["clustering"], first["statistics"]["clustering"])
+        self.assertEqual(
+            {label: [item["id"] for item in items] for label, items in second["clusters"].items()},
+            {label: [item["id"] for item in items] for label, items in first["clusters"].items()}
+        )
+        self.assertEqual(second["clusters"][0][0]["metadata"]["file_path"], f"/path/to/{second['clusters'][0][0]['id']}.jpg")
+        with open(second["output_file"]) as f:
+            self.assertEqual(json.load(f)["statistics"]["num_clusters"], 3)
+
+        # Different settings or embeddings miss the cache
+        third = ClusterTool(embeddings=embeddings.copy(), min_cluster_size=6, output_dir=self.test_output_dir).run()
+        self.assertFalse(third["statistics"]["cache"]["hit"])
+        changed = embeddings.copy()
+        changed[0, 0] += 1.0
+        self.assertFalse(ClusterTool(embeddings=changed, **params).run()["statistics"]["cache"]["hit"])
+
+    def test_cache_keeps_saved_model(self):
+        """Test that a cache hit never pairs cached labels with another fit's saved model"""
+        params = dict(min_cluster_size=5, output_dir=self.test_output_dir)
+        model_path = Path(self.test_output_dir) / "cluster_model.pkl"
+        first = ClusterTool(embeddings=self.topic_matrix(), **params).run()
+        other = self.topic_matrix()[::-1].copy()
+        ClusterTool(embeddings=other, **params).run()
+
+        # Fit A, fit B, fit A: the third run refits so the model assign mode reads is A's again
+        third = ClusterTool(embeddings=self.topic_matrix(), **params).run()
+        self.assertFalse(third["statistics"]["cache"]["hit"])
+        model = ClusterModel.load(model_path)
+        self.assertEqual(model.fingerprint, first["statistics"]["cache"]["fingerprint"])
+        labels = {item["id"]: label for label, items in third["clusters"].items() for item in items}
+        self.assertEqual({item_id: label for item_id, label in model.labels_by_id.items() if label >= 0}, labels)
+
+        # With the model in place, the next identical fit is served from the cache
+        self.assertTrue(ClusterTool(embeddings=self.topic_matrix(), **params).run()["statistics"]["cache"]["hit"])
+
+    def test_sweep_mode(self):
+        """Test scoring a grid of HDBSCAN settings in one call"""
+        result = ClusterTool(
+            embeddings=self.topic_matrix(),
+            mode="sweep",
+            sweep_min_cluster_sizes=[5, 15, 40],
+            sweep_min_samples=[2, 5],
+            sweep_epsilons=[0.0, 0.5],
+            output_dir=self.test_output_dir
+        ).run()
+
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(len(result["results"]), 12)
+        self.assertEqual(result["statistics"]["trees_built"], 2)
+        self.assertEqual(result["statistics"]["total_items"], 60)
+        by_setting = {(r["min_samples"], r["min_cluster_size"], r["cluster_selection_epsilon"]): r
+                      for r in result["results"]}
+        self.assertEqual(by_setting[(2, 5, 0.0)]["num_clusters"], 3)
+        self.assertEqual(by_setting[(2, 40, 0.0)]["num_clusters"], 0)
+        self.assertEqual(result["best"]["num_clusters"], 3)
+        self.assertIsNotNone(result["best"]["dbcv"])
+        self.assertTrue((Path(self.test_output_dir) / "sweep_results.json").exists())
+        # A sweep only scores settings: no clustering results are written
+        self.assertFalse((Path(self.test_output_dir) / "clustering_results.npz").exists())
+
+    def test_event_segmentation(self):
+        """Test clustering per capture-time event with globally unique cluster ids"""
+        embeddings = self.topic_matrix()
+        # The first 30 items (one scene) were shot in two sessions a week apart; the rest have no EXIF
+        metadata = [
+            {"exif_data": {"DateTimeOriginal": f"2024:05:{1 if i < 15 else 8:02d} 10:{i % 15:02d}:00"}}
+            if i < 30 else {"file_modification_time": "2024-06-01T09:00:00"}
+            for i in range(60)
+        ]
+        result = ClusterTool(
+            embeddings=embeddings,
+            metadata=metadata,
+            segment_events=True,
+            event_workers=1,
+            min_cluster_size=5,
+            output_dir=self.test_output_dir
+        ).run()
+
+        self.assertEqual(result["status"], "success")
+        clustering = result["statistics"]["clustering"]
+        self.assertEqual(clustering["backend"], "events")
+        self.assertEqual(clustering["events"], 3)
+        self.assertEqual(clustering["undated_items"], 0)
+        # The scene is split by session; the other two scenes share the June event
+        self.assertEqual(result["statistics"]["num_clusters"], 4)
+        groups = [range(0, 15), range(15, 30), range(30, 50), range(50, 60)]
+        for items in result["clusters"].values():
+            ids = [item["id"] for item in items]
+            self.assertEqual(sum(all(i in group for i in ids) for group in groups), 1)
+        self.assertEqual(sorted(len(items) for items in result["clusters"].values())[-2:], [10, 20])
+
+        # Assign mode can't place new items by event, so it refits instead of using the nearest centroid
+        late = np.vstack([embeddings, embeddings[:1]])
+        result = ClusterTool(
+            embeddings=late,
+            metadata=metadata + [{"exif_data": {"DateTimeOriginal": "2024:05:08 10:20:00"}}],
+            segment_events=True,
+            event_workers=1,
+            min_cluster_size=5,
+            mode="assign",
+            output_dir=self.test_output_dir
+        ).run()
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["statistics"]["assignment"]["refit_reason"], "event segmentation")
+        self.assertEqual(result["statistics"]["clustering"]["backend"], "events")
+        self.assertEqual(result["statistics"]["total_items"], 61)
+        # The new photo looks like the first session's (item 0) but was shot in the second: never grouped with it
+        labels = {item["id"]: label for label, items in result["clusters"].items() for item in items}
+        self.assertTrue(60 not in labels or labels[60] != labels.get(0))
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
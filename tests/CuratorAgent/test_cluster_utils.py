@@ -0,0 +1,347 @@
+import os
+import unittest
+import hdbscan
+import numpy as np
+from pathlib import Path
+import tempfile
+from sklearn.preprocessing import normalize
+from CuratorAgent.tools.cluster_utils import (
+    ClusterModel,
+    ClusterResults,
+    EmbeddingReducer,
+    ResultsCache,
+    StreamingClusterer,
+    as_embedding_matrix,
+    attach_shared_embeddings,
+    best_sweep_result,
+    choose_backend,
+    cluster_profiles,
+    graph_cluster,
+    knn_graph,
+    load_npy_embeddings,
+    normalize_rows_inplace,
+    relabel_by_size,
+    results_fingerprint,
+    sweep_hdbscan
+)
+from multiprocessing import shared_memory
+
+class TestEmbeddingReducer(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        # 100 points that vary along 4 directions of a 64-d space, plus a little noise
+        self.embeddings = rng.normal(size=(100, 4)) @ rng.normal(size=(4, 64)) + 0.01 * rng.normal(size=(100, 64))
+
+    def test_fit_transform(self):
+        for method in ("pca", "randomized"):
+            reducer = EmbeddingReducer(4, method)
+            reduced = reducer.fit_transform(self.embeddings)
+            self.assertEqual(reduced.shape, (100, 4))
+            self.assertEqual(reduced.dtype, np.float32)
+            self.assertGreater(reducer.explained_variance, 0.99)
+
+    def test_components_capped_by_sample_count(self):
+        reducer = EmbeddingReducer(32).fit(self.embeddings[:10])
+        self.assertEqual(reducer.report()["components"], 10)
+
+    def test_save_load_round_trip(self):
+        reducer = EmbeddingReducer(4, "pca").fit(self.embeddings)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "model.npz"
+            reducer.save(path)
+            loaded = EmbeddingReducer.load(path)
+        self.assertTrue(loaded.matches(4, "pca", 64))
+        self.assertFalse(loaded.matches(8, "pca", 64))
+        np.testing.assert_allclose(loaded.transform(self.embeddings), reducer.transform(self.embeddings))
+
+    def test_invalid_input(self):
+        with self.assertRaises(ValueError):
+            EmbeddingReducer(4, "tsne")
+        with self.assertRaises(RuntimeError):
+            EmbeddingReducer(4).transform(self.embeddings)
+        reducer = EmbeddingReducer(4).fit(self.embeddings)
+        with self.assertRaises(ValueError):
+            reducer.transform(self.embeddings[:, :32])
+        self.assertIsNone(EmbeddingReducer.load(Path("missing_model.npz")))
+
+class TestGraphClustering(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        centers = normalize(rng.normal(size=(4, 32)))
+        self.topics = np.repeat(np.arange(4), 25)
+        self.embeddings = normalize(centers[self.topics] + 0.05 * rng.normal(size=(100, 32))).astype(np.float32)
+
+    def test_knn_graph_matches_brute_force(self):
+        # A tiny block size forces many blocks
+        neighbors, similarities = knn_graph(self.embeddings, 5, block_bytes=4096)
+        full = self.embeddings @ self.embeddings.T
+        np.fill_diagonal(full, -np.inf)
+        expected = np.sort(full, axis=1)[:, -5:]
+        np.testing.assert_allclose(np.sort(similarities, axis=1), expected, rtol=1e-5)
+        self.assertFalse((neighbors == np.arange(100)[:, None]).any())
+
+    def test_knn_graph_rescoring(self):
+        reduced = normalize(EmbeddingReducer(8).fit_transform(self.embeddings))
+        neighbors, similarities = knn_graph(reduced, 5, rescore_vectors=self.embeddings)
+        exact = np.einsum('id,ikd->ik', self.embeddings, self.embeddings[neighbors])
+        np.testing.assert_allclose(similarities, exact, rtol=1e-5)
+
+    def test_graph_cluster_methods(self):
+        neighbors, similarities = knn_graph(self.embeddings, 10)
+        for method in ("components", "label_propagation"):
+            labels, info = graph_cluster(neighbors, similarities, 0.5, 5, method)
+            self.assertEqual(info["method"], method)
+            self.assertEqual(len(set(labels)), 4)
+            # Every topic maps to exactly one cluster
+            for topic in range(4):
+                self.assertEqual(len(set(labels[self.topics == topic])), 1)
+        with self.assertRaises(ValueError):
+            graph_cluster(neighbors, similarities, 0.5, 5, "louvain")
+
+    def test_graph_cluster_threshold_makes_noise(self):
+        neighbors, similarities = knn_graph(self.embeddings, 10)
+        labels, info = graph_cluster(neighbors, similarities, 1.01, 2)
+        self.assertTrue((labels == -1).all())
+        self.assertEqual(info["edges"], 0)
+
+    def test_relabel_by_size(self):
+        labels = relabel_by_size(np.array([7, 7, 7, 3, 3, 9]), 2)
+        np.testing.assert_array_equal(labels, [0, 0, 0, 1, 1, -1])
+
+    def test_cluster_model_centroid_assignment(self):
+        labels = np.repeat([0, 1, 2, -1], 25)
+        model = ClusterModel({"backend": "graph"}, list(range(100)), labels, self.embeddings, min_similarity=0.8)
+        self.assertEqual(model.noise_ratio, 0.25)
+        self.assertEqual(model.labels_by_id[30], 1)
+        np.testing.assert_array_equal(model.assign(None, self.embeddings[:75:25]), [0, 1, 2])
+        # Items of the unclustered topic match no centroid
+        self.assertTrue((model.assign(None, self.embeddings[75:]) == -1).all())
+        self.assertAlmostEqual(model.drift(self.embeddings), 0.0, places=5)
+        self.assertGreater(model.drift(self.embeddings[75:]), 0.1)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "model.pkl"
+            model.save(path)
+            loaded = ClusterModel.load(path)
+            path.write_bytes(b"not a pickle")
+            self.assertIsNone(ClusterModel.load(path))
+        self.assertEqual(loaded.signature, {"backend": "graph"})
+        np.testing.assert_array_equal(loaded.centroids, model.centroids)
+
+    def test_choose_backend(self):
+        self.assertEqual(choose_backend(5_000, 512), "hdbscan")
+        self.assertEqual(choose_backend(50_000, 32), "boruvka_kdtree")
+        self.assertEqual(choose_backend(50_000, 512), "boruvka_balltree")
+        self.assertEqual(choose_backend(300_000, 32), "graph")
+
+class TestStreamingClusterer(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        centers = normalize(rng.normal(size=(5, 32)))
+        self.topics = rng.integers(0, 5, size=2000)
+        self.embeddings = normalize(centers[self.topics] + 0.03 * rng.normal(size=(2000, 32))).astype(np.float32)
+        self.pages = np.array_split(self.embeddings, 20)
+
+    def stream(self, clusterer):
+        for page in self.pages:
+            clusterer.partial_fit(page)
+        info = clusterer.finalize()
+        labels = relabel_by_size(np.concatenate([clusterer.predict(page) for page in self.pages]), 20)
+        return labels, info
+
+    def test_codebooks_recover_topics(self):
+        for method in ("minibatch_kmeans", "birch"):
+            labels, info = self.stream(StreamingClusterer(codebook_size=50, method=method))
+            self.assertEqual(info["points_seen"], 2000)
+            self.assertEqual(len(set(labels)), 5, method)
+            for topic in range(5):
+                self.assertEqual(len(set(labels[self.topics == topic])), 1, method)
+
+    def test_without_refinement_each_centroid_is_a_cluster(self):
+        labels, info = self.stream(StreamingClusterer(codebook_size=50, refine=False))
+        self.assertEqual(info["codebook_size"], 50)
+        self.assertEqual(info["refined_groups"], 0)
+        self.assertGreater(len(set(labels)), 5)
+
+    def test_small_stream_and_errors(self):
+        clusterer = StreamingClusterer(codebook_size=1000)
+        clusterer.partial_fit(self.embeddings[:100])
+        self.assertEqual(clusterer.finalize()["codebook_size"], 100)
+        with self.assertRaises(RuntimeError):
+            StreamingClusterer().predict(self.embeddings)
+        with self.assertRaises(ValueError):
+            StreamingClusterer().finalize()
+        with self.assertRaises(ValueError):
+            StreamingClusterer(method="kmeans")
+
+class TestEmbeddingInputs(unittest.TestCase):
+    def test_normalize_rows_inplace(self):
+        matrix = np.array([[3, 4], [0, 0], [1, 0], [0, 2]], dtype=np.float32)
+        result = normalize_rows_inplace(matrix, block_rows=3)
+        self.assertIs(result, matrix)
+        np.testing.assert_allclose(matrix, [[0.6, 0.8], [0, 0], [1, 0], [0, 1]])
+
+    def test_as_embedding_matrix(self):
+        matrix = np.ones((4, 3), dtype=np.float32)
+        self.assertIs(as_embedding_matrix(matrix), matrix)
+        converted = as_embedding_matrix([[1, 2], [3, 4]])
+        self.assertEqual(converted.dtype, np.float32)
+        self.assertTrue(converted.flags.c_contiguous)
+        with self.assertRaises(ValueError):
+            as_embedding_matrix(np.ones(3))
+
+    def test_load_npy_embeddings_is_copy_on_write(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "embeddings.npy"
+            np.save(path, np.full((5, 2), 2.0, dtype=np.float32))
+            matrix = load_npy_embeddings(str(path))
+            normalize_rows_inplace(matrix)
+            np.testing.assert_allclose(matrix, np.sqrt(0.5))
+            np.testing.assert_array_equal(np.load(path), 2.0)
+
+    def test_attach_shared_embeddings(self):
+        owner = shared_memory.SharedMemory(create=True, size=6 * 4)
+        try:
+            np.ndarray((2, 3), dtype=np.float32, buffer=owner.buf)[:] = [[1, 2, 3], [4, 5, 6]]
+            shm, matrix = attach_shared_embeddings(owner.name, (2, 3))
+            np.testing.assert_array_equal(matrix, [[1, 2, 3], [4, 5, 6]])
+            matrix[0, 0] = 9
+            self.assertEqual(np.ndarray((2, 3), dtype=np.float32, buffer=owner.buf)[0, 0], 9)
+            del matrix
+            shm.close()
+        finally:
+            owner.close()
+            owner.unlink()
+
+class TestClusterResults(unittest.TestCase):
+    def setUp(self):
+        self.embeddings = normalize(np.array([[1, 0], [1, 0.1], [0, 1], [0.1, 1], [-1, -1]], dtype=np.float32))
+        self.labels = np.array([0, 0, 1, 1, -1])
+        self.ids = ["a", "b", "c", "d", "e"]
+
+    def test_statistics_and_groups(self):
+        results = ClusterResults(self.ids, self.labels, self.embeddings)
+        self.assertEqual(results.sizes.tolist(), [2, 2])
+        np.testing.assert_allclose(np.linalg.norm(results.centroids, axis=1), 1.0, rtol=1e-6)
+        expected = np.mean(self.embeddings[:2] @ results.centroids[0])
+        self.assertAlmostEqual(float(results.cohesion[0]), expected, places=5)
+        clusters, noise = results.groups([{"n": i} for i in range(5)])
+        self.assertEqual([item["id"] for item in clusters[1]], ["c", "d"])
+        self.assertAlmostEqual(clusters[0][0]["distance"], float(1 - results.cohesion[0]), places=4)
+        self.assertEqual(results.profiles()[1]["medoid"], "c")
+        self.assertEqual(results.profiles()[1]["representatives"], ["c", "d"])
+        self.assertEqual(noise, [{"id": "e", "metadata": {"n": 4}}])
+
+    def test_save_load_round_trip(self):
+        results = ClusterResults(self.ids, self.labels, self.embeddings, {"clustering": {"backend": "hdbscan"}}, "abc")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "results.npz"
+            results.save(path)
+            loaded = ClusterResults.load(path)
+            self.assertIsNone(ClusterResults.load(Path(tmp) / "missing.npz"))
+        self.assertEqual(loaded.ids, self.ids)
+        np.testing.assert_array_equal(loaded.labels, self.labels)
+        np.testing.assert_array_equal(loaded.centroids, results.centroids)
+        self.assertEqual(loaded.statistics, {"clustering": {"backend": "hdbscan"}})
+        np.testing.assert_array_equal(loaded.representatives, results.representatives)
+        self.assertEqual(loaded.profiles(), results.profiles())
+        self.assertEqual(loaded.fingerprint, "abc")
+
+    def test_fingerprint(self):
+        settings = {"min_cluster_size": 5}
+        fingerprint = results_fingerprint(self.embeddings, self.ids, settings)
+        self.assertEqual(fingerprint, results_fingerprint(self.embeddings.copy(), list(self.ids), dict(settings)))
+        self.assertNotEqual(fingerprint, results_fingerprint(self.embeddings, self.ids, {"min_cluster_size": 6}))
+        self.assertNotEqual(fingerprint, results_fingerprint(self.embeddings, self.ids[::-1], settings))
+        self.assertNotEqual(fingerprint, results_fingerprint(self.embeddings[::-1], self.ids, settings))
+
+    def test_cache_keeps_most_recent_entries(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResultsCache(Path(tmp), max_entries=2)
+            for i, fingerprint in enumerate(["one", "two", "three"]):
+                cache.put(ClusterResults(self.ids, self.labels, fingerprint=fingerprint))
+                os.utime(cache.path(fingerprint), (i, i))
+            self.assertIsNone(cache.get("one"))
+            self.assertIsNotNone(cache.get("two"))
+            self.assertIsNotNone(cache.get("three"))
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        centers = rng.normal(size=(4, 8))
+        self.vectors = normalize(centers[np.repeat(np.arange(4), 50)] + 0.2 * rng.normal(size=(200, 8)))
+
+    def test_matches_full_fits(self):
+        results, timings = sweep_hdbscan(self.vectors, [3, 8], [5, 30, 60], [0.0, 0.3])
+        self.assertEqual(timings["trees_built"], 2)
+        self.assertEqual(timings["combinations"], 12)
+        for result in results:
+            labels = hdbscan.HDBSCAN(
+                min_cluster_size=result["min_cluster_size"],
+                min_samples=result["min_samples"],
+                cluster_selection_epsilon=result["cluster_selection_epsilon"]
+            ).fit_predict(self.vectors)
+            self.assertEqual(result["num_clusters"], labels.max() + 1)
+            self.assertAlmostEqual(result["noise_ratio"], (labels == -1).mean(), places=4)
+
+    def test_epsilon_merges_clusters_and_best_choice(self):
+        results, _ = sweep_hdbscan(self.vectors, [5], [10], [0.0, 2.0])
+        self.assertEqual(results[0]["num_clusters"], 4)
+        self.assertLess(results[1]["num_clusters"], 4)
+        best = best_sweep_result(results)
+        self.assertEqual(best["cluster_selection_epsilon"], 0.0)
+        self.assertGreater(best["silhouette"], 0.5)
+        self.assertIsNone(best_sweep_result([{"dbcv": None, "silhouette": None, "noise_ratio": 1.0}]))
+
+class TestClusterProfiles(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(6)
+        centers = rng.normal(size=(3, 16))
+        self.labels = np.repeat([2, 0, 5, -1], [40, 25, 3, 7])
+        topics = np.repeat([0, 1, 2], [40, 25, 3])
+        self.embeddings = normalize(np.vstack([
+            centers[topics] + 0.4 * rng.normal(size=(68, 16)), rng.normal(size=(7, 16))
+        ])).astype(np.float32)
+
+    def test_statistics_match_brute_force(self):
+        profiles = cluster_profiles(self.embeddings, self.labels, n_representatives=4)
+        self.assertEqual(profiles["cluster_labels"].tolist(), [0, 2, 5])
+        self.assertEqual(profiles["sizes"].tolist(), [25, 40, 3])
+        for i, label in enumerate([0, 2, 5]):
+            members = np.flatnonzero(self.labels == label)
+            vectors = self.embeddings[members]
+            # Exact medoid: smallest summed cosine distance to the other members
+            self.assertEqual(profiles["medoids"][i], members[(1 - vectors @ vectors.T).sum(axis=1).argmin()])
+            mean = vectors.mean(axis=0)
+            self.assertAlmostEqual(float(profiles["dispersion"][i]), float(((vectors - mean) ** 2).sum(axis=1).mean()),
+                                   places=4)
+            distances = 1 - vectors @ (mean / np.linalg.norm(mean))
+            np.testing.assert_allclose(profiles["distances"][members], distances, atol=1e-5)
+            self.assertAlmostEqual(float(profiles["radius"][i]), float(distances.max()), places=5)
+        self.assertTrue(np.isnan(profiles["distances"][self.labels == -1]).all())
+
+        # Members ordered by cluster, then distance
+        order = profiles["order"]
+        self.assertEqual(len(order), 68)
+        self.assertEqual(order[0], profiles["medoids"][0])
+        first = order[:25]
+        self.assertTrue((np.diff(profiles["distances"][first]) >= 0).all())
+
+    def test_representatives_are_distinct_and_spread(self):
+        profiles = cluster_profiles(self.embeddings, self.labels, n_representatives=4)
+        representatives = profiles["representatives"]
+        self.assertEqual(representatives.shape, (3, 4))
+        for i, label in enumerate([0, 2, 5]):
+            picked = representatives[i][representatives[i] >= 0]
+            self.assertEqual(picked[0], profiles["medoids"][i])
+            self.assertEqual(len(set(picked.tolist())), len(picked))
+            self.assertTrue((self.labels[picked] == label).all())
+        # A 3-item cluster can only give 3 representatives
+        self.assertEqual(representatives[2, 3], -1)
+        # The second pick is the member farthest from the medoid
+        members = np.flatnonzero(self.labels == 2)
+        farthest = members[(1 - self.embeddings[members] @ self.embeddings[representatives[1, 0]]).argmax()]
+        self.assertEqual(representatives[1, 1], farthest)
+
+if __name__ == '__main__':
+    unittest.main()
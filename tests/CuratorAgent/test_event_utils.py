@@ -0,0 +1,79 @@
+import unittest
+from datetime import datetime
+import numpy as np
+from CuratorAgent.tools.event_utils import (
+    capture_time,
+    capture_times,
+    cluster_events,
+    merge_event_labels,
+    parse_time,
+    segment_events
+)
+
+class TestCaptureTimes(unittest.TestCase):
+    def test_parse_time_formats(self):
+        expected = datetime(2024, 5, 1, 12, 30, 0).timestamp()
+        self.assertEqual(parse_time("2024:05:01 12:30:00"), expected)
+        self.assertEqual(parse_time("2024-05-01T12:30:00"), expected)
+        self.assertEqual(parse_time(datetime(2024, 5, 1, 12, 30)), expected)
+        self.assertEqual(parse_time(expected), expected)
+        self.assertIsNone(parse_time("0000:00:00 00:00:00"))
+        self.assertIsNone(parse_time("not a date"))
+        self.assertIsNone(parse_time(None))
+
+    def test_exif_before_file_times(self):
+        metadata = {
+            "exif_data": {"DateTimeOriginal": "2024:05:01 12:30:00", "DateTime": "2024:06:01 08:00:00"},
+            "file_modification_time": "2025-01-01T00:00:00"
+        }
+        self.assertEqual(capture_time(metadata), datetime(2024, 5, 1, 12, 30).timestamp())
+        metadata["exif_data"] = {"DateTimeOriginal": "0000:00:00 00:00:00"}
+        self.assertEqual(capture_time(metadata), datetime(2025, 1, 1).timestamp())
+        times = capture_times([metadata, {}, None])
+        self.assertEqual(times[0], datetime(2025, 1, 1).timestamp())
+        self.assertTrue(np.isnan(times[1:]).all())
+
+class TestEventSegmentation(unittest.TestCase):
+    def test_adaptive_gaps(self):
+        day = 86400.0
+        # Two bursts a few seconds apart, separated by 3 hours, then a day later a slow series every 2 hours
+        times = np.concatenate([
+            1000 + np.arange(20) * 5.0,
+            1000 + 3 * 3600 + np.arange(20) * 5.0,
+            1000 + 2 * day + np.arange(10) * 7200.0
+        ])
+        shuffled = np.random.default_rng(0).permutation(len(times))
+        events = segment_events(times[shuffled])
+        recovered = np.empty_like(events)
+        recovered[shuffled] = events
+        self.assertEqual(recovered.tolist(), [0] * 20 + [1] * 20 + [2] * 10)
+
+    def test_undated_items_form_their_own_event(self):
+        events = segment_events(np.array([10.0, np.nan, 20.0, np.nan]))
+        self.assertEqual(events.tolist(), [0, 1, 0, 1])
+        self.assertEqual(segment_events(np.array([np.nan, np.nan])).tolist(), [0, 0])
+
+class TestEventClustering(unittest.TestCase):
+    def test_labels_are_unique_across_events(self):
+        rng = np.random.default_rng(1)
+        centers = rng.normal(size=(2, 16))
+        # Two events showing the same two scenes, plus an event too small to cluster
+        topics = np.array([0] * 15 + [1] * 10 + [0] * 12 + [1] * 8 + [0] * 3)
+        events = np.array([0] * 25 + [1] * 20 + [2] * 3)
+        vectors = centers[topics] + 0.05 * rng.normal(size=(len(topics), 16))
+        for workers in (1, 2):
+            labels, info = cluster_events(vectors, events, min_cluster_size=5, min_samples=3, workers=workers)
+            self.assertEqual(info["events"], 3)
+            self.assertEqual(info["clustered_events"], 2)
+            # Same scene in different events: different clusters, numbered by size
+            self.assertEqual(labels[:15].tolist(), [0] * 15)
+            self.assertEqual(len(set(labels[:45])), 4)
+            self.assertEqual(labels[45:].tolist(), [-1] * 3)
+
+    def test_merge_event_labels(self):
+        members = {0: np.array([0, 2]), 1: np.array([1, 3, 4])}
+        labels = merge_event_labels(members, {0: np.array([0, -1]), 1: np.array([0, 0, 1])}, 5)
+        self.assertEqual(labels.tolist(), [1, 0, -1, 0, 2])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,10 @@ import unittest
 from pathlib import Path
 import json
 import shutil
+import numpy as np
 from CuratorAgent.tools.HTMLGalleryWriterTool import HTMLGalleryWriterTool
+from CuratorAgent.tools.qdrant_utils import export_snapshot
+from test_base import FakeQdrantCollection
 
 class TestHTMLGalleryWriterTool(unittest.TestCase):
     def setUp(self):
@@ -190,5 +193,118 @@ class TestHTMLGalleryWriterTool(unittest.TestCase):
         self.assertIn('beach_2.mp4', html_content)
         self.assertIn('video-overlay', html_content)
 
+    def test_video_previews(self):
+        """Test that videos are shown by their poster and sprite sheet, never the video file"""
+        preview_dir = Path(self.test_output_dir + "_previews")
+        preview_dir.mkdir(parents=True, exist_ok=True)
+        self.addCleanup(shutil.rmtree, preview_dir)
+        (preview_dir / "beach_2_poster.jpg").write_bytes(b"poster")
+        (preview_dir / "beach_2_sprite.jpg").write_bytes(b"sprite")
+        video = self.test_clusters["0"][1]["metadata"]
+        video["poster_path"] = str(preview_dir / "beach_2_poster.jpg")
+        video["sprite_sheet"] = {
+            "path": str(preview_dir / "beach_2_sprite.jpg"),
+            "columns": 2,
+            "rows": 2,
+            "timestamps": [1.0, 2.0, 3.0]
+        }
+        video_without_poster = {
+            "id": "test_4",
+            "metadata": {"file_path": "/path/to/mountain_2.mp4", "media_type": "video"}
+        }
+        self.test_clusters["1"].append(video_without_poster)
+
+        gallery_tool = HTMLGalleryWriterTool(
+            clusters=self.test_clusters,
+            summaries=self.test_summaries,
+            output_dir=self.test_output_dir,
+            title="Preview Gallery"
+        )
+        result = gallery_tool.run()
+        self.assertEqual(result["status"], "success")
+
+        with open(Path(self.test_output_dir) / "index.html", 'r') as f:
+            html_content = f.read()
+
+        # Previews are copied into the gallery and referenced relatively
+        copied = sorted(p.name for p in (Path(self.test_output_dir) / "media").iterdir())
+        self.assertEqual(len(copied), 2)
+        poster = next(name for name in copied if name.endswith("_poster.jpg"))
+        self.assertIn(f'src="media/{poster}"', html_content)
+        self.assertIn('data-sprite-columns="2"', html_content)
+        self.assertIn('data-sprite-count="3"', html_content)
+
+        # No <img> ever points at a video file
+        self.assertNotIn('src="/path/to/beach_2.mp4"', html_content)
+        self.assertNotIn('src="/path/to/mountain_2.mp4"', html_content)
+        self.assertIn('video-placeholder', html_content)
+
+    def test_regenerated_preview_is_copied_again(self):
+        """Test that a poster rewritten at the same path replaces the gallery's copy"""
+        preview_dir = Path(self.test_output_dir + "_previews")
+        preview_dir.mkdir(parents=True, exist_ok=True)
+        self.addCleanup(shutil.rmtree, preview_dir)
+        poster = preview_dir / "beach_2_poster.jpg"
+        poster.write_bytes(b"old poster")
+        self.test_clusters["0"][1]["metadata"]["poster_path"] = str(poster)
+
+        def render():
+            result = HTMLGalleryWriterTool(
+                clusters=self.test_clusters,
+                summaries=self.test_summaries,
+                output_dir=self.test_output_dir
+            ).run()
+            self.assertEqual(result["status"], "success")
+            return [p.read_bytes() for p in (Path(self.test_output_dir) / "media").iterdir()]
+
+        self.assertEqual(render(), [b"old poster"])
+        poster.write_bytes(b"new poster!")
+        self.assertEqual(render(), [b"new poster!"])
+
+    def test_representatives_first(self):
+        """Test that profile representatives lead each cluster and large clusters are cut"""
+        gallery_tool = HTMLGalleryWriterTool(
+            clusters=self.test_clusters,
+            summaries=self.test_summaries,
+            profiles={"0": {"representatives": ["test_2"]}},
+            max_items_per_cluster=1,
+            output_dir=self.test_output_dir
+        )
+        result = gallery_tool.run()
+        self.assertEqual(result["status"], "success")
+
+        with open(Path(self.test_output_dir) / "index.html", 'r') as f:
+            html_content = f.read()
+        self.assertIn('class="media-item representative" data-path="/path/to/beach_2.mp4"', html_content)
+        self.assertNotIn('data-path="/path/to/beach_1.jpg"', html_content)
+        self.assertIn('+1 more items', html_content)
+        self.assertIn('data-path="/path/to/mountain_1.jpg"', html_content)
+
+    def test_snapshot_metadata(self):
+        """Test that clusters of bare ids are shown with metadata read from a snapshot"""
+        snapshot_dir = Path(self.test_output_dir) / "snapshot"
+        payloads = [
+            {"file_path": f"/path/to/photo_{i}.jpg", "media_type": "image", "exif_data": {"Make": "Camera"}}
+            for i in range(4)
+        ]
+        export_snapshot(FakeQdrantCollection(np.eye(4), payloads), "media", snapshot_dir)
+
+        gallery_tool = HTMLGalleryWriterTool(
+            clusters={"0": [{"id": 10}, {"id": 20}, {"id": 30}], "1": [{"id": 40, "metadata": {}}]},
+            summaries=self.test_summaries,
+            max_items_per_cluster=2,
+            snapshot_dir=str(snapshot_dir),
+            output_dir=self.test_output_dir
+        )
+        result = gallery_tool.run()
+        self.assertEqual(result["status"], "success")
+
+        with open(Path(self.test_output_dir) / "index.html", 'r') as f:
+            html_content = f.read()
+        self.assertIn('data-path="/path/to/photo_1.jpg"', html_content)
+        self.assertIn('data-path="/path/to/photo_3.jpg"', html_content)
+        self.assertNotIn('photo_2.jpg', html_content)
+        self.assertNotIn('Camera', html_content)
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
@@ -1,112 +1,247 @@
 import unittest
-from unittest.mock import patch, MagicMock
-from CuratorAgent.tools.QdrantFetcherTool import QdrantFetcherTool
-from qdrant_client.http.models import Filter, FieldCondition, MatchValue, Range
-from datetime import datetime
+import shutil
+import tempfile
+from unittest.mock import MagicMock
+import numpy as np
+from CuratorAgent.tools.QdrantFetcherTool import QdrantFetcherTool, query_cache
+from CuratorAgent.tools.qdrant_utils import Snapshot
+from qdrant_client.http.models import Filter, FieldCondition, Range
+from test_base import FakeQdrantCollection
 
 class TestQdrantFetcherTool(unittest.TestCase):
     def setUp(self):
-        self.mock_client = MagicMock()
-        self.mock_collection = MagicMock()
-        self.mock_client.get_collection.return_value = self.mock_collection
-        
-        # Setup default scroll response
-        self.mock_points = [
-            {"id": 1, "payload": {"url": "test1.jpg", "type": "image", "timestamp": "2024-01-01"}},
-            {"id": 2, "payload": {"url": "test2.jpg", "type": "image", "timestamp": "2024-01-02"}}
+        rng = np.random.default_rng(0)
+        self.payloads = [
+            {
+                "file_path": f"/path/to/{i}.jpg",
+                "media_type": "image" if i % 3 else "video",
+                "file_creation_time": f"2024-01-{i + 1:02d}"
+            }
+            for i in range(25)
         ]
-        self.mock_client.scroll.return_value = (self.mock_points, None)
-        
+        self.client = FakeQdrantCollection(rng.normal(size=(25, 8)), self.payloads)
+
         self.tool = QdrantFetcherTool(
             collection_name="test_collection",
-            limit=10,
-            media_type=None,
-            start_date=None,
-            end_date=None
+            limit=10
         )
-        self.tool._qdrant_client = self.mock_client
+        self.tool._qdrant_client = lambda: self.client
+        self.write_version = 0
+        self.tool._write_version = lambda client, collection_name: self.write_version
+        query_cache.clear()
+
+    def last_filter(self):
+        return self.client.scroll_calls[-1]["scroll_filter"]
 
-    @patch('CuratorAgent.tools.QdrantFetcherTool.QdrantClient')
-    def test_basic_fetch(self, mock_qdrant):
-        mock_qdrant.return_value = self.mock_client
+    def test_basic_fetch(self):
         result = self.tool.run()
-        
+
         self.assertEqual(result["status"], "success")
-        self.assertEqual(len(result["media_items"]), 2)
-        self.mock_client.scroll.assert_called_once()
+        self.assertEqual(len(result["items"]), 10)
+        self.assertEqual(result["total_items"], 25)
+        self.assertEqual(result["items"][0]["id"], 10)
+        self.assertEqual(len(result["items"][0]["embedding"]), 8)
+        self.assertEqual(result["items"][0]["metadata"]["file_path"], "/path/to/0.jpg")
+        self.assertTrue(result["has_more"])
+        self.assertEqual(len(self.client.scroll_calls), 1)
 
-    @patch('CuratorAgent.tools.QdrantFetcherTool.QdrantClient')
-    def test_media_type_filter(self, mock_qdrant):
-        mock_qdrant.return_value = self.mock_client
+    def test_media_type_filter(self):
         self.tool.media_type = "image"
         result = self.tool.run()
-        
-        # Get the filter argument from the last call
-        call_args = self.mock_client.scroll.call_args
-        self.assertIsNotNone(call_args)
-        filter_args = call_args[1]["filter"]
-        
-        # Verify filter conditions
+
+        filter_args = self.last_filter()
         self.assertIsInstance(filter_args, Filter)
         self.assertEqual(len(filter_args.must), 1)
         self.assertIsInstance(filter_args.must[0], FieldCondition)
-        self.assertEqual(filter_args.must[0].key, "type")
+        self.assertEqual(filter_args.must[0].key, "media_type")
         self.assertEqual(filter_args.must[0].match.value, "image")
+        # The total is the filtered count, not the collection size
+        self.assertEqual(result["total_items"], 16)
+        self.assertTrue(all(item["metadata"]["media_type"] == "image" for item in result["items"]))
 
-    @patch('CuratorAgent.tools.QdrantFetcherTool.QdrantClient')
-    def test_date_range_filter(self, mock_qdrant):
-        mock_qdrant.return_value = self.mock_client
-        self.tool.start_date = "2024-01-01"
-        self.tool.end_date = "2024-01-31"
+    def test_date_range_filter(self):
+        self.tool.date_range = {"start": "2024-01-01", "end": "2024-01-05"}
         result = self.tool.run()
-        
-        call_args = self.mock_client.scroll.call_args
-        self.assertIsNotNone(call_args)
-        filter_args = call_args[1]["filter"]
-        
-        self.assertIsInstance(filter_args, Filter)
+
+        filter_args = self.last_filter()
         self.assertEqual(len(filter_args.must), 1)  # Only date range filter
         date_condition = filter_args.must[0]
-        self.assertIsInstance(date_condition, FieldCondition)
-        self.assertEqual(date_condition.key, "timestamp")
+        self.assertEqual(date_condition.key, "file_creation_time")
         self.assertIsInstance(date_condition.range, Range)
         self.assertEqual(date_condition.range.gte, "2024-01-01")
-        self.assertEqual(date_condition.range.lte, "2024-01-31")
+        self.assertEqual(date_condition.range.lte, "2024-01-05")
+        self.assertEqual(result["total_items"], 5)
+        self.assertFalse(result["has_more"])
 
-    @patch('CuratorAgent.tools.QdrantFetcherTool.QdrantClient')
-    def test_combined_filters(self, mock_qdrant):
-        mock_qdrant.return_value = self.mock_client
+    def test_combined_filters(self):
         self.tool.media_type = "image"
-        self.tool.start_date = "2024-01-01"
-        self.tool.end_date = "2024-01-31"
+        self.tool.date_range = {"start": "2024-01-01", "end": "2024-01-10"}
         result = self.tool.run()
-        
-        call_args = self.mock_client.scroll.call_args
-        self.assertIsNotNone(call_args)
-        filter_args = call_args[1]["filter"]
-        
-        self.assertIsInstance(filter_args, Filter)
-        self.assertEqual(len(filter_args.must), 2)  # Both type and date range filters
 
-    @patch('CuratorAgent.tools.QdrantFetcherTool.QdrantClient')
-    def test_pagination(self, mock_qdrant):
-        mock_qdrant.return_value = self.mock_client
-        self.tool.limit = 10
+        self.assertEqual(len(self.last_filter().must), 2)  # Both type and date range filters
+        self.assertEqual(result["total_items"], 6)
+
+    def test_pagination(self):
+        result = self.tool.run()
+        call_args = self.client.scroll_calls[0]
+        self.assertEqual(call_args["limit"], 10)
+        self.assertIsNone(call_args["offset"])
+
+        # Following next_cursor walks the collection by point id, without gaps or repeats
+        seen = [item["id"] for item in result["items"]]
+        while result["has_more"]:
+            self.tool.cursor = result["next_cursor"]
+            result = self.tool.run()
+            seen.extend(item["id"] for item in result["items"])
+        self.assertEqual(seen, [10 * (i + 1) for i in range(25)])
+        self.assertIsNone(result["next_cursor"])
+
+    def test_small_limit(self):
+        self.tool.limit = 4
+        first = self.tool.run()
+        self.tool.cursor = first["next_cursor"]
+        second = self.tool.run()
+        self.assertEqual([item["id"] for item in second["items"]], [50, 60, 70, 80])
+
+    def test_cursor_from_other_query(self):
+        first = self.tool.run()
+        self.tool.cursor = first["next_cursor"]
+        self.tool.media_type = "video"
+        result = self.tool.run()
+        self.assertEqual(result["status"], "error")
+        self.assertIn("different collection or filter", result["message"])
+
+        self.tool.cursor = "not-a-cursor"
+        self.assertEqual(self.tool.run()["status"], "error")
+
+    def test_projections(self):
+        for payload in self.payloads:
+            payload["exif_data"] = {"Make": "Camera", "MakerNote": "x" * 100}
+
+        self.tool.projection = "cluster"
+        item = self.tool.run()["items"][0]
+        self.assertEqual(len(item["embedding"]), 8)
+        self.assertEqual(set(item["metadata"]), {"file_path", "media_type"})
+
+        self.tool.projection = "gallery"
+        item = self.tool.run()["items"][0]
+        self.assertNotIn("embedding", item)
+        self.assertFalse(self.client.scroll_calls[-1]["with_vectors"])
+        self.assertNotIn("exif_data", item["metadata"])
+
+        # Explicit settings override the projection
+        self.tool.with_vectors = True
+        self.tool.payload_exclude = ["exif_data"]
+        item = self.tool.run()["items"][0]
+        self.assertIn("embedding", item)
+        self.assertEqual(set(item["metadata"]), {"file_path", "media_type", "file_creation_time"})
+
+        self.tool.projection = "ids"
+        self.tool.with_vectors = None
+        self.tool.payload_exclude = None
+        result = self.tool.run()
+        self.assertEqual(result["items"][0], {"id": 10, "metadata": {}})
+        self.assertFalse(self.client.scroll_calls[-1]["with_payload"])
+
+        self.tool.payload_include = ["file_path"]
+        self.tool.payload_exclude = ["exif_data"]
+        self.assertEqual(self.tool.run()["status"], "error")
+
+    def test_snapshot_export(self):
+        export_dir = tempfile.mkdtemp()
+        try:
+            for i, payload in enumerate(self.payloads):
+                payload["indexed_at"] = 1000.0 + i
+            self.tool.export_dir = export_dir
+            self.tool.media_type = "image"
+            self.tool.workers = 3
+            result = self.tool.run()
+
+            self.assertEqual(result["status"], "success")
+            self.assertEqual(result["total_items"], 16)
+            self.assertEqual(result["statistics"]["mode"], "full")
+            self.assertEqual(result["statistics"]["fetch"]["workers"], 3)
+            snapshot = Snapshot(result["snapshot_dir"])
+            self.assertEqual(snapshot.embeddings().shape, (16, 8))
+            self.assertEqual(snapshot.embeddings().dtype, np.float32)
+            self.assertEqual(set(snapshot.column("media_type")), {"image"})
+
+            # The same query again refreshes the snapshot instead of re-reading it
+            self.client.points[0].payload = {**self.payloads[1], "indexed_at": 2000.0}
+            result = self.tool.run()
+            self.assertEqual(result["statistics"]["mode"], "incremental")
+            self.assertEqual(result["statistics"]["added"], 1)
+            self.assertEqual(result["total_items"], 17)
+
+            # Without vectors there is nothing to snapshot
+            self.tool.projection = "gallery"
+            self.assertEqual(self.tool.run()["status"], "error")
+
+            # A different query or payload selection replaces it
+            self.tool.projection = "full"
+            self.tool.payload_exclude = ["file_creation_time"]
+            result = self.tool.run()
+            self.assertEqual(result["statistics"]["mode"], "full")
+            self.assertNotIn("file_creation_time", Snapshot(export_dir).columns)
+            self.assertIn("indexed_at", Snapshot(export_dir).columns)
+            self.assertEqual(self.tool.run()["statistics"]["mode"], "incremental")
+
+            self.tool.media_type = None
+            result = self.tool.run()
+            self.assertEqual(result["statistics"]["mode"], "full")
+            self.assertEqual(result["total_items"], 25)
+        finally:
+            shutil.rmtree(export_dir)
+
+    def test_result_cache(self):
+        first = self.tool.run()
+        self.assertFalse(first["cache"]["hit"])
+        self.assertEqual(first["cache"]["misses"], 1)
+
+        # The same query is answered without reading Qdrant again
+        second = self.tool.run()
+        self.assertTrue(second["cache"]["hit"])
+        self.assertEqual(second["items"], first["items"])
+        self.assertEqual(len(self.client.scroll_calls), 1)
+        self.assertEqual(self.client.count_calls, 1)
+        self.assertEqual(second["cache"]["hit_rate"], 0.5)
+        self.assertGreaterEqual(second["cache"]["saved_seconds"], 0)
+
+        # Changing returned items does not change what later hits return
+        expected = [{**item, "metadata": dict(item["metadata"])} for item in first["items"]]
+        first["items"][0]["metadata"]["caption"] = "edited"
+        second["items"][1]["metadata"].clear()
+        second["items"].pop()
+        self.assertEqual(self.tool.run()["items"], expected)
+
+        # Another page, filter or projection is a different entry
+        self.tool.cursor = first["next_cursor"]
+        self.assertFalse(self.tool.run()["cache"]["hit"])
+        self.tool.cursor = None
+        self.tool.projection = "ids"
+        self.assertFalse(self.tool.run()["cache"]["hit"])
+        self.tool.projection = "full"
+
+        # A write to the collection invalidates what was cached before it
+        self.write_version = 1
+        third = self.tool.run()
+        self.assertFalse(third["cache"]["hit"])
+        self.assertEqual(third["cache"]["invalidated"], 1)
+        self.assertTrue(self.tool.run()["cache"]["hit"])
+
+        self.tool.use_cache = False
         result = self.tool.run()
-        
-        call_args = self.mock_client.scroll.call_args
-        self.assertIsNotNone(call_args)
-        self.assertEqual(call_args[1]["limit"], 10)
-        self.assertIsNone(call_args[1]["offset"])
-
-    @patch('CuratorAgent.tools.QdrantFetcherTool.QdrantClient')
-    def test_error_handling(self, mock_qdrant):
-        mock_qdrant.return_value = self.mock_client
-        self.mock_client.scroll.side_effect = Exception("Database error")
+        self.assertNotIn("cache", result)
+        self.assertEqual(len(self.client.scroll_calls), 5)
+
+    def test_error_handling(self):
+        failing_client = MagicMock()
+        failing_client.count.side_effect = Exception("Database error")
+        self.tool._qdrant_client = lambda: failing_client
         result = self.tool.run()
-        
+
         self.assertEqual(result["status"], "error")
         self.assertIn("Database error", result["message"])
 
 if __name__ == '__main__':
-    unittest.main() 
\ No newline at end of file
+    unittest.main()
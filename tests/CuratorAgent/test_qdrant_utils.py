@@ -0,0 +1,364 @@
+import unittest
+import shutil
+import tempfile
+import uuid
+from pathlib import Path
+from unittest.mock import patch
+import numpy as np
+from CuratorAgent.tools.qdrant_utils import (
+    PointBatch,
+    QueryCache,
+    Snapshot,
+    build_filter,
+    count_points,
+    decode_cursor,
+    encode_cursor,
+    export_snapshot,
+    fetch_points,
+    id_range_partitions,
+    iter_point_batches,
+    parallel_fetch,
+    payload_selector,
+    query_scope,
+    refresh_snapshot
+)
+from CuratorAgent.tools import qdrant_utils
+from test_base import FakeQdrantCollection, MockPoint
+
+class TestCursors(unittest.TestCase):
+    def test_round_trip(self):
+        scope = query_scope("media", media_type="image")
+        for offset in (0, 12345, "3f2a9c1e-0000-4000-8000-000000000000"):
+            cursor = encode_cursor(offset, scope)
+            self.assertIsInstance(cursor, str)
+            self.assertEqual(decode_cursor(cursor, scope), offset)
+
+    def test_rejects_other_query(self):
+        cursor = encode_cursor(10, query_scope("media", media_type="image"))
+        with self.assertRaises(ValueError):
+            decode_cursor(cursor, query_scope("media", media_type="video"))
+        with self.assertRaises(ValueError):
+            decode_cursor(cursor, query_scope("other", media_type="image"))
+        with self.assertRaises(ValueError):
+            decode_cursor("%%%", query_scope("media"))
+
+    def test_build_filter(self):
+        self.assertIsNone(build_filter())
+        self.assertEqual(len(build_filter("image", {"start": "2024-01-01", "end": "2024-02-01"}).must), 2)
+
+class TestPointBatches(unittest.TestCase):
+    def setUp(self):
+        self.vectors = np.random.default_rng(1).normal(size=(23, 6))
+        payloads = [{"media_type": "image" if i % 2 else "video", "n": i} for i in range(23)]
+        self.client = FakeQdrantCollection(self.vectors, payloads)
+
+    def test_batches_follow_next_page_offset(self):
+        batches = list(iter_point_batches(self.client, "media", batch_size=10))
+        self.assertEqual([len(batch.ids) for batch in batches], [10, 10, 3])
+        self.assertTrue(all(isinstance(batch, PointBatch) for batch in batches))
+        self.assertEqual(batches[0].vectors.dtype, np.float32)
+        np.testing.assert_allclose(np.concatenate([b.vectors for b in batches]), self.vectors, rtol=1e-6)
+        # Offsets are point ids returned by the previous page, not row counts
+        self.assertEqual([call["offset"] for call in self.client.scroll_calls], [None, 110, 210])
+        self.assertIsNone(batches[-1].cursor)
+
+    def test_resume_from_batch_cursor(self):
+        first = next(iter_point_batches(self.client, "media", batch_size=10))
+        rest = list(iter_point_batches(self.client, "media", batch_size=10, cursor=first.cursor))
+        self.assertEqual(first.ids + [i for batch in rest for i in batch.ids], [10 * (i + 1) for i in range(23)])
+
+    def test_vectors_and_payloads_optional(self):
+        batch = next(iter_point_batches(self.client, "media", batch_size=5, with_payload=False))
+        self.assertIsNone(batch.payloads)
+        batch = next(iter_point_batches(self.client, "media", batch_size=5, with_vectors=False))
+        self.assertIsNone(batch.vectors)
+        self.assertEqual(batch.payloads[0]["n"], 0)
+
+    def test_named_vectors(self):
+        client = FakeQdrantCollection(self.vectors[:3])
+        for point in client.points:
+            point.vector = {"clip": point.vector}
+        batch = next(iter_point_batches(client, "media", with_payload=False, vector_name="clip"))
+        np.testing.assert_allclose(batch.vectors, self.vectors[:3], rtol=1e-6)
+
+    def test_fetch_whole_collection(self):
+        ids, matrix, payloads, cursor = fetch_points(self.client, "media", batch_size=4)
+        self.assertEqual(matrix.shape, (23, 6))
+        self.assertEqual(len(ids), 23)
+        self.assertEqual(payloads[22]["n"], 22)
+        self.assertIsNone(cursor)
+        self.assertEqual(self.client.count_calls, 1)
+
+    def test_fetch_filtered_count(self):
+        images = build_filter("image")
+        self.assertEqual(count_points(self.client, "media", images), 11)
+        ids, matrix, payloads, _ = fetch_points(self.client, "media", images, batch_size=4)
+        self.assertEqual(len(matrix), 11)
+        self.assertTrue(all(payload["media_type"] == "image" for payload in payloads))
+
+    def test_fetch_resumes_inside_page(self):
+        scope = query_scope("media")
+        ids, _, _, cursor = fetch_points(self.client, "media", batch_size=10, max_items=15, scope=scope)
+        self.assertEqual(len(ids), 15)
+        self.assertEqual(decode_cursor(cursor, scope), 160)
+        more, _, _, _ = fetch_points(self.client, "media", batch_size=10, cursor=cursor, scope=scope)
+        self.assertEqual(ids + more, [10 * (i + 1) for i in range(23)])
+
+    def test_fetch_collection_growing_while_read(self):
+        client = FakeQdrantCollection(self.vectors)
+        original_scroll = client.scroll
+
+        def scroll_and_insert(**kwargs):
+            # A point is ingested after the count, while the first page is read
+            if kwargs["offset"] is None:
+                client.points.append(MockPoint(id=1000, vector=[0.0] * 6, payload={}))
+            return original_scroll(**kwargs)
+
+        client.scroll = scroll_and_insert
+        ids, matrix, _, _ = fetch_points(client, "media", batch_size=10)
+        self.assertEqual(len(ids), 24)
+        self.assertEqual(matrix.shape, (24, 6))
+
+class TestParallelFetch(unittest.TestCase):
+    def setUp(self):
+        self.vectors = np.random.default_rng(2).normal(size=(103, 6)).astype(np.float32)
+        self.payloads = [{"n": i, "media_type": "image" if i % 4 else "video", "shard_bucket": i % 64}
+                         for i in range(103)]
+
+    def test_id_ranges_match_sequential_scroll(self):
+        client = FakeQdrantCollection(self.vectors, self.payloads)
+        ids, matrix, payloads, stats = parallel_fetch(client, "media", workers=4, batch_size=10)
+        expected_ids, expected, _, _ = fetch_points(client, "media", batch_size=10)
+        self.assertEqual(ids.dtype, np.int64)
+        self.assertEqual(ids.tolist(), expected_ids)
+        np.testing.assert_array_equal(matrix, expected)
+        self.assertEqual([p["n"] for p in payloads], list(range(103)))
+        self.assertEqual(stats["points"], 103)
+        self.assertEqual(stats["workers"], 4)
+        self.assertEqual(sum(worker["points"] for worker in stats["per_worker"]), 103)
+        self.assertTrue(all(worker["points"] > 0 for worker in stats["per_worker"]))
+        self.assertIn("points_per_sec", stats)
+
+    def test_id_ranges_find_sparse_integer_bounds(self):
+        client = FakeQdrantCollection(self.vectors[:3], ids=[5, 70_000, 1_000_000_007])
+        ranges = id_range_partitions(client, "media", 2)
+        self.assertEqual(ranges[0][0], 5)
+        self.assertEqual(ranges[-1][1], None)
+        self.assertEqual(ranges[1][0], 5 + (1_000_000_008 - 5) // 2)
+        ids, _, _, _ = parallel_fetch(client, "media", workers=8)
+        self.assertEqual(ids.tolist(), [5, 70_000, 1_000_000_007])
+
+    def test_uuid_ids_and_filter(self):
+        rng = np.random.default_rng(5)
+        point_ids = [str(uuid.UUID(bytes=rng.bytes(16), version=4)) for _ in range(103)]
+        client = FakeQdrantCollection(self.vectors, self.payloads, ids=point_ids)
+        client.points.sort(key=lambda point: uuid.UUID(point.id).int)
+        ids, matrix, payloads, stats = parallel_fetch(client, "media", build_filter("image"), workers=3, batch_size=8)
+        self.assertEqual(sorted(ids.tolist()), sorted(i for i, p in zip(point_ids, self.payloads) if p["media_type"] == "image"))
+        self.assertEqual(ids.tolist(), sorted(ids.tolist(), key=lambda i: uuid.UUID(i).int))
+        self.assertEqual(len(matrix), 77)
+        self.assertEqual(stats["expected_points"], 77)
+
+    def test_bucket_partitions(self):
+        client = FakeQdrantCollection(self.vectors, self.payloads)
+        ids, matrix, payloads, stats = parallel_fetch(client, "media", workers=4, partition_by='bucket', batch_size=10)
+        self.assertEqual(sorted(ids.tolist()), [10 * (i + 1) for i in range(103)])
+        # Rows stay aligned with their ids and payloads
+        for point_id, row, payload in zip(ids.tolist(), matrix, payloads):
+            np.testing.assert_array_equal(row, self.vectors[point_id // 10 - 1])
+            self.assertEqual(payload["n"], point_id // 10 - 1)
+        self.assertEqual(stats["partition_by"], "bucket")
+
+        del client.points[0].payload["shard_bucket"]
+        with self.assertRaises(ValueError):
+            parallel_fetch(client, "media", workers=4, partition_by='bucket')
+
+    def test_empty_collection(self):
+        ids, matrix, payloads, stats = parallel_fetch(FakeQdrantCollection([]), "media", workers=4)
+        self.assertEqual(len(ids), 0)
+        self.assertEqual(stats["points"], 0)
+
+class TestProjection(unittest.TestCase):
+    def setUp(self):
+        self.payloads = [{"file_path": f"/p/{i}.jpg", "exif_data": {"Make": "X"}} for i in range(12)]
+        self.client = FakeQdrantCollection(np.ones((12, 4)), self.payloads)
+
+    def test_payload_selector(self):
+        self.assertIs(payload_selector(), True)
+        self.assertIs(payload_selector(include=[]), False)
+        self.assertEqual(payload_selector(include=("file_path",)).include, ["file_path"])
+        self.assertEqual(payload_selector(exclude=["exif_data"]).exclude, ["exif_data"])
+        with self.assertRaises(ValueError):
+            payload_selector(include=["file_path"], exclude=["exif_data"])
+
+    def test_fetch_without_vectors(self):
+        ids, matrix, payloads, cursor = fetch_points(self.client, "media", batch_size=5, max_items=7,
+                                                     with_payload=payload_selector(exclude=["exif_data"]),
+                                                     with_vectors=False)
+        self.assertEqual(ids, [10 * (i + 1) for i in range(7)])
+        self.assertEqual(matrix.shape, (7, 0))
+        self.assertEqual(payloads[0], {"file_path": "/p/0.jpg"})
+        self.assertFalse(any(call["with_vectors"] for call in self.client.scroll_calls))
+        ids, _, _, _ = fetch_points(self.client, "media", batch_size=5, with_payload=False, with_vectors=False,
+                                    cursor=cursor)
+        self.assertEqual(ids, [80, 90, 100, 110, 120])
+
+class TestQueryCache(unittest.TestCase):
+    def test_hits_and_saved_seconds(self):
+        cache = QueryCache()
+        key = QueryCache.key("media", media_type="image", cursor=None)
+        self.assertNotEqual(key, QueryCache.key("media", media_type="video", cursor=None))
+        self.assertIsNone(cache.get(key, version=0))
+        cache.put(key, 0, {"items": [1]}, seconds=0.25)
+        self.assertEqual(cache.get(key, version=0), {"items": [1]})
+        self.assertEqual(cache.get(key, version=0), {"items": [1]})
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (2, 1, 1))
+        self.assertAlmostEqual(stats["hit_rate"], 0.667)
+        self.assertAlmostEqual(stats["saved_seconds"], 0.5)
+
+    def test_hits_are_copies(self):
+        cache = QueryCache()
+        page = {"items": [{"id": 1, "metadata": {"tags": ["beach"]}}]}
+        cache.put("key", 0, page, seconds=0.1)
+        page["items"][0]["metadata"]["tags"].append("put")
+        hit = cache.get("key", version=0)
+        hit["items"][0]["metadata"]["tags"].append("hit")
+        hit["items"].clear()
+        self.assertEqual(cache.get("key", version=0), {"items": [{"id": 1, "metadata": {"tags": ["beach"]}}]})
+
+    def test_write_version_invalidates(self):
+        cache = QueryCache()
+        cache.put("key", 3, "result", seconds=0.1)
+        self.assertIsNone(cache.get("key", version=4))
+        # Dropped, not kept for the old version
+        self.assertIsNone(cache.get("key", version=3))
+        self.assertEqual(cache.stats()["invalidated"], 1)
+
+    def test_ttl(self):
+        cache = QueryCache(ttl=10)
+        with patch.object(qdrant_utils.time, "monotonic", return_value=100.0):
+            cache.put("key", 0, "result", seconds=0.1)
+        with patch.object(qdrant_utils.time, "monotonic", return_value=105.0):
+            self.assertEqual(cache.get("key", version=0), "result")
+        with patch.object(qdrant_utils.time, "monotonic", return_value=111.0):
+            self.assertIsNone(cache.get("key", version=0))
+        self.assertEqual(cache.stats()["expired"], 1)
+
+    def test_lru_eviction(self):
+        cache = QueryCache(max_entries=2)
+        cache.put("a", 0, "A", seconds=0)
+        cache.put("b", 0, "B", seconds=0)
+        cache.get("a", version=0)  # "b" is now the least recently used
+        cache.put("c", 0, "C", seconds=0)
+        self.assertIsNone(cache.get("b", version=0))
+        self.assertEqual(cache.get("a", version=0), "A")
+        self.assertEqual(cache.get("c", version=0), "C")
+        self.assertEqual(cache.stats()["evicted"], 1)
+
+        cache.clear()
+        self.assertEqual(cache.stats(), {"entries": 0, "hits": 0, "misses": 0, "expired": 0, "invalidated": 0,
+                                         "evicted": 0, "hit_rate": None, "saved_seconds": 0.0})
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.directory = Path(tempfile.mkdtemp())
+        self.vectors = rng.normal(size=(30, 6)).astype(np.float32)
+        self.payloads = [
+            {"file_path": f"/p/{i}.jpg", "media_type": "image" if i % 2 else "video", "indexed_at": 100.0 + i}
+            for i in range(30)
+        ]
+        self.client = FakeQdrantCollection(self.vectors, self.payloads)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def upsert(self, point_id, vector, payload):
+        self.client.points = [p for p in self.client.points if p.id != point_id]
+        self.client.points.append(MockPoint(id=point_id, vector=list(map(float, vector)), payload=payload))
+        self.client.points.sort(key=lambda point: point.id)
+
+    def assert_matches_collection(self, snapshot):
+        ids = [p.id for p in self.client.points]
+        self.assertEqual(sorted(snapshot.ids()), ids)
+        rows = snapshot.rows(ids)
+        expected = np.array([p.vector for p in self.client.points], dtype=np.float32)
+        expected /= np.linalg.norm(expected, axis=1, keepdims=True)
+        np.testing.assert_allclose(snapshot.embeddings()[rows], expected, rtol=1e-6)
+        self.assertEqual(snapshot.payloads(rows), [p.payload for p in self.client.points])
+
+    def test_export_and_read(self):
+        stats = export_snapshot(self.client, "media", self.directory, workers=3, batch_size=7)
+        snapshot = Snapshot(self.directory)
+
+        self.assertEqual(stats["points"], 30)
+        self.assertEqual(len(snapshot), 30)
+        self.assertEqual(snapshot.manifest["watermark"], 129.0)
+        embeddings = snapshot.embeddings()
+        self.assertIsInstance(embeddings, np.memmap)
+        self.assertEqual(embeddings.dtype, np.float32)
+        self.assert_matches_collection(snapshot)
+        self.assertEqual(snapshot.payloads([0], ["file_path"]), [{"file_path": "/p/0.jpg"}])
+
+        items = [{"id": 20, "metadata": {"file_path": "kept"}}, {"id": 999}]
+        snapshot.fill_metadata(items, ["file_path", "media_type"])
+        self.assertEqual(items[0]["metadata"], {"file_path": "kept", "media_type": "image"})
+        self.assertNotIn("metadata", items[1])
+
+    def test_filtered_export(self):
+        export_snapshot(self.client, "media", self.directory, media_type="image", workers=2)
+        snapshot = Snapshot(self.directory)
+        self.assertEqual(len(snapshot), 15)
+        self.assertEqual(set(snapshot.column("media_type")), {"image"})
+
+    def test_incremental_refresh(self):
+        export_snapshot(self.client, "media", self.directory, workers=2)
+        old_files = set(Snapshot(self.directory).manifest["columns"].values())
+        rng = np.random.default_rng(4)
+        self.upsert(50, rng.normal(size=6), {"file_path": "/p/changed.jpg", "media_type": "image", "indexed_at": 200.0})
+        self.upsert(1000, rng.normal(size=6), {"file_path": "/p/new.jpg", "media_type": "video", "indexed_at": 201.0})
+        self.client.points = [p for p in self.client.points if p.id != 120]
+        self.client.scroll_calls.clear()
+
+        stats = refresh_snapshot(self.client, self.directory)
+        snapshot = Snapshot(self.directory)
+
+        self.assertEqual((stats["updated"], stats["added"], stats["deleted"]), (1, 1, 1))
+        self.assert_matches_collection(snapshot)
+        self.assertEqual(snapshot.manifest["watermark"], 201.0)
+        # Only changed points are read with vectors; the old generation's files are gone
+        self.assertEqual(sum(call["with_vectors"] for call in self.client.scroll_calls), 1)
+        self.assertFalse(any((self.directory / name).exists() for name in old_files))
+
+        # Nothing new: the watermark point itself is not fetched again as a change
+        stats = refresh_snapshot(self.client, self.directory)
+        self.assertEqual((stats["updated"], stats["added"], stats["deleted"]), (0, 0, 0))
+        self.assertEqual(Snapshot(self.directory).manifest["generation"], snapshot.manifest["generation"])
+
+    def test_refresh_delete_and_add(self):
+        export_snapshot(self.client, "media", self.directory)
+        # One point deleted and one added whose upsert time predates the watermark (e.g. a writer with a slow
+        # clock): the live count equals the snapshot's, yet the deleted point must go
+        self.client.points = [p for p in self.client.points if p.id != 30]
+        self.upsert(1000, np.ones(6), {"file_path": "/p/late.jpg", "media_type": "image", "indexed_at": 1.0})
+
+        stats = refresh_snapshot(self.client, self.directory)
+        snapshot = Snapshot(self.directory)
+        self.assertEqual((stats["updated"], stats["added"], stats["deleted"]), (0, 0, 1))
+        self.assertNotIn(30, list(snapshot.ids()))
+        self.assertEqual(len(snapshot), len(self.client.points) - 1)
+
+    def test_refresh_needs_watermark(self):
+        for payload in self.payloads:
+            del payload["indexed_at"]
+        export_snapshot(self.client, "media", self.directory)
+        with self.assertRaises(ValueError):
+            refresh_snapshot(self.client, self.directory)
+
+    def test_missing_snapshot(self):
+        with self.assertRaises(FileNotFoundError):
+            Snapshot(self.directory / "missing")
+
+if __name__ == '__main__':
+    unittest.main()
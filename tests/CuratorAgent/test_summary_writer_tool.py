@@ -1,9 +1,14 @@
 import unittest
-from unittest.mock import patch, MagicMock
+import os
+from unittest.mock import patch
 from pathlib import Path
 import json
 import shutil
+import numpy as np
+from CuratorAgent.tools import chat_utils
 from CuratorAgent.tools.SummaryWriterTool import SummaryWriterTool
+from CuratorAgent.tools.qdrant_utils import export_snapshot
+from test_base import FakeQdrantCollection, StubChatServer
 
 class TestSummaryWriterTool(unittest.TestCase):
     def setUp(self):
@@ -42,26 +47,27 @@ class TestSummaryWriterTool(unittest.TestCase):
         
         self.test_output_dir = "test_summaries"
         
-        # Mock OpenAI response
-        self.mock_response = MagicMock()
-        self.mock_response.choices = [
-            MagicMock(
-                message=MagicMock(
-                    content="This is a test summary for the cluster."
-                )
-            )
-        ]
+        # Summaries come from a local stub of the chat API; retries don't wait
+        self.server = self.start_server()
+        patcher = patch.object(chat_utils, "retry_delay", return_value=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def start_server(self, **kwargs):
+        server = StubChatServer(**kwargs).__enter__()
+        self.addCleanup(server.__exit__)
+        patcher = patch.dict(os.environ, {"OPENAI_BASE_URL": server.url, "OPENAI_API_KEY": "test-key"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return server
     
     def tearDown(self):
         # Clean up test directory
         if Path(self.test_output_dir).exists():
             shutil.rmtree(self.test_output_dir)
     
-    @patch('CuratorAgent.tools.SummaryWriterTool.client')
-    def test_basic_summary_generation(self, mock_client):
+    def test_basic_summary_generation(self):
         """Test basic summary generation functionality"""
-        mock_client.chat.completions.create.return_value = self.mock_response
-        
         summary_tool = SummaryWriterTool(
             clusters=self.test_clusters,
             output_dir=self.test_output_dir
@@ -96,11 +102,8 @@ class TestSummaryWriterTool(unittest.TestCase):
         self.assertIn("summaries", saved_data)
         self.assertIn("statistics", saved_data)
     
-    @patch('CuratorAgent.tools.SummaryWriterTool.client')
-    def test_cluster_metadata_analysis(self, mock_client):
+    def test_cluster_metadata_analysis(self):
         """Test cluster metadata analysis"""
-        mock_client.chat.completions.create.return_value = self.mock_response
-        
         summary_tool = SummaryWriterTool(
             clusters=self.test_clusters,
             output_dir=self.test_output_dir
@@ -117,11 +120,8 @@ class TestSummaryWriterTool(unittest.TestCase):
         self.assertEqual(cluster_1_summary["media_types"]["image"], 1)
         self.assertNotIn("video", cluster_1_summary["media_types"])
     
-    @patch('CuratorAgent.tools.SummaryWriterTool.client')
-    def test_empty_clusters(self, mock_client):
+    def test_empty_clusters(self):
         """Test handling of empty clusters"""
-        mock_client.chat.completions.create.return_value = self.mock_response
-        
         empty_clusters = {}
         summary_tool = SummaryWriterTool(
             clusters=empty_clusters,
@@ -136,11 +136,10 @@ class TestSummaryWriterTool(unittest.TestCase):
         self.assertEqual(result["statistics"]["total_clusters"], 0)
         self.assertEqual(result["statistics"]["total_items"], 0)
     
-    @patch('CuratorAgent.tools.SummaryWriterTool.client')
-    def test_api_error_handling(self, mock_client):
+    def test_api_error_handling(self):
         """Test handling of OpenAI API errors"""
         # Simulate API error
-        mock_client.chat.completions.create.side_effect = Exception("API Error")
+        self.server.failures = [(400, "API Error", {})] * 2
         
         summary_tool = SummaryWriterTool(
             clusters=self.test_clusters,
@@ -152,12 +151,17 @@ class TestSummaryWriterTool(unittest.TestCase):
         # Check error handling
         self.assertEqual(result["status"], "error")
         self.assertIn("API Error", result["message"])
+        self.assertEqual(result["statistics"]["failed_clusters"], 2)
+        self.assertTrue(all("API Error" in s["summary"] for s in result["summaries"].values()))
+
+        # With some clusters summarized, failures are reported per cluster
+        self.server.failures = [(400, "API Error", {})]
+        result = SummaryWriterTool(clusters=self.test_clusters, concurrency=1, output_dir=self.test_output_dir).run()
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["statistics"]["failed_clusters"], 1)
     
-    @patch('CuratorAgent.tools.SummaryWriterTool.client')
-    def test_shared_state(self, mock_client):
+    def test_shared_state(self):
         """Test if summaries are stored in shared state"""
-        mock_client.chat.completions.create.return_value = self.mock_response
-        
         summary_tool = SummaryWriterTool(
             clusters=self.test_clusters,
             output_dir=self.test_output_dir
@@ -169,5 +173,92 @@ class TestSummaryWriterTool(unittest.TestCase):
         self.assertIsNotNone(shared_results)
         self.assertEqual(shared_results["statistics"], result["statistics"])
 
+    def test_representative_items(self):
+        """Test that profiles from ClusterTool pick the items described in the prompt"""
+        summary_tool = SummaryWriterTool(
+            clusters=self.test_clusters,
+            profiles={"0": {"size": 2, "representatives": ["test_2"], "cohesion": 0.91}},
+            output_dir=self.test_output_dir
+        )
+        result = summary_tool.run()
+        self.assertEqual(result["status"], "success")
+        
+        # Requests run concurrently, so find each cluster's prompt by its cohesion line
+        prompts = {("0" if "0.91" in prompt else "1"): prompt for prompt in self.server.prompts()}
+        self.assertIn("beach_2.mp4", prompts["0"])
+        self.assertNotIn("beach_1.jpg", prompts["0"])
+        # Clusters without a profile fall back to their first items
+        self.assertIn("mountain_1.jpg", prompts["1"])
+
+    def test_snapshot_metadata(self):
+        """Test that clusters of bare ids are summarized with metadata read from a snapshot"""
+        snapshot_dir = Path(self.test_output_dir) / "snapshot"
+        payloads = [
+            {"file_path": f"/path/to/clip_{i}.mp4", "media_type": "video", "duration": 12.5 + i}
+            for i in range(5)
+        ]
+        export_snapshot(FakeQdrantCollection(np.eye(5), payloads), "media", snapshot_dir)
+
+        summary_tool = SummaryWriterTool(
+            clusters={"0": [{"id": 10 * (i + 1)} for i in range(5)]},
+            profiles={"0": {"representatives": [20]}},
+            snapshot_dir=str(snapshot_dir),
+            output_dir=self.test_output_dir
+        )
+        result = summary_tool.run()
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["summaries"]["0"]["media_types"], {"video": 5})
+
+        prompt = self.server.prompts()[-1]
+        self.assertIn("clip_1.mp4", prompt)
+        self.assertIn("Duration: 13.5", prompt)
+        self.assertNotIn("clip_0.mp4", prompt)
+
+    def test_concurrent_requests(self):
+        """Test that clusters are summarized concurrently up to the limit and saved as they complete"""
+        server = self.start_server(delay=0.2)
+        clusters = {str(i): [{"id": i, "metadata": {"file_path": f"/path/to/{i}.jpg", "media_type": "image"}}]
+                    for i in range(6)}
+        summary_tool = SummaryWriterTool(clusters=clusters, concurrency=3, output_dir=self.test_output_dir)
+        result = summary_tool.run()
+
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(list(result["summaries"]), [str(i) for i in range(6)])
+        self.assertEqual(len(server.requests), 6)
+        self.assertEqual(server.max_in_flight, 3)
+        # Two waves of 0.2s, not six
+        self.assertLess(result["statistics"]["seconds"], 1.0)
+        self.assertEqual(server.requests[0]["model"], "gpt-4o-mini")
+
+        with open(Path(self.test_output_dir) / "cluster_summaries.jsonl") as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual(sorted(line["cluster_id"] for line in lines), [str(i) for i in range(6)])
+        self.assertEqual(lines[0]["summary"], "This is a test summary for the cluster.")
+
+    def test_retries_and_timeouts(self):
+        """Test that rate-limited and failed requests are retried and slow clusters time out"""
+        self.server.failures = [(429, "Rate limit reached", {"Retry-After": "0"}), (503, "Overloaded", {})]
+        summary_tool = SummaryWriterTool(clusters=self.test_clusters, concurrency=1, output_dir=self.test_output_dir)
+        result = summary_tool.run()
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["statistics"]["retries"], 2)
+        self.assertEqual(result["statistics"]["requests"], 4)
+        self.assertEqual(result["statistics"]["failed_clusters"], 0)
+        self.assertEqual(result["summaries"]["0"]["summary"], "This is a test summary for the cluster.")
+
+        # Client errors other than 429 are not retried
+        self.server.failures = [(400, "Bad request", {})]
+        result = SummaryWriterTool(clusters={"1": self.test_clusters["1"]}, output_dir=self.test_output_dir).run()
+        self.assertEqual(result["status"], "error")
+        self.assertEqual(result["statistics"]["requests"], 1)
+        self.assertIn("Bad request", result["summaries"]["1"]["summary"])
+
+        self.server.delay = 0.5
+        summary_tool = SummaryWriterTool(clusters=self.test_clusters, cluster_timeout=0.1,
+                                         output_dir=self.test_output_dir)
+        result = summary_tool.run()
+        self.assertEqual(result["statistics"]["failed_clusters"], 2)
+        self.assertIn("timed out", result["summaries"]["0"]["summary"])
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
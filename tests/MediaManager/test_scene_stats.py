@@ -0,0 +1,84 @@
+import shutil
+import numpy as np
+import pytest
+import ffmpeg
+from MediaManager.tools import scene_stats
+from MediaManager.tools.scene_stats import (
+    cuts_from_metrics,
+    detect_scenes_cached,
+    file_fingerprint,
+    load_scene_stats,
+    save_scene_stats
+)
+from MediaManager.tools.scene_utils import detect_scenes
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg binary not available")
+
+@pytest.fixture
+def test_video(tmp_path):
+    # 6 second, 25 fps synthetic clip with hard cuts at 2s and 4s
+    video_path = tmp_path / "cuts.mp4"
+    parts = [ffmpeg.input(f'{src}=size=320x240:rate=25', f='lavfi', t=2) for src in ('testsrc', 'smptebars', 'rgbtestsrc')]
+    (
+        ffmpeg
+        .concat(*parts, v=1, a=0)
+        .output(str(video_path), vcodec='libx264', pix_fmt='yuv420p')
+        .overwrite_output()
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    return video_path
+
+def test_file_fingerprint_ignores_name_but_not_content(tmp_path):
+    a, b, c = tmp_path / "a.mp4", tmp_path / "b.mp4", tmp_path / "c.mp4"
+    a.write_bytes(b"video" * 1000)
+    b.write_bytes(b"video" * 1000)
+    c.write_bytes(b"video" * 999 + b"VIDEO")
+    assert file_fingerprint(str(a)) == file_fingerprint(str(b))
+    assert file_fingerprint(str(a)) != file_fingerprint(str(c))
+
+def test_save_and_load_scene_stats(tmp_path):
+    stats = {'fps': 25.0, 'total_frames': 4, 'metrics': {'hist_diff': np.array([np.nan, 0.1, 0.9, 0.2], dtype=np.float32)}}
+    path = tmp_path / "stats" / "video.npz"
+    save_scene_stats(path, stats)
+    loaded = load_scene_stats(path)
+    assert loaded['fps'] == 25.0 and loaded['total_frames'] == 4
+    assert np.array_equal(loaded['metrics']['hist_diff'], stats['metrics']['hist_diff'], equal_nan=True)
+    assert load_scene_stats(tmp_path / "missing.npz") is None
+
+def test_cuts_from_metrics_applies_threshold_and_min_scene_len():
+    diff = np.zeros(100, dtype=np.float32)
+    diff[0] = np.nan
+    diff[[10, 20, 30, 60]] = [0.9, 0.5, 0.9, 0.4]
+    metrics = {'hist_diff': diff}
+    assert cuts_from_metrics(metrics, 'histogram', threshold=0.35, min_scene_len=15) == [20, 60]
+    assert cuts_from_metrics(metrics, 'histogram', threshold=0.8, min_scene_len=15) == [30]
+    assert cuts_from_metrics(metrics, 'histogram', threshold=0.35, min_scene_len=5) == [10, 20, 30, 60]
+
+def test_cuts_from_metrics_reweights_content_components():
+    zeros = np.zeros(50, dtype=np.float32)
+    metrics = {
+        'content_val': zeros.copy(),
+        'delta_hue': zeros.copy(),
+        'delta_sat': zeros.copy(),
+        'delta_lum': zeros.copy(),
+        'delta_edges': zeros.copy(),
+    }
+    metrics['delta_lum'][30] = 90.0
+    metrics['content_val'][30] = 30.0
+    assert cuts_from_metrics(metrics, 'content', threshold=27.0) == [30]
+    # Hue-only weighting ignores the luma change
+    assert cuts_from_metrics(metrics, 'content', threshold=27.0, weights=(1.0, 0.0, 0.0, 0.0)) == []
+
+@requires_ffmpeg
+@pytest.mark.skipif(not scene_stats.SCENEDETECT_AVAILABLE, reason="PySceneDetect not installed")
+def test_detect_scenes_cached_matches_decoding_and_skips_it_when_cached(test_video, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "scene_stats")
+    for detector, thresholds in (('content', (27.0, 60.0)), ('histogram', (0.35, 0.9))):
+        for threshold in thresholds:
+            expected = detect_scenes(str(test_video), detector=detector, threshold=threshold)
+            assert detect_scenes_cached(str(test_video), cache_dir, detector=detector, threshold=threshold) == expected
+
+    def fail(*args, **kwargs):
+        raise AssertionError("video decoded despite cached metrics")
+    monkeypatch.setattr(scene_stats, "compute_scene_metrics", fail)
+    assert len(detect_scenes_cached(str(test_video), cache_dir, detector='content', threshold=27.0)) == 3
@@ -0,0 +1,92 @@
+import cv2
+import numpy as np
+import pytest
+from MediaManager.tools.scene_utils import (
+    SCENEDETECT_AVAILABLE,
+    HistogramDetector,
+    choose_sampling_mode,
+    compact_histogram,
+    cuts_to_scenes,
+    detect_cuts,
+    detect_cuts_parallel,
+    evenly_spaced_indices,
+    make_detector,
+    merge_segment_cuts,
+    plan_segments,
+    uniform_timestamps
+)
+
+def _solid_frame(value, size=(36, 64)):
+    return np.full(size + (3,), value, dtype=np.uint8)
+
+def _write_clip(path, cuts, total_frames, fps=10):
+    # Solid-colour scenes, a random colour per scene
+    colours = np.random.default_rng(0).integers(0, 256, size=(len(cuts) + 1, 3), dtype=np.uint8)
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), fps, (64, 36))
+    bounds = [0] + cuts + [total_frames]
+    for scene, (start, end) in enumerate(zip(bounds, bounds[1:])):
+        for _ in range(start, end):
+            writer.write(np.full((36, 64, 3), colours[scene], dtype=np.uint8))
+    writer.release()
+
+def test_compact_histogram_is_normalized():
+    frame = np.random.randint(0, 256, size=(36, 64, 3), dtype=np.uint8)
+    hist = compact_histogram(frame, bins=8)
+    assert hist.shape == (512,)
+    assert hist.sum() == pytest.approx(1.0)
+
+def test_histogram_detector_cuts_on_content_change():
+    detector = HistogramDetector(threshold=0.5, min_scene_len=5)
+    frames = [_solid_frame(20)] * 10 + [_solid_frame(220)] * 3 + [_solid_frame(20)] * 5
+    cuts = []
+    for frame_num, frame in enumerate(frames):
+        cuts.extend(detector.process_frame(frame_num, frame))
+    # The last change comes fewer than min_scene_len frames after the previous cut
+    assert cuts == [10]
+
+def test_make_detector_rejects_unknown_name():
+    with pytest.raises(ValueError):
+        make_detector('edges')
+
+def test_uniform_timestamps_caps_sample_count():
+    assert uniform_timestamps(60.0, 10.0, 100) == [5.0, 15.0, 25.0, 35.0, 45.0, 55.0]
+    # Three hours at one frame per 10s would be 1080 samples; the interval widens instead
+    assert len(uniform_timestamps(3 * 3600.0, 10.0, 240)) == 240
+    assert uniform_timestamps(0.0, 10.0, 240) == []
+
+def test_evenly_spaced_indices():
+    assert evenly_spaced_indices(5, 10) == [0, 1, 2, 3, 4]
+    assert evenly_spaced_indices(100, 4) == [0, 25, 50, 75]
+
+def test_choose_sampling_mode():
+    assert choose_sampling_mode(120.0, 8_000_000, 1920, 1080, 30.0) == 'scenes'
+    # Two hour lecture at 500 kbit/s: nearly static picture
+    assert choose_sampling_mode(7200.0, 500_000, 1280, 720, 30.0) == 'uniform'
+    # Two hour film at 8 Mbit/s
+    assert choose_sampling_mode(7200.0, 8_000_000, 1920, 1080, 24.0) == 'keyframes'
+
+def test_plan_segments_covers_video_with_aligned_warmup():
+    segments = plan_segments(total_frames=9000, fps=30.0, workers=4, frame_skip=2)
+    assert segments[0]['own_start'] == 0 and segments[-1]['own_end'] == 9000
+    for previous, segment in zip(segments, segments[1:]):
+        assert previous['own_end'] == segment['own_start']
+        assert segment['own_start'] % 3 == 0 and segment['warmup_start'] % 3 == 0
+        assert segment['own_start'] - segment['warmup_start'] >= 60  # 2s at 30 fps
+
+def test_merge_segment_cuts_reapplies_min_scene_len():
+    # 1005 comes from the next segment but is too close to 1000, like in a serial pass
+    assert merge_segment_cuts([[10, 400, 1000], [1005, 2000], [2000, 2500]], min_scene_len=15) == [400, 1000, 2000, 2500]
+
+def test_cuts_to_scenes():
+    assert cuts_to_scenes([], 300, 30.0) == []
+    assert cuts_to_scenes([90, 240], 300, 30.0) == [(0.0, 3.0), (3.0, 8.0), (8.0, 10.0)]
+
+@pytest.mark.skipif(not SCENEDETECT_AVAILABLE, reason="PySceneDetect not installed")
+@pytest.mark.parametrize('detector', ['content', 'histogram'])
+def test_parallel_cuts_match_serial_near_segment_starts(tmp_path, detector):
+    # 90s at 10 fps: three segments owning from frames 0, 300 and 600, each with a 20 frame warm-up
+    video_path = tmp_path / "cuts.avi"
+    _write_clip(video_path, [100, 285, 300, 315, 330, 598, 603, 620, 800], total_frames=900)
+    serial = detect_cuts(str(video_path), detector)['cuts']
+    assert detect_cuts_parallel(str(video_path), detector, workers=3)['cuts'] == serial
+    assert {300, 315, 598, 620}.issubset(serial) and 603 not in serial
@@ -0,0 +1,129 @@
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+import pytest
+import torch
+from MediaManager.tools.VideoBatchProcessor import VideoBatchProcessor
+from MediaManager.tools.video_metadata import VideoMetadata
+
+# The module, not the tool class the package exports under the same name
+batch_module = importlib.import_module('MediaManager.tools.VideoBatchProcessor')
+
+FRAMES_PER_VIDEO = 6
+
+class FakeProcessor:
+    """Turns each frame into a 2-d 'pixel' vector [frame value, 1] and records the batch sizes it sees."""
+    def __init__(self):
+        self.batch_sizes = []
+
+    def __call__(self, images, return_tensors):
+        self.batch_sizes.append(len(images))
+        return {'pixel_values': torch.tensor([[float(image[0, 0, 0]), 1.0] for image in images])}
+
+class FakeModel:
+    def get_image_features(self, pixel_values):
+        return pixel_values
+
+class FakeQdrantClient:
+    def __init__(self):
+        self.upserts = []
+
+    def upsert(self, collection_name, points, wait):
+        self.upserts.append(list(points))
+
+def _frame_values(video_path):
+    # Distinct values per video: 10 * (index in the file name) + frame number
+    index = int(Path(video_path).stem.split('_')[1])
+    return [10 * index + frame for frame in range(FRAMES_PER_VIDEO)]
+
+def fake_prepare_video(video_path, sampler, metadata, preview_dir, preview_format):
+    if Path(video_path).stem == 'clip_3':
+        raise RuntimeError("decoder crashed")
+    metadata.sampling_mode = 'uniform'
+    frames = [(1, i, float(i), np.full((4, 4, 3), value, dtype=np.uint8))
+              for i, value in enumerate(_frame_values(video_path))]
+    return {
+        'status': 'success',
+        'video_path': video_path,
+        'metadata': metadata,
+        'frames': frames,
+        'frames_planned': len(frames),
+        'ffmpeg_processes': 1,
+        'timings': {'decode_sec': 0.01}
+    }
+
+def fake_harvest_metadata(paths, max_concurrency, cache):
+    metadata = {path: VideoMetadata(filename=Path(path).name, file_path=path, duration_seconds=10.0) for path in paths}
+    return {'metadata': metadata, 'errors': {}, 'probed': len(paths), 'cache_hits': 0, 'elapsed_sec': 0.0}
+
+@pytest.fixture
+def stubbed_pipeline(monkeypatch):
+    fakes = {'processor': FakeProcessor(), 'model': FakeModel(), 'qdrant_client': FakeQdrantClient()}
+    for name, fake in fakes.items():
+        monkeypatch.setattr(batch_module, name, fake)
+    monkeypatch.setattr(batch_module, 'DEVICE', 'cpu')
+    monkeypatch.setattr(batch_module, 'mark_collection_written', lambda: None)
+    monkeypatch.setattr(batch_module, 'harvest_metadata', fake_harvest_metadata)
+    monkeypatch.setattr(batch_module, 'prepare_video', fake_prepare_video)
+    # Threads instead of spawned processes, so workers see the fake prepare_video
+    monkeypatch.setattr(batch_module, 'ProcessPoolExecutor',
+                        lambda max_workers, mp_context: ThreadPoolExecutor(max_workers=max_workers))
+    return fakes
+
+@pytest.fixture
+def video_paths(tmp_path):
+    paths = []
+    for i in range(4):
+        path = tmp_path / f"clip_{i}.mp4"
+        path.write_bytes(b"not decoded")
+        paths.append(str(path.resolve()))
+    return paths
+
+def test_batches_are_pooled_across_videos(stubbed_pipeline, video_paths):
+    result = VideoBatchProcessor(
+        input_paths=video_paths,
+        max_workers=2,
+        inference_batch_size=4,
+        upsert_batch_size=2
+    ).run()
+
+    # 18 frames from three videos: full batches of 4 regardless of video boundaries, then the tail
+    assert stubbed_pipeline['processor'].batch_sizes == [4, 4, 4, 4, 2]
+
+    points = [point for batch in stubbed_pipeline['qdrant_client'].upserts for point in batch]
+    assert sorted(point.id for point in points) == video_paths[:3]
+    for point in points:
+        assert point.vector == pytest.approx([np.mean(_frame_values(point.id)), 1.0])
+        assert point.payload['media_type'] == 'video'
+    assert [len(batch) for batch in stubbed_pipeline['qdrant_client'].upserts] == [2, 1]
+
+    assert result['status'] == 'warning'
+    assert result['processed_count'] == 3 and result['failed_count'] == 1
+    assert result['failed_paths'] == [video_paths[3]]
+    failed = next(video for video in result['videos'] if video['video_path'] == video_paths[3])
+    assert 'Worker failed: decoder crashed' in failed['message']
+
+    throughput = result['throughput']
+    assert throughput['inference_batches'] == 5
+    assert throughput['mean_batch_size'] == 3.6
+    assert throughput['footage_sec'] == 30.0
+    assert throughput['workers'] == 2
+    assert throughput['videos_per_sec'] > 0 and throughput['frames_per_sec'] > 0
+
+def test_same_named_clips_in_different_folders_keep_their_own_files(stubbed_pipeline, tmp_path):
+    # Camera cards repeat file names across folders, e.g. 100GOPRO/GOPR0001.MP4 and 101GOPRO/GOPR0001.MP4
+    for folder in ("100GOPRO", "101GOPRO"):
+        (tmp_path / "card" / folder).mkdir(parents=True)
+        (tmp_path / "card" / folder / "clip_0.mp4").write_bytes(b"not decoded")
+    output_dir = tmp_path / "output"
+    result = VideoBatchProcessor(
+        input_paths=[str(tmp_path / "card")],
+        output_dir=str(output_dir),
+        max_workers=2,
+        save_frames=True
+    ).run()
+
+    assert result['processed_count'] == 2
+    assert len(list((output_dir / "metadata").glob("clip_0_*_metadata.json"))) == 2
+    assert len(list((output_dir / "frames").glob("clip_0_*.jpg"))) == 2 * FRAMES_PER_VIDEO
@@ -0,0 +1,88 @@
+import os
+import shutil
+import pytest
+import ffmpeg
+from MediaManager.tools.video_metadata import (
+    ProbeCache,
+    harvest_metadata,
+    parse_frame_rate,
+    summarize_probe
+)
+
+requires_ffprobe = pytest.mark.skipif(
+    shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None, reason="ffmpeg/ffprobe binaries not available"
+)
+
+@pytest.fixture
+def test_videos(tmp_path):
+    # Three copies of a 1 second, 30000/1001 fps clip plus a file that is not a video
+    first = tmp_path / "clip_0.mp4"
+    (
+        ffmpeg
+        .input('testsrc=size=320x240:rate=30000/1001', f='lavfi', t=1)
+        .output(str(first), vcodec='libx264', pix_fmt='yuv420p')
+        .overwrite_output()
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    paths = [first]
+    for i in (1, 2):
+        paths.append(tmp_path / f"clip_{i}.mp4")
+        shutil.copy(first, paths[-1])
+    broken = tmp_path / "broken.mp4"
+    broken.write_bytes(b"not a video")
+    return [str(p) for p in paths], str(broken)
+
+def test_parse_frame_rate():
+    assert parse_frame_rate('30000/1001') == pytest.approx(29.97, abs=0.01)
+    assert parse_frame_rate('25/1') == 25.0
+    assert parse_frame_rate('25') == 25.0
+    assert parse_frame_rate('0/0') == 0.0
+    assert parse_frame_rate(None) == 0.0
+    # Never evaluated as code
+    assert parse_frame_rate("__import__('os').getcwd()") == 0.0
+
+def test_summarize_probe():
+    probe = {
+        'format': {'duration': '12.5', 'bit_rate': 'N/A'},
+        'streams': [
+            {'codec_type': 'audio', 'codec_name': 'aac'},
+            {'codec_type': 'video', 'codec_name': 'h264', 'width': 1920, 'height': 1080, 'r_frame_rate': '0/0', 'avg_frame_rate': '24000/1001'},
+        ],
+    }
+    summary = summarize_probe(probe)
+    assert summary['duration_seconds'] == 12.5
+    assert summary['bitrate'] == 0
+    assert summary['fps'] == pytest.approx(23.976, abs=0.001)
+    assert (summary['width'], summary['height'], summary['codec_name']) == (1920, 1080, 'h264')
+    with pytest.raises(ValueError):
+        summarize_probe({'format': {}, 'streams': [{'codec_type': 'audio'}]})
+
+def test_probe_cache_keys_on_size_and_mtime(tmp_path):
+    video = tmp_path / "a.mp4"
+    video.write_bytes(b"x" * 10)
+    cache_file = tmp_path / "probe_cache.json"
+    cache = ProbeCache(str(cache_file))
+    cache.put(str(video), video.stat(), {'fps': 25.0})
+    cache.save()
+
+    reloaded = ProbeCache(str(cache_file))
+    assert reloaded.get(str(video), video.stat()) == {'fps': 25.0}
+    stats = video.stat()
+    os.utime(video, ns=(stats.st_atime_ns, stats.st_mtime_ns + 1_000_000_000))
+    assert reloaded.get(str(video), video.stat()) is None
+
+@requires_ffprobe
+def test_harvest_metadata_concurrently_with_cache(test_videos, tmp_path):
+    videos, broken = test_videos
+    cache = ProbeCache(str(tmp_path / "probe_cache.json"))
+    result = harvest_metadata(videos + [broken], max_concurrency=2, cache=cache)
+
+    assert result['probed'] == 3 and result['cache_hits'] == 0
+    assert set(result['metadata']) == set(videos)
+    assert list(result['errors']) == [broken]
+    metadata = result['metadata'][videos[0]]
+    assert (metadata.width, metadata.height) == (320, 240)
+    assert metadata.fps == pytest.approx(29.97, abs=0.01)
+
+    again = harvest_metadata(videos, cache=ProbeCache(str(tmp_path / "probe_cache.json")))
+    assert again['probed'] == 0 and again['cache_hits'] == 3
@@ -0,0 +1,78 @@
+import shutil
+from pathlib import Path
+import pytest
+import ffmpeg
+from MediaManager.tools.video_pipeline import (
+    FrameSampler,
+    SceneInfo,
+    ffmpeg_process_count,
+    prepare_video
+)
+
+requires_ffmpeg = pytest.mark.skipif(
+    shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None, reason="ffmpeg/ffprobe binaries not available"
+)
+
+@pytest.fixture
+def test_video(tmp_path):
+    # 6 second, 25 fps synthetic clip with a hard cut at 3s
+    video_path = tmp_path / "cut.mp4"
+    first = ffmpeg.input('testsrc=size=320x240:rate=25', f='lavfi', t=3)
+    second = ffmpeg.input('smptebars=size=320x240:rate=25', f='lavfi', t=3)
+    (
+        ffmpeg
+        .concat(first, second, v=1, a=0)
+        .output(str(video_path), vcodec='libx264', pix_fmt='yuv420p')
+        .overwrite_output()
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    return video_path
+
+def test_plan_scene_frames():
+    scenes = [SceneInfo(1, 0.0, 4.0, 4.0), SceneInfo(2, 4.0, 6.0, 2.0)]
+    plan = FrameSampler.plan_scene_frames(scenes)
+    assert plan == [(1, 0, 1.0), (1, 1, 2.0), (1, 2, 3.0), (2, 0, 4.5), (2, 1, 5.0), (2, 2, 5.5)]
+
+def test_ffmpeg_process_count():
+    assert ffmpeg_process_count('scenes') == 2
+    assert ffmpeg_process_count('keyframes') == 3
+    assert ffmpeg_process_count('uniform') == 1
+
+def test_prepare_video_missing_file(tmp_path):
+    result = prepare_video(str(tmp_path / "missing.mp4"), FrameSampler())
+    assert result['status'] == 'error'
+
+@requires_ffmpeg
+def test_prepare_video_scenes(test_video):
+    sampler = FrameSampler(sampling_mode='scenes', scene_detector='histogram', show_progress=False)
+    result = prepare_video(str(test_video), sampler)
+
+    assert result['status'] == 'success'
+    assert result['metadata'].sampling_mode == 'scenes'
+    assert len(result['metadata'].scenes) == 2
+    assert result['frames_planned'] == 6
+    assert len(result['frames']) == 6
+    assert result['frames'][0][3].shape == (224, 298, 3)
+    assert set(result['timings']) == {'metadata_sec', 'frame_selection_sec', 'decode_sec'}
+
+@requires_ffmpeg
+def test_prepare_video_uniform(test_video):
+    pytest.importorskip("cv2")
+    result = prepare_video(str(test_video), FrameSampler(sampling_mode='uniform', sample_interval_sec=2.0))
+    assert result['status'] == 'success'
+    assert [t for _, _, t, _ in result['frames']] == [1.0, 3.0, 5.0]
+
+@requires_ffmpeg
+def test_prepare_video_previews_of_same_named_clips_do_not_collide(test_video, tmp_path):
+    # Camera cards repeat file names across folders, e.g. 100GOPRO/GOPR0001.MP4 and 101GOPRO/GOPR0001.MP4
+    clips = []
+    for folder in ("100GOPRO", "101GOPRO"):
+        (tmp_path / folder).mkdir()
+        clips.append(shutil.copy(test_video, tmp_path / folder / "GOPR0001.mp4"))
+    preview_dir = tmp_path / "previews"
+    sampler = FrameSampler(sampling_mode='scenes', scene_detector='histogram', show_progress=False)
+    posters = [prepare_video(str(clip), sampler, preview_dir=str(preview_dir))['metadata'].poster_path for clip in clips]
+
+    assert posters[0] != posters[1]
+    assert all(Path(poster).is_file() for poster in posters)
+    assert len(list(preview_dir.iterdir())) == 4  # a poster and a sprite sheet per clip
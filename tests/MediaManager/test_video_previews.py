@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from PIL import Image
+from MediaManager.tools.video_previews import VideoPreviewBuilder
+
+def make_frame(value, width=320, height=180):
+    return np.full((height, width, 3), value, dtype=np.uint8)
+
+def test_builder_picks_poster_and_tiles():
+    timestamps = [float(t) for t in range(10)]
+    builder = VideoPreviewBuilder(timestamps, max_tiles=4)
+    assert builder.poster_time == 5.0
+    assert len(builder.tile_times) == 4
+    assert builder.tile_times == [0.0, 2.0, 5.0, 7.0]
+
+def test_builder_without_timestamps_saves_nothing(tmp_path):
+    builder = VideoPreviewBuilder([])
+    assert builder.poster_time is None
+    assert builder.save(str(tmp_path), "empty") == {}
+
+def test_save_writes_poster_and_sprite_grid(tmp_path):
+    timestamps = [float(t) for t in range(6)]
+    builder = VideoPreviewBuilder(timestamps, poster_max_size=100, tile_width=40, max_tiles=5)
+    # Frames arrive in decode order and may repeat a timestamp (several plan entries per frame)
+    for t in timestamps + [3.0]:
+        builder.add(t, make_frame(int(t) * 40))
+
+    previews = builder.save(str(tmp_path), "clip")
+    with Image.open(previews['poster_path']) as poster:
+        assert max(poster.size) == 100
+    sprite = previews['sprite_sheet']
+    assert (sprite['columns'], sprite['rows']) == (3, 2)
+    assert (sprite['tile_width'], sprite['tile_height']) == (40, 22)
+    assert sprite['timestamps'] == builder.tile_times
+    with Image.open(sprite['path']) as sheet:
+        assert sheet.size == (3 * 40, 2 * 22)
+
+def test_save_rejects_unknown_format(tmp_path):
+    builder = VideoPreviewBuilder([0.0])
+    builder.add(0.0, make_frame(0))
+    with pytest.raises(ValueError):
+        builder.save(str(tmp_path), "clip", image_format="gif")
+
+def test_save_webp(tmp_path):
+    builder = VideoPreviewBuilder([0.0, 1.0])
+    for t in (0.0, 1.0):
+        builder.add(t, make_frame(128))
+    previews = builder.save(str(tmp_path), "clip", image_format="webp")
+    assert previews['poster_path'].endswith(('.webp', '.jpg'))  # JPEG if Pillow lacks WebP
+    assert previews['sprite_sheet']['path'].endswith(('.webp', '.jpg'))
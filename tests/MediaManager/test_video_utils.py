@@ -0,0 +1,128 @@
+import shutil
+import pytest
+import ffmpeg
+import numpy as np
+from PIL import Image
+from MediaManager.tools.video_utils import (
+    FrameSink,
+    extract_frames,
+    frame_output_size,
+    frame_select_command,
+    iter_frames,
+    iter_frames_seek,
+    output_stem,
+    parse_keyframe_packets,
+    select_expression,
+    timestamps_to_frame_numbers
+)
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg binary not available")
+
+@pytest.fixture
+def test_video(tmp_path):
+    # 8 second, 25 fps synthetic clip
+    video_path = tmp_path / "testsrc.mp4"
+    (
+        ffmpeg
+        .input('testsrc=size=320x240:rate=25', f='lavfi', t=8)
+        .output(str(video_path), vcodec='libx264', pix_fmt='yuv420p', g=50)  # keyframe every 2s
+        .overwrite_output()
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    return video_path
+
+def test_frame_output_size():
+    assert frame_output_size(3840, 2160) == (398, 224)
+    assert frame_output_size(1080, 1920) == (224, 398)
+    # Small videos are never upscaled
+    assert frame_output_size(160, 120) == (160, 120)
+
+def test_timestamps_to_frame_numbers():
+    assert timestamps_to_frame_numbers([0.0, 1.0, 2.02], 25) == [0, 25, 50]
+    with pytest.raises(ValueError):
+        timestamps_to_frame_numbers([1.0], 0)
+
+def _evaluate_select(expression, n):
+    # ffmpeg's expression functions, enough to evaluate select_expression output in Python
+    functions = {
+        'if_': lambda condition, then, otherwise: then if condition else otherwise,
+        'lt': lambda x, y: int(x < y),
+        'eq': lambda x, y: int(x == y),
+        'between': lambda x, low, high: int(low <= x <= high),
+        'n': n,
+    }
+    return eval(expression.replace('if(', 'if_('), functions)
+
+def test_select_expression_matches_exactly_the_requested_frames():
+    wanted = [0, 1, 2, 3, 9, 10, 50, 52, 53, 99]
+    expression = select_expression(wanted + [10, 2])  # duplicates and any order
+    assert expression.count('between(') == 3 and expression.count('eq(') == 2
+    assert [n for n in range(120) if _evaluate_select(expression, n)] == wanted
+
+def test_frame_select_command_stays_under_argument_limit(tmp_path):
+    # A long film in 'scenes' mode: 3 frames for each of 3,500 shots
+    frame_numbers = [shot * 150 + offset for shot in range(3500) for offset in (10, 75, 140)]
+    script_path = str(tmp_path / "select.txt")
+    command, graph = frame_select_command("film.mp4", frame_numbers, 298, 224, script_path)
+
+    max_arg_strlen = 32 * 4096  # Linux MAX_ARG_STRLEN
+    assert max(len(arg) for arg in command) < 1024 and sum(len(arg) + 1 for arg in command) < max_arg_strlen
+    assert command[command.index('-filter_complex_script') + 1] == script_path
+    assert len(graph) > max_arg_strlen  # would not have fit in a single argument
+    # A binary search over the ranges: each frame passes ~log2(10,500) nested tests, not one per requested frame
+    depth = max_depth = 0
+    for char in select_expression(frame_numbers):
+        depth += {'(': 1, ')': -1}.get(char, 0)
+        max_depth = max(max_depth, depth)
+    assert max_depth <= 16
+
+def test_output_stem_tells_same_named_videos_apart(tmp_path):
+    first = tmp_path / "100GOPRO" / "GOPR0001.MP4"
+    second = tmp_path / "101GOPRO" / "GOPR0001.MP4"
+    assert output_stem(str(first)).startswith("GOPR0001_")
+    assert output_stem(str(first)) != output_stem(str(second))
+    assert output_stem(str(first)) == output_stem(str(tmp_path / "100GOPRO" / ".." / "100GOPRO" / "GOPR0001.MP4"))
+
+@requires_ffmpeg
+def test_extract_frames_single_pass(test_video):
+    timestamps = [3.5, 0.0, 1.0, 1.0, 20.0]  # unsorted, duplicated and past the end
+    frames, stats = extract_frames(str(test_video), timestamps, fps=25, width=320, height=240)
+
+    assert stats['ffmpeg_processes'] == 1
+    assert stats['frames_requested'] == 5
+    assert stats['frames_decoded'] == 4
+    assert len(frames) == len(timestamps)
+    assert frames[0].shape == (224, 298, 3)
+    assert (frames[2] == frames[3]).all()
+    assert frames[4] is None
+
+def test_parse_keyframe_packets():
+    output = "0.000000,K__\n0.040000,___\nN/A,K_\n2.000000,K__\n"
+    assert parse_keyframe_packets(output) == [0.0, 2.0]
+
+@requires_ffmpeg
+def test_keyframes_only_decoding_matches_full_decode(test_video):
+    keyframes = dict(iter_frames(str(test_video), [1, 3], 298, 224, keyframes_only=True))
+    frames = dict(iter_frames(str(test_video), [50, 150], 298, 224))
+    assert (keyframes[1] == frames[50]).all()
+    assert (keyframes[3] == frames[150]).all()
+
+@requires_ffmpeg
+def test_iter_frames_seek(test_video):
+    samples = list(iter_frames_seek(str(test_video), [6.0, 1.3, 30.0], 298, 224))
+    assert [t for t, _ in samples] == [1.3, 6.0]
+    assert samples[0][1].shape == (224, 298, 3)
+
+def test_frame_sink_writes_downscaled_previews(tmp_path):
+    frame = np.zeros((224, 398, 3), dtype=np.uint8)
+    sink = FrameSink(str(tmp_path / "frames"), max_size=128)
+    sink.submit(frame, "scene_0001_frame_00.jpg")
+    sink.submit(frame, "scene_0001_frame_01.jpg")
+    result = sink.close()
+
+    written = sorted((tmp_path / "frames").glob("*.jpg"))
+    assert len(written) == 2
+    assert len(result['written']) == 2
+    assert result['failed'] == 0
+    with Image.open(written[0]) as img:
+        assert max(img.size) == 128
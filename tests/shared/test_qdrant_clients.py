@@ -0,0 +1,224 @@
+import asyncio
+import os
+import unittest
+from unittest.mock import patch
+from shared import qdrant_clients
+from shared.qdrant_clients import (
+    AsyncRetryingClient,
+    QdrantSettings,
+    RetryingClient,
+    bump_write_version,
+    close_async_clients,
+    close_clients,
+    get_async_client,
+    get_client,
+    is_transient,
+    resolve_collection,
+    write_version
+)
+
+class RecordingClient:
+    """Stands in for QdrantClient / AsyncQdrantClient and remembers its constructor arguments."""
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+class FlakyClient:
+    """Fails the first `failures` scroll calls with `error`."""
+    def __init__(self, failures, error):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def scroll(self, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return [], None
+
+    def create_collection(self, **kwargs):
+        self.calls += 1
+        raise self.error
+
+class AsyncFlakyClient(FlakyClient):
+    async def scroll(self, **kwargs):
+        return FlakyClient.scroll(self, **kwargs)
+
+def overloaded():
+    return qdrant_clients.UnexpectedResponse(503, "Service Unavailable", b"", {})
+
+class TestQdrantSettings(unittest.TestCase):
+    def test_from_env(self):
+        env = {"QDRANT_URL": "https://qdrant.example:6333", "QDRANT_API_KEY": "key",
+               "QDRANT_COLLECTION_NAME": "photos", "QDRANT_TIMEOUT": "3", "QDRANT_RETRIES": "5"}
+        with patch.dict(os.environ, env):
+            settings = QdrantSettings.from_env()
+            self.assertEqual(resolve_collection(), "photos")
+            self.assertEqual(resolve_collection("other"), "other")
+        self.assertEqual(settings.retries, 5)
+        args = settings.client_args()
+        self.assertEqual(args["url"], "https://qdrant.example:6333")
+        self.assertEqual(args["timeout"], 3)
+        self.assertNotIn("host", args)
+        # Keep-alive connections are pooled (qdrant-client disables them for localhost by default)
+        self.assertEqual(args["limits"].max_keepalive_connections, settings.max_connections)
+
+    def test_local_mode(self):
+        self.assertEqual(QdrantSettings.local().client_args(), {"location": ":memory:"})
+        self.assertEqual(QdrantSettings.local("/tmp/qdrant").client_args(), {"path": "/tmp/qdrant"})
+
+class TestSharedClients(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.multiple(qdrant_clients, QdrantClient=RecordingClient, AsyncQdrantClient=RecordingClient)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(close_clients)
+
+    def test_one_client_per_settings(self):
+        settings = QdrantSettings(host="qdrant", retries=2)
+        client = get_client(settings)
+        self.assertIsInstance(client, RetryingClient)
+        self.assertIs(get_client(settings), client)
+        self.assertIsNot(get_client(QdrantSettings(host="other")), client)
+        self.assertEqual(client.client.kwargs["host"], "qdrant")
+        self.assertEqual(client.retries, 2)
+
+        self.assertEqual(close_clients(), 2)
+        self.assertTrue(client.client.closed)
+        self.assertIsNot(get_client(settings), client)
+
+    def test_async_client_per_event_loop(self):
+        settings = QdrantSettings.local()
+
+        async def shared_clients():
+            client = get_async_client(settings)
+            self.assertIs(get_async_client(settings), client)
+            return client
+
+        first = asyncio.run(shared_clients())
+        self.assertIsInstance(first, AsyncRetryingClient)
+        self.assertEqual(first.client.kwargs, {"location": ":memory:"})
+        self.assertIsNot(asyncio.run(shared_clients()), first)
+
+class TestRetries(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(qdrant_clients, "retry_delay", return_value=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_transient_errors(self):
+        self.assertTrue(is_transient(overloaded()))
+        self.assertTrue(is_transient(qdrant_clients.ResponseHandlingException(TimeoutError("timed out"))))
+        self.assertFalse(is_transient(qdrant_clients.UnexpectedResponse(404, "Not Found", b"", {})))
+        self.assertFalse(is_transient(ValueError("bad request")))
+
+    def test_retries_transient_errors(self):
+        flaky = FlakyClient(failures=2, error=overloaded())
+        self.assertEqual(RetryingClient(flaky, retries=3).scroll(collection_name="media"), ([], None))
+        self.assertEqual(flaky.calls, 3)
+
+        flaky = FlakyClient(failures=5, error=overloaded())
+        with self.assertRaises(Exception):
+            RetryingClient(flaky, retries=2).scroll(collection_name="media")
+        self.assertEqual(flaky.calls, 3)
+
+    def test_no_retry(self):
+        flaky = FlakyClient(failures=1, error=ValueError("bad request"))
+        with self.assertRaises(ValueError):
+            RetryingClient(flaky).scroll(collection_name="media")
+        self.assertEqual(flaky.calls, 1)
+
+        # Calls that are not safe to repeat are passed through
+        flaky = FlakyClient(failures=1, error=overloaded())
+        with self.assertRaises(Exception):
+            RetryingClient(flaky).create_collection(collection_name="media")
+        self.assertEqual(flaky.calls, 1)
+
+    def test_async_retries(self):
+        flaky = AsyncFlakyClient(failures=2, error=overloaded())
+        result = asyncio.run(AsyncRetryingClient(flaky, retries=3).scroll(collection_name="media"))
+        self.assertEqual(result, ([], None))
+        self.assertEqual(flaky.calls, 3)
+
+@unittest.skipUnless(hasattr(qdrant_clients.QdrantClient, "recreate_collection"), "needs qdrant-client")
+class TestLocalMode(unittest.TestCase):
+    def test_sync_and_async(self):
+        from qdrant_client.http import models
+        settings = QdrantSettings.local()
+        vectors = models.VectorParams(size=2, distance=models.Distance.COSINE)
+        points = [models.PointStruct(id=i, vector=[1.0, float(i)]) for i in range(3)]
+
+        client = get_client(settings)
+        self.addCleanup(close_clients)
+        client.recreate_collection("media", vectors_config=vectors)
+        client.upsert("media", points=points)
+        self.assertEqual(get_client(settings).count("media").count, 3)
+
+        async def count_async():
+            async_client = get_async_client(settings)
+            await async_client.recreate_collection("media", vectors_config=vectors)
+            await async_client.upsert("media", points=points[:2])
+            count = (await async_client.count("media")).count
+            await close_async_clients()
+            return count
+
+        self.assertEqual(asyncio.run(count_async()), 2)
+
+    def test_write_versions(self):
+        client = get_client(QdrantSettings.local(collection_name="versions"))
+        self.addCleanup(close_clients)
+        self.assertEqual(write_version(client, "media"), 0)
+        self.assertEqual(bump_write_version(client, "media"), 1)
+        self.assertEqual(bump_write_version(client, "media"), 2)
+        self.assertEqual(write_version(client, "media"), 2)
+        self.assertEqual(write_version(client, "other"), 0)
+
+    def test_write_version_errors_are_not_a_missing_collection(self):
+        class VersionsClient:
+            """Versions collection that exists but answers every call with `error`."""
+            def __init__(self, error):
+                self.error = error
+                self.created = False
+
+            def retrieve(self, **kwargs):
+                return []
+
+            def upsert(self, **kwargs):
+                raise self.error
+
+            def create_collection(self, **kwargs):
+                self.created = True
+
+        client = VersionsClient(overloaded())
+        with self.assertRaises(qdrant_clients.UnexpectedResponse) as raised:
+            bump_write_version(client, "media")
+        self.assertEqual(raised.exception.status_code, 503)
+        self.assertFalse(client.created)
+
+        client.retrieve = lambda **kwargs: (_ for _ in ()).throw(overloaded())
+        with self.assertRaises(qdrant_clients.UnexpectedResponse):
+            write_version(client, "media")
+
+    def test_bump_write_version_when_another_writer_creates_the_collection(self):
+        client = get_client(QdrantSettings.local(collection_name="versions"))
+        self.addCleanup(close_clients)
+        upsert = client.upsert
+        versions = qdrant_clients.WRITE_VERSIONS_COLLECTION
+
+        def upsert_racing_another_writer(**kwargs):
+            # The first upsert finds no collection, and the other writer creates it before this one can
+            if versions not in [c.name for c in client.get_collections().collections]:
+                client.create_collection(versions, vectors_config=qdrant_clients.VectorParams(
+                    size=1, distance=qdrant_clients.Distance.DOT))
+                raise qdrant_clients.UnexpectedResponse(404, "Not Found", b"", {})
+            return upsert(**kwargs)
+
+        with patch.object(client, "upsert", side_effect=upsert_racing_another_writer):
+            self.assertEqual(bump_write_version(client, "media"), 1)
+        self.assertEqual(write_version(client, "media"), 1)
+
+if __name__ == '__main__':
+    unittest.main()